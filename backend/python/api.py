@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+ライブラリAPI（PDF解析・Excel編集・Excel検証・PDF生成）
+
+各段階のスクリプト（pdf_parser・excel_editor・excel_validator・pdf_generator）は
+1プロセス1ジョブのCLIとして、結果を標準出力に書き込みます。このモジュールは同じ処理を
+関数として呼び出し、結果を型付きのオブジェクトで返します。1プロセス内の複数スレッドから
+同時に呼び出せるため、常駐ワーカーの中で複数のジョブを並行して処理できます。
+
+    - 入力はパス、またはバイト列（メモリ上のPDF・Excel）
+    - 出力（編集済みExcel・生成したPDF）はバイト列で返し、出力ディレクトリを使わない
+    - sofficeが必要とする中間ファイルは呼び出しごとの作業ディレクトリに作成し、返す前に削除する
+    - 処理時間は呼び出しごとに timings に返す（timings.collect 参照、CLIの "timings" には含まれない）
+    - エラーは例外（ValueError: 入力・解析エラー、RuntimeError: Excel編集・PDF変換の失敗）
+
+    プロセス内で共有するのはキャッシュ（コンパイル済みテンプレート・生成結果キャッシュ・
+    環境検出結果）のみで、いずれも同じ入力に対して同じ値になるため、同時に作成されても結果は変わらない。
+    差分検証で再利用する検証結果もコンパイル済みテンプレートに保持するため、テンプレートのキャッシュの
+    上限（excel_formula.TEMPLATE_CACHE_SIZE）を超えるとテンプレートとともに破棄される。
+
+使用例:
+    import api
+
+    estimate = api.parse('ネクストビッツ', 'estimate', estimate_pdf_bytes)
+    invoice = api.parse('ネクストビッツ', 'invoice', '/path/to/請求書.pdf')
+    edited = api.edit('ネクストビッツ', template_bytes, {
+        'estimate': estimate.data, 'invoice': invoice.data, 'order_confirmation': {},
+        'estimate_filename': 'TRR-25-008_お見積書.pdf',
+    })
+    validation_data = api.make_validation_data(estimate.data, invoice.data)
+    rendered = api.render(edited.excel, 'ネクストビッツ', validation_data, optimize=True)
+    if rendered.success:
+        save(rendered.order_pdf, rendered.inspection_pdf)
+"""
+
+import io
+import os
+from typing import Dict, Any, List, NamedTuple, Optional, Union
+
+import scratch
+import timings
+
+# 入力（ファイルのパス、またはメモリ上のデータ）
+Source = Union[str, bytes]
+
+
+class ParseResult(NamedTuple):
+    """PDF解析の結果"""
+    company_name: str
+    pdf_type: str
+    data: Dict[str, Any]  # 抽出データ（pdf_parser の出力と同じ）
+    timings: Dict[str, float]
+
+
+class EditResult(NamedTuple):
+    """Excel編集の結果"""
+    excel: bytes  # 編集済みExcel
+    result: Dict[str, Any]  # 編集結果（excel_editor の出力と同じ、output_path は None）
+    timings: Dict[str, float]
+
+
+class ValidationResult(NamedTuple):
+    """Excel検証の結果"""
+    success: bool
+    checks: List[Dict[str, Any]]
+    errors: List[str]
+    calculation: str  # "cached" / "libreoffice"
+    timings: Dict[str, float]
+
+
+class RenderResult(NamedTuple):
+    """PDF生成＋生成PDFの検証の結果（検証エラーの場合PDFは None）"""
+    success: bool
+    order_pdf: Optional[bytes]
+    inspection_pdf: Optional[bytes]
+    validation: Dict[str, Any]
+    engine: str
+    cache: str  # "hit" / "miss" / "disabled"
+    optimization: Optional[Dict[str, Any]]
+    timings: Dict[str, float]
+
+
+def _write_input(source: Source, work_dir: str, filename: str) -> str:
+    """入力がバイト列なら作業ディレクトリに書き込み、パスを返す（sofficeはファイルしか読めないため）"""
+    if isinstance(source, str):
+        return source
+    path = os.path.join(work_dir, filename)
+    with open(path, 'wb') as f:
+        f.write(source)
+    return path
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def make_validation_data(estimate: Dict[str, Any], invoice: Dict[str, Any]) -> Dict[str, Any]:
+    """解析結果から検証データ（validate・render の引数）を作成（processService と同じ形式）"""
+    return {
+        'invoice': invoice,
+        'estimate': estimate,
+        'items_count': len(invoice.get('items') or []) or 1,
+    }
+
+
+def parse(company_name: str, pdf_type: str, pdf: Source) -> ParseResult:
+    """
+    PDFを解析してデータを抽出
+
+    Args:
+        company_name: 取引先名（ネクストビッツ or オフ・ビート・ワークス）
+        pdf_type: PDF種別（estimate/invoice/order_confirmation/delivery）
+        pdf: PDFファイルのパス、またはバイト列
+
+    Raises:
+        ValueError: 解析エラー（未対応の取引先、必要な項目が見つからない等）
+    """
+    import pdf_parser
+
+    with timings.collect() as collected:
+        data = pdf_parser.parse_pdf(company_name, pdf_type, pdf)
+    if 'error' in data:
+        raise ValueError(f"PDF解析エラー（{pdf_type}）: {data['error']}")
+    return ParseResult(company_name, pdf_type, data, collected)
+
+
+def edit(company_name: str, template: Source, data: Dict[str, Any]) -> EditResult:
+    """
+    テンプレートExcelに解析データを書き込み、編集済みExcelをバイト列で返す
+
+    Args:
+        company_name: 取引先名
+        template: テンプレートExcelファイルのパス、またはバイト列
+        data: 解析データ（estimate, invoice, order_confirmation, estimate_filename）
+
+    Raises:
+        RuntimeError: Excel編集エラー
+    """
+    import excel_editor
+
+    buffer = io.BytesIO()
+    with timings.collect() as collected:
+        result = excel_editor.edit_excel(company_name, template, buffer, data)
+    return EditResult(buffer.getvalue(), result, collected)
+
+
+def validate(excel: Source, company_name: str, validation_data: Dict[str, Any],
+             full_validation: bool = None) -> ValidationResult:
+    """
+    編集済みExcelを検証（excel_validator.validate_excel と同じ）
+
+    Args:
+        excel: Excelファイルのパス、またはバイト列
+        company_name: 取引先名
+        validation_data: 検証データ（make_validation_data() 参照）
+        full_validation: 差分検証を行わず全項目を検証するか（None: 環境変数に従う）
+    """
+    import excel_validator
+
+    with scratch.workspace('api_validate') as work_dir:
+        with timings.collect() as collected:
+            excel_path = _write_input(excel, work_dir, 'input.xlsx')
+            result = excel_validator.validate_excel(
+                excel_path, company_name, validation_data, full_validation=full_validation
+            )
+
+    # checksのpassedフィールドをboolに強制変換（excel_validator.mainと同じ、Matchオブジェクト対策）
+    checks = [{**check, 'passed': bool(check['passed'])} if 'passed' in check else check
+              for check in result.get('checks', [])]
+    return ValidationResult(
+        bool(result['success']), checks, list(result.get('errors', [])), result.get('calculation', ''), collected
+    )
+
+
+def render(excel: Source, company_name: str, validation_data: Dict[str, Any],
+           optimize: bool = False, linearize: bool = False) -> RenderResult:
+    """
+    注文書・検収書PDFを生成し、生成したPDFの表示値を検証（pdf_generator.render_and_validate と同じ）
+
+    Args:
+        excel: 編集済みExcelファイルのパス、またはバイト列
+        company_name: 取引先名
+        validation_data: 検証データ（make_validation_data() 参照）
+        optimize: 生成したPDFを最適化する
+        linearize: 最適化時にWeb表示用に線形化する
+
+    Raises:
+        RuntimeError: PDF変換の失敗（LibreOffice未インストール・タイムアウト等）
+    """
+    import pdf_generator
+
+    with scratch.workspace('api_render') as work_dir:
+        with timings.collect() as collected:
+            excel_path = _write_input(excel, work_dir, 'input.xlsx')
+            result = pdf_generator.render_and_validate(
+                excel_path, work_dir, company_name, validation_data, optimize, linearize
+            )
+            order_pdf = inspection_pdf = None
+            if result['success']:
+                order_pdf = _read_file(result['order_pdf_path'])
+                inspection_pdf = _read_file(result['inspection_pdf_path'])
+
+    return RenderResult(
+        result['success'], order_pdf, inspection_pdf, result['validation'], result['engine'], result['cache'],
+        result.get('optimization'), collected
+    )
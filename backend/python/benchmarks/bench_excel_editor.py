@@ -0,0 +1,45 @@
+"""Excel編集（excel_editor.py）のベンチマーク"""
+
+import shutil
+
+import openpyxl
+
+import excel_editor
+import excel_formula
+
+
+def test_edit_excel(benchmark, case, parsed_data, tmp_path):
+    """テンプレートの読み込みから保存・drawing復元まで（コンパイル済みテンプレートはキャッシュ済み）"""
+    benchmark.group = 'excel_editor'
+    output_path = str(tmp_path / 'output.xlsx')
+    result = benchmark(excel_editor.edit_excel, case.company_name, case.template, output_path, parsed_data)
+    assert result['success']
+
+
+def test_restore_drawing_from_template(benchmark, case, parsed_data, tmp_path):
+    """openpyxlで保存したファイルへのdrawing・キャッシュ値・マニフェストの復元"""
+    benchmark.group = 'excel_editor'
+    wb = openpyxl.load_workbook(case.template)
+    template_hash = excel_formula.template_hash(case.template)
+    template = excel_formula.register_template(template_hash, wb)
+    issue_date = excel_editor.apply_company_edits(wb, case.company_name, parsed_data)
+    snapshot = excel_formula.snapshot_workbook(wb)
+    cached = excel_editor.compute_cached_values(wb, snapshot)
+    edits = excel_formula.diff_workbook(template, *snapshot)
+    saved_path = str(tmp_path / 'saved.xlsx')
+    wb.save(saved_path)
+    output_path = str(tmp_path / 'output.xlsx')
+
+    def setup():
+        # 復元はファイルを書き換えるため、毎回openpyxlの保存直後の状態に戻す（計測対象外）
+        shutil.copyfile(saved_path, output_path)
+
+    benchmark.pedantic(
+        excel_editor.restore_drawing_from_template,
+        args=(case.template, output_path, issue_date, case.company_name),
+        kwargs={
+            'cached_values': cached['values'], 'write_manifest': cached['complete'],
+            'template_hash': template_hash, 'edits': edits,
+        },
+        setup=setup, rounds=20, warmup_rounds=1
+    )
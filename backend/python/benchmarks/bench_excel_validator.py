@@ -0,0 +1,56 @@
+"""Excel検証（excel_validator.py）の再計算・セル値参照のベンチマーク"""
+
+import pytest
+
+import excel_formula
+import excel_validator
+
+
+def test_validate_incremental(benchmark, case, edited_excel, validation_data):
+    """マニフェストの差分に関係するチェックのみ評価（デフォルトの検証経路）"""
+    benchmark.group = 'excel_validator'
+    result = benchmark(excel_validator.validate_excel, edited_excel, case.company_name, validation_data)
+    assert result['calculation'] == 'cached'
+
+
+def test_validate_cached_full(benchmark, case, edited_excel, validation_data):
+    """キャッシュ値をCSVに書き出して全項目を検証（--full）"""
+    benchmark.group = 'excel_validator'
+    result = benchmark(
+        excel_validator.validate_excel, edited_excel, case.company_name, validation_data, full_validation=True
+    )
+    assert result['calculation'] == 'cached'
+
+
+def test_validate_libreoffice(benchmark, soffice, case, edited_excel, validation_data):
+    """LibreOfficeで再計算して全項目を検証（マニフェストを信頼しない経路）"""
+    benchmark.group = 'excel_validator'
+    result = benchmark.pedantic(
+        excel_validator.validate_excel, args=(edited_excel, case.company_name, validation_data),
+        kwargs={'trust_cached_values': False}, rounds=3
+    )
+    assert result['calculation'] == 'libreoffice'
+
+
+def test_recalculate_template(benchmark, case, edited_excel):
+    """コンパイル済みテンプレートの全数式セルの再計算"""
+    benchmark.group = 'excel_validator'
+    template = excel_formula.load_compiled_template(excel_formula.template_hash(case.template))
+    values = benchmark(template.evaluate)
+    assert values
+
+
+def test_rule_lookups(benchmark, case, edited_excel, validation_data, tmp_path):
+    """CSVのセル値の読み込みとルール表の評価"""
+    benchmark.group = 'excel_validator'
+    csv_paths = excel_validator.export_values_to_csv(edited_excel, str(tmp_path))
+    result = benchmark(excel_validator.validate_with_rules, case.company_name, csv_paths, validation_data)
+    assert result['checks']
+
+
+@pytest.mark.parametrize('sheet_name', ['注文書', '検収書'])
+def test_extract_rendered_cells(benchmark, rendered_pdfs, sheet_name):
+    """生成済みPDFからの表示値の抽出（render_and_validate の検証）"""
+    benchmark.group = 'excel_validator'
+    cells = benchmark(excel_validator.extract_rendered_cells, rendered_pdfs[sheet_name], sheet_name)
+    assert cells
@@ -0,0 +1,36 @@
+"""PDF生成（pdf_generator.py）と1ジョブ全体のベンチマーク"""
+
+import openpyxl
+
+import pdf_generator
+
+
+def test_calculate_formulas_python(benchmark, edited_excel):
+    """Pythonでの数式計算（LibreOfficeのシート間参照の代替）"""
+    benchmark.group = 'pdf_generator'
+    wb = openpyxl.load_workbook(edited_excel)
+    values = benchmark(pdf_generator.calculate_formulas_python, wb)
+    assert values['注文書']
+
+
+def test_convert_excel_sheets_to_pdf(benchmark, soffice, edited_excel, tmp_path, monkeypatch):
+    """注文書・検収書シートのPDF変換（生成結果キャッシュは無効）"""
+    benchmark.group = 'pdf_generator'
+    monkeypatch.setenv('PDF_PROCESSOR_RENDER_CACHE', '0')
+    result = benchmark.pedantic(pdf_generator.convert_excel_sheets_to_pdf, args=(edited_excel, str(tmp_path)), rounds=3)
+    assert result['cache'] == 'disabled'
+
+
+def test_pipeline(benchmark, run_pipeline):
+    """PDF解析 → Excel編集 → Excel検証（LibreOfficeなし）"""
+    benchmark.group = 'pipeline'
+    result = benchmark.pedantic(run_pipeline, rounds=5, warmup_rounds=1)
+    assert result['checks']
+
+
+def test_pipeline_with_render(benchmark, soffice, run_pipeline, monkeypatch):
+    """PDF解析 → Excel編集 → Excel検証 → PDF生成＋表示値検証（生成結果キャッシュは無効）"""
+    benchmark.group = 'pipeline'
+    monkeypatch.setenv('PDF_PROCESSOR_RENDER_CACHE', '0')
+    result = benchmark.pedantic(run_pipeline, kwargs={'render': True}, rounds=3)
+    assert result['validation']['checks']
@@ -0,0 +1,26 @@
+"""PDF解析（pdf_parser.py）の抽出処理ごとのベンチマーク"""
+
+import pytest
+
+import pdf_parser
+from conftest import CASES
+
+# (取引先キー, PDF種別, 抽出関数)
+EXTRACTORS = [
+    ('nextbits', 'estimate', pdf_parser.extract_nextbits_estimate),
+    ('nextbits', 'invoice', pdf_parser.extract_nextbits_invoice),
+    ('offbeat', 'estimate', pdf_parser.extract_offbeat_estimate),
+    ('offbeat', 'invoice', pdf_parser.extract_offbeat_invoice),
+    ('offbeat', 'order_confirmation', pdf_parser.extract_offbeat_order_confirmation),
+]
+
+
+@pytest.mark.parametrize(
+    'company_key, pdf_type, extractor', EXTRACTORS,
+    ids=[f"{company_key}-{pdf_type}" for company_key, pdf_type, _ in EXTRACTORS]
+)
+def test_extract(benchmark, company_key, pdf_type, extractor):
+    benchmark.group = 'pdf_parser'
+    pdf_path = getattr(CASES[company_key], f"{pdf_type}_pdf")
+    result = benchmark(extractor, pdf_path)
+    assert 'error' not in result
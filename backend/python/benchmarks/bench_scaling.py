@@ -0,0 +1,56 @@
+"""
+PDF解析の明細行数に対するスケーリングのベンチマーク
+
+synthetic_documents.py で明細行数を変えた帳票PDFを生成し、解析時間を計測します。
+解析結果が期待値と一致することも確認します（group: pdf_parser_scaling、名前の items=N で比較）。
+"""
+
+import json
+
+import pytest
+
+import pdf_parser
+import synthetic_documents
+
+ITEM_COUNTS = [1, 10, 100, 1000]
+
+# 1000行の解析は1回数秒かかるため、ラウンド数を減らす
+ROUNDS = {1: 5, 10: 5, 100: 3, 1000: 1}
+
+DOCUMENTS = [
+    ('nextbits', 'estimate'),
+    ('nextbits', 'invoice'),
+    ('offbeat', 'estimate'),
+    ('offbeat', 'invoice'),
+]
+
+
+@pytest.fixture(scope='session')
+def synthetic_jobs(tmp_path_factory):
+    """(取引先キー, 明細行数) → job.json の内容を生成する関数（生成結果はセッション内で共有）"""
+    output_dir = str(tmp_path_factory.mktemp('synthetic'))
+    jobs = {}
+
+    def get(company_key: str, items: int):
+        if (company_key, items) not in jobs:
+            job_path = synthetic_documents.generate_job(output_dir, company_key, items)
+            with open(job_path, 'r', encoding='utf-8') as f:
+                jobs[(company_key, items)] = json.load(f)
+        return jobs[(company_key, items)]
+
+    return get
+
+
+@pytest.mark.parametrize('items', ITEM_COUNTS, ids=[f"items={items}" for items in ITEM_COUNTS])
+@pytest.mark.parametrize(
+    'company_key, pdf_type', DOCUMENTS,
+    ids=[f"{company_key}-{pdf_type}" for company_key, pdf_type in DOCUMENTS]
+)
+def test_parse_scaling(benchmark, synthetic_jobs, company_key, pdf_type, items):
+    benchmark.group = 'pdf_parser_scaling'
+    job = synthetic_jobs(company_key, items)
+    document = job['documents'][pdf_type]
+    result = benchmark.pedantic(
+        pdf_parser.parse_pdf, args=(job['company_name'], pdf_type, document['path']), rounds=ROUNDS[items]
+    )
+    assert result == document['expected']
@@ -0,0 +1,86 @@
+"""作業ディレクトリ管理（scratch.py）のスイーパーのベンチマーク"""
+
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import scratch
+
+# 残った作業ディレクトリの数（1回のスイープで削除する数）
+LEFTOVER_COUNT = 50
+
+
+@pytest.fixture
+def scratch_dir(tmp_path, monkeypatch):
+    """配置先をテスト用のディレクトリにする（tmpfs・既存の作業ディレクトリに影響させない）"""
+    root = tmp_path / 'scratch'
+    monkeypatch.setenv('PDF_PROCESSOR_SCRATCH_DIR', str(root))
+    return str(scratch.scratch_root())
+
+
+@pytest.fixture(scope='module')
+def dead_pid() -> int:
+    """終了済みのプロセスID（強制終了で残った作業ディレクトリの再現用）"""
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def _make_leftovers(root: str, pid: int) -> None:
+    for index in range(LEFTOVER_COUNT):
+        path = os.path.join(root, f"render.{pid}.leftover{index}")
+        os.makedirs(path)
+        with open(os.path.join(path, 'temp_full.pdf'), 'wb') as f:
+            f.write(b'0' * 1024)
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='終了済みプロセスの判定はPOSIXのみ')
+def test_sweep_root(benchmark, scratch_dir, dead_pid, monkeypatch):
+    """終了済みプロセスの作業ディレクトリの削除（使用中の作業ディレクトリは残す）"""
+    benchmark.group = 'scratch'
+    # 経過時間・容量の上限をすべての作業ディレクトリが超える設定でも、使用中のものは削除しない
+    monkeypatch.setenv('PDF_PROCESSOR_SCRATCH_MAX_AGE', '0')
+    monkeypatch.setenv('PDF_PROCESSOR_SCRATCH_QUOTA_MB', '0')
+    with scratch.workspace('job') as active_dir:
+        with open(os.path.join(active_dir, 'input.xlsx'), 'wb') as f:
+            f.write(b'0' * 1024)
+        result = benchmark.pedantic(
+            scratch.sweep_root, args=(scratch_dir,), setup=lambda: _make_leftovers(scratch_dir, dead_pid), rounds=5
+        )
+        assert result['orphaned'] == LEFTOVER_COUNT
+        assert result['expired'] == 0 and result['quota'] == 0
+        leftovers = [name for name in os.listdir(scratch_dir) if not name.startswith('.')]
+        assert leftovers == [os.path.basename(active_dir)]
+        assert os.path.exists(os.path.join(active_dir, 'input.xlsx'))
+    assert not os.path.exists(active_dir)
+
+
+def test_maybe_sweep_from_other_thread(scratch_dir, monkeypatch):
+    """別のスレッドが作業ディレクトリを作成した際のスイープで、使用中の作業ディレクトリを削除しない"""
+    monkeypatch.setenv('PDF_PROCESSOR_SCRATCH_MAX_AGE', '0')
+    monkeypatch.setenv('PDF_PROCESSOR_SCRATCH_QUOTA_MB', '0')
+    errors = []
+    other_dirs = []
+
+    def open_workspace():
+        try:
+            with scratch.workspace('api_render') as work_dir:
+                other_dirs.append(work_dir)
+        except Exception as e:
+            errors.append(e)
+
+    with scratch.workspace('api_validate') as active_dir:
+        # 前回のスイープから実行間隔が空いた状態にする
+        marker = os.path.join(scratch_dir, scratch.SWEEP_MARKER)
+        os.utime(marker, (0, 0))
+        thread = threading.Thread(target=open_workspace)
+        thread.start()
+        thread.join()
+        assert os.path.isdir(active_dir)
+
+    assert not errors
+    assert len(other_dirs) == 1
+    assert os.path.getmtime(marker) > 0
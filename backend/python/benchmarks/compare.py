@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+ベンチマーク結果の比較
+
+pytest-benchmark の --benchmark-json で保存した2つの結果（変更前・変更後）を比較し、
+閾値を超えて遅くなったベンチマーク（処理段階）があれば終了コード1で終了します。
+
+使用法:
+    python3 compare.py <baseline.json> <current.json> [--threshold 10] [--stat median] [--min-delta-ms 0.5]
+
+    --threshold: 遅くなったと判定する割合（%、デフォルト: 10）
+    --stat: 比較する統計値（min / median / mean、デフォルト: median）
+    --min-delta-ms: 差がこの時間（ミリ秒）未満なら割合によらず判定しない（計測誤差対策、デフォルト: 0.5）
+
+出力:
+    {
+        "success": false,
+        "stat": "median",
+        "threshold_percent": 10.0,
+        "regressions": [{"name": "...", "group": "excel_editor", "baseline_ms": 120.1, "current_ms": 140.3, "change_percent": 16.8}],
+        "improvements": [...],
+        "unchanged": [...],
+        "missing": ["..."],   # 変更前にのみあるベンチマーク
+        "added": ["..."]      # 変更後にのみあるベンチマーク
+    }
+"""
+
+import sys
+import json
+import argparse
+from typing import Dict, Any, List
+
+STATS = ('min', 'median', 'mean')
+
+
+def load_benchmarks(path: str) -> Dict[str, Dict[str, Any]]:
+    """結果ファイルのベンチマーク（fullname → ベンチマーク）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {benchmark['fullname']: benchmark for benchmark in data.get('benchmarks', [])}
+
+
+def compare(baseline: Dict[str, Dict[str, Any]], current: Dict[str, Dict[str, Any]],
+            threshold: float, stat: str = 'median', min_delta_ms: float = 0.5) -> Dict[str, Any]:
+    """
+    2つの結果を比較
+
+    Args:
+        baseline: 変更前の結果（load_benchmarks の戻り値）
+        current: 変更後の結果
+        threshold: 遅くなったと判定する割合（%）
+        stat: 比較する統計値
+        min_delta_ms: 判定しない差の上限（ミリ秒）
+
+    Returns:
+        比較結果（モジュールdocstringの出力形式を参照）
+    """
+    regressions: List[Dict[str, Any]] = []
+    improvements: List[Dict[str, Any]] = []
+    unchanged: List[Dict[str, Any]] = []
+
+    for name in sorted(set(baseline) & set(current)):
+        baseline_ms = baseline[name]['stats'][stat] * 1000
+        current_ms = current[name]['stats'][stat] * 1000
+        change_percent = (current_ms - baseline_ms) / baseline_ms * 100 if baseline_ms > 0 else 0.0
+        entry = {
+            "name": name,
+            "group": current[name].get('group'),
+            "baseline_ms": round(baseline_ms, 3),
+            "current_ms": round(current_ms, 3),
+            "change_percent": round(change_percent, 1),
+        }
+        if abs(current_ms - baseline_ms) < min_delta_ms:
+            unchanged.append(entry)
+        elif change_percent > threshold:
+            regressions.append(entry)
+        elif change_percent < -threshold:
+            improvements.append(entry)
+        else:
+            unchanged.append(entry)
+
+    return {
+        "success": not regressions,
+        "stat": stat,
+        "threshold_percent": threshold,
+        "regressions": regressions,
+        "improvements": improvements,
+        "unchanged": unchanged,
+        "missing": sorted(set(baseline) - set(current)),
+        "added": sorted(set(current) - set(baseline)),
+    }
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='ベンチマーク結果の比較')
+    parser.add_argument('baseline', help='変更前の結果（--benchmark-json の出力）')
+    parser.add_argument('current', help='変更後の結果（--benchmark-json の出力）')
+    parser.add_argument('--threshold', type=float, default=10.0, help='遅くなったと判定する割合（%%）')
+    parser.add_argument('--stat', choices=STATS, default='median', help='比較する統計値')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5, help='判定しない差の上限（ミリ秒）')
+    args = parser.parse_args()
+
+    try:
+        result = compare(
+            load_benchmarks(args.baseline), load_benchmarks(args.current),
+            args.threshold, args.stat, args.min_delta_ms
+        )
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        if not result["success"]:
+            sys.exit(1)
+
+    except Exception as e:
+        import traceback
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc()
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+ベンチマーク共通設定（pytest-benchmark）
+
+リポジトリ同梱の取引先ごとのフィクスチャ（tests/e2e/fixtures のPDF・テンプレート）と
+生成済みPDF（test_order_2506.pdf / test_inspection_2506.pdf）を入力に、各処理段階の所要時間を計測します。
+
+実行方法（backend/python で実行）:
+    pip install -r benchmarks/requirements.txt
+    python3 -m pytest benchmarks --benchmark-json=benchmarks/results/<名前>.json
+
+    # 変更前後の比較（閾値を超えて遅くなった段階があれば終了コード1）
+    python3 benchmarks/compare.py benchmarks/results/before.json benchmarks/results/after.json --threshold 10
+
+LibreOffice（soffice）が必要なベンチマークは、soffice が見つからない場合はスキップします。
+LibreOffice本体の代わりに代替の soffice（fake_soffice.py）を使うと、起動時間の揺らぎなしに計測できます。
+    PDF_PROCESSOR_SOFFICE=benchmarks/bin/soffice python3 -m pytest benchmarks
+キャッシュ（コンパイル済みテンプレート・生成結果・環境検出）はセッションごとの一時ディレクトリを使い、
+開発環境のキャッシュには影響させません。
+"""
+
+import os
+import sys
+import json
+import shutil
+from typing import Dict, Any, NamedTuple, Optional
+
+import pytest
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(os.path.dirname(PYTHON_DIR))
+FIXTURES_DIR = os.path.join(REPO_ROOT, 'tests', 'e2e', 'fixtures')
+
+sys.path.insert(0, PYTHON_DIR)
+
+# 生成済みPDF（注文書・検収書、ネクストビッツ 2025年6月分）
+RENDERED_ORDER_PDF = os.path.join(REPO_ROOT, 'test_order_2506.pdf')
+RENDERED_INSPECTION_PDF = os.path.join(REPO_ROOT, 'test_inspection_2506.pdf')
+
+
+class CompanyCase(NamedTuple):
+    """取引先ごとのベンチマーク入力"""
+    company_name: str
+    estimate_pdf: str
+    invoice_pdf: str
+    order_confirmation_pdf: Optional[str]
+    template: str
+
+
+CASES = {
+    'nextbits': CompanyCase(
+        'ネクストビッツ',
+        os.path.join(FIXTURES_DIR, 'nextbits', 'TRR-25-007_お見積書.pdf'),
+        os.path.join(FIXTURES_DIR, 'nextbits', 'TRR-25-007_請求書.pdf'),
+        None,
+        os.path.join(FIXTURES_DIR, 'nextbits', 'E2E_テラ【株式会社ネクストビッツ御中】注文検収書_2506.xlsx'),
+    ),
+    'offbeat': CompanyCase(
+        'オフ・ビート・ワークス',
+        os.path.join(FIXTURES_DIR, 'offbeat', '1951023-見積-offbeat-to-terra-202507.pdf'),
+        os.path.join(FIXTURES_DIR, 'offbeat', '2951023-請求_offbeat-to-terra-202507.pdf'),
+        os.path.join(FIXTURES_DIR, 'offbeat', '請書_offbeat-to-terra-202507.pdf'),
+        os.path.join(FIXTURES_DIR, 'offbeat', 'E2E_テラ【株式会社オフ・ビート・ワークス御中】注文検収書_2506.xlsx'),
+    ),
+}
+
+
+def pytest_configure(config):
+    """キャッシュディレクトリを実行ごとの一時ディレクトリにする（収集時の環境検出にも適用するためフィクスチャにしない）"""
+    import tempfile
+    config._benchmark_cache_dir = tempfile.mkdtemp(prefix='seikyu-henkan-bench-')
+    config._previous_cache_dir = os.environ.get('PDF_PROCESSOR_CACHE_DIR')
+    os.environ['PDF_PROCESSOR_CACHE_DIR'] = config._benchmark_cache_dir
+
+
+def pytest_unconfigure(config):
+    if config._previous_cache_dir is None:
+        os.environ.pop('PDF_PROCESSOR_CACHE_DIR', None)
+    else:
+        os.environ['PDF_PROCESSOR_CACHE_DIR'] = config._previous_cache_dir
+    shutil.rmtree(config._benchmark_cache_dir, ignore_errors=True)
+
+
+def soffice_available() -> bool:
+    import environment_probe
+    return shutil.which(environment_probe.soffice_command()) is not None
+
+
+@pytest.fixture(scope='session')
+def soffice():
+    """LibreOffice（soffice）が必要なベンチマーク用（見つからない場合はスキップ）"""
+    if not soffice_available():
+        pytest.skip('LibreOffice（soffice）が見つかりません')
+
+
+@pytest.fixture(params=sorted(CASES), scope='session')
+def case(request) -> CompanyCase:
+    return CASES[request.param]
+
+
+def parse_case(case: CompanyCase) -> Dict[str, Any]:
+    """フィクスチャのPDFを解析し、excel_editorに渡すデータ（processServiceのcombinedDataと同じ形式）を返す"""
+    import pdf_parser
+    data = {
+        'estimate': pdf_parser.parse_pdf(case.company_name, 'estimate', case.estimate_pdf),
+        'invoice': pdf_parser.parse_pdf(case.company_name, 'invoice', case.invoice_pdf),
+        'order_confirmation': {},
+        'estimate_filename': os.path.basename(case.estimate_pdf),
+    }
+    if case.order_confirmation_pdf:
+        data['order_confirmation'] = pdf_parser.parse_pdf(
+            case.company_name, 'order_confirmation', case.order_confirmation_pdf
+        )
+    return data
+
+
+def validation_data_for(data: Dict[str, Any]) -> Dict[str, Any]:
+    """excel_validatorに渡す検証データ（processServiceのvalidationDataと同じ形式）"""
+    return {
+        'invoice': data['invoice'],
+        'estimate': data['estimate'],
+        'items_count': len(data['invoice'].get('items') or []) or 1,
+    }
+
+
+@pytest.fixture(scope='session')
+def parsed_data(case) -> Dict[str, Any]:
+    data = parse_case(case)
+    for key in ('estimate', 'invoice', 'order_confirmation'):
+        assert 'error' not in data[key], json.dumps(data[key], ensure_ascii=False)
+    return data
+
+
+@pytest.fixture(scope='session')
+def validation_data(parsed_data) -> Dict[str, Any]:
+    return validation_data_for(parsed_data)
+
+
+@pytest.fixture(scope='session')
+def rendered_pdfs() -> Dict[str, str]:
+    """生成済みPDF（シート名 → パス）"""
+    return {'注文書': RENDERED_ORDER_PDF, '検収書': RENDERED_INSPECTION_PDF}
+
+
+@pytest.fixture(scope='session')
+def edited_excel(case, parsed_data, tmp_path_factory) -> str:
+    """編集済みExcel（マニフェスト付き）のパス"""
+    import excel_editor
+    output_path = str(tmp_path_factory.mktemp('edited') / 'output.xlsx')
+    excel_editor.edit_excel(case.company_name, case.template, output_path, parsed_data)
+    return output_path
+
+
+@pytest.fixture
+def run_pipeline(case, tmp_path):
+    """
+    1ジョブ分の処理（PDF解析 → Excel編集 → Excel検証、render=True でPDF生成＋表示値検証）を実行する関数
+
+    processService.executeProcess と同じ順序・データの受け渡しで各段階を呼び出す（サブプロセスは起動しない）。
+    """
+    import excel_editor
+    import excel_validator
+    import pdf_generator
+
+    def run(render: bool = False) -> Dict[str, Any]:
+        data = parse_case(case)
+        output_path = str(tmp_path / 'output.xlsx')
+        excel_editor.edit_excel(case.company_name, case.template, output_path, data)
+        validation_data = validation_data_for(data)
+        result = excel_validator.validate_excel(output_path, case.company_name, validation_data)
+        if render:
+            result = pdf_generator.render_and_validate(output_path, str(tmp_path), case.company_name, validation_data)
+        return result
+
+    return run
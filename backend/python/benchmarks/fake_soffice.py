@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+LibreOffice（soffice）の代替（ベンチマーク・負荷試験用）
+
+pdf_generator・excel_validator が使う soffice の呼び出し
+（--headless --convert-to pdf|ods|xlsx --outdir <dir> <file>）を模倣し、
+遅延時間の分布・失敗率を指定して決定的に応答します。LibreOffice本体の起動時間の揺らぎに
+左右されずに、本リポジトリ側の処理時間の計測や、並行実行・タイムアウト処理の試験ができます。
+
+使い方（いずれか）:
+    PATH=<backend/python>/benchmarks/bin:$PATH ...         # bin/soffice がこのスクリプトを呼び出す
+    PDF_PROCESSOR_SOFFICE=<backend/python>/benchmarks/bin/soffice ...
+
+出力:
+    pdf: 表示中のシートごとに1ページ。セルのキャッシュ値を表示書式で整形し、行・列の位置に配置する
+         （フォントは埋め込まないため表示は環境依存だが、pdfplumberで表示値を抽出できる）
+    ods: 入力ファイルをそのままコピー（本スクリプトの xlsx 変換でのみ読み戻す）
+    xlsx: 入力ファイルをそのままコピー（excel_editorが書き込んだキャッシュ値が再計算結果になる）
+    --version: "LibreOffice 0.0.0 fake-soffice"
+    --accept: 終了させられるまで待機（リスナーの模倣）
+
+環境変数:
+    PDF_PROCESSOR_FAKE_SOFFICE_LATENCY: 変換1回の遅延（ミリ秒、デフォルト: fixed:0）
+        fixed:<ms> / uniform:<最小ms>,<最大ms> / lognormal:<中央値ms>,<σ>
+    PDF_PROCESSOR_FAKE_SOFFICE_STARTUP_MS: プロファイル（-env:UserInstallation）初回使用時の追加遅延（デフォルト: 0）
+    PDF_PROCESSOR_FAKE_SOFFICE_FAILURE_RATE: 変換に失敗する割合（0〜1、出力なし・終了コード1）
+    PDF_PROCESSOR_FAKE_SOFFICE_HANG_RATE: 応答しなくなる割合（0〜1、タイムアウト処理の試験用）
+    PDF_PROCESSOR_FAKE_SOFFICE_SEED: 乱数のシード（指定時は入力ファイル名ごとに同じ遅延・結果になる）
+    PDF_PROCESSOR_FAKE_SOFFICE_LOG: 呼び出しごとの記録（JSON行）を追記するファイル
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+from datetime import datetime
+from typing import Dict, Any, List
+from urllib.parse import urlparse, unquote
+
+from text_pdf import PdfWriter
+
+VERSION_STRING = 'LibreOffice 0.0.0 fake-soffice'
+
+# PDFのレイアウト（ポイント）
+PAGE_WIDTH = 842
+PAGE_HEIGHT = 595
+MARGIN = 20
+FONT_SIZE = 6
+ROW_HEIGHT = 9
+COLUMN_SCALE = 3.0  # 列幅（文字数）→ ポイント
+DEFAULT_COLUMN_WIDTH = 8.43
+CELL_GAP = 6  # 隣接するセルの文字列が1つの単語にならない間隔
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def make_random(input_paths: List[str]) -> random.Random:
+    """乱数生成器（シード指定時は入力ファイル名ごとに決定的）"""
+    seed = os.getenv('PDF_PROCESSOR_FAKE_SOFFICE_SEED')
+    if seed is None:
+        return random.Random()
+    return random.Random(f"{seed}:{':'.join(os.path.basename(path) for path in input_paths)}")
+
+
+def sample_latency_ms(spec: str, rng: random.Random) -> float:
+    """遅延の分布指定（fixed / uniform / lognormal）から遅延時間（ミリ秒）を1つ得る"""
+    kind, _, params = spec.partition(':')
+    values = [float(value) for value in params.split(',') if value.strip()]
+    if kind == 'fixed':
+        return values[0] if values else 0.0
+    if kind == 'uniform':
+        return rng.uniform(values[0], values[1])
+    if kind == 'lognormal':
+        import math
+        return rng.lognormvariate(math.log(values[0]), values[1] if len(values) > 1 else 0.25)
+    raise ValueError(f"未対応の遅延分布: {spec}")
+
+
+def parse_arguments(argv: List[str]) -> Dict[str, Any]:
+    """soffice の引数のうち模倣に必要なものを取り出す"""
+    options: Dict[str, Any] = {"convert_to": None, "outdir": os.getcwd(), "inputs": [], "profile": None,
+                               "version": False, "accept": False}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == '--version':
+            options["version"] = True
+        elif arg.startswith('--accept'):
+            options["accept"] = True
+        elif arg == '--convert-to' and i + 1 < len(argv):
+            options["convert_to"] = argv[i + 1]
+            i += 1
+        elif arg == '--outdir' and i + 1 < len(argv):
+            options["outdir"] = argv[i + 1]
+            i += 1
+        elif arg.startswith('-env:UserInstallation='):
+            url = arg.split('=', 1)[1]
+            options["profile"] = unquote(urlparse(url).path) if url.startswith('file:') else url
+        elif not arg.startswith('-'):
+            options["inputs"].append(arg)
+        i += 1
+    return options
+
+
+def _first_section(number_format: str) -> str:
+    """表示書式の正の数のセクション（色指定・ロケール指定・余白指定を除く）"""
+    section = number_format.split(';')[0]
+    section = re.sub(r'\[[^\]]*\]', '', section)
+    section = re.sub(r'_.', '', section)
+    section = re.sub(r'\\(.)', r'"\1"', section)
+    return section.replace('@', '')
+
+
+def format_cell_value(value: Any, number_format: str) -> str:
+    """セルの値を表示書式（日付・桁区切り・通貨記号等の主な書式）で整形"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, str):
+        return value
+    fmt = _first_section(number_format or 'General')
+    if isinstance(value, datetime):
+        if fmt in ('', 'General'):
+            fmt = 'yyyy/m/d'
+        tokens = {
+            'yyyy': f"{value.year:04d}", 'yy': f"{value.year % 100:02d}",
+            'mm': f"{value.month:02d}", 'm': str(value.month),
+            'dd': f"{value.day:02d}", 'd': str(value.day),
+        }
+        parts = re.split(r'("[^"]*")', fmt)
+        return ''.join(
+            part[1:-1] if part.startswith('"') else
+            re.sub(r'yyyy|yy|mm|m|dd|d', lambda m: tokens[m.group(0).lower()], part, flags=re.IGNORECASE)
+            for part in parts
+        )
+    if fmt in ('', 'General'):
+        return str(int(value)) if float(value).is_integer() else str(value)
+
+    def number_text(pattern: str) -> str:
+        decimals = len(pattern.split('.')[1]) if '.' in pattern else 0
+        grouping = ',' if ',' in pattern else ''
+        return format(round(float(value), decimals), f"{grouping}.{decimals}f")
+
+    parts = re.split(r'("[^"]*")', fmt)
+    return ''.join(
+        part[1:-1] if part.startswith('"') else re.sub(r'[#0][#0,]*(?:\.[0#]+)?', lambda m: number_text(m.group(0)), part)
+        for part in parts
+    )
+
+
+def _column_positions(ws) -> Dict[int, float]:
+    """列番号 → 左端のx座標"""
+    from openpyxl.utils import get_column_letter
+    positions = {}
+    x = MARGIN
+    for col in range(1, ws.max_column + 2):
+        positions[col] = x
+        dimension = ws.column_dimensions.get(get_column_letter(col))
+        width = dimension.width if dimension is not None and dimension.width else DEFAULT_COLUMN_WIDTH
+        x += width * COLUMN_SCALE
+    return positions
+
+
+def workbook_to_pdf(input_path: str, output_path: str) -> None:
+    """表示中のシートごとに1ページのPDFを作成（セルのキャッシュ値を表示書式で配置）"""
+    import openpyxl
+
+    wb = openpyxl.load_workbook(input_path, data_only=True)
+    writer = PdfWriter(FONT_SIZE)
+    for ws in wb.worksheets:
+        if ws.sheet_state != 'visible':
+            continue
+        positions = _column_positions(ws)
+        items = []
+        for row in ws.iter_rows():
+            next_x = 0.0
+            for cell in row:
+                text = format_cell_value(cell.value, cell.number_format)
+                if not text:
+                    continue
+                # 前のセルの文字列がはみ出す場合は右にずらす（1つの単語として抽出されないように）
+                x = max(positions[cell.column], next_x)
+                y = PAGE_HEIGHT - MARGIN - cell.row * ROW_HEIGHT
+                items.append((x, y, text))
+                next_x = x + writer.text_width(text) + CELL_GAP
+        writer.add_page(items, PAGE_WIDTH, PAGE_HEIGHT)
+
+    with open(output_path, 'wb') as f:
+        f.write(writer.to_bytes())
+
+
+def convert(input_path: str, convert_to: str, outdir: str) -> str:
+    """1ファイルを変換し、出力ファイルのパスを返す"""
+    extension = convert_to.split(':')[0].lower()
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    output_path = os.path.join(outdir, f"{stem}.{extension}")
+    if extension == 'pdf':
+        workbook_to_pdf(input_path, output_path)
+    elif extension in ('ods', 'xlsx'):
+        shutil.copyfile(input_path, output_path)
+    else:
+        raise ValueError(f"未対応の変換形式: {convert_to}")
+    return output_path
+
+
+def _write_log(record: Dict[str, Any]) -> None:
+    log_path = os.getenv('PDF_PROCESSOR_FAKE_SOFFICE_LOG')
+    if not log_path:
+        return
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def run(argv: List[str]) -> int:
+    """soffice と同じ引数で実行し、終了コードを返す"""
+    options = parse_arguments(argv)
+    if options["version"]:
+        print(VERSION_STRING)
+        return 0
+    if options["accept"]:
+        # リスナーの模倣: 終了させられるまで待機
+        while True:
+            time.sleep(3600)
+
+    rng = make_random(options["inputs"])
+    started = time.time()
+    record: Dict[str, Any] = {"pid": os.getpid(), "args": argv, "started": started}
+
+    # プロファイルの初回使用（LibreOfficeのコールドスタート）
+    profile = options["profile"]
+    if profile and not os.path.isdir(profile):
+        os.makedirs(profile, exist_ok=True)
+        time.sleep(_env_float('PDF_PROCESSOR_FAKE_SOFFICE_STARTUP_MS', 0) / 1000)
+        record["cold_start"] = True
+
+    latency_ms = sample_latency_ms(os.getenv('PDF_PROCESSOR_FAKE_SOFFICE_LATENCY', 'fixed:0'), rng)
+    hang = rng.random() < _env_float('PDF_PROCESSOR_FAKE_SOFFICE_HANG_RATE', 0)
+    fail = rng.random() < _env_float('PDF_PROCESSOR_FAKE_SOFFICE_FAILURE_RATE', 0)
+    record["latency_ms"] = round(latency_ms, 1)
+
+    if hang:
+        record["outcome"] = "hang"
+        _write_log(record)
+        while True:
+            time.sleep(3600)
+
+    time.sleep(latency_ms / 1000)
+
+    exit_code = 0
+    if fail or not options["convert_to"]:
+        record["outcome"] = "failure"
+        print("Error: source file could not be loaded", file=sys.stderr)
+        exit_code = 1
+    else:
+        outputs = []
+        for input_path in options["inputs"]:
+            try:
+                outputs.append(convert(input_path, options["convert_to"], options["outdir"]))
+                print(f"convert {input_path} -> {outputs[-1]} using filter : fake-soffice")
+            except Exception as e:
+                print(f"Error: {e}", file=sys.stderr)
+                exit_code = 1
+        record["outcome"] = "success" if exit_code == 0 else "failure"
+        record["outputs"] = outputs
+
+    record["duration_ms"] = round((time.time() - started) * 1000, 1)
+    _write_log(record)
+    return exit_code
+
+
+def main():
+    """メイン関数"""
+    sys.exit(run(sys.argv[1:]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+負荷試験（同時ジョブ数を増やしたときのスループット・段階ごとの遅延・リソース使用量）
+
+月末に複数ユーザーが同時に処理を実行した状況を模して、取引先を混在させたジョブを
+指定した同時実行数で流し、サーバーと同じPythonの入口を通して処理します。
+同時実行数ごとにスループット、ジョブ全体と段階ごとの遅延（p50/p95/p99）、
+CPU時間・最大メモリ・同時に動いていた soffice のプロセス数を出力します。
+LibreOfficeの変換待ち（soffice.* の段階の遅延）が急増する同時実行数を確認できます。
+
+実行方式（--mode）:
+    subprocess: processService.executeProcess と同じく、段階ごとにサブプロセスを起動
+                （pdf_parser ×2〜3 → excel_editor → render_and_validate）
+    pipeline:   ジョブごとに main.py pipeline を1回起動（pipeline.py参照）
+    serve:      同時実行数と同じ数の main.py serve を常駐させ、"pipeline" コマンドを送る
+                （計測前に各プロセスで1ジョブずつ実行してウォームアップする）
+                --msgpack を指定すると serve --msgpack で起動し、テンプレート・PDFをバイト列のまま送る
+
+入力:
+    デフォルトは tests/e2e/fixtures の取引先ごとのPDF・テンプレート。
+    --synthetic-items N を指定すると、明細N行の合成PDF（synthetic_documents.py）を使う。
+
+使用法（backend/python で実行）:
+    python3 benchmarks/load_test.py [--mode subprocess|pipeline|serve] [--concurrency 1,2,4,8] [--jobs 20]
+                                    [--companies nextbits,offbeat] [--no-render] [--no-optimize]
+                                    [--render-cache] [--synthetic-items N] [--executable <pdf_processor.exe>]
+                                    [--msgpack]
+                                    [--timeout 600] [--output report.json]
+
+    --jobs: 同時実行数ごとに流すジョブ数
+    --no-render: PDFを生成せず excel_validator で検証（LibreOfficeなしで計測する場合）
+    --render-cache: PDF生成結果のキャッシュを使う（デフォルトは無効。同じ入力の繰り返しで変換が省略されるため）
+    --executable: PyInstallerでビルドした実行ファイル（Electron本番時と同じサブコマンド方式で起動）
+
+    LibreOfficeの代わりに fake_soffice.py を使う場合:
+        PDF_PROCESSOR_SOFFICE=benchmarks/bin/soffice PDF_PROCESSOR_FAKE_SOFFICE_LATENCY=lognormal:800,0.3 \\
+            python3 benchmarks/load_test.py --mode serve --concurrency 1,2,4,8,16
+
+出力:
+    {
+        "mode": "subprocess",
+        "render": true,
+        "cpu_count": 8,
+        "levels": [
+            {
+                "concurrency": 4,
+                "jobs": 20, "succeeded": 20, "failed": 0, "errors": [],
+                "wall_s": 31.2,
+                "throughput_jobs_per_s": 0.64,
+                "latency_ms": {"p50": 5900.1, "p95": 7420.3, "p99": 7610.0, "max": 7610.0, "mean": 6012.4},
+                "stages": {"pdf_parser.estimate": {"count": 20, "p50": ..., "p95": ..., "p99": ..., "max": ...}, ...},
+                "resources": {"cpu_user_s": 80.1, "cpu_system_s": 9.3, "cpu_utilization": 0.36,
+                              "max_rss_mb": 210.4, "loadavg_max": 5.1, "soffice_processes_max": 4}
+            }
+        ]
+    }
+    CPU時間は終了した子プロセスの合計のため、serve方式ではウォームアップ分を含む。
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import argparse
+import struct
+import tempfile
+import resource
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(os.path.dirname(PYTHON_DIR))
+FIXTURES_DIR = os.path.join(REPO_ROOT, 'tests', 'e2e', 'fixtures')
+
+MODES = ('subprocess', 'pipeline', 'serve')
+
+# 取引先キー → (取引先名, PDF種別 → フィクスチャのPDF, テンプレート)
+FIXTURE_JOBS = {
+    'nextbits': (
+        'ネクストビッツ',
+        {
+            'estimate': os.path.join(FIXTURES_DIR, 'nextbits', 'TRR-25-007_お見積書.pdf'),
+            'invoice': os.path.join(FIXTURES_DIR, 'nextbits', 'TRR-25-007_請求書.pdf'),
+        },
+        os.path.join(FIXTURES_DIR, 'nextbits', 'E2E_テラ【株式会社ネクストビッツ御中】注文検収書_2506.xlsx'),
+    ),
+    'offbeat': (
+        'オフ・ビート・ワークス',
+        {
+            'estimate': os.path.join(FIXTURES_DIR, 'offbeat', '1951023-見積-offbeat-to-terra-202507.pdf'),
+            'invoice': os.path.join(FIXTURES_DIR, 'offbeat', '2951023-請求_offbeat-to-terra-202507.pdf'),
+            'order_confirmation': os.path.join(FIXTURES_DIR, 'offbeat', '請書_offbeat-to-terra-202507.pdf'),
+        },
+        os.path.join(FIXTURES_DIR, 'offbeat', 'E2E_テラ【株式会社オフ・ビート・ワークス御中】注文検収書_2506.xlsx'),
+    ),
+}
+
+# 段階ごとに起動するスクリプト（サブコマンド → python3 で実行する引数、processService.runPythonScript と同じ）
+SCRIPT_COMMANDS = {
+    'render_and_validate': ['pdf_generator.py', 'render_and_validate'],
+    'serve': ['main.py', 'serve'],
+}
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """パーセンタイル（最近傍順位法）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), int(-(-p * len(ordered) // 100))))
+    return ordered[rank - 1]
+
+
+def distribution_ms(values: List[float]) -> Dict[str, Any]:
+    """秒の値のリスト → 件数・p50/p95/p99・最大（ミリ秒）"""
+    return {
+        "count": len(values),
+        **{name: round(percentile(values, p) * 1000, 1) if values else None
+           for name, p in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))},
+    }
+
+
+class ResourceSampler:
+    """負荷試験中のロードアベレージ・sofficeのプロセス数を定期的に記録（Linuxの/procのみ）"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.loadavg_max = 0.0
+        self.soffice_processes_max = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def count_soffice_processes() -> int:
+        """コマンドラインに soffice を含むプロセス数（fake_soffice.py を含む）"""
+        count = 0
+        try:
+            pids = [name for name in os.listdir('/proc') if name.isdigit()]
+        except OSError:
+            return 0
+        for pid in pids:
+            try:
+                with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                    argv = f.read().split(b'\0')[:2]
+            except OSError:
+                continue
+            if any(b'soffice' in os.path.basename(arg) for arg in argv):
+                count += 1
+        return count
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.loadavg_max = max(self.loadavg_max, os.getloadavg()[0])
+            except OSError:
+                pass
+            self.soffice_processes_max = max(self.soffice_processes_max, self.count_soffice_processes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class LoadTest:
+    """実行方式・入力を保持し、同時実行数ごとにジョブを流す"""
+
+    def __init__(self, mode: str, companies: List[str], render: bool, optimize: bool, work_dir: str,
+                 executable: Optional[str] = None, synthetic_items: Optional[int] = None, timeout: float = 600,
+                 msgpack: bool = False):
+        self.mode = mode
+        self.msgpack = msgpack
+        self.render = render
+        self.optimize = optimize
+        self.work_dir = work_dir
+        self.executable = executable
+        self.timeout = timeout
+        self.inputs = [self._job_input(company, synthetic_items) for company in companies]
+        self.env = dict(os.environ)
+        self._counter = 0
+        self._counter_lock = threading.Lock()
+
+    def _job_input(self, company: str, synthetic_items: Optional[int]) -> Dict[str, Any]:
+        """取引先キー → ジョブの入力（取引先名・PDF・テンプレート）"""
+        company_name, documents, template = FIXTURE_JOBS[company]
+        if synthetic_items:
+            sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+            import synthetic_documents
+            job_path = synthetic_documents.generate_job(
+                os.path.join(self.work_dir, 'inputs'), company, synthetic_items
+            )
+            with open(job_path, 'r', encoding='utf-8') as f:
+                job = json.load(f)
+            documents = {pdf_type: document['path'] for pdf_type, document in job['documents'].items()}
+        return {"company_name": company_name, "documents": documents, "template": template}
+
+    def command(self, subcommand: str, args: List[str]) -> List[str]:
+        """サブコマンドの起動引数（--executable 指定時はサブコマンド方式、それ以外は python3 <スクリプト>）"""
+        if self.executable:
+            return [self.executable, subcommand] + args
+        script = SCRIPT_COMMANDS.get(subcommand, [f'{subcommand}.py'])
+        return [sys.executable, os.path.join(PYTHON_DIR, script[0])] + script[1:] + args
+
+    def next_job(self) -> Dict[str, Any]:
+        """取引先を順に混在させた次のジョブ（ジョブごとの出力ディレクトリ付き）"""
+        with self._counter_lock:
+            index = self._counter
+            self._counter += 1
+        job = dict(self.inputs[index % len(self.inputs)])
+        job["output_dir"] = os.path.join(self.work_dir, f'job_{index:05d}')
+        os.makedirs(job["output_dir"], exist_ok=True)
+        return job
+
+    def _run_script(self, subcommand: str, args: List[str], frames: Dict[str, bytes] = None,
+                    bundle: bool = False) -> Any:
+        """
+        サブプロセスを1回実行し、標準出力のJSONを返す（失敗時は例外）
+
+        frames は標準入力のフレーム（stream_input.encode_frames、引数の stdin:<名前> で参照する）。
+        bundle の場合は標準出力をバンドルとして読み込み、(ヘッダー, 名前 → データ) を返す。
+        """
+        import stream_input
+        import stream_output
+
+        completed = subprocess.run(
+            self.command(subcommand, args), input=stream_input.encode_frames(frames or {}),
+            capture_output=True, env=self.env, timeout=self.timeout
+        )
+        if completed.returncode != 0:
+            message = (completed.stderr.decode('utf-8', 'replace').strip()
+                       or completed.stdout.decode('utf-8', 'replace').strip() or '不明なエラー')
+            raise RuntimeError(f'{subcommand}: {message[-500:]}')
+        if bundle:
+            return stream_output.read_bundle(io.BytesIO(completed.stdout))
+        return json.loads(completed.stdout)
+
+    @staticmethod
+    def _soffice_stages(result: Dict[str, Any], stages: Dict[str, float]) -> None:
+        """結果の timings のうち soffice.* の区間を段階に追加（秒）"""
+        for name, ms in (result.get('timings') or {}).items():
+            if name.startswith('soffice.'):
+                stages[name] = stages.get(name, 0.0) + ms / 1000
+
+    def run_subprocess_job(self, job: Dict[str, Any]) -> Dict[str, float]:
+        """
+        段階ごとにサブプロセスを起動（processService.executeProcess と同じ順序・引数）
+
+        入力は標準入力のフレーム（stdin:<名前>）、編集済みExcel・生成したPDFは標準出力のバンドル
+        （stdout:output.xlsx / stdout:）で受け渡し、ジョブの入出力に一時ファイルを使わない。
+        --no-render の場合のみ、excel_validator がパスしか受け付けないため編集済みExcelを書き出す。
+        """
+        stages: Dict[str, float] = {}
+
+        def timed(stage: str, subcommand: str, args: List[str], frames: Dict[str, bytes],
+                  bundle: bool = False) -> Any:
+            start = time.perf_counter()
+            result = self._run_script(subcommand, args, frames, bundle)
+            stages[stage] = time.perf_counter() - start
+            return result
+
+        def read_file(path: str) -> bytes:
+            with open(path, 'rb') as f:
+                return f.read()
+
+        def encode_json(data: Dict[str, Any]) -> bytes:
+            return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+        company_name = job["company_name"]
+        parsed: Dict[str, Any] = {'order_confirmation': {}}
+        for pdf_type, pdf_path in job["documents"].items():
+            parsed[pdf_type] = timed(f'pdf_parser.{pdf_type}', 'pdf_parser',
+                                     [company_name, pdf_type, f'stdin:{pdf_type}'], {pdf_type: read_file(pdf_path)})
+
+        combined_data = {
+            'estimate': parsed['estimate'],
+            'invoice': parsed['invoice'],
+            'order_confirmation': parsed['order_confirmation'],
+            'estimate_filename': os.path.basename(job["documents"]['estimate']),
+        }
+        _, artifacts = timed(
+            'excel_editor', 'excel_editor', [company_name, 'stdin:template', 'stdout:output.xlsx', 'stdin:data'],
+            {'template': read_file(job["template"]), 'data': encode_json(combined_data)}, bundle=True
+        )
+
+        validation_data = encode_json({
+            'invoice': parsed['invoice'],
+            'estimate': parsed['estimate'],
+            'items_count': len(parsed['invoice'].get('items') or []) or 1,
+        })
+        if self.render:
+            args = ['stdin:excel', 'stdout:', company_name, 'stdin:validation_data']
+            result, _ = timed('render_and_validate', 'render_and_validate',
+                              args + (['--optimize'] if self.optimize else []),
+                              {'excel': artifacts['excel'], 'validation_data': validation_data}, bundle=True)
+            self._soffice_stages(result, stages)
+        else:
+            output_excel_path = os.path.join(job["output_dir"], 'output.xlsx')
+            with open(output_excel_path, 'wb') as f:
+                f.write(artifacts['excel'])
+            timed('excel_validator', 'excel_validator', [output_excel_path, company_name, 'stdin:validation_data'],
+                  {'validation_data': validation_data})
+        return stages
+
+    def _pipeline_spec(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        return {**job, "render": self.render, "optimize": self.optimize}
+
+    def _pipeline_stages(self, result: Dict[str, Any]) -> Dict[str, float]:
+        """pipeline の結果の timings から段階ごとの処理時間（秒）"""
+        import pipeline
+        stage_names = {pipeline.EDIT_STAGE, pipeline.RENDER_STAGE, pipeline.VALIDATE_STAGE}
+        stages = {
+            name: ms / 1000 for name, ms in (result.get('timings') or {}).items()
+            if name in stage_names or name.startswith('pdf_parser.')
+        }
+        self._soffice_stages(result, stages)
+        if not result.get('success'):
+            validation = (result.get('render') or {}).get('validation') or result.get('validation') or {}
+            raise RuntimeError(f"検証エラー: {'; '.join(str(error) for error in validation.get('errors', [])[:3])}")
+        return stages
+
+    def run_pipeline_job(self, job: Dict[str, Any]) -> Dict[str, float]:
+        """ジョブごとに main.py pipeline を1回起動"""
+        completed = subprocess.run(
+            self.command('pipeline', [json.dumps(self._pipeline_spec(job), ensure_ascii=False)]),
+            capture_output=True, text=True, env=self.env, timeout=self.timeout
+        )
+        if completed.returncode != 0 and not completed.stdout.strip():
+            raise RuntimeError(f'pipeline: {completed.stderr.strip()[-500:]}')
+        return self._pipeline_stages(json.loads(completed.stdout))
+
+    def run_level(self, concurrency: int, jobs: int) -> Dict[str, Any]:
+        """同時実行数 concurrency で jobs 件のジョブを流し、結果を集計"""
+        workers: Optional[queue.Queue] = None
+        processes: List[subprocess.Popen] = []
+        if self.mode == 'serve':
+            workers = queue.Queue()
+            for _ in range(concurrency):
+                if self.msgpack:
+                    process = subprocess.Popen(
+                        self.command('serve', ['--msgpack']), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                        env=self.env
+                    )
+                else:
+                    process = subprocess.Popen(
+                        self.command('serve', []), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                        text=True, env=self.env, bufsize=1
+                    )
+                processes.append(process)
+                workers.put(process)
+            # ウォームアップ（モジュール読み込み・テンプレートのコンパイル・sofficeの初回起動）
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(lambda _: self._run_serve_job(workers, self.next_job()), range(concurrency)))
+
+        def run_one(_) -> Dict[str, Any]:
+            job = self.next_job()
+            start = time.perf_counter()
+            try:
+                if self.mode == 'subprocess':
+                    stages = self.run_subprocess_job(job)
+                elif self.mode == 'pipeline':
+                    stages = self.run_pipeline_job(job)
+                else:
+                    stages = self._run_serve_job(workers, job)
+                return {"success": True, "latency": time.perf_counter() - start, "stages": stages}
+            except Exception as e:
+                return {"success": False, "latency": time.perf_counter() - start, "stages": {},
+                        "error": f'{type(e).__name__}: {e}'}
+            finally:
+                shutil.rmtree(job["output_dir"], ignore_errors=True)
+
+        usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        start = time.perf_counter()
+        with ResourceSampler() as sampler:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = list(executor.map(run_one, range(jobs)))
+            wall = time.perf_counter() - start
+            # serveのプロセスは終了させてからCPU時間を集計（終了した子プロセスのみ計上されるため）
+            for process in processes:
+                process.stdin.close()
+                process.wait()
+        usage_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+        latencies = [result["latency"] for result in results if result["success"]]
+        stage_values: Dict[str, List[float]] = {}
+        for result in results:
+            for name, seconds in result["stages"].items():
+                stage_values.setdefault(name, []).append(seconds)
+        cpu_user = usage_after.ru_utime - usage_before.ru_utime
+        cpu_system = usage_after.ru_stime - usage_before.ru_stime
+        errors = sorted({result["error"] for result in results if not result["success"]})
+
+        latency = distribution_ms(latencies)
+        latency.pop("count")
+        latency["mean"] = round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None
+        return {
+            "concurrency": concurrency,
+            "jobs": jobs,
+            "succeeded": len(latencies),
+            "failed": jobs - len(latencies),
+            "errors": errors[:5],
+            "wall_s": round(wall, 2),
+            "throughput_jobs_per_s": round(len(latencies) / wall, 3) if wall > 0 else None,
+            "latency_ms": latency,
+            "stages": {name: distribution_ms(values) for name, values in stage_values.items()},
+            "resources": {
+                "cpu_user_s": round(cpu_user, 2),
+                "cpu_system_s": round(cpu_system, 2),
+                "cpu_utilization": round((cpu_user + cpu_system) / wall / (os.cpu_count() or 1), 3) if wall > 0 else None,
+                # ru_maxrss は子プロセス全体での最大値（Linuxはキロバイト単位）
+                "max_rss_mb": round(usage_after.ru_maxrss / 1024, 1),
+                "loadavg_max": round(sampler.loadavg_max, 2),
+                "soffice_processes_max": sampler.soffice_processes_max,
+            },
+        }
+
+    def _run_serve_job(self, workers: queue.Queue, job: Dict[str, Any]) -> Dict[str, float]:
+        """空いている serve のプロセスに "pipeline" コマンドを送り、応答を待つ"""
+        process = workers.get()
+        try:
+            request = {"id": job["output_dir"], "command": "pipeline", "args": self._pipeline_spec(job)}
+            if self.msgpack:
+                response = self._send_msgpack(process, request)
+            else:
+                process.stdin.write(json.dumps(request, ensure_ascii=False) + '\n')
+                process.stdin.flush()
+                line = process.stdout.readline()
+                if not line:
+                    raise RuntimeError(f'serveのプロセスが終了しました（終了コード: {process.poll()}）')
+                response = json.loads(line)
+        finally:
+            workers.put(process)
+        if 'error' in response:
+            raise RuntimeError(f"{response.get('error_type')}: {response['error']}")
+        return self._pipeline_stages({**response['result'], 'timings': response.get('timings')})
+
+
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _send_msgpack(self, process: subprocess.Popen, request: Dict[str, Any]) -> Dict[str, Any]:
+        """serve --msgpack のプロセスにリクエストを送り、応答を待つ（テンプレート・PDFはバイト列で送る）"""
+        import msgpack
+        args = request["args"]
+        args["estimate_filename"] = os.path.basename(args["documents"]["estimate"])
+        args["template"] = self._read_file(args["template"])
+        args["documents"] = {pdf_type: self._read_file(path) for pdf_type, path in args["documents"].items()}
+        data = msgpack.packb(request, use_bin_type=True)
+        process.stdin.write(struct.pack('>I', len(data)) + data)
+        process.stdin.flush()
+        header = process.stdout.read(4)
+        if len(header) < 4:
+            raise RuntimeError(f'serveのプロセスが終了しました（終了コード: {process.poll()}）')
+        return msgpack.unpackb(process.stdout.read(struct.unpack('>I', header)[0]), raw=False)
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='負荷試験（同時ジョブ数ごとのスループット・遅延・リソース使用量）')
+    parser.add_argument('--mode', choices=MODES, default='subprocess')
+    parser.add_argument('--concurrency', default='1,2,4,8', help='同時実行数（カンマ区切り）')
+    parser.add_argument('--jobs', type=int, default=20, help='同時実行数ごとのジョブ数')
+    parser.add_argument('--companies', default='nextbits,offbeat', help='取引先キー（カンマ区切り、順に混在させる）')
+    parser.add_argument('--no-render', action='store_true', help='PDFを生成せず excel_validator で検証')
+    parser.add_argument('--no-optimize', action='store_true', help='生成したPDFを最適化しない')
+    parser.add_argument('--render-cache', action='store_true', help='PDF生成結果のキャッシュを使う')
+    parser.add_argument('--synthetic-items', type=int, help='明細N行の合成PDFを入力にする')
+    parser.add_argument('--executable', help='PyInstallerでビルドした実行ファイル')
+    parser.add_argument('--timeout', type=float, default=600, help='サブプロセス1回のタイムアウト（秒）')
+    parser.add_argument('--msgpack', action='store_true', help='serve方式でMessagePackの形式を使う')
+    parser.add_argument('--output', help='結果を保存するJSONファイル')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='seikyu-henkan-load-')
+    try:
+        sys.path.insert(0, PYTHON_DIR)
+        companies = [company.strip() for company in args.companies.split(',') if company.strip()]
+        unknown = [company for company in companies if company not in FIXTURE_JOBS]
+        if unknown:
+            raise ValueError(f"不明な取引先キー: {', '.join(unknown)}（{', '.join(FIXTURE_JOBS)}）")
+
+        load_test = LoadTest(
+            args.mode, companies, not args.no_render, not args.no_optimize, work_dir,
+            args.executable, args.synthetic_items, args.timeout, args.msgpack
+        )
+        if not args.render_cache:
+            load_test.env['PDF_PROCESSOR_RENDER_CACHE'] = '0'
+
+        report: Dict[str, Any] = {
+            "mode": args.mode,
+            "msgpack": args.msgpack,
+            "render": not args.no_render,
+            "companies": companies,
+            "synthetic_items": args.synthetic_items,
+            "cpu_count": os.cpu_count(),
+            "levels": [],
+        }
+        for concurrency in [int(value) for value in args.concurrency.split(',') if value.strip()]:
+            level = load_test.run_level(concurrency, args.jobs)
+            report["levels"].append(level)
+            print(json.dumps({
+                "concurrency": concurrency,
+                "throughput_jobs_per_s": level["throughput_jobs_per_s"],
+                "p95_ms": level["latency_ms"]["p95"],
+                "failed": level["failed"],
+            }, ensure_ascii=False), file=sys.stderr)
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    except Exception as e:
+        import traceback
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc()
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
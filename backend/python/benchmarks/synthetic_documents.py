@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+取引先の帳票PDF（合成データ）の生成（スケーリング試験用）
+
+pdf_parser.py の正規表現が前提とするテキストの並びで、取引先ごとの帳票PDFと、
+そのPDFから抽出されるべき値（期待値JSON）を生成します。明細行数・ページ数・全角数字の有無を
+変えた入力で、PDF解析・Excel編集の処理時間とメモリ使用量を文書の規模に対して計測できます。
+
+生成する帳票:
+    ネクストビッツ: 見積書（No.TRR-XX-XXX・件名・明細「□品名 N式 単価 金額」）、請求書（消費税10%対象・消費税(10%)・合計金額）
+    オフ・ビート・ワークス: 見積書（見積書番号）、請求書（明細「納品日 品目 単価 数量 単位 金額」・小計・消費税額合計・合計）、
+                          注文請書（発行日）
+
+レイアウト:
+    pdf_parser は1ページ目のみを解析するため、明細はすべて1ページ目に配置し、明細行数に応じて
+    1ページ目の高さを伸ばします。--pages で指定したページ数になるまで、2ページ目以降に
+    備考（取引条件）のページを追加します。
+
+全角数字（--fullwidth）:
+    none: すべて半角
+    month: ネクストビッツの見積書の件名の月を「0８月」のように記載（実際の帳票で見られる形式）
+    all: ネクストビッツの見積書の件名・明細の数字をすべて全角、その他の帳票は品名の数字を全角
+
+使用法:
+    python3 synthetic_documents.py <output_dir> [--company nextbits|offbeat|all] [--items 1,10,100,1000]
+                                   [--pages 1] [--fullwidth none|month|all] [--year-month 2508] [--seed 0] [--check]
+
+    --check: 生成したPDFを pdf_parser で解析し、期待値との一致・解析時間・メモリ使用量（tracemalloc）を出力
+             （不一致があれば終了コード1）
+
+出力:
+    <output_dir>/<取引先>_<明細行数>items_<ページ数>p_<全角数字>/
+        帳票PDF（実際のファイル名と同じ形式）
+        job.json: {"company_name": ..., "documents": {"estimate": {"path": ..., "expected": {...}}, ...}}
+    標準出力: {"jobs": [{"company": ..., "items": 10, "pages": 1, "fullwidth": "none", "job_path": ...}], "checks": [...]}
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+from datetime import date
+from typing import Dict, Any, List, Tuple
+
+from text_pdf import PdfWriter
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMPANY_NAMES = {
+    'nextbits': 'ネクストビッツ',
+    'offbeat': 'オフ・ビート・ワークス',
+}
+
+MAX_ITEMS = 1000
+FULLWIDTH_MODES = ('none', 'month', 'all')
+
+# レイアウト（ポイント、A4縦）
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 40
+FONT_SIZE = 9
+LINE_HEIGHT = 14
+
+# 品名（明細行ごとに順に使い、2周目以降は番号を付ける）
+ITEM_NAMES = [
+    'ITX帳票PDF出力',
+    'CONEXIO AIOCRデータ取込機能',
+    'SB社ログインサーバー証明書更新',
+    'CONEXIO テレマス4DV20コンバート作業',
+    'Telemas作業(システム改修等)',
+    '受注管理画面レイアウト変更',
+    'バッチ処理性能改善',
+    '帳票テンプレート追加',
+]
+
+TERMS_LINES = [
+    '備考',
+    'お支払条件：月末締め翌月末払い',
+    '振込手数料は貴社にてご負担ください。',
+    '本書に記載のない事項は別途協議の上決定いたします。',
+]
+
+FULLWIDTH_TABLE = str.maketrans('0123456789', '０１２３４５６７８９')
+
+Line = List[Tuple[float, str]]
+
+
+def to_fullwidth(text: str) -> str:
+    return text.translate(FULLWIDTH_TABLE)
+
+
+def item_name(index: int, fullwidth: bool) -> str:
+    name = ITEM_NAMES[index % len(ITEM_NAMES)]
+    if index >= len(ITEM_NAMES):
+        name = f"{name} その{index // len(ITEM_NAMES) + 1}"
+    return to_fullwidth(name) if fullwidth else name
+
+
+def write_pdf(path: str, lines: List[Line], pages: int) -> None:
+    """
+    行（(x座標, 文字列) のリスト）を1ページ目に上から配置し、ページ数に達するまで備考のページを追加
+
+    1ページ目は全行が収まる高さにする（pdf_parserは1ページ目のみを解析するため）。
+    """
+    writer = PdfWriter(FONT_SIZE)
+    first_height = max(PAGE_HEIGHT, MARGIN * 2 + len(lines) * LINE_HEIGHT)
+    items = []
+    for index, line in enumerate(lines):
+        y = first_height - MARGIN - (index + 1) * LINE_HEIGHT
+        for x, text in line:
+            items.append((x, y, text))
+    writer.add_page(items, PAGE_WIDTH, first_height)
+
+    for page in range(2, pages + 1):
+        items = [(MARGIN, PAGE_HEIGHT - MARGIN - (index + 1) * LINE_HEIGHT, text)
+                 for index, text in enumerate(TERMS_LINES + [f"{page} / {pages}"])]
+        writer.add_page(items, PAGE_WIDTH, PAGE_HEIGHT)
+
+    with open(path, 'wb') as f:
+        f.write(writer.to_bytes())
+
+
+def _amount(value: int) -> str:
+    return f"{value:,}"
+
+
+def generate_nextbits(output_dir: str, items: int, pages: int, fullwidth: str, year_month: str,
+                      rng: random.Random) -> Dict[str, Any]:
+    """ネクストビッツの見積書・請求書を生成し、job.json の内容を返す"""
+    year, month = int(year_month[:2]), int(year_month[2:])
+    estimate_number = f"TRR-{year:02d}-{month:03d}"
+
+    lines_data = []
+    for index in range(items):
+        quantity = rng.randint(1, 3)
+        unit_price = rng.randrange(100000, 1000000, 50000)
+        lines_data.append((item_name(index, fullwidth == 'all'), quantity, unit_price))
+    subtotal = sum(quantity * unit_price for _, quantity, unit_price in lines_data)
+    tax = subtotal // 10
+
+    subject = f"20{year:02d}年{month:02d}月作業：Telemasシステム改修作業等"
+    if fullwidth == 'month':
+        subject = f"20{year:02d}年{month // 10}{to_fullwidth(str(month % 10))}月作業：Telemasシステム改修作業等"
+    elif fullwidth == 'all':
+        subject = to_fullwidth(subject)
+
+    def number(text: str) -> str:
+        return to_fullwidth(text) if fullwidth == 'all' else text
+
+    estimate_lines: List[Line] = [
+        [(MARGIN, '御見積書'), (400, f"No.{estimate_number}")],
+        [(MARGIN, '株式会社テラ 御中'), (400, f"発行日：20{year:02d}年{month}月1日")],
+        [(400, '株式会社ネクストビッツ')],
+        [(MARGIN, f"件名：{subject}")],
+        [(MARGIN, '品名'), (320, '数量'), (400, '単価'), (480, '金額')],
+    ]
+    for name, quantity, unit_price in lines_data:
+        estimate_lines.append([
+            (MARGIN, f"□{name}"), (320, number(f"{quantity}式")),
+            (400, number(_amount(unit_price))), (480, number(_amount(quantity * unit_price))),
+        ])
+    estimate_lines.append([(400, '合計金額'), (480, _amount(subtotal))])
+
+    invoice_number = f"TRR-{year:02d}-{month - 1 if month > 1 else 12:03d}"
+    invoice_lines: List[Line] = [
+        [(MARGIN, '御請求書'), (400, f"No.{invoice_number}")],
+        [(MARGIN, '株式会社テラ 御中'), (400, f"請求日：20{year:02d}年{month}月末日")],
+        [(MARGIN, '品名'), (320, '数量'), (400, '単価'), (480, '金額')],
+    ]
+    for name, quantity, unit_price in lines_data:
+        invoice_lines.append([
+            (MARGIN, name), (320, f"{quantity}式"), (400, _amount(unit_price)), (480, _amount(quantity * unit_price)),
+        ])
+    invoice_lines += [
+        [(320, '消費税10%対象'), (480, _amount(subtotal))],
+        [(320, '消費税(10%)'), (480, _amount(tax))],
+        [(320, '合計金額'), (480, _amount(subtotal + tax))],
+    ]
+
+    estimate_path = os.path.join(output_dir, f"{estimate_number}_お見積書.pdf")
+    invoice_path = os.path.join(output_dir, f"{estimate_number}_請求書.pdf")
+    write_pdf(estimate_path, estimate_lines, pages)
+    write_pdf(invoice_path, invoice_lines, pages)
+
+    first_name, first_quantity, first_unit_price = lines_data[0]
+    return {
+        "company_name": COMPANY_NAMES['nextbits'],
+        "documents": {
+            "estimate": {
+                "path": estimate_path,
+                "expected": {
+                    "estimate_number": estimate_number,
+                    "subject": subject.translate(str.maketrans('０１２３４５６７８９', '0123456789')),
+                    "quantity": first_quantity,
+                    "unit_price": first_unit_price,
+                },
+            },
+            "invoice": {
+                "path": invoice_path,
+                "expected": {"total": subtotal + tax, "subtotal": subtotal, "tax": tax},
+            },
+        },
+    }
+
+
+def generate_offbeat(output_dir: str, items: int, pages: int, fullwidth: str, year_month: str,
+                     rng: random.Random) -> Dict[str, Any]:
+    """オフ・ビート・ワークスの見積書・請求書・注文請書を生成し、job.json の内容を返す"""
+    year, month = 2000 + int(year_month[:2]), int(year_month[2:])
+    estimate_number = f"19{rng.randint(10000, 99999)}"
+    invoice_number = f"2{estimate_number[1:]}"
+    issue_date = date(year, month, rng.randint(1, 28))
+    delivery_date = date(year, month, 28)
+
+    lines_data = []
+    for index in range(items):
+        quantity = rng.randint(1, 20)
+        unit_price = rng.randrange(25000, 50001, 2500)
+        lines_data.append((item_name(index, fullwidth == 'all'), quantity, unit_price))
+    subtotal = sum(quantity * unit_price for _, quantity, unit_price in lines_data)
+    tax = subtotal // 10
+
+    def detail_lines(with_dates: bool) -> List[Line]:
+        lines: List[Line] = [[(MARGIN, '納品日'), (100, '品目'), (360, '単価'), (420, '数量'), (450, '単位'), (500, '金額')]]
+        for name, quantity, unit_price in lines_data:
+            lines.append([
+                (MARGIN, delivery_date.strftime('%Y/%m/%d') if with_dates else '-'), (100, name),
+                (360, _amount(unit_price)), (420, str(quantity)), (450, '人日'), (500, _amount(quantity * unit_price)),
+            ])
+        return lines
+
+    estimate_lines: List[Line] = [
+        [(MARGIN, '御見積書'), (400, f"見積書番号: {estimate_number}")],
+        [(MARGIN, '株式会社テラ 御中'), (400, '株式会社オフ・ビート・ワークス')],
+    ] + detail_lines(False) + [[(420, '合計'), (500, _amount(subtotal + tax))]]
+
+    invoice_lines: List[Line] = [
+        [(MARGIN, '請求書'), (400, f"請求書番号: {invoice_number}")],
+        [(MARGIN, '株式会社テラ 御中'), (400, f"請求日 {year}年{month}月末日")],
+    ] + detail_lines(True) + [
+        [(420, '小計'), (500, _amount(subtotal))],
+        [(420, '消費税額合計'), (500, _amount(tax))],
+        [(420, '合計'), (500, _amount(subtotal + tax))],
+    ]
+
+    order_confirmation_lines: List[Line] = [
+        [(MARGIN, '注文請書')],
+        [(400, f"発行日 {issue_date.year}年{issue_date.month}月{issue_date.day}日")],
+        [(MARGIN, '株式会社テラ 御中'), (400, '株式会社オフ・ビート・ワークス')],
+        [(MARGIN, '下記の通りご注文をお請けいたします。')],
+    ]
+
+    suffix = f"offbeat-to-terra-{year}{month:02d}.pdf"
+    estimate_path = os.path.join(output_dir, f"{estimate_number}-見積-{suffix}")
+    invoice_path = os.path.join(output_dir, f"{invoice_number}-請求_{suffix}")
+    order_confirmation_path = os.path.join(output_dir, f"請書_{suffix}")
+    write_pdf(estimate_path, estimate_lines, pages)
+    write_pdf(invoice_path, invoice_lines, pages)
+    write_pdf(order_confirmation_path, order_confirmation_lines, pages)
+
+    return {
+        "company_name": COMPANY_NAMES['offbeat'],
+        "documents": {
+            "estimate": {"path": estimate_path, "expected": {"estimate_number": estimate_number}},
+            "invoice": {
+                "path": invoice_path,
+                "expected": {
+                    "items": [
+                        {"name": name, "quantity": quantity, "unit_price": unit_price, "amount": quantity * unit_price}
+                        for name, quantity, unit_price in lines_data
+                    ],
+                    "total": subtotal + tax,
+                    "subtotal": subtotal,
+                    "tax": tax,
+                },
+            },
+            "order_confirmation": {"path": order_confirmation_path, "expected": {"issue_date": issue_date.isoformat()}},
+        },
+    }
+
+
+GENERATORS = {
+    'nextbits': generate_nextbits,
+    'offbeat': generate_offbeat,
+}
+
+
+def generate_job(output_dir: str, company: str, items: int, pages: int = 1, fullwidth: str = 'none',
+                 year_month: str = '2508', seed: int = 0) -> str:
+    """
+    1ジョブ分の帳票PDFと job.json を生成し、job.json のパスを返す
+
+    Args:
+        output_dir: 出力先の親ディレクトリ
+        company: 取引先（nextbits / offbeat）
+        items: 明細行数（1〜1000）
+        pages: ページ数（1ページ目に全明細、2ページ目以降は備考）
+        fullwidth: 全角数字（none / month / all）
+        year_month: 対象年月（YYMM）
+        seed: 乱数のシード（同じ引数なら同じ内容になる）
+    """
+    if not 1 <= items <= MAX_ITEMS:
+        raise ValueError(f"明細行数は1〜{MAX_ITEMS}で指定してください: {items}")
+    if fullwidth not in FULLWIDTH_MODES:
+        raise ValueError(f"未対応の全角数字の指定: {fullwidth}")
+
+    job_dir = os.path.join(output_dir, f"{company}_{items}items_{pages}p_{fullwidth}")
+    os.makedirs(job_dir, exist_ok=True)
+    rng = random.Random(f"{seed}:{company}:{items}:{year_month}")
+    job = GENERATORS[company](job_dir, items, max(pages, 1), fullwidth, year_month, rng)
+    job.update({"items": items, "pages": max(pages, 1), "fullwidth": fullwidth})
+
+    job_path = os.path.join(job_dir, 'job.json')
+    with open(job_path, 'w', encoding='utf-8') as f:
+        json.dump(job, f, ensure_ascii=False, indent=2)
+    return job_path
+
+
+def check_job(job_path: str) -> List[Dict[str, Any]]:
+    """生成したPDFを pdf_parser で解析し、期待値との一致・解析時間・メモリ使用量を返す"""
+    import time
+    import tracemalloc
+    sys.path.insert(0, PYTHON_DIR)
+    import pdf_parser
+
+    with open(job_path, 'r', encoding='utf-8') as f:
+        job = json.load(f)
+
+    results = []
+    for pdf_type, document in job["documents"].items():
+        tracemalloc.start()
+        start = time.perf_counter()
+        parsed = pdf_parser.parse_pdf(job["company_name"], pdf_type, document["path"])
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results.append({
+            "company": job["company_name"],
+            "pdf_type": pdf_type,
+            "items": job["items"],
+            "pages": job["pages"],
+            "fullwidth": job["fullwidth"],
+            "bytes": os.path.getsize(document["path"]),
+            "parse_ms": round(elapsed * 1000, 1),
+            "tracemalloc_peak_kb": round(peak / 1024, 1),
+            "matches": parsed == document["expected"],
+        })
+    return results
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='取引先の帳票PDF（合成データ）の生成')
+    parser.add_argument('output_dir')
+    parser.add_argument('--company', choices=('nextbits', 'offbeat', 'all'), default='all')
+    parser.add_argument('--items', default='1,10,100,1000', help='明細行数（カンマ区切り）')
+    parser.add_argument('--pages', type=int, default=1)
+    parser.add_argument('--fullwidth', choices=FULLWIDTH_MODES, default='none')
+    parser.add_argument('--year-month', default='2508', help='対象年月（YYMM）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--check', action='store_true', help='pdf_parserで解析して期待値と照合')
+    args = parser.parse_args()
+
+    try:
+        companies = sorted(GENERATORS) if args.company == 'all' else [args.company]
+        item_counts = [int(value) for value in args.items.split(',') if value.strip()]
+
+        jobs = []
+        for company in companies:
+            for items in item_counts:
+                job_path = generate_job(
+                    args.output_dir, company, items, args.pages, args.fullwidth, args.year_month, args.seed
+                )
+                jobs.append({"company": company, "items": items, "pages": max(args.pages, 1),
+                             "fullwidth": args.fullwidth, "job_path": job_path})
+
+        output: Dict[str, Any] = {"jobs": jobs}
+        if args.check:
+            output["checks"] = [result for job in jobs for result in check_job(job["job_path"])]
+        print(json.dumps(output, ensure_ascii=False, indent=2))
+
+        if args.check and not all(result["matches"] for result in output["checks"]):
+            sys.exit(1)
+
+    except Exception as e:
+        import traceback
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc()
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+テキストのみの最小限のPDF作成（fake_soffice.py・synthetic_documents.py で使用）
+
+文字ごとにCIDを割り当てたType0フォント（Identity-H）とToUnicodeのCMapを使い、
+フォントを埋め込まずに日本語の文字列をpdfplumberで抽出可能な形で出力します。
+（表示に使うフォントは閲覧環境に依存します）
+"""
+
+from typing import Dict, List, Tuple
+
+
+class PdfWriter:
+    """
+    テキストのみのPDFを作成
+
+    使用例:
+        writer = PdfWriter(font_size=9)
+        writer.add_page([(40, 800, '御見積書'), (40, 780, 'No.TRR-25-008')], 595, 842)
+        with open(path, 'wb') as f:
+            f.write(writer.to_bytes())
+    """
+
+    def __init__(self, font_size: float):
+        self.font_size = font_size
+        self.cids: Dict[str, int] = {}
+        # (コンテンツストリーム, 幅, 高さ)
+        self.pages: List[Tuple[bytes, float, float]] = []
+
+    def _cid(self, char: str) -> int:
+        if char not in self.cids:
+            self.cids[char] = len(self.cids) + 1
+        return self.cids[char]
+
+    @staticmethod
+    def char_width(char: str) -> int:
+        """文字幅（1000分率、半角文字は半分）"""
+        return 500 if ord(char) < 0x2000 or 0xFF61 <= ord(char) <= 0xFF9F else 1000
+
+    def text_width(self, text: str) -> float:
+        """文字列の幅（ポイント）"""
+        return sum(self.char_width(char) for char in text) * self.font_size / 1000
+
+    def add_page(self, items: List[Tuple[float, float, str]], width: float, height: float) -> None:
+        """ページを追加（items: (x, y, 文字列)、座標は左下原点のポイント）"""
+        lines = [b'BT', f'/F1 {self.font_size} Tf'.encode('ascii')]
+        for x, y, text in items:
+            encoded = ''.join(f"{self._cid(char):04X}" for char in text)
+            lines.append(f'1 0 0 1 {x:.2f} {y:.2f} Tm <{encoded}> Tj'.encode('ascii'))
+        lines.append(b'ET')
+        self.pages.append((b'\n'.join(lines), width, height))
+
+    def _to_unicode_cmap(self) -> bytes:
+        entries = sorted(self.cids.items(), key=lambda item: item[1])
+        body = [
+            '/CIDInit /ProcSet findresource begin', '12 dict begin', 'begincmap',
+            '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def',
+            '/CMapName /Adobe-Identity-UCS def', '/CMapType 2 def',
+            '1 begincodespacerange', '<0000> <FFFF>', 'endcodespacerange',
+        ]
+        for start in range(0, len(entries), 100):
+            chunk = entries[start:start + 100]
+            body.append(f'{len(chunk)} beginbfchar')
+            for char, cid in chunk:
+                body.append(f"<{cid:04X}> <{char.encode('utf-16-be').hex().upper()}>")
+            body.append('endbfchar')
+        body += ['endcmap', 'CMapName currentdict /CMap defineresource pop', 'end', 'end']
+        return '\n'.join(body).encode('ascii')
+
+    def to_bytes(self) -> bytes:
+        """PDFのバイト列"""
+        objects: List[bytes] = []
+
+        def add(content: bytes) -> int:
+            objects.append(content)
+            return len(objects)
+
+        def stream(data: bytes) -> bytes:
+            return b'<< /Length ' + str(len(data)).encode('ascii') + b' >>\nstream\n' + data + b'\nendstream'
+
+        widths = ' '.join(f"{cid} [{self.char_width(char)}]" for char, cid in self.cids.items())
+        catalog_id = add(b'')
+        pages_id = add(b'')
+        descriptor_id = add(
+            b'<< /Type /FontDescriptor /FontName /TextPdfGothic /Flags 4 '
+            b'/FontBBox [0 -120 1000 880] /ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 700 /StemV 80 >>'
+        )
+        cid_font_id = add(
+            f'<< /Type /Font /Subtype /CIDFontType2 /BaseFont /TextPdfGothic '
+            f'/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> '
+            f'/FontDescriptor {descriptor_id} 0 R /DW 1000 /W [{widths}] /CIDToGIDMap /Identity >>'.encode('ascii')
+        )
+        to_unicode_id = add(stream(self._to_unicode_cmap()))
+        font_id = add(
+            f'<< /Type /Font /Subtype /Type0 /BaseFont /TextPdfGothic /Encoding /Identity-H '
+            f'/DescendantFonts [{cid_font_id} 0 R] /ToUnicode {to_unicode_id} 0 R >>'.encode('ascii')
+        )
+
+        page_ids = []
+        for content, width, height in self.pages:
+            content_id = add(stream(content))
+            page_ids.append(add(
+                f'<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {width:.0f} {height:.0f}] '
+                f'/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>'.encode('ascii')
+            ))
+        objects[catalog_id - 1] = f'<< /Type /Catalog /Pages {pages_id} 0 R >>'.encode('ascii')
+        kids = ' '.join(f'{page_id} 0 R' for page_id in page_ids)
+        objects[pages_id - 1] = f'<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>'.encode('ascii')
+
+        output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, content in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += f'{number} 0 obj\n'.encode('ascii') + content + b'\nendobj\n'
+        xref_offset = len(output)
+        output += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('ascii')
+        for offset in offsets:
+            output += f'{offset:010d} 00000 n \n'.encode('ascii')
+        output += (
+            f'trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\n'
+            f'startxref\n{xref_offset}\n%%EOF\n'
+        ).encode('ascii')
+        return bytes(output)
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+実行環境の検出モジュール（結果をキャッシュ）
+
+PDF生成・Excel検証で使う外部コマンドの有無を1回だけ調べ、結果を共有します。
+    - LibreOffice: sofficeのパスとバージョン
+    - WSL: wslpathの有無とディストリビューション名
+    - Excel: Windows側のExcel COMオブジェクトが使えるか（powershell.exeがある場合のみ確認）
+      Excelの起動には最大30秒かかるため、Excelエンジンを使う場合（excel_available）のみ検出し、
+      結果は別にキャッシュします（LibreOfficeでの変換・検証ではExcelを起動しない）。
+
+従来は変換・検証のたびに soffice --version 等を起動していたため、
+LibreOfficeの起動1回分の時間が毎回かかっていた。
+
+キャッシュ:
+    検出結果はプロセス内メモリと、キャッシュディレクトリ（PDF_PROCESSOR_CACHE_DIR、
+    デフォルト: <tmp>/seikyu-henkan-cache）の environment.json に保存されます。
+    キャッシュキーはPATHと各コマンドのパス・更新日時（mtime）のため、
+    インストール・更新・PATH変更があれば自動的に再検出されます。
+    sofficeが見つかったのに --version が失敗した場合（WSLのコールドスタートでのタイムアウト等）は
+    キャッシュファイルに保存せず、PROBE_FAILURE_TTL 秒後の呼び出しで再検出します。
+    Excelの検出結果は environment-excel.json に保存します。
+
+環境変数:
+    PDF_PROCESSOR_SOFFICE: 使用する soffice のパス（未設定時はPATHから検出）
+
+使用法:
+    python3 environment_probe.py [--refresh]   # Excelの検出結果・利用可能なPDF出力エンジンも出力
+
+出力:
+    {
+        "soffice_path": "/usr/bin/soffice",
+        "soffice_version": "LibreOffice 7.6.4.1 ...",
+        "libreoffice": true,
+        "wsl": false,
+        "wsl_distro": null,
+        "excel": false,
+        "engines": ["libreoffice"]
+    }
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from typing import Dict, Any, Optional
+
+import metrics
+
+# キャッシュ形式バージョン（形式変更時にインクリメント）
+PROBE_VERSION = 2
+
+PROBE_CACHE_FILENAME = 'environment.json'
+EXCEL_PROBE_CACHE_FILENAME = 'environment-excel.json'
+
+# sofficeの検出に失敗した結果をプロセス内で再利用する時間（秒、キャッシュファイルには保存しない）
+PROBE_FAILURE_TTL = 60
+
+# 検出対象のコマンド（キャッシュキーに含める）
+PROBED_COMMANDS = ('soffice', 'wslpath', 'powershell.exe')
+
+# プロセス内キャッシュ
+_probe_result: Optional[Dict[str, Any]] = None
+# _probe_result の有効期限（time.monotonic()、検出に失敗した結果のみ、成功時はNone）
+_probe_expires: Optional[float] = None
+_excel_result: Optional[bool] = None
+
+
+def get_cache_dir() -> str:
+    """
+    キャッシュディレクトリのパスを取得（存在しない場合は作成）
+
+    Returns:
+        PDF_PROCESSOR_CACHE_DIR、未設定時は <tmp>/seikyu-henkan-cache
+    """
+    cache_dir = os.getenv('PDF_PROCESSOR_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'seikyu-henkan-cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def _command_paths() -> Dict[str, Optional[str]]:
+    """
+    検出対象コマンドの絶対パス（見つからない場合はNone）
+
+    PDF_PROCESSOR_SOFFICE が設定されていれば、PATHの soffice の代わりに使う
+    （ベンチマーク・負荷試験用の benchmarks/fake_soffice.py 等）。
+    """
+    paths = {name: shutil.which(name) for name in PROBED_COMMANDS}
+    soffice_override = os.getenv('PDF_PROCESSOR_SOFFICE')
+    if soffice_override:
+        paths['soffice'] = shutil.which(soffice_override)
+    return paths
+
+
+def compute_probe_key(command_paths: Dict[str, Optional[str]]) -> str:
+    """
+    キャッシュキー（PATH・各コマンドのパスと更新日時）
+
+    プロセスを起動せずに計算できる（stat のみ）。
+    """
+    digest = hashlib.sha256()
+    digest.update(os.getenv('PATH', '').encode('utf-8'))
+    for name in PROBED_COMMANDS:
+        path = command_paths.get(name)
+        mtime = 0
+        if path:
+            try:
+                mtime = os.stat(os.path.realpath(path)).st_mtime_ns
+            except OSError:
+                pass
+        digest.update(f"\0{name}\0{path}\0{mtime}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _probe_soffice(soffice_path: Optional[str]) -> Optional[str]:
+    """soffice --version の出力（起動できない場合はNone）"""
+    if not soffice_path:
+        return None
+    try:
+        result = subprocess.run(
+            [soffice_path, '--version'],
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+        if result.returncode == 0:
+            return result.stdout.strip() or 'unknown'
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+    return None
+
+
+def _probe_wsl_distro(wslpath_path: Optional[str]) -> Optional[str]:
+    """WSLディストリビューション名（WSLでない場合はNone）"""
+    if not wslpath_path:
+        return None
+    try:
+        result = subprocess.run(
+            [wslpath_path, '-w', '/'],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+        if result.returncode == 0:
+            # \\wsl$\Ubuntu\ のような形式から抽出
+            parts = result.stdout.strip().split('\\')
+            for i, part in enumerate(parts):
+                if part in ('wsl$', 'wsl.localhost') and i + 1 < len(parts):
+                    return parts[i + 1]
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+    return None
+
+
+def _probe_excel(powershell_path: Optional[str]) -> bool:
+    """Windows側でExcel COMオブジェクトが作成できるか"""
+    if not powershell_path:
+        return False
+    try:
+        result = subprocess.run(
+            [powershell_path, '-ExecutionPolicy', 'Bypass', '-Command',
+             '$excel = New-Object -ComObject Excel.Application; $excel.Quit(); Write-Output "OK"'],
+            capture_output=True,
+            text=True,
+            timeout=30
+        )
+        return result.returncode == 0 and 'OK' in result.stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+
+def _run_probe(command_paths: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    """外部コマンドを起動して環境を検出（Excelは probe_excel で別に検出）"""
+    soffice_version = _probe_soffice(command_paths['soffice'])
+    wsl_distro = _probe_wsl_distro(command_paths['wslpath'])
+
+    return {
+        "soffice_path": command_paths['soffice'] if soffice_version is not None else None,
+        "soffice_version": soffice_version,
+        "libreoffice": soffice_version is not None,
+        "wsl": command_paths['wslpath'] is not None,
+        "wsl_distro": wsl_distro,
+    }
+
+
+def _read_cache(filename: str, key: str) -> Optional[Any]:
+    """キャッシュファイルの検出結果（キー・形式バージョンが一致しない場合はNone）"""
+    try:
+        with open(os.path.join(get_cache_dir(), filename), 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get("version") == PROBE_VERSION and cached.get("key") == key:
+            return cached["probe"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def _write_cache(filename: str, key: str, probe: Any) -> None:
+    """キャッシュファイルに保存（書き込み途中のファイルを読まれないよう一時ファイル経由で置換）"""
+    try:
+        cache_path = os.path.join(get_cache_dir(), filename)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"version": PROBE_VERSION, "key": key, "probe": probe}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # キャッシュ保存の失敗は処理に影響させない
+        pass
+
+
+def probe_environment(refresh: bool = False) -> Dict[str, Any]:
+    """
+    実行環境を検出（メモリ → キャッシュファイル → 実際の検出の順）
+
+    Args:
+        refresh: キャッシュを使わずに再検出する
+
+    Returns:
+        検出結果（モジュールdocstringの出力形式を参照、excel・engines を除く）
+    """
+    global _probe_result, _probe_expires
+
+    if _probe_result is not None and not refresh:
+        if _probe_expires is None or time.monotonic() < _probe_expires:
+            metrics.record_cache('environment', True)
+            return _probe_result
+
+    command_paths = _command_paths()
+    key = compute_probe_key(command_paths)
+
+    if not refresh:
+        cached = _read_cache(PROBE_CACHE_FILENAME, key)
+        if cached is not None:
+            _probe_result, _probe_expires = cached, None
+            metrics.record_cache('environment', True)
+            return _probe_result
+
+    metrics.record_cache('environment', False)
+    _probe_result = _run_probe(command_paths)
+
+    if command_paths['soffice'] and _probe_result["soffice_version"] is None:
+        # sofficeがあるのに起動できなかった（タイムアウト等）: 一時的な失敗の可能性があるため保存しない
+        _probe_expires = time.monotonic() + PROBE_FAILURE_TTL
+    else:
+        _probe_expires = None
+        _write_cache(PROBE_CACHE_FILENAME, key, _probe_result)
+
+    return _probe_result
+
+
+def probe_excel(refresh: bool = False) -> bool:
+    """
+    Windows側のExcel COMオブジェクトが使えるか（メモリ → キャッシュファイル → 実際の検出の順）
+
+    Excelを起動するため、Excelエンジンを使う場合のみ呼び出す。
+    """
+    global _excel_result
+
+    if _excel_result is not None and not refresh:
+        metrics.record_cache('environment_excel', True)
+        return _excel_result
+
+    command_paths = _command_paths()
+    key = compute_probe_key(command_paths)
+
+    if not refresh:
+        cached = _read_cache(EXCEL_PROBE_CACHE_FILENAME, key)
+        if cached is not None:
+            _excel_result = bool(cached)
+            metrics.record_cache('environment_excel', True)
+            return _excel_result
+
+    metrics.record_cache('environment_excel', False)
+    _excel_result = _probe_excel(command_paths['powershell.exe'])
+    _write_cache(EXCEL_PROBE_CACHE_FILENAME, key, _excel_result)
+    return _excel_result
+
+
+def libreoffice_available() -> bool:
+    """LibreOffice（soffice）が利用可能か"""
+    return probe_environment()["libreoffice"]
+
+
+def soffice_command() -> str:
+    """sofficeの実行パス（検出できない場合は 'soffice'）"""
+    return probe_environment()["soffice_path"] or 'soffice'
+
+
+def excel_available() -> bool:
+    """Windows側のExcelが利用可能か（WSL2環境用、初回はExcelを起動して検出）"""
+    return probe_excel()
+
+
+def wsl_distro_name() -> str:
+    """WSLディストリビューション名（取得失敗時は 'Ubuntu'）"""
+    return probe_environment()["wsl_distro"] or 'Ubuntu'
+
+
+def main():
+    """
+    メイン関数
+
+    検出結果をJSON形式で標準出力に返す。--refresh でキャッシュを使わずに再検出する。
+    """
+    try:
+        import timings
+        refresh = '--refresh' in sys.argv[1:]
+        with timings.span("probe_environment"):
+            # キャッシュ済みの検出結果を変更しないようコピーに追加
+            result = dict(probe_environment(refresh=refresh))
+        with timings.span("probe_excel"):
+            result["excel"] = probe_excel(refresh=refresh)
+        result["engines"] = [
+            engine for engine, available in (('libreoffice', result["libreoffice"]), ('excel', result["excel"]))
+            if available
+        ]
+        print(json.dumps(timings.attach(result), ensure_ascii=False))
+
+    except Exception as e:
+        import traceback
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc()
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
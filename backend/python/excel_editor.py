@@ -10,9 +10,10 @@ Excel編集スクリプト（openpyxl使用）
 
 引数:
     company_name: 取引先名（ネクストビッツ or オフ・ビート・ワークス）
-    template_path: テンプレートExcelファイルのパス
-    output_path: 出力Excelファイルのパス
-    data_json: PDF解析データ（JSON文字列）
+    template_path: テンプレートExcelファイルのパス、または stdin:<名前> / fd:<番号>（stream_input.py参照）
+    output_path: 出力Excelファイルのパス、または stdout:<ファイル名>
+                 （ファイルに書き込まず、結果のJSONと出力Excelをバンドルで標準出力に返す、stream_output.py参照）
+    data_json: PDF解析データ（JSON文字列）（@<パス> / - / stdin:<名前> も指定可、stream_input.load_json 参照）
 
 出力:
     編集済みExcelファイルのパス（標準出力）
@@ -40,12 +41,19 @@ Excel編集スクリプト（openpyxl使用）
             - T20~: 単価（注文書シートT18~と同じ）
 """
 
+import io
 import sys
 import json
 import openpyxl
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union, BinaryIO
+
+import excel_formula
+import scratch
+import stream_input
+import stream_output
+import timings
 
 
 def edit_nextbits_excel(wb: openpyxl.Workbook, data: Dict[str, Any]) -> datetime:
@@ -306,7 +314,66 @@ def validate_totals(wb: openpyxl.Workbook, data: Dict[str, Any], company_name: s
     }
 
 
-def restore_drawing_from_template(template_path: str, output_path: str, issue_date: datetime = None, company_name: str = None) -> None:
+def _issue_date_cached_values(issue_date: datetime, company_name: str) -> Dict[str, Dict[str, Any]]:
+    """
+    発行日から求まるTEXT関数のキャッシュ値（数式評価ができない場合の最低限の値）
+
+    - 注文書AC3: =TEXT(AC2,"yyyymmdd")&"-01"（オフ・ビート・ワークスは"-02"）
+    - 注文書C17 / 検収書C19: =TEXT(AC2,"yyyy年mm月分作業費")（オフ・ビート・ワークスは「分」なし）
+    """
+    order_suffix = '-02' if company_name == 'オフ・ビート・ワークス' else '-01'
+    if company_name == 'オフ・ビート・ワークス':
+        title = issue_date.strftime('%Y年%m月作業費')
+    else:
+        title = issue_date.strftime('%Y年%m月分作業費')
+    return {
+        "注文書": {"AC3": issue_date.strftime('%Y%m%d') + order_suffix, "C17": title},
+        "検収書": {"C19": title},
+    }
+
+
+def _sheet_part_names(workbook_xml: str) -> Dict[str, str]:
+    """
+    シート名 → シートXMLのパート名（openpyxlはシート順に sheet1.xml, sheet2.xml... で保存する）
+    """
+    import re
+    names = re.findall(r'<sheet [^>]*name="([^"]+)"', workbook_xml)
+    return {
+        name: f'xl/worksheets/sheet{i}.xml'
+        for i, name in enumerate(names, start=1)
+    }
+
+
+def compute_cached_values(wb: openpyxl.Workbook, snapshot: tuple = None) -> Dict[str, Any]:
+    """
+    編集済みワークブックの数式セルをPythonで評価
+
+    Args:
+        wb: 編集済みワークブック
+        snapshot: excel_formula.snapshot_workbook(wb) の結果（取得済みの場合）
+
+    Returns:
+        {"values": {シート名: {座標: 値}}, "complete": 全数式セルを評価できたか}
+    """
+    values, formulas = snapshot or excel_formula.snapshot_workbook(wb)
+    evaluator = excel_formula.FormulaEvaluator(values, formulas)
+    results: Dict[str, Dict[str, Any]] = {}
+    complete = True
+    for sheet_name, sheet_formulas in formulas.items():
+        results[sheet_name] = {}
+        for coord in sheet_formulas:
+            try:
+                results[sheet_name][coord] = evaluator.cell_value(sheet_name, coord)
+            except excel_formula.UnsupportedFormulaError as e:
+                # 評価できないセルはキャッシュ値なし（Excel/LibreOfficeでの再計算に任せる）
+                print(f"[cached_values] {sheet_name}!{coord}: {e}", file=sys.stderr)
+                complete = False
+    return {"values": results, "complete": complete}
+
+
+def restore_drawing_from_template(template_path: Union[str, bytes], output_path: Union[str, BinaryIO], issue_date: datetime = None, company_name: str = None,
+                                  cached_values: Dict[str, Dict[str, Any]] = None, write_manifest: bool = False,
+                                  template_hash: str = None, edits: Dict[str, Dict[str, Any]] = None) -> None:
     """
     テンプレートからopenpyxlが削除/変更したファイルを復元する
 
@@ -328,13 +395,18 @@ def restore_drawing_from_template(template_path: str, output_path: str, issue_da
     シートXML（データ）のみを処理後ファイルから取得することで、Excelでの修復エラーを防ぐ。
 
     Args:
-        template_path: テンプレートExcelファイルのパス
-        output_path: 出力Excelファイルのパス（修復対象）
-        issue_date: 発行日（TEXT関数のキャッシュ値計算用）
+        template_path: テンプレートExcelファイルのパス、またはバイト列
+        output_path: 出力Excelファイルのパス（修復対象）、またはメモリ上の出力（BytesIO、内容を置き換える）
+        issue_date: 発行日（cached_values未指定時のTEXT関数のキャッシュ値計算用）
+        company_name: 取引先名
+        cached_values: 数式セルのキャッシュ値 {シート名: {座標: 値}}（compute_cached_valuesの結果）
+        write_manifest: キャッシュ値マニフェストを追加するか（全数式セルを評価できた場合のみ指定する）
+        template_hash: テンプレートのハッシュ（マニフェストに記録し、excel_validatorの差分検証に使う）
+        edits: テンプレートから変更したセル（excel_formula.diff_workbookの結果）
     """
     import zipfile
-    import tempfile
     import shutil
+    from contextlib import ExitStack
     import os
     import re
 
@@ -375,10 +447,11 @@ def restore_drawing_from_template(template_path: str, output_path: str, issue_da
     template_files = {}
     processed_files = {}
     template_drawing_rids = {}
+    written_files = {}
 
     try:
         # テンプレートファイルを読み込み
-        with zipfile.ZipFile(template_path, 'r') as template_zip:
+        with zipfile.ZipFile(stream_input.as_file(template_path), 'r') as template_zip:
             for name in template_zip.namelist():
                 template_files[name] = template_zip.read(name)
 
@@ -399,203 +472,206 @@ def restore_drawing_from_template(template_path: str, output_path: str, issue_da
         print(f"[restore_drawing] Error reading files: {e}", file=sys.stderr)
         raise
 
-    # 出力ファイルを更新
-    tmp_path = None
+    # キャッシュ値をシートXMLのパート名ごとに振り分け
+    # cached_valuesが渡されない場合は、発行日から求まるTEXT関数の値のみを設定する
+    if cached_values is None and issue_date is not None:
+        cached_values = _issue_date_cached_values(issue_date, company_name)
+        write_manifest = False
+    sheet_cached_values = {}
+    if cached_values:
+        sheet_parts = _sheet_part_names(processed_files.get('xl/workbook.xml', b'').decode('utf-8'))
+        for sheet_name, values in cached_values.items():
+            if sheet_name in sheet_parts:
+                sheet_cached_values[sheet_parts[sheet_name]] = values
+    write_manifest = bool(write_manifest and cached_values)
+
+    # 出力ファイルを更新（作業ディレクトリに書き込んでから置き換える、scratch.py参照）
+    in_memory = not isinstance(output_path, str)
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            tmp_path = tmp_file.name
-
-        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as new_zip:
-            # 処理後ファイルのすべてのファイルをベースにする
-            for name, content in processed_files.items():
-                # 削除対象のファイルはスキップ
-                if name in files_to_remove:
-                    continue
-
-                # テンプレートから復元すべきファイルの場合
-                if name in files_from_template and name in template_files:
-                    content = template_files[name]
-
-                # シートXMLの場合、drawing参照のrIdを修正（テンプレートの正しいrIdに合わせる）
-                if name in template_drawing_rids:
-                    content_str = content.decode('utf-8')
-                    correct_rid = template_drawing_rids[name]
-                    # drawing参照のrIdを正しい値に置換
-                    content_str = re.sub(
-                        r'(<drawing[^>]*r:id=")rId\d+(")',
-                        rf'\g<1>{correct_rid}\2',
-                        content_str
-                    )
-                    content = content_str.encode('utf-8')
-
-                # シートXML（sheet1.xml = 注文書）の場合、TEXT関数のキャッシュ値を設定
-                # openpyxlは数式のキャッシュ値を保持しないため、Pythonで計算して設定する
-                if name == 'xl/worksheets/sheet1.xml' and issue_date is not None:
-                    content_str = content.decode('utf-8')
-
-                    # AC3: 注文番号（取引先ごとに異なる形式）
-                    # ネクストビッツ: =TEXT(AC2,"yyyymmdd")&"-01" → "20250801-01"
-                    # オフビートワークス: =TEXT(AC2,"yyyymmdd")&"-02" → "20250801-02"
-                    order_suffix = '-02' if company_name == 'オフ・ビート・ワークス' else '-01'
-                    ac3_value = issue_date.strftime('%Y%m%d') + order_suffix
-                    # <v></v> または <v/> を <v>計算結果</v> に置換
-                    # AC3セルのパターン: <c r="AC3" ...><f>...</f><v></v></c>
-                    content_str = re.sub(
-                        r'(<c r="AC3"[^>]*>)(<f>[^<]*</f>)<v></v>(</c>)',
-                        rf'\1\2<v>{ac3_value}</v>\3',
-                        content_str
-                    )
-                    # <v/>の場合も対応
-                    content_str = re.sub(
-                        r'(<c r="AC3"[^>]*>)(<f>[^<]*</f>)<v/>(</c>)',
-                        rf'\1\2<v>{ac3_value}</v>\3',
-                        content_str
-                    )
-                    # t="str"属性を追加（数式の結果が文字列であることを示す）
-                    # <c r="AC3" s="47"> → <c r="AC3" s="47" t="str">
-                    content_str = re.sub(
-                        r'(<c r="AC3" s="\d+")(?! t="str")([^>]*>)',
-                        r'\1 t="str"\2',
-                        content_str
-                    )
-
-                    # C17: 明細タイトル（取引先ごとに異なる形式）
-                    # ネクストビッツ: =TEXT(AC2,"yyyy年mm月分作業費") → "2025年08月分作業費"
-                    # オフビートワークス: =TEXT(AC2,"yyyy年mm月作業費") → "2025年08月作業費"（「分」なし）
-                    if company_name == 'オフ・ビート・ワークス':
-                        c17_value = issue_date.strftime('%Y年%m月作業費')
-                    else:
-                        c17_value = issue_date.strftime('%Y年%m月分作業費')
-                    content_str = re.sub(
-                        r'(<c r="C17"[^>]*>)(<f>[^<]*</f>)<v></v>(</c>)',
-                        rf'\1\2<v>{c17_value}</v>\3',
-                        content_str
-                    )
-                    content_str = re.sub(
-                        r'(<c r="C17"[^>]*>)(<f>[^<]*</f>)<v/>(</c>)',
-                        rf'\1\2<v>{c17_value}</v>\3',
-                        content_str
-                    )
-                    # t="str"属性を追加
-                    content_str = re.sub(
-                        r'(<c r="C17" s="\d+")(?! t="str")([^>]*>)',
-                        r'\1 t="str"\2',
-                        content_str
-                    )
-
-                    content = content_str.encode('utf-8')
-
-                # シートXML（sheet2.xml = 検収書）の場合も同様にキャッシュ値を設定
-                if name == 'xl/worksheets/sheet2.xml' and issue_date is not None:
-                    content_str = content.decode('utf-8')
-
-                    # C19: 明細タイトル（取引先ごとに異なる形式）
-                    # ネクストビッツ: =TEXT(注文書!$AC$2,"yyyy年mm月分作業費") → "2025年08月分作業費"
-                    # オフビートワークス: =TEXT(注文書!$AC$2,"yyyy年mm月作業費") → "2025年08月作業費"（「分」なし）
-                    if company_name == 'オフ・ビート・ワークス':
-                        c19_value = issue_date.strftime('%Y年%m月作業費')
-                    else:
-                        c19_value = issue_date.strftime('%Y年%m月分作業費')
-                    content_str = re.sub(
-                        r'(<c r="C19"[^>]*>)(<f>[^<]*</f>)<v></v>(</c>)',
-                        rf'\1\2<v>{c19_value}</v>\3',
-                        content_str
-                    )
-                    content_str = re.sub(
-                        r'(<c r="C19"[^>]*>)(<f>[^<]*</f>)<v/>(</c>)',
-                        rf'\1\2<v>{c19_value}</v>\3',
-                        content_str
-                    )
-                    # t="str"属性を追加
-                    content_str = re.sub(
-                        r'(<c r="C19" s="\d+")(?! t="str")([^>]*>)',
-                        r'\1 t="str"\2',
-                        content_str
-                    )
-
-                    content = content_str.encode('utf-8')
-
-                # workbook.xmlの場合、強制再計算フラグを追加
-                # calcPr要素にfullCalcOnLoad="1"を設定してExcelがファイルを開いた時に再計算させる
-                if name == 'xl/workbook.xml':
-                    content_str = content.decode('utf-8')
-                    # calcPr要素が存在する場合、fullCalcOnLoadを追加
-                    if '<calcPr' in content_str:
-                        # fullCalcOnLoad属性がない場合のみ追加
-                        if 'fullCalcOnLoad' not in content_str:
-                            content_str = re.sub(
-                                r'(<calcPr)',
-                                r'\1 fullCalcOnLoad="1"',
-                                content_str
-                            )
-                    else:
-                        # calcPr要素がない場合、workbook終了タグの前に追加
+        with ExitStack() as stack:
+            if in_memory:
+                new_target = io.BytesIO()
+            else:
+                new_target = os.path.join(stack.enter_context(scratch.workspace('restore')), 'output.xlsx')
+
+            with zipfile.ZipFile(new_target, 'w', zipfile.ZIP_DEFLATED) as new_zip:
+                # 処理後ファイルのすべてのファイルをベースにする
+                for name, content in processed_files.items():
+                    # 削除対象のファイルはスキップ
+                    if name in files_to_remove:
+                        continue
+
+                    # テンプレートから復元すべきファイルの場合
+                    if name in files_from_template and name in template_files:
+                        content = template_files[name]
+
+                    # シートXMLの場合、drawing参照のrIdを修正（テンプレートの正しいrIdに合わせる）
+                    if name in template_drawing_rids:
+                        content_str = content.decode('utf-8')
+                        correct_rid = template_drawing_rids[name]
+                        # drawing参照のrIdを正しい値に置換
                         content_str = re.sub(
-                            r'(</workbook>)',
-                            r'<calcPr fullCalcOnLoad="1"/>\1',
+                            r'(<drawing[^>]*r:id=")rId\d+(")',
+                            rf'\g<1>{correct_rid}\2',
                             content_str
                         )
-                    content = content_str.encode('utf-8')
-
-                new_zip.writestr(name, content)
+                        content = content_str.encode('utf-8')
+
+                    # シートXMLの場合、数式のキャッシュ値（<v>）を設定
+                    # openpyxlは数式のキャッシュ値を保持しないため、Pythonで計算した値を設定する
+                    if name in sheet_cached_values:
+                        content_str = content.decode('utf-8')
+                        content_str = excel_formula.set_cached_values(content_str, sheet_cached_values[name])
+                        content = content_str.encode('utf-8')
+
+                    # マニフェストを追加する場合、ContentTypeを登録
+                    if name == '[Content_Types].xml' and write_manifest:
+                        content_str = content.decode('utf-8')
+                        manifest_part_name = '/' + excel_formula.MANIFEST_PART
+                        if manifest_part_name not in content_str:
+                            content_str = content_str.replace(
+                                '</Types>',
+                                f'<Override PartName="{manifest_part_name}" '
+                                f'ContentType="{excel_formula.MANIFEST_CONTENT_TYPE}"/></Types>'
+                            )
+                        content = content_str.encode('utf-8')
+
+                    # workbook.xmlの場合、強制再計算フラグを追加
+                    # calcPr要素にfullCalcOnLoad="1"を設定してExcelがファイルを開いた時に再計算させる
+                    if name == 'xl/workbook.xml':
+                        content_str = content.decode('utf-8')
+                        # calcPr要素が存在する場合、fullCalcOnLoadを追加
+                        if '<calcPr' in content_str:
+                            # fullCalcOnLoad属性がない場合のみ追加
+                            if 'fullCalcOnLoad' not in content_str:
+                                content_str = re.sub(
+                                    r'(<calcPr)',
+                                    r'\1 fullCalcOnLoad="1"',
+                                    content_str
+                                )
+                        else:
+                            # calcPr要素がない場合、workbook終了タグの前に追加
+                            content_str = re.sub(
+                                r'(</workbook>)',
+                                r'<calcPr fullCalcOnLoad="1"/>\1',
+                                content_str
+                            )
+                        content = content_str.encode('utf-8')
 
-            # テンプレートにあって処理後ファイルにないファイルを追加
-            # （openpyxlが削除したファイルを復元）
-            # ただし削除対象のファイルは復元しない
-            for name, content in template_files.items():
-                if name not in processed_files and name not in files_to_remove:
                     new_zip.writestr(name, content)
+                    written_files[name] = content
+
+                # テンプレートにあって処理後ファイルにないファイルを追加
+                # （openpyxlが削除したファイルを復元）
+                # ただし削除対象のファイルは復元しない
+                for name, content in template_files.items():
+                    if name not in processed_files and name not in files_to_remove:
+                        new_zip.writestr(name, content)
+                        written_files[name] = content
+
+                # キャッシュ値マニフェストを追加（excel_validatorがLibreOfficeでの再計算を省略するために使用）
+                if write_manifest:
+                    hashed_parts = {
+                        name: written_files[name]
+                        for name in excel_formula.manifest_hashed_parts(list(written_files))
+                    }
+                    manifest = excel_formula.build_manifest(
+                        company_name, cached_values, hashed_parts, template_hash=template_hash, edits=edits
+                    )
+                    new_zip.writestr(excel_formula.MANIFEST_PART, json.dumps(manifest, ensure_ascii=False))
 
-        # 元のファイルを置き換え
-        shutil.move(tmp_path, output_path)
+            # 元のファイルを置き換え
+            if in_memory:
+                output_path.seek(0)
+                output_path.truncate()
+                output_path.write(new_target.getvalue())
+            else:
+                shutil.move(new_target, output_path)
 
     except Exception as e:
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
         print(f"[restore_drawing] Error restoring files: {e}", file=sys.stderr)
         raise
 
 
-def edit_excel(company_name: str, template_path: str, output_path: str, data: Dict[str, Any]) -> Dict[str, Any]:
+def apply_company_edits(wb: openpyxl.Workbook, company_name: str, data: Dict[str, Any]) -> datetime:
+    """
+    取引先ごとの編集処理を適用
+
+    openpyxlのワークブックのほか、excel_formula.WorkbookModel（プレビュー用）も受け付ける。
+
+    Returns:
+        発行日（TEXT関数のキャッシュ値計算に使用）
+
+    Raises:
+        ValueError: 未対応の取引先の場合
+    """
+    if company_name == "ネクストビッツ":
+        return edit_nextbits_excel(wb, data)
+    elif company_name == "オフ・ビート・ワークス":
+        return edit_offbeat_excel(wb, data)
+    else:
+        raise ValueError(f"未対応の取引先: {company_name}")
+
+
+def edit_excel(company_name: str, template_path: Union[str, bytes], output_path: Union[str, BinaryIO],
+               data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Excelテンプレートにデータを転記
 
     Args:
         company_name: 取引先名
-        template_path: テンプレートExcelファイルのパス
-        output_path: 出力Excelファイルのパス
+        template_path: テンプレートExcelファイルのパス、またはテンプレートのバイト列（メモリ上で読み込む）
+        output_path: 出力Excelファイルのパス、またはメモリ上の出力（BytesIO、ファイルに書き込まない）
         data: PDF解析データ（辞書型）
 
     Returns:
-        編集結果（パス、検証結果を含む）
+        編集結果（パス、検証結果を含む、メモリ上の出力の場合は output_path が None）
     """
     try:
         # テンプレートExcelを読み込み
-        wb = openpyxl.load_workbook(template_path)
+        with timings.span("load_workbook"):
+            wb = openpyxl.load_workbook(stream_input.as_file(template_path))
+
+        # 編集前のテンプレートをコンパイル済みテンプレートとして登録（excel_validatorの差分検証用）
+        with timings.span("register_template"):
+            template_hash = excel_formula.template_hash(template_path)
+            template = excel_formula.register_template(template_hash, wb)
 
         # 取引先ごとの編集処理（発行日を返す）
-        issue_date = None
-        if company_name == "ネクストビッツ":
-            issue_date = edit_nextbits_excel(wb, data)
-        elif company_name == "オフ・ビート・ワークス":
-            issue_date = edit_offbeat_excel(wb, data)
-        else:
-            raise ValueError(f"未対応の取引先: {company_name}")
+        with timings.span("apply_edits"):
+            issue_date = apply_company_edits(wb, company_name, data)
 
         # 金額の検証
-        validation = validate_totals(wb, data, company_name)
+        with timings.span("validate_totals"):
+            validation = validate_totals(wb, data, company_name)
+
+        # 数式セルのキャッシュ値を計算（excel_validatorはこの値を信頼して再計算を省略できる）
+        with timings.span("compute_cached_values"):
+            snapshot = excel_formula.snapshot_workbook(wb)
+            cached = compute_cached_values(wb, snapshot)
+
+        # テンプレートから変更したセル（マニフェストに記録）
+        with timings.span("diff_workbook"):
+            edits = excel_formula.diff_workbook(template, *snapshot)
 
         # 編集済みExcelを保存
-        wb.save(output_path)
+        with timings.span("save_workbook"):
+            wb.save(output_path)
 
         # テンプレートからdrawing1.xmlを復元（openpyxlが削除した拡張情報を復元）
-        # issue_dateとcompany_nameを渡してTEXT関数のキャッシュ値を設定
-        restore_drawing_from_template(template_path, output_path, issue_date, company_name)
+        # 計算したキャッシュ値を設定し、全数式セルを評価できた場合はマニフェストを追加
+        with timings.span("restore_drawing"):
+            restore_drawing_from_template(
+                template_path, output_path, issue_date, company_name,
+                cached_values=cached["values"], write_manifest=cached["complete"],
+                template_hash=template_hash, edits=edits
+            )
 
         return {
             "success": True,
-            "output_path": output_path,
-            "validation": validation
+            "output_path": output_path if isinstance(output_path, str) else None,
+            "validation": validation,
+            "cached_values": cached["complete"]
         }
 
     except Exception as e:
@@ -616,19 +692,30 @@ def main():
         sys.exit(1)
 
     company_name = sys.argv[1]
-    template_path = sys.argv[2]
+    template_source = sys.argv[2]
     output_path = sys.argv[3]
     data_json = sys.argv[4]
 
     try:
-        # JSON文字列をパース
-        data = json.loads(data_json)
+        # JSON文字列をパース（@<パス> / - / stdin:<名前> の場合はファイル・標準入力から読み込む）
+        data = stream_input.load_json(data_json)
+
+        # stdin:<名前> / fd:<番号> の場合はテンプレートのバイト列を受け取る
+        template_path = stream_input.resolve(template_source)
+
+        # stdout:<ファイル名> の場合はメモリ上に出力し、バンドルで標準出力に返す
+        if stream_output.is_stdout(output_path):
+            buffer = io.BytesIO()
+            result = edit_excel(company_name, template_path, buffer, data)
+            filename = stream_output.stdout_filename(output_path, 'output.xlsx')
+            stream_output.write_bundle(timings.attach(result), [('excel', filename, buffer.getvalue())])
+            return
 
         # Excel編集
         result = edit_excel(company_name, template_path, output_path, data)
 
         # 成功時は結果をJSON形式で返す
-        print(json.dumps(result, ensure_ascii=False))
+        print(json.dumps(timings.attach(result), ensure_ascii=False))
 
     except Exception as e:
         # エラー時はエラー情報をJSON形式で返す
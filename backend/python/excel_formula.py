@@ -0,0 +1,1174 @@
+#!/usr/bin/env python3
+"""
+Excel数式評価モジュール（LibreOffice不要）
+
+テンプレートExcelのセル値と数式を「コンパイル済みテンプレート」として
+キャッシュし、Pythonだけで数式を評価します。
+
+テンプレートで使われている数式のみを対象とした小さな評価器で、
+以下の関数・演算子に対応しています:
+    - TEXT, EOMONTH, SUM, ROUND, ROUNDDOWN, ROUNDUP
+    - 四則演算（+ - * /）、文字列連結（&）、比較演算子
+    - シート間参照（例: 注文書!$AC$2）、範囲参照（例: W16:Z38）
+
+未対応の関数を含む数式は UnsupportedFormulaError を送出します。
+呼び出し側はこの例外を受けて、LibreOfficeでの再計算にフォールバックすること。
+
+キャッシュ:
+    コンパイル済みテンプレートはテンプレートのSHA-256ハッシュをキーとして、
+    プロセス内メモリと PDF_PROCESSOR_CACHE_DIR（デフォルト: <tmp>/seikyu-henkan-cache）
+    配下の templates/<hash>.json に保存されます。ディスクへの保存はExcel編集（register_template）・
+    compile_template のみで、プレビュー（resolve_template）はメモリ上でのみコンパイルします。
+    プロセス内のキャッシュ（コンパイル済みテンプレート・数式の解析結果）は、serveモードで
+    常駐しても増え続けないよう、最近使用したものから一定数のみ保持します。
+"""
+
+import os
+import re
+import json
+import math
+import hmac
+import hashlib
+import secrets
+import tempfile
+import threading
+import unicodedata
+from calendar import monthrange
+from collections import OrderedDict
+from functools import lru_cache
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
+
+import metrics
+# キャッシュディレクトリは環境検出モジュールと共有
+from environment_probe import get_cache_dir
+
+# コンパイル済みテンプレートのキャッシュ形式バージョン（形式変更時にインクリメント）
+COMPILED_TEMPLATE_VERSION = 1
+
+# Excelのシリアル値の基準日（1900年日付システム、1900/2/29バグ込み）
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+# プロセス内キャッシュの上限（コンパイル済みテンプレート数・数式の解析結果数、最近使用したものを残す）
+TEMPLATE_CACHE_SIZE = 32
+PARSE_CACHE_SIZE = 4096
+
+# プロセス内キャッシュ（テンプレートハッシュ → CompiledTemplate、使用順）
+_compiled_templates: "OrderedDict[str, CompiledTemplate]" = OrderedDict()
+_compiled_templates_lock = threading.Lock()
+
+
+class UnsupportedFormulaError(ValueError):
+    """評価器が対応していない数式"""
+
+
+# ============================================================
+# セル座標ユーティリティ
+# ============================================================
+
+def col_letter_to_number(col_letter: str) -> int:
+    """列文字を列番号に変換（A=1, B=2, ..., AA=27, ...）"""
+    result = 0
+    for char in col_letter.upper():
+        result = result * 26 + (ord(char) - ord('A') + 1)
+    return result
+
+
+def col_number_to_letter(col: int) -> str:
+    """列番号を列文字に変換（1=A, 27=AA, ...）"""
+    letters = ''
+    while col > 0:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def split_coordinate(coord: str) -> Tuple[str, int]:
+    """セル座標を列文字と行番号に分割（例: "$AC$3" → ("AC", 3)）"""
+    match = re.match(r'^\$?([A-Z]{1,3})\$?(\d+)$', coord.upper())
+    if not match:
+        raise ValueError(f"不正なセル座標: {coord}")
+    return match.group(1), int(match.group(2))
+
+
+def normalize_coordinate(coord: str) -> str:
+    """絶対参照の$を除去したセル座標を返す（例: "$AC$2" → "AC2"）"""
+    col, row = split_coordinate(coord)
+    return f"{col}{row}"
+
+
+# ============================================================
+# 数式パーサー
+# ============================================================
+
+_TOKEN_PATTERN = re.compile(
+    r'\s*(?:'
+    r'(?P<string>"(?:[^"]|"")*")'
+    r'|(?P<func>[A-Z][A-Z0-9.]*)\('
+    r'|(?P<ref>(?:(?:\'[^\']+\'|[^\W\d][\w.]*)!)?\$?[A-Z]{1,3}\$?\d+(?::\$?[A-Z]{1,3}\$?\d+)?)(?![\w(])'
+    r'|(?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)'
+    r'|(?P<op><>|<=|>=|[-+*/&^=<>(),])'
+    r')'
+)
+
+
+def tokenize(formula: str) -> List[Tuple[str, str]]:
+    """数式文字列をトークン列に分解"""
+    tokens: List[Tuple[str, str]] = []
+    pos = 0
+    text = formula.strip()
+    while pos < len(text):
+        match = _TOKEN_PATTERN.match(text, pos)
+        if not match or match.end() == pos:
+            raise UnsupportedFormulaError(f"数式を解析できません: {formula}（位置 {pos}）")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+        # 末尾の空白を読み飛ばす
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+    return tokens
+
+
+class _Parser:
+    """
+    再帰下降パーサー
+
+    優先順位（低→高）: 比較 < & < +- < */ < ^ < 単項マイナス
+    ASTはタプルで表現する:
+        ('num', 値) / ('str', 値) / ('ref', シート, 座標) / ('range', シート, 始点, 終点)
+        ('func', 関数名, [引数]) / ('binop', 演算子, 左, 右) / ('neg', 式)
+    """
+
+    def __init__(self, tokens: List[Tuple[str, str]], formula: str):
+        self.tokens = tokens
+        self.formula = formula
+        self.pos = 0
+
+    def peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self) -> Tuple[str, str]:
+        token = self.peek()
+        if token is None:
+            raise UnsupportedFormulaError(f"数式が途中で終わっています: {self.formula}")
+        self.pos += 1
+        return token
+
+    def expect_op(self, op: str) -> None:
+        kind, value = self.take()
+        if kind != 'op' or value != op:
+            raise UnsupportedFormulaError(f"「{op}」が必要です: {self.formula}")
+
+    def parse(self):
+        node = self.comparison()
+        if self.peek() is not None:
+            raise UnsupportedFormulaError(f"数式の末尾を解析できません: {self.formula}")
+        return node
+
+    def _binary(self, operand, operators):
+        node = operand()
+        while True:
+            token = self.peek()
+            if token and token[0] == 'op' and token[1] in operators:
+                self.pos += 1
+                node = ('binop', token[1], node, operand())
+            else:
+                return node
+
+    def comparison(self):
+        return self._binary(self.concat, ('=', '<>', '<', '>', '<=', '>='))
+
+    def concat(self):
+        return self._binary(self.additive, ('&',))
+
+    def additive(self):
+        return self._binary(self.term, ('+', '-'))
+
+    def term(self):
+        return self._binary(self.power, ('*', '/'))
+
+    def power(self):
+        return self._binary(self.unary, ('^',))
+
+    def unary(self):
+        token = self.peek()
+        if token and token[0] == 'op' and token[1] in ('-', '+'):
+            self.pos += 1
+            operand = self.unary()
+            return ('neg', operand) if token[1] == '-' else operand
+        return self.primary()
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == 'number':
+            number = float(value)
+            return ('num', int(number) if number.is_integer() and '.' not in value else number)
+        if kind == 'string':
+            return ('str', value[1:-1].replace('""', '"'))
+        if kind == 'ref':
+            sheet = None
+            if '!' in value:
+                sheet, value = value.rsplit('!', 1)
+                sheet = sheet.strip("'")
+            if ':' in value:
+                start, end = value.split(':')
+                return ('range', sheet, normalize_coordinate(start), normalize_coordinate(end))
+            return ('ref', sheet, normalize_coordinate(value))
+        if kind == 'func':
+            args = []
+            token = self.peek()
+            if token == ('op', ')'):
+                self.pos += 1
+            else:
+                while True:
+                    args.append(self.comparison())
+                    kind2, value2 = self.take()
+                    if kind2 == 'op' and value2 == ')':
+                        break
+                    if kind2 != 'op' or value2 != ',':
+                        raise UnsupportedFormulaError(f"関数の引数を解析できません: {self.formula}")
+            return ('func', value.upper(), args)
+        if kind == 'op' and value == '(':
+            node = self.comparison()
+            self.expect_op(')')
+            return node
+        raise UnsupportedFormulaError(f"予期しないトークン「{value}」: {self.formula}")
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse(text: str):
+    return _Parser(tokenize(text), text).parse()
+
+
+def parse_formula(formula: str):
+    """
+    数式文字列をASTに変換（結果は PARSE_CACHE_SIZE 件までキャッシュされる）
+
+    Args:
+        formula: 数式（先頭の「=」はあってもなくてもよい）
+    """
+    return _parse(formula[1:] if formula.startswith('=') else formula)
+
+
+# ============================================================
+# 値の変換
+# ============================================================
+
+def to_serial(value: datetime) -> float:
+    """datetimeをExcelのシリアル値に変換"""
+    delta = value - EXCEL_EPOCH
+    return delta.days + delta.seconds / 86400
+
+
+def from_serial(serial: Union[int, float]) -> datetime:
+    """Excelのシリアル値をdatetimeに変換"""
+    return EXCEL_EPOCH + timedelta(days=float(serial))
+
+
+def _excel_precision(value: float) -> float:
+    """Excelと同じく有効桁数15桁に丸める（0.1倍などの浮動小数点誤差対策）"""
+    return float(f"{value:.15g}")
+
+
+def _tidy_number(value: float) -> Union[int, float]:
+    """整数値のfloatはintに変換（JSON出力・比較を安定させるため）"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _to_number(value: Any) -> Union[int, float]:
+    if value is None or value == '':
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return to_serial(value)
+    try:
+        return float(str(value).replace(',', ''))
+    except ValueError:
+        raise UnsupportedFormulaError(f"数値に変換できません: {value!r}")
+
+
+def _to_text(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float):
+        return str(_tidy_number(value))
+    if isinstance(value, datetime):
+        return str(_tidy_number(to_serial(value)))
+    return str(value)
+
+
+def _to_datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return from_serial(_to_number(value))
+
+
+def format_text(value: Any, fmt: str) -> str:
+    """
+    TEXT関数の書式適用
+
+    日付書式（yyyy, yy, mm, m, dd, d）と数値書式（0, #,##0, 0.00 等）に対応。
+    テンプレートでは全角の「ｍｍ」も使われているため、書式はNFKC正規化してから解釈する。
+    """
+    fmt = unicodedata.normalize('NFKC', fmt)
+    if re.search(r'[yYdD]|m', fmt):
+        date = _to_datetime(value)
+        tokens = {
+            'yyyy': f"{date.year:04d}",
+            'yy': f"{date.year % 100:02d}",
+            'mm': f"{date.month:02d}",
+            'm': str(date.month),
+            'dd': f"{date.day:02d}",
+            'd': str(date.day),
+        }
+        return re.sub(r'yyyy|yy|mm|m|dd|d', lambda m: tokens[m.group(0)], fmt, flags=re.IGNORECASE)
+
+    number = _to_number(value)
+    match = re.match(r'^([#,0]*)(?:\.(0+))?$', fmt)
+    if not match:
+        raise UnsupportedFormulaError(f"未対応のTEXT書式: {fmt}")
+    decimals = len(match.group(2) or '')
+    grouping = ',' if ',' in match.group(1) else ''
+    return format(round(number, decimals), f"{grouping}.{decimals}f")
+
+
+def _round(value: float, digits: int, mode: str) -> Union[int, float]:
+    factor = 10 ** digits
+    scaled = _excel_precision(value * factor)
+    if mode == 'down':
+        result = math.trunc(scaled)
+    elif mode == 'up':
+        result = math.ceil(abs(scaled)) * (1 if scaled >= 0 else -1)
+    else:
+        result = math.floor(abs(scaled) + 0.5) * (1 if scaled >= 0 else -1)
+    return _tidy_number(result / factor if digits else float(result))
+
+
+# ============================================================
+# 評価器
+# ============================================================
+
+class FormulaEvaluator:
+    """
+    シートごとの値・数式を受け取り、数式セルを評価する
+
+    Args:
+        values: {シート名: {座標: 値}}（数式セルを含まない）
+        formulas: {シート名: {座標: 数式文字列}}
+    """
+
+    def __init__(self, values: Dict[str, Dict[str, Any]], formulas: Dict[str, Dict[str, str]]):
+        self.values = values
+        self.formulas = formulas
+        self._results: Dict[Tuple[str, str], Any] = {}
+        self._evaluating: set = set()
+
+    def cell_value(self, sheet: str, coord: str) -> Any:
+        """セル値を取得（数式セルは評価結果）"""
+        key = (sheet, coord)
+        if key in self._results:
+            return self._results[key]
+        formula = self.formulas.get(sheet, {}).get(coord)
+        if formula is None:
+            return self.values.get(sheet, {}).get(coord)
+        if key in self._evaluating:
+            raise UnsupportedFormulaError(f"循環参照: {sheet}!{coord}")
+        self._evaluating.add(key)
+        try:
+            value = self._eval(parse_formula(formula), sheet)
+        finally:
+            self._evaluating.discard(key)
+        self._results[key] = value
+        return value
+
+    def evaluate_all(self) -> Dict[str, Dict[str, Any]]:
+        """すべての数式セルを評価して {シート名: {座標: 値}} を返す"""
+        return {
+            sheet: {coord: self.cell_value(sheet, coord) for coord in formulas}
+            for sheet, formulas in self.formulas.items()
+        }
+
+    def _range_values(self, sheet: str, start: str, end: str) -> List[Any]:
+        start_col, start_row = split_coordinate(start)
+        end_col, end_row = split_coordinate(end)
+        col_from, col_to = sorted((col_letter_to_number(start_col), col_letter_to_number(end_col)))
+        row_from, row_to = sorted((start_row, end_row))
+        # 範囲内の既知セルのみを走査（空セルはSUM等で無視されるため）
+        known = set(self.values.get(sheet, {})) | set(self.formulas.get(sheet, {}))
+        result = []
+        for coord in known:
+            col, row = split_coordinate(coord)
+            if row_from <= row <= row_to and col_from <= col_letter_to_number(col) <= col_to:
+                result.append(self.cell_value(sheet, coord))
+        return result
+
+    def _eval(self, node, sheet: str) -> Any:
+        kind = node[0]
+        if kind in ('num', 'str'):
+            return node[1]
+        if kind == 'ref':
+            return self.cell_value(node[1] or sheet, node[2])
+        if kind == 'range':
+            return self._range_values(node[1] or sheet, node[2], node[3])
+        if kind == 'neg':
+            return _tidy_number(-_to_number(self._eval(node[1], sheet)))
+        if kind == 'binop':
+            return self._binop(node[1], self._eval(node[2], sheet), self._eval(node[3], sheet))
+        if kind == 'func':
+            return self._call(node[1], node[2], sheet)
+        raise UnsupportedFormulaError(f"未対応の式: {node!r}")
+
+    def _binop(self, op: str, left: Any, right: Any) -> Any:
+        if op == '&':
+            return _to_text(left) + _to_text(right)
+        if op in ('+', '-', '*', '/', '^'):
+            a, b = _to_number(left), _to_number(right)
+            if op == '+':
+                result = a + b
+            elif op == '-':
+                result = a - b
+            elif op == '*':
+                result = a * b
+            elif op == '/':
+                if b == 0:
+                    raise UnsupportedFormulaError("0除算（#DIV/0!）")
+                result = a / b
+            else:
+                result = a ** b
+            return _tidy_number(_excel_precision(result)) if isinstance(result, float) else result
+        # 比較演算子
+        if isinstance(left, str) or isinstance(right, str):
+            a, b = _to_text(left), _to_text(right)
+        else:
+            a, b = _to_number(left), _to_number(right)
+        return {
+            '=': a == b, '<>': a != b, '<': a < b,
+            '>': a > b, '<=': a <= b, '>=': a >= b,
+        }[op]
+
+    def _call(self, name: str, arg_nodes: list, sheet: str) -> Any:
+        args = [self._eval(arg, sheet) for arg in arg_nodes]
+        if name == 'SUM':
+            total = 0
+            for arg in args:
+                for value in (arg if isinstance(arg, list) else [arg]):
+                    # 範囲内の文字列・空セルは無視（Excelと同じ挙動）
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        total += value
+            return _tidy_number(_excel_precision(total)) if isinstance(total, float) else total
+        if name == 'TEXT' and len(args) == 2:
+            return format_text(args[0], _to_text(args[1]))
+        if name == 'EOMONTH' and len(args) == 2:
+            start = _to_datetime(args[0])
+            month_index = start.year * 12 + (start.month - 1) + int(_to_number(args[1]))
+            year, month = divmod(month_index, 12)
+            month += 1
+            return datetime(year, month, monthrange(year, month)[1])
+        if name in ('ROUND', 'ROUNDDOWN', 'ROUNDUP') and len(args) in (1, 2):
+            digits = int(_to_number(args[1])) if len(args) == 2 else 0
+            mode = {'ROUND': 'half', 'ROUNDDOWN': 'down', 'ROUNDUP': 'up'}[name]
+            return _round(_to_number(args[0]), digits, mode)
+        raise UnsupportedFormulaError(f"未対応の関数: {name}")
+
+
+# ============================================================
+# コンパイル済みテンプレート
+# ============================================================
+
+def _encode_value(value: Any) -> Any:
+    """キャッシュJSON用に値をエンコード（datetimeはタグ付き）"""
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$datetime" in value:
+        return datetime.fromisoformat(value["$datetime"])
+    return value
+
+
+class CompiledTemplate:
+    """
+    テンプレートExcelのセル値・数式のスナップショット
+
+    openpyxlでの読み込みは初回のみ行い、以降はキャッシュから復元する。
+    数式は読み込み時にすべて解析され、未対応の数式は unsupported に記録される。
+    """
+
+    def __init__(self, template_hash: str, sheetnames: List[str],
+                 values: Dict[str, Dict[str, Any]], formulas: Dict[str, Dict[str, str]]):
+        self.template_hash = template_hash
+        self.sheetnames = sheetnames
+        self.values = values
+        self.formulas = formulas
+        self.unsupported: Dict[str, str] = {}
+        for sheet, cells in formulas.items():
+            for coord, formula in cells.items():
+                try:
+                    parse_formula(formula)
+                except UnsupportedFormulaError as e:
+                    self.unsupported[f"{sheet}!{coord}"] = str(e)
+        # 全数式セルの参照先（precedents() の初回呼び出し時に解析）
+        self._precedents: Optional[List[Tuple[str, str, List[Tuple]]]] = None
+        # テンプレートのまま変更されていないセルの検証結果（unchanged_check() 参照）
+        self._unchanged_checks: Dict[Tuple, Any] = {}
+
+    def precedents(self) -> List[Tuple[str, str, List[Tuple]]]:
+        """
+        全数式セルの参照先 [(シート名, 座標, formula_precedents の結果)]（テンプレートごとに1回だけ解析する）
+
+        解析できない数式は全セルに依存するものとして [('any',)] とする。
+        同時に呼び出された場合は両方が解析するが、結果は同じ。
+        """
+        if self._precedents is None:
+            precedents = []
+            for sheet, cells in self.formulas.items():
+                for coord, formula in cells.items():
+                    try:
+                        precedents.append((sheet, coord, formula_precedents(formula, sheet)))
+                    except UnsupportedFormulaError:
+                        precedents.append((sheet, coord, [('any',)]))
+            self._precedents = precedents
+        return self._precedents
+
+    def unchanged_check(self, key: Tuple, evaluate: Callable[[], Any]) -> Any:
+        """
+        テンプレートのまま変更されていないセルの検証結果（key ごとに1回だけ evaluate() を呼び出す）
+
+        excel_validator の差分検証で (取引先名, ルール番号) ごとに使う。結果はテンプレートとともに
+        キャッシュから破棄される。同時に呼び出された場合は両方が評価するが、結果は同じ。
+        """
+        result = self._unchanged_checks.get(key)
+        if result is None:
+            result = self._unchanged_checks.setdefault(key, evaluate())
+        return result
+
+    def new_workbook(self) -> "WorkbookModel":
+        """テンプレートを元にした編集用ワークブックモデルを作成"""
+        return WorkbookModel(self)
+
+    def evaluate(self) -> Dict[str, Dict[str, Any]]:
+        """テンプレートそのままの数式評価結果"""
+        return FormulaEvaluator(self.values, self.formulas).evaluate_all()
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "version": COMPILED_TEMPLATE_VERSION,
+            "template_hash": self.template_hash,
+            "sheetnames": self.sheetnames,
+            "values": {
+                sheet: {coord: _encode_value(v) for coord, v in cells.items()}
+                for sheet, cells in self.values.items()
+            },
+            "formulas": self.formulas,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "CompiledTemplate":
+        return cls(
+            data["template_hash"],
+            data["sheetnames"],
+            {
+                sheet: {coord: _decode_value(v) for coord, v in cells.items()}
+                for sheet, cells in data["values"].items()
+            },
+            data["formulas"],
+        )
+
+
+def snapshot_workbook(wb) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, str]]]:
+    """
+    openpyxlのワークブックからセル値と数式を抽出
+
+    Returns:
+        (values, formulas) のタプル。いずれも {シート名: {座標: 値}}
+    """
+    values: Dict[str, Dict[str, Any]] = {}
+    formulas: Dict[str, Dict[str, str]] = {}
+    for ws in wb.worksheets:
+        sheet_values: Dict[str, Any] = {}
+        sheet_formulas: Dict[str, str] = {}
+        for row in ws.iter_rows():
+            for cell in row:
+                value = cell.value
+                if value is None:
+                    continue
+                if cell.data_type == 'f' or (isinstance(value, str) and value.startswith('=')):
+                    sheet_formulas[cell.coordinate] = str(value)
+                else:
+                    sheet_values[cell.coordinate] = value
+        values[ws.title] = sheet_values
+        formulas[ws.title] = sheet_formulas
+    return values, formulas
+
+
+def template_hash(template: Union[str, bytes]) -> str:
+    """テンプレートのSHA-256ハッシュ（パスまたはバイト列）"""
+    if isinstance(template, str):
+        with open(template, 'rb') as f:
+            template = f.read()
+    return hashlib.sha256(template).hexdigest()
+
+
+def _compiled_cache_path(digest: str) -> str:
+    return os.path.join(get_cache_dir(), 'templates', f"{digest}.json")
+
+
+def _remember_template(digest: str, compiled: CompiledTemplate) -> None:
+    """プロセス内キャッシュに追加（上限を超えた場合は最も長く使われていないものを破棄）"""
+    with _compiled_templates_lock:
+        _compiled_templates[digest] = compiled
+        _compiled_templates.move_to_end(digest)
+        while len(_compiled_templates) > TEMPLATE_CACHE_SIZE:
+            _compiled_templates.popitem(last=False)
+
+
+def _find_compiled_template(digest: str) -> Optional[CompiledTemplate]:
+    """ハッシュからコンパイル済みテンプレートを探す（メモリ → ディスクの順、なければNone）"""
+    with _compiled_templates_lock:
+        compiled = _compiled_templates.get(digest)
+        if compiled is not None:
+            _compiled_templates.move_to_end(digest)
+            return compiled
+
+    if re.match(r'^[0-9a-f]{64}$', digest):
+        cache_path = _compiled_cache_path(digest)
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == COMPILED_TEMPLATE_VERSION:
+                compiled = CompiledTemplate.from_json(data)
+                _remember_template(digest, compiled)
+                return compiled
+        except (OSError, ValueError, KeyError):
+            pass
+
+    return None
+
+
+def load_compiled_template(digest: str) -> CompiledTemplate:
+    """
+    ハッシュからコンパイル済みテンプレートを取得（メモリ → ディスクの順に探す）
+
+    Raises:
+        KeyError: キャッシュに存在しない場合
+    """
+    compiled = _find_compiled_template(digest)
+    metrics.record_cache('template', compiled is not None)
+    if compiled is None:
+        raise KeyError(f"コンパイル済みテンプレートが見つかりません: {digest}")
+    return compiled
+
+
+def compile_template(template_path: str, persist: bool = True) -> CompiledTemplate:
+    """
+    テンプレートExcelをコンパイル（キャッシュがあればそれを返す）
+
+    Args:
+        template_path: テンプレートExcelファイルのパス
+        persist: コンパイル結果をディスクキャッシュに保存するか（False の場合はメモリのみ）
+
+    Returns:
+        CompiledTemplate
+    """
+    digest = template_hash(template_path)
+    try:
+        return load_compiled_template(digest)
+    except KeyError:
+        pass
+
+    import openpyxl
+
+    wb = openpyxl.load_workbook(template_path)
+    try:
+        return _compile_workbook(digest, wb, persist)
+    finally:
+        wb.close()
+
+
+def register_template(digest: str, wb) -> CompiledTemplate:
+    """
+    読み込み済み（編集前）のopenpyxlワークブックをコンパイル済みテンプレートとして登録
+
+    excel_editorはテンプレートを読み込んだ直後にこれを呼ぶことで、
+    テンプレートを再度読み込まずにキャッシュを作成できる（キャッシュ済みならそれを返す）。
+
+    Args:
+        digest: テンプレートのSHA-256ハッシュ
+        wb: テンプレートを読み込んだopenpyxlのワークブック（編集前）
+    """
+    try:
+        return load_compiled_template(digest)
+    except KeyError:
+        pass
+
+    return _compile_workbook(digest, wb)
+
+
+def _compile_workbook(digest: str, wb, persist: bool = True) -> CompiledTemplate:
+    """openpyxlのワークブックをコンパイルし、メモリ（persist の場合はディスクも）のキャッシュに保存"""
+    values, formulas = snapshot_workbook(wb)
+    compiled = CompiledTemplate(digest, list(wb.sheetnames), values, formulas)
+    _remember_template(digest, compiled)
+    if not persist:
+        return compiled
+
+    # ディスクキャッシュに保存（書き込み途中のファイルを読まれないよう一時ファイル経由で置換）
+    try:
+        cache_path = _compiled_cache_path(digest)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(compiled.to_json(), f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # キャッシュ保存の失敗は処理に影響させない
+        pass
+
+    return compiled
+
+
+def resolve_template(template: str) -> CompiledTemplate:
+    """
+    テンプレート指定（ファイルパス または テンプレートハッシュ）からコンパイル済みテンプレートを取得
+
+    プレビュー用のため、ファイルパスの場合もディスクキャッシュには保存しない（メモリ上でのみコンパイル）。
+    """
+    if os.path.exists(template):
+        return compile_template(template, persist=False)
+    return load_compiled_template(template)
+
+
+# ============================================================
+# 編集用ワークブックモデル（openpyxl互換の最小インターフェース）
+# ============================================================
+
+class CellModel:
+    """セルモデル（openpyxlのCellと同じく .value で読み書きする）"""
+
+    def __init__(self, sheet: "SheetModel", coordinate: str):
+        self._sheet = sheet
+        self.coordinate = coordinate
+
+    @property
+    def value(self) -> Any:
+        return self._sheet.get_value(self.coordinate)
+
+    @value.setter
+    def value(self, value: Any) -> None:
+        self._sheet.set_value(self.coordinate, value)
+
+
+class SheetModel:
+    """
+    シートモデル
+
+    テンプレートの値・数式の上に編集内容を重ねて保持する（テンプレート自体は変更しない）。
+    「=」で始まる文字列を設定すると、openpyxlと同様に数式として扱う。
+    """
+
+    def __init__(self, template: CompiledTemplate, title: str):
+        self.title = title
+        self.values = dict(template.values.get(title, {}))
+        self.formulas = dict(template.formulas.get(title, {}))
+
+    def get_value(self, coord: str) -> Any:
+        coord = normalize_coordinate(coord)
+        if coord in self.formulas:
+            return self.formulas[coord]
+        return self.values.get(coord)
+
+    def set_value(self, coord: str, value: Any) -> None:
+        coord = normalize_coordinate(coord)
+        self.values.pop(coord, None)
+        self.formulas.pop(coord, None)
+        if isinstance(value, str) and value.startswith('='):
+            self.formulas[coord] = value
+        elif value is not None:
+            self.values[coord] = value
+
+    def __getitem__(self, coord: str) -> CellModel:
+        return CellModel(self, normalize_coordinate(coord))
+
+    def __setitem__(self, coord: str, value: Any) -> None:
+        self.set_value(coord, value)
+
+    def cell(self, row: int, column: int, value: Any = None) -> CellModel:
+        cell = CellModel(self, f"{col_number_to_letter(column)}{row}")
+        if value is not None:
+            cell.value = value
+        return cell
+
+
+class WorkbookModel:
+    """ワークブックモデル（excel_editorの編集関数にopenpyxlの代わりに渡せる）"""
+
+    def __init__(self, template: CompiledTemplate):
+        self.template = template
+        self.sheetnames = list(template.sheetnames)
+        self._sheets = {name: SheetModel(template, name) for name in self.sheetnames}
+
+    def __getitem__(self, name: str) -> SheetModel:
+        return self._sheets[name]
+
+    def evaluator(self) -> FormulaEvaluator:
+        return FormulaEvaluator(
+            {name: sheet.values for name, sheet in self._sheets.items()},
+            {name: sheet.formulas for name, sheet in self._sheets.items()},
+        )
+
+    def evaluate(self) -> Dict[str, Dict[str, Any]]:
+        """編集後のすべての数式セルを評価"""
+        return self.evaluator().evaluate_all()
+
+
+# ============================================================
+# テンプレートとの差分・数式の依存関係
+# ============================================================
+
+def cell_content(values: Dict[str, Any], formulas: Dict[str, str], coord: str) -> Any:
+    """セルの内容（数式セルは「=」で始まる数式文字列、空セルはNone）"""
+    if coord in formulas:
+        return formulas[coord]
+    return values.get(coord)
+
+
+def diff_workbook(template: CompiledTemplate, values: Dict[str, Dict[str, Any]],
+                  formulas: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, Any]]:
+    """
+    テンプレートから変更されたセルを抽出
+
+    Args:
+        template: コンパイル済みテンプレート
+        values, formulas: 編集後のワークブックのスナップショット（snapshot_workbookの結果）
+
+    Returns:
+        {シート名: {座標: 編集後の内容}}（数式は「=」付き文字列、削除されたセルはNone）
+    """
+    edits: Dict[str, Dict[str, Any]] = {}
+    for sheet in set(values) | set(formulas) | set(template.sheetnames):
+        new_values, new_formulas = values.get(sheet, {}), formulas.get(sheet, {})
+        old_values, old_formulas = template.values.get(sheet, {}), template.formulas.get(sheet, {})
+        sheet_edits = {}
+        for coord in set(new_values) | set(new_formulas) | set(old_values) | set(old_formulas):
+            content = cell_content(new_values, new_formulas, coord)
+            if content != cell_content(old_values, old_formulas, coord):
+                sheet_edits[coord] = content
+        if sheet_edits:
+            edits[sheet] = sheet_edits
+    return edits
+
+
+def changed_cells(template: CompiledTemplate, edits: Dict[str, Dict[str, Any]]) -> Dict[str, set]:
+    """
+    編集内容のうち、実際にテンプレートと内容が異なるセル
+
+    走査するのは編集されたセルのみ（シート全体は見ない）。
+    """
+    changed: Dict[str, set] = {}
+    for sheet, cells in edits.items():
+        old_values, old_formulas = template.values.get(sheet, {}), template.formulas.get(sheet, {})
+        coords = {
+            coord for coord, content in cells.items()
+            if content != cell_content(old_values, old_formulas, coord)
+        }
+        if coords:
+            changed[sheet] = coords
+    return changed
+
+
+def formula_precedents(formula: str, sheet: str) -> List[Tuple]:
+    """
+    数式が参照するセル・範囲
+
+    Returns:
+        [('ref', シート, 座標)] / [('range', シート, (列From, 列To), (行From, 行To))] のリスト
+    """
+    precedents: List[Tuple] = []
+    stack = [parse_formula(formula)]
+    while stack:
+        node = stack.pop()
+        kind = node[0]
+        if kind == 'ref':
+            precedents.append(('ref', node[1] or sheet, node[2]))
+        elif kind == 'range':
+            start_col, start_row = split_coordinate(node[2])
+            end_col, end_row = split_coordinate(node[3])
+            precedents.append((
+                'range', node[1] or sheet,
+                tuple(sorted((col_letter_to_number(start_col), col_letter_to_number(end_col)))),
+                tuple(sorted((start_row, end_row))),
+            ))
+        elif kind == 'neg':
+            stack.append(node[1])
+        elif kind == 'binop':
+            stack.extend((node[2], node[3]))
+        elif kind == 'func':
+            stack.extend(node[2])
+    return precedents
+
+
+def affected_cells(template: CompiledTemplate, changed: Dict[str, set]) -> Dict[str, set]:
+    """
+    変更セルと、その値に（推移的に）依存するテンプレートの数式セル
+
+    編集で書き換えられた数式セル自体は変更セルに含まれるため、
+    依存関係はテンプレートの数式のみから求めればよい。
+
+    Returns:
+        {シート名: {座標}}（変更セルを含む）
+    """
+    affected = {sheet: set(coords) for sheet, coords in changed.items()}
+    # 範囲参照の判定用に (列番号, 行番号) でも保持
+    positions: Dict[str, set] = {}
+    for sheet, coords in changed.items():
+        positions[sheet] = set()
+        for coord in coords:
+            col, row = split_coordinate(coord)
+            positions[sheet].add((col_letter_to_number(col), row))
+
+    pending = [
+        entry for entry in template.precedents()
+        if entry[1] not in affected.get(entry[0], ())
+    ]
+    grew = bool(changed)
+    while grew and pending:
+        grew = False
+        remaining = []
+        for sheet, coord, precedents in pending:
+            if any(_precedent_hits(precedent, affected, positions) for precedent in precedents):
+                affected.setdefault(sheet, set()).add(coord)
+                col, row = split_coordinate(coord)
+                positions.setdefault(sheet, set()).add((col_letter_to_number(col), row))
+                grew = True
+            else:
+                remaining.append((sheet, coord, precedents))
+        pending = remaining
+    return affected
+
+
+def _precedent_hits(precedent: Tuple, affected: Dict[str, set], positions: Dict[str, set]) -> bool:
+    kind = precedent[0]
+    if kind == 'ref':
+        return precedent[2] in affected.get(precedent[1], ())
+    if kind == 'range':
+        (col_from, col_to), (row_from, row_to) = precedent[2], precedent[3]
+        return any(
+            col_from <= col <= col_to and row_from <= row <= row_to
+            for col, row in positions.get(precedent[1], ())
+        )
+    return any(affected.values())
+
+
+def encode_cells(cells: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """{シート名: {座標: 値}} をJSON用にエンコード"""
+    return {
+        sheet: {coord: _encode_value(v) for coord, v in sheet_cells.items()}
+        for sheet, sheet_cells in cells.items()
+    }
+
+
+def decode_cells(cells: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """encode_cells の逆変換"""
+    return {
+        sheet: {coord: _decode_value(v) for coord, v in sheet_cells.items()}
+        for sheet, sheet_cells in cells.items()
+    }
+
+
+# ============================================================
+# キャッシュ値マニフェスト
+# ============================================================
+
+# マニフェストを格納するxlsx内のパート名と、[Content_Types].xml に登録するContentType
+MANIFEST_PART = 'seikyu/cached-values.json'
+MANIFEST_CONTENT_TYPE = 'application/json'
+MANIFEST_VERSION = 3
+
+# マニフェストの署名鍵（インストールごと、キャッシュディレクトリに保存）
+# 複数のホストでExcel編集と検証を分けて実行する場合は、環境変数で同じ鍵（16進数）を指定する
+MANIFEST_KEY_ENV = 'PDF_PROCESSOR_MANIFEST_KEY'
+MANIFEST_KEY_FILE = 'manifest.key'
+_manifest_key: Optional[bytes] = None
+_manifest_key_lock = threading.Lock()
+
+
+def manifest_hashed_parts(names: List[str]) -> List[str]:
+    """マニフェストのハッシュ対象とするパート（セル値を保持するシートXMLと共有文字列）"""
+    return sorted(
+        name for name in names
+        if (name.startswith('xl/worksheets/') and name.endswith('.xml')) or name == 'xl/sharedStrings.xml'
+    )
+
+
+def _manifest_payload(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """マニフェストのうちハッシュ対象とする項目"""
+    return {key: manifest.get(key) for key in ("values", "template_hash", "cells")}
+
+
+def manifest_key() -> bytes:
+    """
+    マニフェストの署名鍵（PDF_PROCESSOR_MANIFEST_KEY、未設定時はキャッシュディレクトリの manifest.key）
+
+    manifest.key がなければ乱数で作成する（他のプロセスと同時に作成した場合は先に作成された方を使う）。
+    """
+    global _manifest_key
+    with _manifest_key_lock:
+        if _manifest_key is not None:
+            return _manifest_key
+
+        configured = os.getenv(MANIFEST_KEY_ENV)
+        if configured:
+            _manifest_key = bytes.fromhex(configured)
+            return _manifest_key
+
+        key_path = os.path.join(get_cache_dir(), MANIFEST_KEY_FILE)
+        if not os.path.exists(key_path):
+            # 書き込み途中の鍵を読まれないよう、一時ファイルに書き込んでからリンクする（既存なら失敗する）
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(key_path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(secrets.token_bytes(32))
+                os.link(tmp_path, key_path)
+            except FileExistsError:
+                pass
+            except OSError:
+                # ハードリンクに対応していないファイルシステム
+                if not os.path.exists(key_path):
+                    os.replace(tmp_path, key_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        with open(key_path, 'rb') as f:
+            _manifest_key = f.read()
+        return _manifest_key
+
+
+def compute_manifest_hash(payload: Dict[str, Any], parts: Dict[str, bytes]) -> str:
+    """
+    マニフェストの記録内容（キャッシュ値・テンプレートハッシュ・編集セル）とシートXMLの署名（HMAC-SHA256）
+
+    鍵はインストールごとの manifest_key() のため、このインストールのexcel_editorが出力したファイル以外
+    （別の環境で作成・改ざんされたマニフェスト）は一致しない。
+
+    Args:
+        payload: マニフェストのハッシュ対象項目（エンコード済み）
+        parts: パート名 → バイト列（manifest_hashed_parts の対象）
+    """
+    digest = hmac.new(manifest_key(), digestmod=hashlib.sha256)
+    digest.update(json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    for name in sorted(parts):
+        digest.update(b'\0' + name.encode('utf-8') + b'\0')
+        digest.update(parts[name])
+    return digest.hexdigest()
+
+
+def build_manifest(company_name: str, values: Dict[str, Dict[str, Any]], parts: Dict[str, bytes],
+                   template_hash: str = None, edits: Dict[str, Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    キャッシュ値マニフェストを作成
+
+    Args:
+        company_name: 取引先名
+        values: {シート名: {座標: 値}}（数式セルの計算結果）
+        parts: 最終的なシートXML（パート名 → バイト列）
+        template_hash: 元のテンプレートのハッシュ（差分検証用）
+        edits: テンプレートから変更したセル {シート名: {座標: 内容}}（diff_workbookの結果）
+    """
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "generator": "excel_editor",
+        "company_name": company_name,
+        "values": encode_cells(values),
+        "template_hash": template_hash,
+        "cells": encode_cells(edits) if edits is not None else None,
+    }
+    manifest["content_hash"] = compute_manifest_hash(_manifest_payload(manifest), parts)
+    return manifest
+
+
+def read_verified_manifest(xlsx_path: str) -> Optional[Dict[str, Any]]:
+    """
+    xlsxからキャッシュ値マニフェストを読み込み、署名（compute_manifest_hash）を検証する
+
+    excel_editorが出力した後にExcel等で編集・再保存されたファイル（シートXMLが変わる）や、
+    別の環境で作成された・改ざんされたマニフェスト（署名鍵が異なる）は一致せず、Noneを返す。
+
+    Returns:
+        検証済みのマニフェスト（値はデコード済み）。存在しない・検証失敗時はNone
+    """
+    import zipfile
+
+    try:
+        with zipfile.ZipFile(xlsx_path, 'r') as zf:
+            names = zf.namelist()
+            if MANIFEST_PART not in names:
+                return None
+            manifest = json.loads(zf.read(MANIFEST_PART).decode('utf-8'))
+            if manifest.get("version") != MANIFEST_VERSION:
+                return None
+            parts = {name: zf.read(name) for name in manifest_hashed_parts(names)}
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+
+    if not isinstance(manifest.get("values"), dict):
+        return None
+    if not hmac.compare_digest(
+        compute_manifest_hash(_manifest_payload(manifest), parts), str(manifest.get("content_hash"))
+    ):
+        return None
+
+    manifest["values"] = decode_cells(manifest["values"])
+    if isinstance(manifest.get("cells"), dict):
+        manifest["cells"] = decode_cells(manifest["cells"])
+    return manifest
+
+
+def set_cached_values(sheet_xml: str, values: Dict[str, Any]) -> str:
+    """
+    シートXMLの数式セルにキャッシュ値（<v>）を設定
+
+    openpyxlは数式セルを <c r="AC3" s="21"><f>...</f><v /></c> の形式で出力するため、
+    <v>に計算結果を入れ、結果の型に応じて t 属性（文字列: str、真偽値: b）を設定する。
+    日付はExcelのシリアル値として格納する。
+
+    Args:
+        sheet_xml: シートXML（文字列）
+        values: {座標: 値}（数式を持たないセルは無視される）
+    """
+    from xml.sax.saxutils import escape
+
+    if not values:
+        return sheet_xml
+
+    def replace(match):
+        coord, attrs, inner = match.group(1), match.group(2), match.group(3)
+        if coord not in values or '<f' not in inner:
+            return match.group(0)
+        value = values[coord]
+        if value is None:
+            return match.group(0)
+        attrs = re.sub(r'\s+t="[^"]*"', '', attrs)
+        inner = re.sub(r'<v\s*/>|<v>.*?</v>', '', inner, flags=re.S)
+        if isinstance(value, bool):
+            type_attr, text = ' t="b"', '1' if value else '0'
+        elif isinstance(value, datetime):
+            type_attr, text = '', str(_tidy_number(to_serial(value)))
+        elif isinstance(value, (int, float)):
+            type_attr, text = '', str(_tidy_number(value))
+        else:
+            type_attr, text = ' t="str"', escape(str(value))
+        return f'<c r="{coord}"{attrs}{type_attr}>{inner}<v>{text}</v></c>'
+
+    return re.sub(r'<c r="([A-Z]{1,3}\d+)"([^>]*?)(?<!/)>(.*?)</c>', replace, sheet_xml, flags=re.S)
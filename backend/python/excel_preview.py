@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+金額プレビュースクリプト（ファイル出力・LibreOfficeなし）
+
+数量・単価などの候補入力に対して、Excel生成・PDF生成を行う前に
+数式セルの計算結果（注文番号・明細タイトル・小計・消費税・合計・検収日）を返します。
+
+テンプレートはコンパイル済みキャッシュ（excel_formula）から復元し、
+excel_editorと同じ編集処理をメモリ上のワークブックモデルに適用してから
+Pythonで数式を評価します。ファイルの書き込みやLibreOfficeの起動は行いません
+（テンプレートのパスを指定した場合もメモリ上でのみコンパイルし、ディスクキャッシュへの保存は
+Excel編集時に行われます）。
+
+使用法:
+    python3 excel_preview.py <company_name> <template> <data_json>
+
+引数:
+    company_name: 取引先名（ネクストビッツ or オフ・ビート・ワークス）
+    template: テンプレートExcelファイルのパス、またはテンプレートハッシュ（SHA-256）
+    data_json: excel_editorと同じ形式の入力データ（JSON文字列）（@<パス> / - / stdin:<名前> も指定可、stream_input.load_json 参照）
+
+出力:
+    {
+        "success": true,
+        "template_hash": "…",
+        "summary": {
+            "order_number": "20250801-01",
+            "detail_title": "2025年08月分作業費",
+            "remarks": "見積番号：TRR-25-008",
+            "subtotal": 600000,
+            "tax": 60000,
+            "total": 660000,
+            "inspection_number": "20250801-01",
+            "inspection_date": "2025-08-31"
+        },
+        "cells": {"注文書": {"AC3": "…", ...}, "検収書": {...}}
+    }
+"""
+
+import sys
+import json
+from datetime import datetime
+from typing import Dict, Any
+
+import excel_formula
+import stream_input
+import timings
+
+# summaryに含めるセル（キー → (シート名, セル)）
+SUMMARY_CELLS = {
+    "order_number": ("注文書", "AC3"),
+    "detail_title": ("注文書", "C17"),
+    "remarks": ("注文書", "AA17"),
+    "order_amount": ("注文書", "G12"),
+    "subtotal": ("注文書", "W39"),
+    "tax": ("注文書", "W40"),
+    "total": ("注文書", "W41"),
+    "inspection_number": ("検収書", "AC4"),
+    "inspection_date": ("検収書", "AC5"),
+    "inspection_subtotal": ("検収書", "W41"),
+    "inspection_tax": ("検収書", "W42"),
+    "inspection_total": ("検収書", "W43"),
+}
+
+
+def _to_json_value(value: Any) -> Any:
+    """JSON出力用に値を変換（日付はYYYY-MM-DD形式）"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def preview(company_name: str, template: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    入力候補に対する数式セルの計算結果を返す
+
+    Args:
+        company_name: 取引先名
+        template: テンプレートExcelファイルのパス、またはテンプレートハッシュ
+        data: PDF解析データ（excel_editorと同じ形式）
+
+    Returns:
+        プレビュー結果（summary: 主要項目、cells: 全数式セルの値）
+
+    Raises:
+        KeyError: テンプレートハッシュがキャッシュに存在しない場合
+        ValueError: 未対応の取引先・件名、または評価できない数式を含む場合
+    """
+    # excel_editorの編集処理を流用（テンプレートExcelの読み込みは行わない）
+    from excel_editor import apply_company_edits
+
+    with timings.span("resolve_template"):
+        compiled = excel_formula.resolve_template(template)
+    with timings.span("apply_edits"):
+        wb = compiled.new_workbook()
+        apply_company_edits(wb, company_name, data)
+
+    with timings.span("evaluate"):
+        values = wb.evaluate()
+
+    summary = {}
+    for key, (sheet, coord) in SUMMARY_CELLS.items():
+        sheet_values = values.get(sheet, {})
+        if coord in sheet_values:
+            summary[key] = _to_json_value(sheet_values[coord])
+        else:
+            # 数式でないセル（オフ・ビート・ワークスの摘要など）は入力値をそのまま返す
+            summary[key] = _to_json_value(wb[sheet].get_value(coord))
+
+    return {
+        "success": True,
+        "template_hash": compiled.template_hash,
+        "summary": summary,
+        "cells": {
+            sheet: {coord: _to_json_value(value) for coord, value in cells.items()}
+            for sheet, cells in values.items()
+        }
+    }
+
+
+def main():
+    """
+    メイン関数
+
+    コマンドライン引数から入力候補を受け取り、プレビュー結果をJSON形式で標準出力に返す。
+    """
+    if len(sys.argv) != 4:
+        print(json.dumps({
+            "error": "引数が不足しています",
+            "usage": "python3 excel_preview.py <company_name> <template> <data_json>"
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+    company_name = sys.argv[1]
+    template = sys.argv[2]
+    data_json = sys.argv[3]
+
+    try:
+        data = stream_input.load_json(data_json)
+        result = preview(company_name, template, data)
+        print(json.dumps(timings.attach(result), ensure_ascii=False))
+
+    except (KeyError, ValueError) as e:
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+    except Exception as e:
+        import traceback
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc()
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
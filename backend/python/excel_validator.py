@@ -5,12 +5,14 @@ Excel検証スクリプト（LibreOffice使用）
 LibreOfficeでExcelを開いて数式を計算させ、セル値を取得して検証します。
 
 使用法:
-    python3 excel_validator.py <excel_path> <company_name> <invoice_data_json>
+    python3 excel_validator.py <excel_path> <company_name> <invoice_data_json> [--full]
 
 引数:
     excel_path: Excelファイルのパス
     company_name: 取引先名（ネクストビッツ or オフ・ビート・ワークス）
-    invoice_data_json: 請求書から抽出したデータ（JSON文字列）
+    invoice_data_json: 請求書から抽出したデータ（JSON文字列）（@<パス> / - / stdin:<名前> も指定可、stream_input.load_json 参照）
+    --full: テンプレートとの差分検証を行わず、全項目を検証する
+            （環境変数 PDF_PROCESSOR_FULL_VALIDATION=1 でも同じ）
 
 出力:
     検証結果（JSON形式、標準出力）
@@ -75,27 +77,24 @@ LibreOfficeでExcelを開いて数式を計算させ、セル値を取得して
 
 import sys
 import json
-import subprocess
 import os
 import csv
 import re
 from datetime import datetime
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, NamedTuple, Tuple, Union
 from pathlib import Path
 
+import environment_probe
+import metrics
+import scratch
+import soffice_runner
+import stream_input
+import timings
+
 
 def check_libreoffice() -> bool:
-    """LibreOfficeがインストールされているかチェック"""
-    try:
-        result = subprocess.run(
-            ['soffice', '--version'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        return result.returncode == 0
-    except (FileNotFoundError, subprocess.TimeoutExpired):
-        return False
+    """LibreOfficeがインストールされているかチェック（environment_probeのキャッシュを使用）"""
+    return environment_probe.libreoffice_available()
 
 
 def convert_excel_to_csv_with_libreoffice(excel_path: str, output_dir: str) -> Dict[str, str]:
@@ -107,7 +106,7 @@ def convert_excel_to_csv_with_libreoffice(excel_path: str, output_dir: str) -> D
 
     Args:
         excel_path: Excelファイルのパス
-        output_dir: 出力ディレクトリ
+        output_dir: 出力ディレクトリ（呼び出しごとの作業ディレクトリ、中間ファイルとCSVを置く）
 
     Returns:
         シート名 -> CSVファイルパスの辞書
@@ -115,30 +114,26 @@ def convert_excel_to_csv_with_libreoffice(excel_path: str, output_dir: str) -> D
     if not check_libreoffice():
         raise RuntimeError("LibreOfficeがインストールされていません")
 
-    import openpyxl
-
     # 方法: LibreOfficeでExcelをODSに変換し、数式を計算させてから再度Excelに変換
     # その後openpyxlでdata_only=Trueで読み込む
 
     # Step 1: LibreOfficeでExcelを開いて再保存（数式計算のため）
     # --convert-to xlsx で再保存すると数式が計算される
-    calc_excel_path = os.path.join(output_dir, f"calculated_{os.getpid()}.xlsx")
+    calc_excel_path = os.path.join(output_dir, "calculated.xlsx")
 
     # LibreOfficeでODS経由で変換（数式を確実に計算させる）
-    temp_ods = os.path.join(output_dir, f"temp_{os.getpid()}.ods")
+    temp_ods = os.path.join(output_dir, "temp.ods")
 
     # Excel -> ODS
-    result = subprocess.run(
+    result = soffice_runner.run_soffice(
         [
-            'soffice',
             '--headless',
             '--convert-to', 'ods',
             '--outdir', output_dir,
             excel_path
         ],
-        capture_output=True,
-        text=True,
-        timeout=60
+        timeout=60,
+        label='to_ods'
     )
 
     base_name = os.path.splitext(os.path.basename(excel_path))[0]
@@ -148,20 +143,18 @@ def convert_excel_to_csv_with_libreoffice(excel_path: str, output_dir: str) -> D
         os.rename(generated_ods, temp_ods)
 
         # ODS -> XLSX（数式が計算された状態で値として保存）
-        result = subprocess.run(
+        result = soffice_runner.run_soffice(
             [
-                'soffice',
                 '--headless',
                 '--convert-to', 'xlsx',
                 '--outdir', output_dir,
                 temp_ods
             ],
-            capture_output=True,
-            text=True,
-            timeout=60
+            timeout=60,
+            label='to_xlsx'
         )
 
-        generated_xlsx = os.path.join(output_dir, f"temp_{os.getpid()}.xlsx")
+        generated_xlsx = os.path.join(output_dir, "temp.xlsx")
         if os.path.exists(generated_xlsx):
             os.rename(generated_xlsx, calc_excel_path)
 
@@ -169,61 +162,57 @@ def convert_excel_to_csv_with_libreoffice(excel_path: str, output_dir: str) -> D
         if os.path.exists(temp_ods):
             os.remove(temp_ods)
 
-    csv_paths = {}
-
     # Step 2: 計算済みExcelをopenpyxlで読み込み、各シートをCSVに変換
     if os.path.exists(calc_excel_path):
-        wb = openpyxl.load_workbook(calc_excel_path, data_only=True)
+        csv_paths = export_values_to_csv(calc_excel_path, output_dir)
 
-        for sheet_name in wb.sheetnames:
-            csv_filename = f"temp_{sheet_name}_{os.getpid()}.csv"
-            csv_path = os.path.join(output_dir, csv_filename)
+        # 計算済みExcel削除
+        os.remove(calc_excel_path)
+    else:
+        # フォールバック: 元のExcelをそのまま読み込む（数式は計算されない可能性）
+        csv_paths = export_values_to_csv(excel_path, output_dir)
 
-            ws = wb[sheet_name]
+    return csv_paths
 
-            with open(csv_path, 'w', encoding='utf-8', newline='') as f:
-                writer = csv.writer(f)
-                for row in ws.iter_rows():
-                    row_data = []
-                    for cell in row:
-                        value = cell.value
-                        if value is None:
-                            row_data.append('')
-                        else:
-                            row_data.append(str(value))
-                    writer.writerow(row_data)
 
-            csv_paths[sheet_name] = csv_path
+def export_values_to_csv(excel_path: str, output_dir: str) -> Dict[str, str]:
+    """
+    Excelのセル値（数式はキャッシュ値、data_only）を各シートごとにCSVとして保存
 
-        wb.close()
+    Args:
+        excel_path: Excelファイルのパス
+        output_dir: 出力ディレクトリ（呼び出しごとの作業ディレクトリ）
 
-        # 計算済みExcel削除
-        os.remove(calc_excel_path)
-    else:
-        # フォールバック: 元のExcelをそのまま読み込む（数式は計算されない可能性）
+    Returns:
+        シート名 -> CSVファイルパスの辞書
+    """
+    import openpyxl
+
+    csv_paths = {}
+    with timings.span("load_workbook"):
         wb = openpyxl.load_workbook(excel_path, data_only=True)
 
-        for sheet_name in wb.sheetnames:
-            csv_filename = f"temp_{sheet_name}_{os.getpid()}.csv"
-            csv_path = os.path.join(output_dir, csv_filename)
+    for sheet_name in wb.sheetnames:
+        csv_filename = f"temp_{sheet_name}.csv"
+        csv_path = os.path.join(output_dir, csv_filename)
 
-            ws = wb[sheet_name]
+        ws = wb[sheet_name]
 
-            with open(csv_path, 'w', encoding='utf-8', newline='') as f:
-                writer = csv.writer(f)
-                for row in ws.iter_rows():
-                    row_data = []
-                    for cell in row:
-                        value = cell.value
-                        if value is None:
-                            row_data.append('')
-                        else:
-                            row_data.append(str(value))
-                    writer.writerow(row_data)
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            for row in ws.iter_rows():
+                row_data = []
+                for cell in row:
+                    value = cell.value
+                    if value is None:
+                        row_data.append('')
+                    else:
+                        row_data.append(str(value))
+                writer.writerow(row_data)
 
-            csv_paths[sheet_name] = csv_path
+        csv_paths[sheet_name] = csv_path
 
-        wb.close()
+    wb.close()
 
     return csv_paths
 
@@ -261,17 +250,20 @@ def col_letter_to_number(col_letter: str) -> int:
     return result
 
 
-def get_cell_value(csv_path: str, cell_ref: str) -> str:
+def get_cell_value(csv_path: Union[str, Dict[str, str]], cell_ref: str) -> str:
     """
     セル参照（例: AC3, B8）から値を取得
 
     Args:
-        csv_path: CSVファイルパス
+        csv_path: CSVファイルパス、またはセル座標 → 値の辞書（レンダリング済みPDFから抽出した値）
         cell_ref: セル参照（例: "AC3"）
 
     Returns:
         セルの値（文字列）
     """
+    if isinstance(csv_path, dict):
+        return csv_path.get(cell_ref.upper(), "")
+
     match = re.match(r'^([A-Z]+)(\d+)$', cell_ref.upper())
     if not match:
         return ""
@@ -295,362 +287,326 @@ def parse_number(value: str) -> int:
         return 0
 
 
-def validate_nextbits_excel(csv_paths: Dict[str, str], validation_data: Dict[str, Any]) -> Dict[str, Any]:
+# === 検証ルール ===
+#
+# 取引先ごとの検証項目をルール表で定義し、validate_with_rules で一括評価する。
+# 各ルールのキー:
+#   sheet:    シート名
+#   cell:     セル座標。"C{18+items_count}" のように {基準行+入力キー} で動的な行を指定できる
+#   item:     検証項目名
+#   kind:     regex（正規表現に一致） / equals（期待値と一致） /
+#             contains（contains の文字列をすべて含む） / numeric（数値が入力値 input と一致）
+#   pattern:  regex の正規表現
+#   expected: 期待値（表示用）。equals では {estimate_number} 等の入力値を埋め込んだ値と比較する
+#   fallback: requires の入力値が空の場合に代わりに使うルール（pattern, expected）
+#   error:    エラーメッセージ（省略時は kind ごとの既定）。{item} {expected} {actual} を埋め込める
+
+# 検収日: yyyy/mm/dd, yyyy-mm-dd, datetime形式（openpyxlは「2025-07-31 00:00:00」のように出力することがある）, シリアル値
+INSPECTION_DATE_PATTERN = r'^(\d{4}[/-]\d{1,2}[/-]\d{1,2}|\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}|\d[\d,]*)$'
+
+VALIDATION_RULES = {
+    "ネクストビッツ": [
+        # 注文書シート
+        {"sheet": "注文書", "cell": "AC3", "item": "注文番号形式", "kind": "regex", "pattern": r'^\d{8}-01$',
+         "expected": "yyyymmdd-01形式", "error": "注文番号が不正です（{actual}）"},
+        {"sheet": "注文書", "cell": "B8", "item": "宛名", "kind": "contains",
+         "contains": ["株式会社ネクストビッツ", "御中"], "expected": "株式会社ネクストビッツ　御中"},
+        {"sheet": "注文書", "cell": "G12", "item": "発注金額", "kind": "numeric", "input": "invoice_total"},
+        {"sheet": "注文書", "cell": "C17", "item": "明細タイトル", "kind": "regex", "pattern": r'^\d{4}年\d{1,2}月分作業費$',
+         "expected": "yyyy年mm月分作業費形式"},
+        {"sheet": "注文書", "cell": "AA17", "item": "摘要", "kind": "equals", "expected": "見積番号：{estimate_number}",
+         "requires": "estimate_number",
+         "fallback": {"pattern": r'^見積番号：TRR-\d{2}-0\d{2}$', "expected": "見積番号：TRR-YY-0MM形式"}},
+        # 見積書の件名「yyyy年mm月作業：Telemasシステム改修作業等」→「　Telemas作業(システム改修等)」（先頭全角スペース）
+        {"sheet": "注文書", "cell": "C18", "item": "件名", "kind": "equals", "expected": "　Telemas作業(システム改修等)"},
+        {"sheet": "注文書", "cell": "C19", "item": "明細締め", "kind": "contains", "contains": ["以下、余白"],
+         "expected": "以下、余白", "error": "「以下、余白」が入力されていません（{actual}）"},
+        {"sheet": "注文書", "cell": "W39", "item": "小計", "kind": "numeric", "input": "invoice_subtotal"},
+        {"sheet": "注文書", "cell": "W40", "item": "消費税", "kind": "numeric", "input": "invoice_tax"},
+        {"sheet": "注文書", "cell": "W41", "item": "合計金額", "kind": "numeric", "input": "invoice_total"},
+        # 検収書シート
+        {"sheet": "検収書", "cell": "AC4", "item": "検収番号形式", "kind": "regex", "pattern": r'^\d{8}-01$',
+         "expected": "yyyymmdd-01形式", "error": "検収番号が不正です（{actual}）"},
+        {"sheet": "検収書", "cell": "AC5", "item": "検収日", "kind": "regex", "pattern": INSPECTION_DATE_PATTERN,
+         "expected": "当月末日"},
+        {"sheet": "検収書", "cell": "B7", "item": "宛名", "kind": "contains",
+         "contains": ["株式会社ネクストビッツ", "御中"], "expected": "株式会社ネクストビッツ　御中"},
+        {"sheet": "検収書", "cell": "G14", "item": "合計金額", "kind": "numeric", "input": "invoice_total"},
+        {"sheet": "検収書", "cell": "C19", "item": "明細タイトル", "kind": "regex", "pattern": r'^\d{4}年\d{1,2}月分作業費$',
+         "expected": "yyyy年mm月分作業費形式"},
+        {"sheet": "検収書", "cell": "AA19", "item": "摘要", "kind": "equals", "expected": "見積番号：{estimate_number}",
+         "requires": "estimate_number",
+         "fallback": {"pattern": r'^見積番号：TRR-\d{2}-0\d{2}$', "expected": "見積番号：TRR-YY-0MM形式"}},
+        {"sheet": "検収書", "cell": "C20", "item": "件名", "kind": "equals", "expected": "　Telemas作業(システム改修等)"},
+        {"sheet": "検収書", "cell": "C21", "item": "明細締め", "kind": "contains", "contains": ["以下、余白"],
+         "expected": "以下、余白", "error": "「以下、余白」が入力されていません（{actual}）"},
+        {"sheet": "検収書", "cell": "W41", "item": "小計", "kind": "numeric", "input": "invoice_subtotal"},
+        {"sheet": "検収書", "cell": "W42", "item": "消費税", "kind": "numeric", "input": "invoice_tax"},
+        {"sheet": "検収書", "cell": "W43", "item": "合計金額", "kind": "numeric", "input": "invoice_total"},
+    ],
+    "オフ・ビート・ワークス": [
+        # 注文書シート（「以下、余白」の行は明細行数に応じて変動: 18 + items_count）
+        {"sheet": "注文書", "cell": "AC3", "item": "注文番号形式", "kind": "regex", "pattern": r'^\d{8}-02$',
+         "expected": "yyyymmdd-02形式", "error": "注文番号が不正です（{actual}）"},
+        {"sheet": "注文書", "cell": "B8", "item": "宛名", "kind": "contains",
+         "contains": ["株式会社オフ・ビート・ワークス", "御中"], "expected": "株式会社オフ・ビート・ワークス　御中"},
+        {"sheet": "注文書", "cell": "G12", "item": "発注金額", "kind": "numeric", "input": "invoice_total"},
+        # 明細タイトルは「分」なし
+        {"sheet": "注文書", "cell": "C17", "item": "明細タイトル", "kind": "regex", "pattern": r'^\d{4}年\d{1,2}月作業費$',
+         "expected": "yyyy年mm月作業費形式"},
+        # 摘要はオフ・ビート・ワークスは1行目のみ（17行目固定）
+        {"sheet": "注文書", "cell": "AA17", "item": "摘要", "kind": "equals", "expected": "見積番号：{estimate_number}",
+         "requires": "estimate_number",
+         "fallback": {"pattern": r'^見積番号：\d{7}$', "expected": "見積番号：NNNNNNN形式"}},
+        {"sheet": "注文書", "cell": "C{18+items_count}", "item": "明細締め", "kind": "contains", "contains": ["以下、余白"],
+         "expected": "以下、余白", "error": "「以下、余白」が入力されていません（{actual}）"},
+        {"sheet": "注文書", "cell": "W39", "item": "小計", "kind": "numeric", "input": "invoice_subtotal"},
+        {"sheet": "注文書", "cell": "W40", "item": "消費税", "kind": "numeric", "input": "invoice_tax"},
+        {"sheet": "注文書", "cell": "W41", "item": "合計金額", "kind": "numeric", "input": "invoice_total"},
+        # 検収書シート（「以下、余白」の行: 20 + items_count）
+        {"sheet": "検収書", "cell": "AC4", "item": "検収番号形式", "kind": "regex", "pattern": r'^\d{8}-02$',
+         "expected": "yyyymmdd-02形式", "error": "検収番号が不正です（{actual}）"},
+        {"sheet": "検収書", "cell": "AC5", "item": "検収日", "kind": "regex", "pattern": INSPECTION_DATE_PATTERN,
+         "expected": "当月末日"},
+        {"sheet": "検収書", "cell": "B7", "item": "宛名", "kind": "contains",
+         "contains": ["株式会社オフ・ビート・ワークス", "御中"], "expected": "株式会社オフ・ビート・ワークス　御中"},
+        {"sheet": "検収書", "cell": "G14", "item": "合計金額", "kind": "numeric", "input": "invoice_total"},
+        {"sheet": "検収書", "cell": "C19", "item": "明細タイトル", "kind": "regex", "pattern": r'^\d{4}年\d{1,2}月作業費$',
+         "expected": "yyyy年mm月作業費形式"},
+        {"sheet": "検収書", "cell": "AA19", "item": "摘要", "kind": "equals", "expected": "見積番号：{estimate_number}",
+         "requires": "estimate_number",
+         "fallback": {"pattern": r'^見積番号：\d{7}$', "expected": "見積番号：NNNNNNN形式"}},
+        {"sheet": "検収書", "cell": "C{20+items_count}", "item": "明細締め", "kind": "contains", "contains": ["以下、余白"],
+         "expected": "以下、余白", "error": "「以下、余白」が入力されていません（{actual}）"},
+        {"sheet": "検収書", "cell": "W41", "item": "小計", "kind": "numeric", "input": "invoice_subtotal"},
+        {"sheet": "検収書", "cell": "W42", "item": "消費税", "kind": "numeric", "input": "invoice_tax"},
+        {"sheet": "検収書", "cell": "W43", "item": "合計金額", "kind": "numeric", "input": "invoice_total"},
+    ],
+}
+
+# kind ごとの既定エラーメッセージ
+DEFAULT_RULE_ERRORS = {
+    "regex": "{item}が不正です（{actual}）",
+    "contains": "{item}が不正です（{actual}）",
+    "equals": "{item}が不正です（期待: {expected}、実際: {actual}）",
+    "numeric": "{item}が請求書と不一致（期待: {expected}、実際: {actual}）",
+}
+
+
+class CompiledRule(NamedTuple):
+    """コンパイル済み検証ルール"""
+    sheet: str
+    column: str
+    row: int
+    row_offset_key: str  # 動的行の入力キー（固定行は空文字）
+    item: str
+    kind: str
+    pattern: Any  # re.Pattern（regex以外はNone）
+    expected: str
+    contains: Tuple[str, ...]
+    input_key: str
+    requires: str
+    fallback: Any  # フォールバック用 CompiledRule（なければNone）
+    error: str
+    uses_input: bool  # 期待値・対象セルが入力値に依存するか（依存しないルールは差分検証で省略できる）
+
+
+_RULE_CELL_PATTERN = re.compile(r'^([A-Z]+)(?:(\d+)|\{(\d+)\+(\w+)\})$')
+
+
+def compile_rule(rule: Dict[str, Any]) -> CompiledRule:
     """
-    ネクストビッツのExcelを検証
+    ルール表の1行をコンパイル（セル式の解析・正規表現のコンパイル）
+
+    Raises:
+        ValueError: セル式・kindが不正な場合
+    """
+    kind = rule["kind"]
+    if kind not in DEFAULT_RULE_ERRORS:
+        raise ValueError(f"不明な検証種別: {kind}")
+
+    match = _RULE_CELL_PATTERN.match(rule["cell"])
+    if not match:
+        raise ValueError(f"不正なセル式: {rule['cell']}")
+    column, fixed_row, base_row, offset_key = match.groups()
+
+    fallback = None
+    if "fallback" in rule:
+        # 入力値がない場合は形式チェックのみ（エラーメッセージは元のルールのものを使う）
+        fallback_rule = {key: value for key, value in rule.items() if key not in ("fallback", "requires")}
+        fallback_rule.update(rule["fallback"], kind="regex", error=rule.get("error") or DEFAULT_RULE_ERRORS[kind])
+        fallback = compile_rule(fallback_rule)
+
+    pattern = rule.get("pattern")
+    return CompiledRule(
+        sheet=rule["sheet"],
+        column=column,
+        row=int(fixed_row or base_row),
+        row_offset_key=offset_key or "",
+        item=rule["item"],
+        kind=kind,
+        pattern=re.compile(pattern) if pattern else None,
+        expected=rule.get("expected", ""),
+        contains=tuple(rule.get("contains", ())),
+        input_key=rule.get("input", ""),
+        requires=rule.get("requires", ""),
+        fallback=fallback,
+        error=rule.get("error") or DEFAULT_RULE_ERRORS[kind],
+        uses_input=bool(kind == "numeric" or offset_key or "requires" in rule or "{" in rule.get("expected", "")),
+    )
+
+
+COMPILED_RULES: Dict[str, List[CompiledRule]] = {
+    company: [compile_rule(rule) for rule in rules]
+    for company, rules in VALIDATION_RULES.items()
+}
+
+
+def col_number_to_letter(col: int) -> str:
+    """列番号を列文字に変換（1=A, 27=AA, ...）"""
+    letters = ""
+    while col > 0:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def load_sheet_snapshot(source: Union[str, Dict[str, str]]) -> Dict[str, str]:
+    """
+    シートのセル値をセル座標 → 値の辞書として読み込む（CSVは1回だけ読む）
+
+    Args:
+        source: CSVファイルパス、またはセル座標 → 値の辞書（get()を持つオブジェクトならそのまま使う）
+
+    Returns:
+        セル座標 → 値の辞書（空セルは含まない）
+    """
+    if not isinstance(source, str):
+        return source
+
+    snapshot: Dict[str, str] = {}
+    try:
+        with open(source, 'r', encoding='utf-8') as f:
+            for row, csv_row in enumerate(csv.reader(f), start=1):
+                for col, value in enumerate(csv_row, start=1):
+                    if value:
+                        snapshot[f"{col_number_to_letter(col)}{row}"] = value
+    except OSError:
+        pass
+    return snapshot
+
+
+def build_rule_context(validation_data: Dict[str, Any]) -> Dict[str, Any]:
+    """検証データからルールの期待値式で参照する入力値を取り出す"""
+    invoice_data = validation_data.get('invoice', validation_data)  # 後方互換性
+    estimate_data = validation_data.get('estimate', {})
+    return {
+        "invoice_total": invoice_data.get('total', 0),
+        "invoice_subtotal": invoice_data.get('subtotal', 0),
+        "invoice_tax": invoice_data.get('tax', 0),
+        "estimate_number": estimate_data.get('estimate_number', ''),
+        "items_count": validation_data.get('items_count', 1),
+    }
+
+
+def rule_cell(rule: CompiledRule, context: Dict[str, Any]) -> str:
+    """ルールの対象セル座標（動的行は入力値から計算）"""
+    if rule.row_offset_key:
+        return f"{rule.column}{rule.row + context[rule.row_offset_key]}"
+    return f"{rule.column}{rule.row}"
+
+
+def evaluate_rule(rule: CompiledRule, cell: str, value: str, context: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    """
+    1件のルールを評価
+
+    Returns:
+        (チェック結果, エラーメッセージ（合格時は空文字）)
+    """
+    if rule.requires and not context.get(rule.requires) and rule.fallback is not None:
+        rule = rule.fallback
+
+    if rule.kind == "numeric":
+        expected_value = context[rule.input_key]
+        actual_value = parse_number(value)
+        passed = actual_value == expected_value
+        expected = f"{expected_value:,}円"
+        actual = f"{actual_value:,}円"
+    else:
+        expected = rule.expected.format(**context) if rule.kind == "equals" else rule.expected
+        actual = value
+        if rule.kind == "regex":
+            passed = bool(rule.pattern.match(value))
+        elif rule.kind == "equals":
+            passed = value == expected
+        else:
+            passed = all(text in value for text in rule.contains)
+
+    check = {
+        "sheet": rule.sheet,
+        "cell": cell,
+        "item": rule.item,
+        "expected": expected,
+        "actual": actual,
+        "passed": passed
+    }
+    error = "" if passed else f"{rule.sheet}{cell}: " + rule.error.format(item=rule.item, expected=expected, actual=actual)
+    return check, error
+
+
+def validate_with_rules(company_name: str, sources: Dict[str, Union[str, Dict[str, str]]],
+                        validation_data: Dict[str, Any], affected: Dict[str, set] = None,
+                        template: "excel_formula.CompiledTemplate" = None) -> Dict[str, Any]:
+    """
+    取引先のルール表で検証（全ルールを1パスで評価）
+
+    affected（テンプレートからの変更セルとその依存セル）を指定した場合、
+    入力値に依存しないルールのうち対象セルが affected に含まれないものは
+    テンプレートの値のままのため、テンプレートごとに1回だけ評価した結果を再利用する
+    （チェック結果に "unchanged": true を付与、評価結果はコンパイル済みテンプレートに保持する）。
 
     Args:
-        csv_paths: シート名 -> CSVファイルパスの辞書
+        company_name: 取引先名
+        sources: シート名 -> CSVファイルパス、またはセル座標 → 値の辞書
         validation_data: 検証データ（invoice, estimate, items_count）
+        affected: 差分検証時の変更セル {シート名: {座標}}（Noneの場合は全ルールを評価）
+        template: 差分検証時のコンパイル済みテンプレート
 
     Returns:
         検証結果
     """
-    checks: List[Dict[str, Any]] = []
-    errors: List[str] = []
-
-    order_csv = csv_paths.get("注文書", "")
-    inspection_csv = csv_paths.get("検収書", "")
+    rules = COMPILED_RULES.get(company_name)
+    if rules is None:
+        return {
+            "success": False,
+            "checks": [],
+            "errors": [f"未対応の取引先: {company_name}"]
+        }
 
-    if not order_csv or not inspection_csv:
+    if not sources.get("注文書") or not sources.get("検収書"):
         return {
             "success": False,
             "checks": [],
             "errors": ["注文書または検収書シートが見つかりません"]
         }
 
-    # 検証データの取り出し
-    invoice_data = validation_data.get('invoice', validation_data)  # 後方互換性
-    estimate_data = validation_data.get('estimate', {})
+    snapshots = {sheet: load_sheet_snapshot(source) for sheet, source in sources.items()}
+    context = build_rule_context(validation_data)
 
-    # 請求書データ
-    invoice_total = invoice_data.get('total', 0)
-    invoice_subtotal = invoice_data.get('subtotal', 0)
-    invoice_tax = invoice_data.get('tax', 0)
-
-    # 見積データ（摘要チェック用）
-    estimate_number = estimate_data.get('estimate_number', '')
-    estimate_subject = estimate_data.get('subject', '')  # 件名チェック用
-
-    # === 注文書シート検証 ===
-
-    # AC3: 注文番号（yyyymmdd-01形式）
-    order_number = get_cell_value(order_csv, "AC3")
-    order_number_valid = bool(re.match(r'^\d{8}-01$', order_number))
-    checks.append({
-        "sheet": "注文書",
-        "cell": "AC3",
-        "item": "注文番号形式",
-        "expected": "yyyymmdd-01形式",
-        "actual": order_number,
-        "passed": order_number_valid
-    })
-    if not order_number_valid:
-        errors.append(f"注文書AC3: 注文番号が不正です（{order_number}）")
-
-    # B8: 宛名
-    order_address = get_cell_value(order_csv, "B8")
-    order_address_valid = "株式会社ネクストビッツ" in order_address and "御中" in order_address
-    checks.append({
-        "sheet": "注文書",
-        "cell": "B8",
-        "item": "宛名",
-        "expected": "株式会社ネクストビッツ　御中",
-        "actual": order_address,
-        "passed": order_address_valid
-    })
-    if not order_address_valid:
-        errors.append(f"注文書B8: 宛名が不正です（{order_address}）")
-
-    # G12: 発注金額
-    order_amount = parse_number(get_cell_value(order_csv, "G12"))
-    order_amount_valid = order_amount == invoice_total
-    checks.append({
-        "sheet": "注文書",
-        "cell": "G12",
-        "item": "発注金額",
-        "expected": f"{invoice_total:,}円",
-        "actual": f"{order_amount:,}円",
-        "passed": order_amount_valid
-    })
-    if not order_amount_valid:
-        errors.append(f"注文書G12: 発注金額が請求書と不一致（期待: {invoice_total:,}円、実際: {order_amount:,}円）")
-
-    # C17: 明細タイトル（yyyy年mm月分作業費形式）
-    detail_title = get_cell_value(order_csv, "C17")
-    detail_title_valid = bool(re.match(r'^\d{4}年\d{1,2}月分作業費$', detail_title))
-    checks.append({
-        "sheet": "注文書",
-        "cell": "C17",
-        "item": "明細タイトル",
-        "expected": "yyyy年mm月分作業費形式",
-        "actual": detail_title,
-        "passed": detail_title_valid
-    })
-    if not detail_title_valid:
-        errors.append(f"注文書C17: 明細タイトルが不正です（{detail_title}）")
-
-    # AA17: 摘要（「見積番号：TRR-YY-0MM」形式）
-    order_remarks = get_cell_value(order_csv, "AA17")
-    # 見積番号の期待値を構築：見積PDFから取得した番号を使用
-    if estimate_number:
-        expected_remarks = f"見積番号：{estimate_number}"
-        order_remarks_valid = order_remarks == expected_remarks
-    else:
-        # 見積番号がない場合は形式チェックのみ
-        expected_remarks = "見積番号：TRR-YY-0MM形式"
-        order_remarks_valid = bool(re.match(r'^見積番号：TRR-\d{2}-0\d{2}$', order_remarks))
-    checks.append({
-        "sheet": "注文書",
-        "cell": "AA17",
-        "item": "摘要",
-        "expected": expected_remarks,
-        "actual": order_remarks,
-        "passed": order_remarks_valid
-    })
-    if not order_remarks_valid:
-        errors.append(f"注文書AA17: 摘要が不正です（期待: {expected_remarks}、実際: {order_remarks}）")
-
-    # C18: 件名（固定文字列「　Telemas作業(システム改修等)」との比較）
-    # ※処理手順より：見積書の件名「yyyy年mm月作業：Telemasシステム改修作業等」→「　Telemas作業(システム改修等)」に変換
-    order_subject = get_cell_value(order_csv, "C18")
-    expected_subject = "　Telemas作業(システム改修等)"  # 先頭に全角スペース
-    order_subject_valid = order_subject == expected_subject
-    checks.append({
-        "sheet": "注文書",
-        "cell": "C18",
-        "item": "件名",
-        "expected": expected_subject,
-        "actual": order_subject,
-        "passed": order_subject_valid
-    })
-    if not order_subject_valid:
-        errors.append(f"注文書C18: 件名が不正です（期待: {expected_subject}、実際: {order_subject}）")
-
-    # C19: 以下、余白
-    blank_marker = get_cell_value(order_csv, "C19")
-    blank_marker_valid = "以下、余白" in blank_marker or blank_marker.strip() == "以下、余白"
-    checks.append({
-        "sheet": "注文書",
-        "cell": "C19",
-        "item": "明細締め",
-        "expected": "以下、余白",
-        "actual": blank_marker,
-        "passed": blank_marker_valid
-    })
-    if not blank_marker_valid:
-        errors.append(f"注文書C19: 「以下、余白」が入力されていません（{blank_marker}）")
-
-    # W39: 小計
-    order_subtotal = parse_number(get_cell_value(order_csv, "W39"))
-    order_subtotal_valid = order_subtotal == invoice_subtotal
-    checks.append({
-        "sheet": "注文書",
-        "cell": "W39",
-        "item": "小計",
-        "expected": f"{invoice_subtotal:,}円",
-        "actual": f"{order_subtotal:,}円",
-        "passed": order_subtotal_valid
-    })
-    if not order_subtotal_valid:
-        errors.append(f"注文書W39: 小計が請求書と不一致（期待: {invoice_subtotal:,}円、実際: {order_subtotal:,}円）")
-
-    # W40: 消費税
-    order_tax = parse_number(get_cell_value(order_csv, "W40"))
-    order_tax_valid = order_tax == invoice_tax
-    checks.append({
-        "sheet": "注文書",
-        "cell": "W40",
-        "item": "消費税",
-        "expected": f"{invoice_tax:,}円",
-        "actual": f"{order_tax:,}円",
-        "passed": order_tax_valid
-    })
-    if not order_tax_valid:
-        errors.append(f"注文書W40: 消費税が請求書と不一致（期待: {invoice_tax:,}円、実際: {order_tax:,}円）")
-
-    # W41: 合計金額
-    order_total = parse_number(get_cell_value(order_csv, "W41"))
-    order_total_valid = order_total == invoice_total
-    checks.append({
-        "sheet": "注文書",
-        "cell": "W41",
-        "item": "合計金額",
-        "expected": f"{invoice_total:,}円",
-        "actual": f"{order_total:,}円",
-        "passed": order_total_valid
-    })
-    if not order_total_valid:
-        errors.append(f"注文書W41: 合計金額が請求書と不一致（期待: {invoice_total:,}円、実際: {order_total:,}円）")
-
-    # === 検収書シート検証 ===
-
-    # AC4: 検収番号（yyyymmdd-01形式）
-    inspection_number = get_cell_value(inspection_csv, "AC4")
-    inspection_number_valid = bool(re.match(r'^\d{8}-01$', inspection_number))
-    checks.append({
-        "sheet": "検収書",
-        "cell": "AC4",
-        "item": "検収番号形式",
-        "expected": "yyyymmdd-01形式",
-        "actual": inspection_number,
-        "passed": inspection_number_valid
-    })
-    if not inspection_number_valid:
-        errors.append(f"検収書AC4: 検収番号が不正です（{inspection_number}）")
-
-    # AC5: 検収日（当月末日）- フォーマットチェックのみ
-    inspection_date = get_cell_value(inspection_csv, "AC5")
-    # 日付形式のチェック（yyyy/mm/dd または yyyy-mm-dd または datetime形式 または数値）
-    # openpyxlはdatetime形式で「2025-07-31 00:00:00」のように出力することがある
-    inspection_date_valid = bool(inspection_date) and bool(
-        re.match(r'^\d{4}[/-]\d{1,2}[/-]\d{1,2}$', inspection_date) or
-        re.match(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$', inspection_date) or  # datetime形式
-        re.match(r'^\d+$', inspection_date.replace(',', ''))
-    )
-    checks.append({
-        "sheet": "検収書",
-        "cell": "AC5",
-        "item": "検収日",
-        "expected": "当月末日",
-        "actual": inspection_date,
-        "passed": inspection_date_valid
-    })
-    if not inspection_date_valid:
-        errors.append(f"検収書AC5: 検収日が不正です（{inspection_date}）")
-
-    # B7: 宛名
-    inspection_address = get_cell_value(inspection_csv, "B7")
-    inspection_address_valid = "株式会社ネクストビッツ" in inspection_address and "御中" in inspection_address
-    checks.append({
-        "sheet": "検収書",
-        "cell": "B7",
-        "item": "宛名",
-        "expected": "株式会社ネクストビッツ　御中",
-        "actual": inspection_address,
-        "passed": inspection_address_valid
-    })
-    if not inspection_address_valid:
-        errors.append(f"検収書B7: 宛名が不正です（{inspection_address}）")
-
-    # G14: 合計金額
-    inspection_amount = parse_number(get_cell_value(inspection_csv, "G14"))
-    inspection_amount_valid = inspection_amount == invoice_total
-    checks.append({
-        "sheet": "検収書",
-        "cell": "G14",
-        "item": "合計金額",
-        "expected": f"{invoice_total:,}円",
-        "actual": f"{inspection_amount:,}円",
-        "passed": inspection_amount_valid
-    })
-    if not inspection_amount_valid:
-        errors.append(f"検収書G14: 合計金額が請求書と不一致（期待: {invoice_total:,}円、実際: {inspection_amount:,}円）")
-
-    # C19: 明細タイトル（検収書）
-    inspection_detail_title = get_cell_value(inspection_csv, "C19")
-    inspection_detail_title_valid = bool(re.match(r'^\d{4}年\d{1,2}月分作業費$', inspection_detail_title))
-    checks.append({
-        "sheet": "検収書",
-        "cell": "C19",
-        "item": "明細タイトル",
-        "expected": "yyyy年mm月分作業費形式",
-        "actual": inspection_detail_title,
-        "passed": inspection_detail_title_valid
-    })
-    if not inspection_detail_title_valid:
-        errors.append(f"検収書C19: 明細タイトルが不正です（{inspection_detail_title}）")
-
-    # AA19: 摘要（「見積番号：TRR-YY-0MM」形式）
-    inspection_remarks = get_cell_value(inspection_csv, "AA19")
-    if estimate_number:
-        expected_inspection_remarks = f"見積番号：{estimate_number}"
-        inspection_remarks_valid = inspection_remarks == expected_inspection_remarks
-    else:
-        expected_inspection_remarks = "見積番号：TRR-YY-0MM形式"
-        inspection_remarks_valid = bool(re.match(r'^見積番号：TRR-\d{2}-0\d{2}$', inspection_remarks))
-    checks.append({
-        "sheet": "検収書",
-        "cell": "AA19",
-        "item": "摘要",
-        "expected": expected_inspection_remarks,
-        "actual": inspection_remarks,
-        "passed": inspection_remarks_valid
-    })
-    if not inspection_remarks_valid:
-        errors.append(f"検収書AA19: 摘要が不正です（期待: {expected_inspection_remarks}、実際: {inspection_remarks}）")
-
-    # C20: 件名（固定文字列「　Telemas作業(システム改修等)」との比較）
-    # ※処理手順より：見積書の件名「yyyy年mm月作業：Telemasシステム改修作業等」→「　Telemas作業(システム改修等)」に変換
-    inspection_subject = get_cell_value(inspection_csv, "C20")
-    expected_inspection_subject = "　Telemas作業(システム改修等)"  # 先頭に全角スペース
-    inspection_subject_valid = inspection_subject == expected_inspection_subject
-    checks.append({
-        "sheet": "検収書",
-        "cell": "C20",
-        "item": "件名",
-        "expected": expected_inspection_subject,
-        "actual": inspection_subject,
-        "passed": inspection_subject_valid
-    })
-    if not inspection_subject_valid:
-        errors.append(f"検収書C20: 件名が不正です（期待: {expected_inspection_subject}、実際: {inspection_subject}）")
-
-    # C21: 以下、余白
-    inspection_blank = get_cell_value(inspection_csv, "C21")
-    inspection_blank_valid = "以下、余白" in inspection_blank or inspection_blank.strip() == "以下、余白"
-    checks.append({
-        "sheet": "検収書",
-        "cell": "C21",
-        "item": "明細締め",
-        "expected": "以下、余白",
-        "actual": inspection_blank,
-        "passed": inspection_blank_valid
-    })
-    if not inspection_blank_valid:
-        errors.append(f"検収書C21: 「以下、余白」が入力されていません（{inspection_blank}）")
-
-    # W41: 小計（検収書）
-    inspection_subtotal = parse_number(get_cell_value(inspection_csv, "W41"))
-    inspection_subtotal_valid = inspection_subtotal == invoice_subtotal
-    checks.append({
-        "sheet": "検収書",
-        "cell": "W41",
-        "item": "小計",
-        "expected": f"{invoice_subtotal:,}円",
-        "actual": f"{inspection_subtotal:,}円",
-        "passed": inspection_subtotal_valid
-    })
-    if not inspection_subtotal_valid:
-        errors.append(f"検収書W41: 小計が請求書と不一致（期待: {invoice_subtotal:,}円、実際: {inspection_subtotal:,}円）")
-
-    # W42: 消費税（検収書）
-    inspection_tax = parse_number(get_cell_value(inspection_csv, "W42"))
-    inspection_tax_valid = inspection_tax == invoice_tax
-    checks.append({
-        "sheet": "検収書",
-        "cell": "W42",
-        "item": "消費税",
-        "expected": f"{invoice_tax:,}円",
-        "actual": f"{inspection_tax:,}円",
-        "passed": inspection_tax_valid
-    })
-    if not inspection_tax_valid:
-        errors.append(f"検収書W42: 消費税が請求書と不一致（期待: {invoice_tax:,}円、実際: {inspection_tax:,}円）")
-
-    # W43: 合計金額（検収書）
-    inspection_total = parse_number(get_cell_value(inspection_csv, "W43"))
-    inspection_total_valid = inspection_total == invoice_total
-    checks.append({
-        "sheet": "検収書",
-        "cell": "W43",
-        "item": "合計金額",
-        "expected": f"{invoice_total:,}円",
-        "actual": f"{inspection_total:,}円",
-        "passed": inspection_total_valid
-    })
-    if not inspection_total_valid:
-        errors.append(f"検収書W43: 合計金額が請求書と不一致（期待: {invoice_total:,}円、実際: {inspection_total:,}円）")
+    checks: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    for index, rule in enumerate(rules):
+        cell = rule_cell(rule, context)
+        if affected is not None and not rule.uses_input and cell not in affected.get(rule.sheet, ()):
+            check, error = template.unchanged_check(
+                (company_name, index), lambda: evaluate_rule(rule, cell, snapshots[rule.sheet].get(cell, ""), context)
+            )
+            check = {**check, "unchanged": True}
+        else:
+            check, error = evaluate_rule(rule, cell, snapshots[rule.sheet].get(cell, ""), context)
+        checks.append(check)
+        if error:
+            errors.append(error)
 
     return {
         "success": len(errors) == 0,
@@ -659,405 +615,323 @@ def validate_nextbits_excel(csv_paths: Dict[str, str], validation_data: Dict[str
     }
 
 
+def validate_nextbits_excel(csv_paths: Dict[str, str], validation_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    ネクストビッツのExcelを検証
+
+    Args:
+        csv_paths: シート名 -> CSVファイルパス（またはセル座標 → 値の辞書）
+        validation_data: 検証データ（invoice, estimate, items_count）
+
+    Returns:
+        検証結果
+    """
+    return validate_with_rules("ネクストビッツ", csv_paths, validation_data)
+
+
 def validate_offbeat_excel(csv_paths: Dict[str, str], validation_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     オフ・ビート・ワークスのExcelを検証
 
     Args:
-        csv_paths: シート名 -> CSVファイルパスの辞書
+        csv_paths: シート名 -> CSVファイルパス（またはセル座標 → 値の辞書）
         validation_data: 検証データ（invoice, estimate, items_count）
 
     Returns:
         検証結果
     """
-    checks: List[Dict[str, Any]] = []
-    errors: List[str] = []
+    return validate_with_rules("オフ・ビート・ワークス", csv_paths, validation_data)
 
-    order_csv = csv_paths.get("注文書", "")
-    inspection_csv = csv_paths.get("検収書", "")
 
-    if not order_csv or not inspection_csv:
-        return {
-            "success": False,
-            "checks": [],
-            "errors": ["注文書または検収書シートが見つかりません"]
-        }
+def should_trust_cached_values() -> bool:
+    """
+    環境変数 PDF_PROCESSOR_TRUST_CACHED_VALUES でキャッシュ値の信頼を無効化できる（デフォルト: 有効）
+    """
+    return os.getenv('PDF_PROCESSOR_TRUST_CACHED_VALUES', '1').lower() not in ('0', 'false', 'no')
 
-    # 検証データの取り出し
-    invoice_data = validation_data.get('invoice', validation_data)  # 後方互換性
-    estimate_data = validation_data.get('estimate', {})
-    items_count = validation_data.get('items_count', 1)
-
-    # 請求書データ
-    invoice_total = invoice_data.get('total', 0)
-    invoice_subtotal = invoice_data.get('subtotal', 0)
-    invoice_tax = invoice_data.get('tax', 0)
-
-    # 見積データ（摘要チェック用）
-    estimate_number = estimate_data.get('estimate_number', '')
-
-    # 動的行番号計算（オフ・ビート・ワークスは複数明細に対応）
-    # 注文書: 18 + items_count = 「以下、余白」の行
-    # 検収書: 20 + items_count = 「以下、余白」の行
-    order_blank_row = 18 + items_count
-    inspection_blank_row = 20 + items_count
-    # 摘要行（AA列）：オフ・ビート・ワークスは1行目のみ（17行目固定）
-    order_remarks_row = 17
-    inspection_remarks_row = 19
-
-    # === 注文書シート検証 ===
-
-    # AC3: 注文番号（yyyymmdd-02形式）
-    order_number = get_cell_value(order_csv, "AC3")
-    order_number_valid = bool(re.match(r'^\d{8}-02$', order_number))
-    checks.append({
-        "sheet": "注文書",
-        "cell": "AC3",
-        "item": "注文番号形式",
-        "expected": "yyyymmdd-02形式",
-        "actual": order_number,
-        "passed": order_number_valid
-    })
-    if not order_number_valid:
-        errors.append(f"注文書AC3: 注文番号が不正です（{order_number}）")
-
-    # B8: 宛名
-    order_address = get_cell_value(order_csv, "B8")
-    order_address_valid = "株式会社オフ・ビート・ワークス" in order_address and "御中" in order_address
-    checks.append({
-        "sheet": "注文書",
-        "cell": "B8",
-        "item": "宛名",
-        "expected": "株式会社オフ・ビート・ワークス　御中",
-        "actual": order_address,
-        "passed": order_address_valid
-    })
-    if not order_address_valid:
-        errors.append(f"注文書B8: 宛名が不正です（{order_address}）")
-
-    # G12: 発注金額
-    order_amount = parse_number(get_cell_value(order_csv, "G12"))
-    order_amount_valid = order_amount == invoice_total
-    checks.append({
-        "sheet": "注文書",
-        "cell": "G12",
-        "item": "発注金額",
-        "expected": f"{invoice_total:,}円",
-        "actual": f"{order_amount:,}円",
-        "passed": order_amount_valid
-    })
-    if not order_amount_valid:
-        errors.append(f"注文書G12: 発注金額が請求書と不一致（期待: {invoice_total:,}円、実際: {order_amount:,}円）")
-
-    # C17: 明細タイトル（yyyy年mm月作業費形式）※「分」なし
-    detail_title = get_cell_value(order_csv, "C17")
-    detail_title_valid = bool(re.match(r'^\d{4}年\d{1,2}月作業費$', detail_title))
-    checks.append({
-        "sheet": "注文書",
-        "cell": "C17",
-        "item": "明細タイトル",
-        "expected": "yyyy年mm月作業費形式",
-        "actual": detail_title,
-        "passed": detail_title_valid
-    })
-    if not detail_title_valid:
-        errors.append(f"注文書C17: 明細タイトルが不正です（{detail_title}）")
-
-    # AA17: 摘要（「見積番号：NNNNNNN」形式）
-    order_remarks = get_cell_value(order_csv, f"AA{order_remarks_row}")
-    if estimate_number:
-        expected_remarks = f"見積番号：{estimate_number}"
-        order_remarks_valid = order_remarks == expected_remarks
-    else:
-        # 見積番号がない場合は形式チェックのみ（7桁の数字）
-        expected_remarks = "見積番号：NNNNNNN形式"
-        order_remarks_valid = bool(re.match(r'^見積番号：\d{7}$', order_remarks))
-    checks.append({
-        "sheet": "注文書",
-        "cell": f"AA{order_remarks_row}",
-        "item": "摘要",
-        "expected": expected_remarks,
-        "actual": order_remarks,
-        "passed": order_remarks_valid
-    })
-    if not order_remarks_valid:
-        errors.append(f"注文書AA{order_remarks_row}: 摘要が不正です（期待: {expected_remarks}、実際: {order_remarks}）")
-
-    # C(18+N): 以下、余白（動的行：明細数に応じて変動）
-    order_blank_cell = f"C{order_blank_row}"
-    blank_marker = get_cell_value(order_csv, order_blank_cell)
-    blank_marker_valid = "以下、余白" in blank_marker or blank_marker.strip() == "以下、余白"
-    checks.append({
-        "sheet": "注文書",
-        "cell": order_blank_cell,
-        "item": "明細締め",
-        "expected": "以下、余白",
-        "actual": blank_marker,
-        "passed": blank_marker_valid
-    })
-    if not blank_marker_valid:
-        errors.append(f"注文書{order_blank_cell}: 「以下、余白」が入力されていません（{blank_marker}）")
-
-    # W39: 小計
-    order_subtotal = parse_number(get_cell_value(order_csv, "W39"))
-    order_subtotal_valid = order_subtotal == invoice_subtotal
-    checks.append({
-        "sheet": "注文書",
-        "cell": "W39",
-        "item": "小計",
-        "expected": f"{invoice_subtotal:,}円",
-        "actual": f"{order_subtotal:,}円",
-        "passed": order_subtotal_valid
-    })
-    if not order_subtotal_valid:
-        errors.append(f"注文書W39: 小計が請求書と不一致（期待: {invoice_subtotal:,}円、実際: {order_subtotal:,}円）")
-
-    # W40: 消費税
-    order_tax = parse_number(get_cell_value(order_csv, "W40"))
-    order_tax_valid = order_tax == invoice_tax
-    checks.append({
-        "sheet": "注文書",
-        "cell": "W40",
-        "item": "消費税",
-        "expected": f"{invoice_tax:,}円",
-        "actual": f"{order_tax:,}円",
-        "passed": order_tax_valid
-    })
-    if not order_tax_valid:
-        errors.append(f"注文書W40: 消費税が請求書と不一致（期待: {invoice_tax:,}円、実際: {order_tax:,}円）")
-
-    # W41: 合計金額
-    order_total = parse_number(get_cell_value(order_csv, "W41"))
-    order_total_valid = order_total == invoice_total
-    checks.append({
-        "sheet": "注文書",
-        "cell": "W41",
-        "item": "合計金額",
-        "expected": f"{invoice_total:,}円",
-        "actual": f"{order_total:,}円",
-        "passed": order_total_valid
-    })
-    if not order_total_valid:
-        errors.append(f"注文書W41: 合計金額が請求書と不一致（期待: {invoice_total:,}円、実際: {order_total:,}円）")
-
-    # === 検収書シート検証 ===
-
-    # AC4: 検収番号（yyyymmdd-02形式）
-    inspection_number = get_cell_value(inspection_csv, "AC4")
-    inspection_number_valid = bool(re.match(r'^\d{8}-02$', inspection_number))
-    checks.append({
-        "sheet": "検収書",
-        "cell": "AC4",
-        "item": "検収番号形式",
-        "expected": "yyyymmdd-02形式",
-        "actual": inspection_number,
-        "passed": inspection_number_valid
-    })
-    if not inspection_number_valid:
-        errors.append(f"検収書AC4: 検収番号が不正です（{inspection_number}）")
-
-    # AC5: 検収日（当月末日）
-    inspection_date = get_cell_value(inspection_csv, "AC5")
-    # 日付形式のチェック（yyyy/mm/dd または yyyy-mm-dd または datetime形式 または数値）
-    # openpyxlはdatetime形式で「2025-07-31 00:00:00」のように出力することがある
-    inspection_date_valid = bool(inspection_date) and bool(
-        re.match(r'^\d{4}[/-]\d{1,2}[/-]\d{1,2}$', inspection_date) or
-        re.match(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$', inspection_date) or  # datetime形式
-        re.match(r'^\d+$', inspection_date.replace(',', ''))
+
+def should_force_full_validation() -> bool:
+    """
+    環境変数 PDF_PROCESSOR_FULL_VALIDATION で差分検証を無効化し、全項目を検証できる（デフォルト: 差分検証）
+    """
+    return os.getenv('PDF_PROCESSOR_FULL_VALIDATION', '0').lower() in ('1', 'true', 'yes')
+
+
+class ManifestSheetView:
+    """
+    テンプレートの値に、マニフェストの編集セル・数式の計算結果を重ねたシートの値
+
+    get() はCSV出力（export_values_to_csv）と同じく値を文字列で返す。
+    """
+
+    def __init__(self, template_values: Dict[str, Any], edits: Dict[str, Any], formula_values: Dict[str, Any]):
+        self.template_values = template_values
+        self.edits = edits
+        self.formula_values = formula_values
+
+    def get(self, coord: str, default: str = "") -> str:
+        if coord in self.formula_values:
+            value = self.formula_values[coord]
+        elif coord in self.edits:
+            value = self.edits[coord]
+        else:
+            value = self.template_values.get(coord)
+        return default if value is None else str(value)
+
+
+def validate_incremental(manifest: Dict[str, Any], company_name: str,
+                         validation_data: Dict[str, Any]) -> Union[Dict[str, Any], None]:
+    """
+    テンプレートとの差分に基づく検証
+
+    マニフェストに記録されたテンプレートハッシュからコンパイル済みテンプレートを取得し、
+    編集セルのうちテンプレートと異なるセルと、その値に依存する数式セルを求める。
+    それらのセルに対するチェックと入力値に依存するチェックのみを評価し、
+    残りはテンプレートのままのため評価済みの結果を再利用する。
+    Excelファイル（シートXML）は読み込まない。
+
+    Returns:
+        検証結果（incremental: 変更セル数・評価したチェック数）。
+        マニフェストに差分情報がない・テンプレートがキャッシュにない場合はNone
+    """
+    import excel_formula
+
+    edits = manifest.get("cells")
+    if not manifest.get("template_hash") or not isinstance(edits, dict):
+        return None
+    try:
+        template = excel_formula.load_compiled_template(manifest["template_hash"])
+    except KeyError:
+        return None
+
+    changed = excel_formula.changed_cells(template, edits)
+    affected = excel_formula.affected_cells(template, changed)
+
+    views = {
+        sheet: ManifestSheetView(
+            template.values.get(sheet, {}), edits.get(sheet, {}), manifest["values"].get(sheet, {})
+        )
+        for sheet in template.sheetnames
+    }
+    result = validate_with_rules(
+        company_name, views, validation_data, affected=affected, template=template
     )
-    checks.append({
-        "sheet": "検収書",
-        "cell": "AC5",
-        "item": "検収日",
-        "expected": "当月末日",
-        "actual": inspection_date,
-        "passed": inspection_date_valid
-    })
-    if not inspection_date_valid:
-        errors.append(f"検収書AC5: 検収日が不正です（{inspection_date}）")
-
-    # B7: 宛名
-    inspection_address = get_cell_value(inspection_csv, "B7")
-    inspection_address_valid = "株式会社オフ・ビート・ワークス" in inspection_address and "御中" in inspection_address
-    checks.append({
-        "sheet": "検収書",
-        "cell": "B7",
-        "item": "宛名",
-        "expected": "株式会社オフ・ビート・ワークス　御中",
-        "actual": inspection_address,
-        "passed": inspection_address_valid
-    })
-    if not inspection_address_valid:
-        errors.append(f"検収書B7: 宛名が不正です（{inspection_address}）")
-
-    # G14: 合計金額
-    inspection_amount = parse_number(get_cell_value(inspection_csv, "G14"))
-    inspection_amount_valid = inspection_amount == invoice_total
-    checks.append({
-        "sheet": "検収書",
-        "cell": "G14",
-        "item": "合計金額",
-        "expected": f"{invoice_total:,}円",
-        "actual": f"{inspection_amount:,}円",
-        "passed": inspection_amount_valid
-    })
-    if not inspection_amount_valid:
-        errors.append(f"検収書G14: 合計金額が請求書と不一致（期待: {invoice_total:,}円、実際: {inspection_amount:,}円）")
-
-    # C19: 明細タイトル（検収書）
-    inspection_detail_title = get_cell_value(inspection_csv, "C19")
-    inspection_detail_title_valid = bool(re.match(r'^\d{4}年\d{1,2}月作業費$', inspection_detail_title))
-    checks.append({
-        "sheet": "検収書",
-        "cell": "C19",
-        "item": "明細タイトル",
-        "expected": "yyyy年mm月作業費形式",
-        "actual": inspection_detail_title,
-        "passed": inspection_detail_title_valid
-    })
-    if not inspection_detail_title_valid:
-        errors.append(f"検収書C19: 明細タイトルが不正です（{inspection_detail_title}）")
-
-    # AA19: 摘要（「見積番号：NNNNNNN」形式）
-    inspection_remarks = get_cell_value(inspection_csv, f"AA{inspection_remarks_row}")
-    if estimate_number:
-        expected_inspection_remarks = f"見積番号：{estimate_number}"
-        inspection_remarks_valid = inspection_remarks == expected_inspection_remarks
-    else:
-        expected_inspection_remarks = "見積番号：NNNNNNN形式"
-        inspection_remarks_valid = bool(re.match(r'^見積番号：\d{7}$', inspection_remarks))
-    checks.append({
-        "sheet": "検収書",
-        "cell": f"AA{inspection_remarks_row}",
-        "item": "摘要",
-        "expected": expected_inspection_remarks,
-        "actual": inspection_remarks,
-        "passed": inspection_remarks_valid
-    })
-    if not inspection_remarks_valid:
-        errors.append(f"検収書AA{inspection_remarks_row}: 摘要が不正です（期待: {expected_inspection_remarks}、実際: {inspection_remarks}）")
-
-    # C(20+N): 以下、余白（動的行：明細数に応じて変動）
-    inspection_blank_cell = f"C{inspection_blank_row}"
-    inspection_blank = get_cell_value(inspection_csv, inspection_blank_cell)
-    inspection_blank_valid = "以下、余白" in inspection_blank or inspection_blank.strip() == "以下、余白"
-    checks.append({
-        "sheet": "検収書",
-        "cell": inspection_blank_cell,
-        "item": "明細締め",
-        "expected": "以下、余白",
-        "actual": inspection_blank,
-        "passed": inspection_blank_valid
-    })
-    if not inspection_blank_valid:
-        errors.append(f"検収書{inspection_blank_cell}: 「以下、余白」が入力されていません（{inspection_blank}）")
-
-    # W41: 小計（検収書）
-    inspection_subtotal = parse_number(get_cell_value(inspection_csv, "W41"))
-    inspection_subtotal_valid = inspection_subtotal == invoice_subtotal
-    checks.append({
-        "sheet": "検収書",
-        "cell": "W41",
-        "item": "小計",
-        "expected": f"{invoice_subtotal:,}円",
-        "actual": f"{inspection_subtotal:,}円",
-        "passed": inspection_subtotal_valid
-    })
-    if not inspection_subtotal_valid:
-        errors.append(f"検収書W41: 小計が請求書と不一致（期待: {invoice_subtotal:,}円、実際: {inspection_subtotal:,}円）")
-
-    # W42: 消費税（検収書）
-    inspection_tax = parse_number(get_cell_value(inspection_csv, "W42"))
-    inspection_tax_valid = inspection_tax == invoice_tax
-    checks.append({
-        "sheet": "検収書",
-        "cell": "W42",
-        "item": "消費税",
-        "expected": f"{invoice_tax:,}円",
-        "actual": f"{inspection_tax:,}円",
-        "passed": inspection_tax_valid
-    })
-    if not inspection_tax_valid:
-        errors.append(f"検収書W42: 消費税が請求書と不一致（期待: {invoice_tax:,}円、実際: {inspection_tax:,}円）")
-
-    # W43: 合計金額（検収書）
-    inspection_total = parse_number(get_cell_value(inspection_csv, "W43"))
-    inspection_total_valid = inspection_total == invoice_total
-    checks.append({
-        "sheet": "検収書",
-        "cell": "W43",
-        "item": "合計金額",
-        "expected": f"{invoice_total:,}円",
-        "actual": f"{inspection_total:,}円",
-        "passed": inspection_total_valid
-    })
-    if not inspection_total_valid:
-        errors.append(f"検収書W43: 合計金額が請求書と不一致（期待: {invoice_total:,}円、実際: {inspection_total:,}円）")
 
-    return {
-        "success": len(errors) == 0,
-        "checks": checks,
-        "errors": errors
+    unchanged = sum(1 for check in result["checks"] if check.get("unchanged"))
+    result["incremental"] = {
+        "changed_cells": sum(len(coords) for coords in changed.values()),
+        "affected_cells": sum(len(coords) for coords in affected.values()),
+        "evaluated_checks": len(result["checks"]) - unchanged,
+        "unchanged_checks": unchanged,
     }
+    return result
+
+
+# レンダリング済みPDFの表示値とセル座標の対応
+# labels: ラベル文字列（空白除去後） → 直後に表示される値のセル座標
+RENDERED_LAYOUT = {
+    "注文書": {
+        "labels": {
+            "発行日：": "AC2",
+            "注文番号：": "AC3",
+            "発注金額：": "G12",
+            "小計": "W39",
+            "消費税（10%）": "W40",
+            "合計金額": "W41",
+        },
+        "address": "B8",
+        "detail_title": "C17",
+        "remarks": "AA17",
+        "detail_start_row": 18,
+    },
+    "検収書": {
+        "labels": {
+            "検収番号：": "AC4",
+            "検収日：": "AC5",
+            "合計金額：": "G14",
+            "小計": "W41",
+            "消費税（10%）": "W42",
+            "合計金額": "W43",
+        },
+        "address": "B7",
+        "detail_title": "C19",
+        "remarks": "AA19",
+        "detail_start_row": 20,
+    },
+}
+
+
+def extract_rendered_cells(pdf_path: str, sheet_name: str) -> Dict[str, str]:
+    """
+    レンダリング済みPDF（注文書・検収書）から表示値を抽出し、セル座標 → 値の辞書を返す
 
+    pdfplumberの単語抽出（keep_blank_chars=True でセル内の全角スペースを保持）を使い、
+    - ラベル（注文番号：、小　計 等）の直後の単語を値として対応付ける
+    - 「御中」を含む単語を宛名、「yyyy年mm月(分)作業費」を明細タイトル、「見積番号：」で始まる単語を摘要とする
+    - 明細タイトルと同じ列（x座標）に並ぶ単語を上から順に明細行（C列）として対応付ける
+    表示上の日付（2025年6月30日）はYYYY-MM-DD形式に正規化する。
 
-def validate_excel(excel_path: str, company_name: str, validation_data: Dict[str, Any]) -> Dict[str, Any]:
+    Args:
+        pdf_path: PDFファイルのパス（1ページ目を使用）
+        sheet_name: シート名（注文書 or 検収書）
+
+    Returns:
+        セル座標 → 表示値の辞書
+    """
+    import pdfplumber
+
+    layout = RENDERED_LAYOUT[sheet_name]
+    cells: Dict[str, str] = {}
+
+    with pdfplumber.open(pdf_path) as pdf:
+        words = pdf.pages[0].extract_words(keep_blank_chars=True)
+
+    title_word = None
+    for i, word in enumerate(words):
+        text = word['text']
+        label = re.sub(r'\s', '', text)
+        if label in layout["labels"] and i + 1 < len(words):
+            cells.setdefault(layout["labels"][label], words[i + 1]['text'])
+        elif '御中' in text:
+            cells.setdefault(layout["address"], text)
+        elif re.match(r'^\d{4}年\d{1,2}月分?作業費$', text) and title_word is None:
+            title_word = word
+            cells[layout["detail_title"]] = text
+        elif text.startswith('見積番号'):
+            cells.setdefault(layout["remarks"], text)
+
+    # 明細行: 明細タイトルと同じ列に並ぶ単語（「以下、余白」まで）
+    if title_word is not None:
+        column_words = sorted(
+            (w for w in words if abs(w['x0'] - title_word['x0']) < 2 and w['top'] > title_word['top'] + 1),
+            key=lambda w: w['top']
+        )
+        for offset, word in enumerate(column_words):
+            cells[f"C{layout['detail_start_row'] + offset}"] = word['text']
+            if '以下、余白' in word['text']:
+                break
+
+    # 表示上の日付をYYYY-MM-DD形式に正規化
+    for coord, value in cells.items():
+        date_match = re.match(r'^(\d{4})年(\d{1,2})月(\d{1,2})日$', value)
+        if date_match:
+            cells[coord] = f"{date_match.group(1)}-{int(date_match.group(2)):02d}-{int(date_match.group(3)):02d}"
+
+    return cells
+
+
+def validate_rendered_pdfs(order_pdf_path: str, inspection_pdf_path: str, company_name: str,
+                           validation_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    レンダリング済みPDF（顧客に届く成果物）の表示値を検証
+
+    Excelの検証と同じチェック項目を、PDFから抽出した表示値に対して実行する。
+    LibreOfficeでの再計算は行わない（PDF生成時の1回のみで済む）。
+
+    Args:
+        order_pdf_path: 注文書PDFのパス
+        inspection_pdf_path: 検収書PDFのパス
+        company_name: 取引先名
+        validation_data: 検証データ（invoice, estimate, items_count を含む辞書）
+
+    Returns:
+        検証結果（calculation: "rendered"）
+    """
+    with timings.span("extract_rendered_cells"):
+        rendered = {
+            "注文書": extract_rendered_cells(order_pdf_path, "注文書"),
+            "検収書": extract_rendered_cells(inspection_pdf_path, "検収書"),
+        }
+
+    result = validate_with_rules(company_name, rendered, validation_data)
+
+    result["calculation"] = "rendered"
+    metrics.record_validation(company_name, result, "rendered")
+    return result
+
+
+def validate_excel(excel_path: str, company_name: str, validation_data: Dict[str, Any],
+                   trust_cached_values: bool = None, full_validation: bool = None) -> Dict[str, Any]:
     """
     Excelファイルを検証
 
+    excel_editorが出力したファイルには、数式セルのキャッシュ値とインストールごとの鍵による署名を
+    記録したマニフェストが含まれる。署名が一致する場合はキャッシュ値（data_only）をそのまま検証し、
+    LibreOfficeでの再計算を省略する。マニフェストがない・署名が一致しない
+    （Excel等で編集された・別の環境で作成された）ファイルは従来どおりLibreOfficeで再計算する。
+
+    マニフェストにテンプレートとの差分が記録されている場合は、差分に関係するチェックのみを
+    評価する（validate_incremental）。full_validation で全項目の検証を強制できる。
+
     Args:
         excel_path: Excelファイルのパス
         company_name: 取引先名
         validation_data: 検証データ（invoice, estimate, items_count を含む辞書）
+        trust_cached_values: キャッシュ値を信頼するか（None: 環境変数に従う）
+        full_validation: 差分検証を行わず全項目を検証するか（None: 環境変数に従う）
 
     Returns:
-        検証結果
+        検証結果（calculation: "cached" または "libreoffice"）
     """
-    # 一時ディレクトリ
-    output_dir = os.path.dirname(excel_path)
-    csv_paths = {}
-
-    try:
-        # LibreOfficeでCSV変換（数式計算後の値を取得）
-        csv_paths = convert_excel_to_csv_with_libreoffice(excel_path, output_dir)
-
-        # 取引先に応じた検証
-        if company_name == "ネクストビッツ":
-            result = validate_nextbits_excel(csv_paths, validation_data)
-        elif company_name == "オフ・ビート・ワークス":
-            result = validate_offbeat_excel(csv_paths, validation_data)
+    import excel_formula
+
+    if trust_cached_values is None:
+        trust_cached_values = should_trust_cached_values()
+    if full_validation is None:
+        full_validation = should_force_full_validation()
+
+    with timings.span("read_manifest"):
+        manifest = excel_formula.read_verified_manifest(excel_path) if trust_cached_values else None
+    if manifest is not None and not full_validation:
+        # 最速パス: テンプレートとの差分に関係するチェックのみ評価（Excelを読み込まない）
+        with timings.span("validate_incremental"):
+            result = validate_incremental(manifest, company_name, validation_data)
+        if result is not None:
+            result["calculation"] = "cached"
+            metrics.record_validation(company_name, result, "incremental")
+            return result
+
+    # 作業ディレクトリ（呼び出しごとに作成、同じExcelを並行して検証しても中間ファイルが衝突しない、
+    # sofficeのタイムアウト時も削除する、scratch.py参照）
+    with scratch.workspace('validate') as output_dir:
+        if manifest is not None:
+            # 高速パス: excel_editorが書き込んだキャッシュ値を検証（LibreOfficeを起動しない）
+            calculation = "cached"
+            csv_paths = export_values_to_csv(excel_path, output_dir)
         else:
-            result = {
-                "success": False,
-                "checks": [],
-                "errors": [f"未対応の取引先: {company_name}"]
-            }
+            # LibreOfficeでCSV変換（数式計算後の値を取得）
+            calculation = "libreoffice"
+            csv_paths = convert_excel_to_csv_with_libreoffice(excel_path, output_dir)
 
-        return result
+        # 取引先のルール表で検証
+        with timings.span("validate_rules"):
+            result = validate_with_rules(company_name, csv_paths, validation_data)
 
-    finally:
-        # 一時CSVファイル削除
-        for csv_path in csv_paths.values():
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
+    result["calculation"] = calculation
+    metrics.record_validation(company_name, result, calculation)
+    return result
 
 
 def main():
     """メイン関数"""
-    if len(sys.argv) != 4:
+    # --full: 差分検証を行わず全項目を検証
+    full_validation = '--full' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--full']
+
+    if len(args) != 3:
         print(json.dumps({
             "error": "引数が不足しています",
-            "usage": "python3 excel_validator.py <excel_path> <company_name> <validation_data_json>"
+            "usage": "python3 excel_validator.py <excel_path> <company_name> <validation_data_json> [--full]"
         }, ensure_ascii=False), file=sys.stderr)
         sys.exit(1)
 
-    excel_path = sys.argv[1]
-    company_name = sys.argv[2]
-    validation_data_json = sys.argv[3]
+    excel_path = args[0]
+    company_name = args[1]
+    validation_data_json = args[2]
 
     try:
-        validation_data = json.loads(validation_data_json)
-        result = validate_excel(excel_path, company_name, validation_data)
+        validation_data = stream_input.load_json(validation_data_json)
+        result = validate_excel(excel_path, company_name, validation_data, full_validation=full_validation or None)
 
         # checksのpassedフィールドをboolに強制変換（Matchオブジェクト対策）
         if "checks" in result:
@@ -1065,7 +939,7 @@ def main():
                 if "passed" in check:
                     check["passed"] = bool(check["passed"])
 
-        print(json.dumps(result, ensure_ascii=False))
+        print(json.dumps(timings.attach(result), ensure_ascii=False))
 
         if not result["success"]:
             sys.exit(1)
@@ -10,10 +10,47 @@ PyInstallerでexe化するためのメインスクリプト。
     pdf_processor.exe excel_editor <company_name> <template_path> <output_path> <data_json>
     pdf_processor.exe excel_validator <excel_path> <company_name> <validation_data_json>
     pdf_processor.exe pdf_generator <excel_path> <output_dir>
+    pdf_processor.exe pdf_generator batch <output_dir> <excel_path> [<excel_path> ...]
+    pdf_processor.exe render_and_validate <excel_path> <output_dir> <company_name> <validation_data_json>
+    pdf_processor.exe preview <company_name> <template_path_or_hash> <data_json>
+    pdf_processor.exe pipeline <job_json>
+    pdf_processor.exe serve [--msgpack]
+    pdf_processor.exe environment [--refresh]
+    pdf_processor.exe soffice prelaunch|status|shutdown
+    pdf_processor.exe scratch status|sweep
+
+serveモード:
+    標準入力から1行1リクエストのJSONを読み込み、1行1レスポンスのJSONを標準出力に返す。
+    プロセスを常駐させることで、Pythonの起動・モジュール読み込み・テンプレートの
+    コンパイルを2回目以降のリクエストで省略できる。
+        リクエスト: {"id": 1, "command": "preview", "args": {"company_name": ..., "template": ..., "data": {...}}}
+                    {"id": 2, "command": "pipeline", "args": {<pipeline.py の job_json と同じ形式>}}
+        レスポンス: {"id": 1, "result": {...}} または {"id": 1, "error": "...", "error_type": "..."}
+        レスポンスにはリクエストごとの処理時間 "timings" が含まれる（timings.py参照）。
+    --msgpack を指定すると、JSON行の代わりに長さ付きのMessagePack（[長さ: 4バイト、ビッグエンディアン][MessagePack]）で
+    リクエスト・レスポンスを受け渡す（msgpack パッケージが必要）。テンプレート・PDFの指定（pipeline の
+    template・documents）にはパスの代わりにバイト列をそのまま渡せ、エスケープ・Base64なしで送れる。
+        PDF_PROCESSOR_METRICS_TEXTFILE / PDF_PROCESSOR_METRICS_PORT を設定すると、
+        ジョブ数・処理段階の所要時間等をOpenMetrics形式で出力する（metrics.py参照）。
+    中間ファイルの作業ディレクトリのうち、強制終了等で残ったものはバックグラウンドで定期的に削除する（scratch.py参照）。
+
+プロファイル:
+    環境変数 PDF_PROCESSOR_PROFILE=<ディレクトリ> を設定すると、サブコマンド全体を
+    cProfile（またはスタックの定期採取）で計測し、結果をディレクトリに保存する（profiler.py参照）。
+
+トレース:
+    PDF_PROCESSOR_TRACE_FILE / PDF_PROCESSOR_TRACE_FD を設定すると、サブコマンド・処理段階・
+    sofficeの実行をOTLP互換のJSONのスパンとして出力する（tracing.py参照）。
+    トレースID・親スパンID・ジョブIDは環境変数、またはコマンドの前のオプションで指定する。
+        pdf_processor.exe --trace-id <32桁> --parent-span-id <16桁> --job-id <ID> pdf_parser ...
+    serveモードでは、リクエストの "trace": {"trace_id": ..., "parent_span_id": ..., "job_id": ...} で指定する。
 """
 
 import sys
 import os
+import json
+import struct
+import importlib.util
 
 # 実行ファイルのディレクトリを基準にパスを設定
 if getattr(sys, 'frozen', False):
@@ -26,15 +63,201 @@ else:
 sys.path.insert(0, base_dir)
 
 
+def _serve_preview(args: dict) -> dict:
+    import excel_preview
+    return excel_preview.preview(args['company_name'], args['template'], args['data'])
+
+
+def _serve_pipeline(args: dict) -> dict:
+    import pipeline
+    import stream_output
+    # 標準出力はレスポンスに使う（stdout: の出力は指定できない）
+    if stream_output.is_stdout(args.get('output_dir', '')):
+        raise ValueError(f"serveモードでは標準出力への出力（{stream_output.STDOUT_PREFIX}）は指定できません")
+    return pipeline.run_job_spec(args)
+
+
+# serveモードで受け付けるコマンド（コマンド名 → ハンドラ）
+SERVE_COMMANDS = {
+    'preview': _serve_preview,
+    'pipeline': _serve_pipeline,
+}
+
+
+# serveモードのMessagePackのメッセージの長さ（ビッグエンディアン4バイト）
+_MESSAGE_LENGTH = struct.Struct('>I')
+
+
+def _read_json_lines():
+    """標準入力からJSON行のリクエストを読み込む（空行は読み飛ばす）"""
+    for line in sys.stdin:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def _write_json_line(response: dict) -> None:
+    sys.stdout.write(json.dumps(response, ensure_ascii=False) + '\n')
+    sys.stdout.flush()
+
+
+def _read_msgpack_messages():
+    """標準入力から長さ付きのMessagePackのリクエストを読み込む"""
+    import stream_input
+    stream = sys.stdin.buffer
+    while True:
+        header = stream.read(_MESSAGE_LENGTH.size)
+        if not header:
+            return
+        if len(header) < _MESSAGE_LENGTH.size:
+            header += stream_input.read_exact(stream, _MESSAGE_LENGTH.size - len(header))
+        yield stream_input.read_exact(stream, _MESSAGE_LENGTH.unpack(header)[0])
+
+
+def _write_msgpack_message(response: dict) -> None:
+    import msgpack
+    data = msgpack.packb(response, use_bin_type=True)
+    sys.stdout.buffer.write(_MESSAGE_LENGTH.pack(len(data)) + data)
+    sys.stdout.buffer.flush()
+
+
+def _unpack_msgpack(message: bytes) -> dict:
+    import msgpack
+    return msgpack.unpackb(message, raw=False)
+
+
+# serveモードの形式（形式名 → (リクエストの読み込み, リクエストのデコード, レスポンスの書き込み)）
+SERVE_FORMATS = {
+    'json': (_read_json_lines, json.loads, _write_json_line),
+    'msgpack': (_read_msgpack_messages, _unpack_msgpack, _write_msgpack_message),
+}
+
+
+def serve(serve_format: str = 'json'):
+    """
+    serveモード: 標準入力のJSON行ごとにコマンドを実行し、結果をJSON行で返す
+
+    serve_format が 'msgpack' の場合は長さ付きのMessagePackで受け渡す。
+    標準入力がEOFになるか、{"command": "shutdown"} を受け取ると終了する。
+    PDF_PROCESSOR_PRELAUNCH_SOFFICE=1 の場合は、起動直後にLibreOfficeのリスナーを起動しておく。
+    """
+    if serve_format == 'msgpack' and importlib.util.find_spec('msgpack') is None:
+        # 任意の依存のため、未インストールの場合は最初のレスポンスではなく起動時にエラーにする
+        print('serve --msgpack には msgpack パッケージが必要です（pip install msgpack）', file=sys.stderr)
+        sys.exit(1)
+    read_requests, decode_request, write_response = SERVE_FORMATS[serve_format]
+
+    import metrics
+    import scratch
+    import soffice_runner
+    import stream_input
+    import timings
+    import tracing
+    # 標準入力はリクエストに使う（stdin:<名前> の入力は指定できない）
+    stream_input.disable_stdin()
+    soffice_runner.prelaunch_if_enabled()
+    metrics.start_exporter()
+    scratch.start_sweeper()
+
+    for message in read_requests():
+        request_id = None
+        command = None
+        company_name = ''
+        # 処理時間はリクエストごとに計測
+        timings.reset()
+        try:
+            request = decode_request(message)
+            request_id = request.get('id')
+            command = request.get('command')
+            trace = request.get('trace') or {}
+            tracing.set_context(trace.get('trace_id'), trace.get('parent_span_id'), trace.get('job_id'))
+            if command == 'shutdown':
+                break
+            handler = SERVE_COMMANDS.get(command)
+            if handler is None:
+                raise ValueError(f'不明なコマンド: {command}')
+            args = request.get('args', {})
+            company_name = args.get('company_name', '')
+            response = {'id': request_id, 'result': handler(args)}
+        except Exception as e:
+            response = {'id': request_id, 'error': str(e), 'error_type': type(e).__name__}
+        tracing.export(f"serve.{command}", {"company": company_name}, response.get('error'))
+        tracing.set_context()
+        timings.attach(response)
+        metrics.jobs.inc(
+            command=str(command), company=company_name, status='error' if 'error' in response else 'success'
+        )
+
+        write_response(response)
+
+    metrics.write_textfile()
+
+
+# コマンドの前に指定するトレースのオプション（オプション名 → tracing.set_context の引数名）
+TRACE_OPTIONS = {
+    '--trace-id': 'trace_id',
+    '--parent-span-id': 'parent_span_id',
+    '--job-id': 'job_id',
+}
+
+
+def _parse_trace_options(argv: list) -> tuple:
+    """先頭のトレースのオプションを取り除き、(オプションの辞書, 残りの引数) を返す"""
+    options = {}
+    while len(argv) >= 2 and argv[0] in TRACE_OPTIONS:
+        options[TRACE_OPTIONS[argv[0]]] = argv[1]
+        argv = argv[2:]
+    return options, argv
+
+
 def main():
+    trace_options, argv = _parse_trace_options(sys.argv[1:])
+    sys.argv = sys.argv[:1] + argv
+    if trace_options:
+        import tracing
+        tracing.set_context(**trace_options)
+
     if len(sys.argv) < 2:
         print('使用法: pdf_processor <command> [args...]', file=sys.stderr)
-        print('コマンド: pdf_parser, excel_editor, excel_validator, pdf_generator', file=sys.stderr)
+        print('コマンド: pdf_parser, excel_editor, excel_validator, pdf_generator, render_and_validate, preview, pipeline, serve, environment, soffice, scratch', file=sys.stderr)
         sys.exit(1)
 
     command = sys.argv[1]
     args = sys.argv[2:]
 
+    # PDF_PROCESSOR_PROFILE=<ディレクトリ> の場合はサブコマンド全体をプロファイル（profiler.py参照）
+    import profiler
+    with profiler.profile_if_enabled(command):
+        run_command_traced(command, args)
+
+
+def run_command_traced(command: str, args: list):
+    """
+    サブコマンドを実行し、トレースの出力先が設定されていればスパンを出力（tracing.py参照）
+
+    serveモードはリクエストごとに出力するため対象外。
+    """
+    import tracing
+    if command == 'serve' or not tracing.enabled():
+        run_command(command, args)
+        return
+
+    error = None
+    try:
+        run_command(command, args)
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            error = f'exit status {e.code}'
+        raise
+    except BaseException as e:
+        error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        tracing.export(command, {"command": command}, error)
+
+
+def run_command(command: str, args: list):
+    """サブコマンドを実行"""
     if command == 'pdf_parser':
         # pdf_parser.py の main 関数を呼び出す
         import pdf_parser
@@ -59,6 +282,45 @@ def main():
         sys.argv = ['pdf_generator.py'] + args
         pdf_generator.main()
 
+    elif command == 'render_and_validate':
+        # pdf_generator.py の render_and_validate モードを呼び出す（PDF生成＋生成PDFの検証）
+        import pdf_generator
+        sys.argv = ['pdf_generator.py', 'render_and_validate'] + args
+        pdf_generator.main()
+
+    elif command == 'preview':
+        # excel_preview.py の main 関数を呼び出す
+        import excel_preview
+        sys.argv = ['excel_preview.py'] + args
+        excel_preview.main()
+
+    elif command == 'pipeline':
+        # pipeline.py の main 関数を呼び出す（1ジョブ分の全段階を1プロセスで実行）
+        import pipeline
+        sys.argv = ['pipeline.py'] + args
+        pipeline.main()
+
+    elif command == 'serve':
+        serve('msgpack' if '--msgpack' in args else 'json')
+
+    elif command == 'environment':
+        # environment_probe.py の main 関数を呼び出す
+        import environment_probe
+        sys.argv = ['environment_probe.py'] + args
+        environment_probe.main()
+
+    elif command == 'soffice':
+        # soffice_runner.py の main 関数を呼び出す
+        import soffice_runner
+        sys.argv = ['soffice_runner.py'] + args
+        soffice_runner.main()
+
+    elif command == 'scratch':
+        # scratch.py の main 関数を呼び出す
+        import scratch
+        sys.argv = ['scratch.py'] + args
+        scratch.main()
+
     elif command == '--help' or command == '-h':
         print('PDF処理統合ツール')
         print('')
@@ -69,6 +331,13 @@ def main():
         print('  excel_editor      Excel編集（openpyxl使用）')
         print('  excel_validator   Excel検証（数式計算結果の検証）')
         print('  pdf_generator     PDF生成（Excel ExportAsFixedFormat使用）')
+        print('  render_and_validate  PDF生成＋生成PDFの表示値検証（LibreOffice起動1回）')
+        print('  preview           金額プレビュー（ファイル出力・LibreOfficeなし）')
+        print('  pipeline          1ジョブ分の全段階（PDF解析→Excel編集→PDF生成＋検証）を1プロセスで実行')
+        print('  serve             常駐モード（標準入力のJSON行を処理）')
+        print('  environment       実行環境の検出結果（LibreOffice/Excel/WSL、キャッシュ済み）')
+        print('  soffice           LibreOfficeリスナーの起動・状態確認・停止（ウォームスタート用）')
+        print('  scratch           中間ファイルの作業ディレクトリの状態確認・残ったものの削除')
         print('')
         print('例:')
         print('  pdf_processor pdf_parser ネクストビッツ estimate /path/to/file.pdf')
@@ -77,7 +346,7 @@ def main():
     else:
         print(f'不明なコマンド: {command}', file=sys.stderr)
         print('使用法: pdf_processor <command> [args...]', file=sys.stderr)
-        print('コマンド: pdf_parser, excel_editor, excel_validator, pdf_generator', file=sys.stderr)
+        print('コマンド: pdf_parser, excel_editor, excel_validator, pdf_generator, render_and_validate, preview, pipeline, serve, environment, soffice, scratch', file=sys.stderr)
         sys.exit(1)
 
 
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+メモリ使用量計測モジュール
+
+timings.span で囲んだ処理段階ごとに、メモリの最大使用量（ハイウォーターマーク）を記録し、
+JSON出力の "memory" に含めます。openpyxlのワークブック読み込み、drawing復元時のzip全体の辞書、
+pdfplumberのページオブジェクト等でメモリ使用量が跳ね上がるため、コンテナのメモリ上限の
+見積もりと、メモリ使用量の増加（リグレッション）の検出に使います。
+
+計測項目:
+    rss_peak_kb: 段階終了時点までのプロセスの最大RSS（getrusage、POSIXのみ）
+    rss_growth_kb: 段階中に最大RSSが増えた量（0ならこの段階で最大値を更新していない）
+    rss_kb: 段階終了時点のRSS（/proc/self/statm、Linuxのみ）
+    rss_delta_kb: 段階中のRSSの増減（段階終了時点 - 開始時点、解放されれば負の値）
+    tracemalloc_peak_kb: 段階中のPythonのメモリ割り当ての最大量（PDF_PROCESSOR_TRACEMALLOC=1 の場合のみ）
+    children_max_rss_kb: 終了した子プロセス（soffice等）のうち最大のRSS
+                         （段階ごとの値は、その段階で終了した子プロセスが最大値を更新した場合のみ）
+
+    rss_peak_kb・rss_growth_kb・children_max_rss_kb はプロセス起動からの最大値のため、1プロセス1ジョブの
+    CLIでのみジョブの値になる。serveモード・api を使う常駐ワーカーでは、先に処理した要求の最大値が
+    残り、以降の要求では rss_growth_kb がほぼ0になる。要求ごとのメモリ使用量は rss_kb・rss_delta_kb を
+    使う（段階の開始・終了時点の値のため、段階中の一時的な増加は含まない）。
+
+環境変数:
+    PDF_PROCESSOR_TRACEMALLOC: 1 でtracemallocによる計測を有効化（Pythonの処理が遅くなるためデフォルト: 無効）
+    PDF_PROCESSOR_METRICS_FILE: 指定したファイルに、サブコマンドごとの処理時間・メモリ使用量をJSON行で追記
+
+出力:
+    "memory": {
+        "rss_peak_kb": 182340,
+        "rss_kb": 171200,
+        "children_max_rss_kb": 412000,
+        "stages": {
+            "load_workbook": {"rss_peak_kb": 150200, "rss_growth_kb": 61000, "rss_kb": 149800, "rss_delta_kb": 60200,
+                              "tracemalloc_peak_kb": 48210.5},
+            "soffice.convert": {"rss_peak_kb": 182340, "rss_growth_kb": 0, "rss_kb": 171200, "rss_delta_kb": 120,
+                                "children_max_rss_kb": 412000},
+            ...
+        }
+    }
+"""
+
+import os
+import sys
+import json
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+try:
+    import resource
+except ImportError:
+    # Windowsにはresourceモジュールがない（RSSは計測しない）
+    resource = None
+
+# 段階ごとの計測結果（段階名 → 計測値、同名の段階は最大値）
+_stages: Dict[str, Dict[str, float]] = {}
+# 実行中の段階のtracemalloc最大値（入れ子の段階を考慮して外側の段階に引き継ぐ）
+_tracemalloc_stack: List[int] = []
+_lock = threading.Lock()
+
+
+def tracemalloc_enabled() -> bool:
+    """環境変数 PDF_PROCESSOR_TRACEMALLOC でtracemallocによる計測が有効か（デフォルト: 無効）"""
+    return os.getenv('PDF_PROCESSOR_TRACEMALLOC', '0').lower() in ('1', 'true', 'yes')
+
+
+def _maxrss_kb(who: int) -> Optional[int]:
+    """getrusage の最大RSS（KB）。macOSはバイト単位のため変換する"""
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(who).ru_maxrss
+    return maxrss // 1024 if sys.platform == 'darwin' else maxrss
+
+
+def rss_peak_kb() -> Optional[int]:
+    """プロセスの最大RSS（KB）"""
+    return _maxrss_kb(resource.RUSAGE_SELF) if resource is not None else None
+
+
+def current_rss_kb() -> Optional[int]:
+    """プロセスの現在のRSS（KB、/proc/self/statm の2列目。Linux以外は None）"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def children_max_rss_kb() -> Optional[int]:
+    """終了した子プロセスのうち最大のRSS（KB）"""
+    return _maxrss_kb(resource.RUSAGE_CHILDREN) if resource is not None else None
+
+
+def _start_tracemalloc() -> bool:
+    import tracemalloc
+    if not tracemalloc.is_tracing():
+        if not tracemalloc_enabled():
+            return False
+        tracemalloc.start()
+    return hasattr(tracemalloc, 'reset_peak')
+
+
+def stage_enter() -> Dict[str, Any]:
+    """
+    段階の開始時に呼び出す（timings.span から使用）
+
+    Returns:
+        stage_exit に渡す開始時の状態
+    """
+    state = {"rss": rss_peak_kb(), "rss_current": current_rss_kb(), "children_rss": children_max_rss_kb(),
+             "tracemalloc": False}
+    # tracemallocはプロセス全体で1つのため、メインスレッドの段階のみ計測する
+    if threading.current_thread() is threading.main_thread() and _start_tracemalloc():
+        import tracemalloc
+        _, peak = tracemalloc.get_traced_memory()
+        if _tracemalloc_stack:
+            _tracemalloc_stack[-1] = max(_tracemalloc_stack[-1], peak)
+        _tracemalloc_stack.append(0)
+        tracemalloc.reset_peak()
+        state["tracemalloc"] = True
+    return state
+
+
+def stage_exit(name: str, state: Dict[str, Any]) -> None:
+    """段階の終了時に呼び出し、計測結果を記録する"""
+    record: Dict[str, float] = {}
+
+    rss = rss_peak_kb()
+    if rss is not None:
+        record["rss_peak_kb"] = rss
+        record["rss_growth_kb"] = rss - state["rss"]
+        children_rss = children_max_rss_kb()
+        if children_rss > state["children_rss"]:
+            record["children_max_rss_kb"] = children_rss
+
+    rss_current = current_rss_kb()
+    if rss_current is not None and state["rss_current"] is not None:
+        record["rss_kb"] = rss_current
+        record["rss_delta_kb"] = rss_current - state["rss_current"]
+
+    if state["tracemalloc"] and _tracemalloc_stack:
+        import tracemalloc
+        _, peak = tracemalloc.get_traced_memory()
+        stage_peak = max(_tracemalloc_stack.pop(), peak)
+        if _tracemalloc_stack:
+            _tracemalloc_stack[-1] = max(_tracemalloc_stack[-1], stage_peak)
+        record["tracemalloc_peak_kb"] = round(stage_peak / 1024, 1)
+
+    if not record:
+        return
+    with _lock:
+        previous = _stages.get(name)
+        if previous is None:
+            _stages[name] = record
+        else:
+            for key, value in record.items():
+                previous[key] = max(previous.get(key, value), value)
+
+
+def reset() -> None:
+    """記録済みの計測結果を破棄（serveモードの要求ごと）"""
+    with _lock:
+        _stages.clear()
+
+
+def summary() -> Dict[str, Any]:
+    """メモリ使用量の計測結果（モジュールdocstringの出力形式を参照）"""
+    with _lock:
+        stages = {name: dict(record) for name, record in _stages.items()}
+    return {
+        "rss_peak_kb": rss_peak_kb(),
+        "rss_kb": current_rss_kb(),
+        "children_max_rss_kb": children_max_rss_kb(),
+        "stages": stages,
+    }
+
+
+def write_metrics(timings: Dict[str, float], memory: Dict[str, Any]) -> None:
+    """
+    PDF_PROCESSOR_METRICS_FILE が設定されていれば、処理時間・メモリ使用量をJSON行で追記
+
+    書き込みの失敗は処理に影響させない。
+    """
+    metrics_path = os.getenv('PDF_PROCESSOR_METRICS_FILE')
+    if not metrics_path:
+        return
+    record = {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "command": os.path.splitext(os.path.basename(sys.argv[0]))[0],
+        "pid": os.getpid(),
+        "timings": timings,
+        "memory": memory,
+    }
+    try:
+        with open(metrics_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    except OSError as e:
+        print(f"[memory_usage] メトリクスファイルへの書き込みに失敗しました: {e}", file=sys.stderr)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+メトリクス（OpenMetrics形式）出力モジュール
+
+常駐するserveモード・batchモードで、ジョブ数・処理段階ごとの所要時間・LibreOfficeの起動回数・
+キャッシュのヒット率・検証方式・検証エラーのセルを集計し、OpenMetrics形式のテキストとして
+ファイルに定期的に書き出す、またはローカルのポートで公開します。
+node_exporter の textfile collector やPrometheusから収集することで、ログを解析せずに
+どこで時間を使っているかをダッシュボードで確認できます。
+
+環境変数:
+    PDF_PROCESSOR_METRICS_TEXTFILE: 書き出すファイルのパス（{pid} はプロセスIDに置換）
+    PDF_PROCESSOR_METRICS_INTERVAL: ファイルの書き出し間隔（秒、デフォルト: 15）
+    PDF_PROCESSOR_METRICS_PORT: 指定したポート（127.0.0.1）で /metrics を公開
+
+メトリクス:
+    seikyu_jobs_total{command, company, status}                  ジョブ数
+    seikyu_stage_duration_seconds{stage}                         処理段階の所要時間（ヒストグラム、timings.span の区間）
+    seikyu_soffice_launches_total{label}                         LibreOffice（soffice）の起動回数
+    seikyu_cache_requests_total{cache, result}                   キャッシュの参照回数（result: hit / miss）
+    seikyu_validation_path_total{path}                           検証方式（incremental / cached / libreoffice / rendered）
+    seikyu_validation_failures_total{company, sheet, cell}       検証エラーのセル
+"""
+
+import os
+import sys
+import time
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+# ヒストグラムのバケット（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+DEFAULT_INTERVAL = 15
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+
+
+class Counter:
+    """ラベルごとに加算するカウンタ"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _label_key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# TYPE {self.name} counter", f"# HELP {self.name} {self.documentation}"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}_total{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """ラベルごとに値の分布を集計するヒストグラム"""
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        # ラベル → (バケットごとの件数, 合計, 件数)
+        self.values: Dict[LabelKey, List[Any]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        with _lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# TYPE {self.name} histogram", f"# HELP {self.name} {self.documentation}"]
+        for key, (bucket_counts, total, count) in sorted(self.values.items()):
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                # le は prometheus_client と同じ表記にする（整数の境界も le="1.0" のように小数点を付ける）
+                bucket_key = key + (("le", repr(float(bound))),)
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_key)} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ''
+    escaped = (
+        f'{name}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in key
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+jobs = Counter('seikyu_jobs', 'Jobs processed by command, company and status.')
+stage_duration = Histogram('seikyu_stage_duration_seconds', 'Duration of internal processing stages.')
+soffice_launches = Counter('seikyu_soffice_launches', 'LibreOffice (soffice) process launches.')
+cache_requests = Counter('seikyu_cache_requests', 'Cache lookups by cache and result (hit/miss).')
+validation_path = Counter('seikyu_validation_path', 'Validations by calculation path.')
+validation_failures = Counter('seikyu_validation_failures', 'Failed validation checks by company, sheet and cell.')
+scratch_removed = Counter('seikyu_scratch_removed', 'Leftover scratch workspaces removed by the sweeper, by reason.')
+
+REGISTRY = (
+    jobs, stage_duration, soffice_launches, cache_requests, validation_path, validation_failures, scratch_removed
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """キャッシュの参照結果を記録"""
+    cache_requests.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def record_validation(company_name: str, result: Dict[str, Any], path: str) -> None:
+    """検証結果（検証方式・エラーのセル）を記録"""
+    validation_path.inc(path=path)
+    for check in result.get("checks", []):
+        if not check.get("passed"):
+            validation_failures.inc(company=company_name, sheet=check.get("sheet", ""), cell=check.get("cell", ""))
+
+
+def render() -> str:
+    """全メトリクスをOpenMetrics形式のテキストで返す"""
+    with _lock:
+        lines = [line for metric in REGISTRY for line in metric.render()]
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+def textfile_path() -> Optional[str]:
+    path = os.getenv('PDF_PROCESSOR_METRICS_TEXTFILE')
+    return path.replace('{pid}', str(os.getpid())) if path else None
+
+
+def write_textfile() -> None:
+    """
+    PDF_PROCESSOR_METRICS_TEXTFILE にメトリクスを書き出す（未設定時は何もしない）
+
+    収集側が書き込み途中のファイルを読まないよう、一時ファイル経由で置換する。
+    """
+    path = textfile_path()
+    if not path:
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(render())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[metrics] メトリクスファイルの書き出しに失敗しました: {e}", file=sys.stderr)
+
+
+def _textfile_loop(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        write_textfile()
+
+
+def _serve_http(port: int) -> None:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/openmetrics-text; version=1.0.0; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # 標準出力・標準エラーはJSONの応答に使うためアクセスログは出さない
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+    server.serve_forever()
+
+
+_exporter_started = False
+
+
+def start_exporter() -> None:
+    """
+    serveモード・batchモードの開始時に呼び出し、環境変数に応じてメトリクスの出力を開始する
+
+    ファイルへの定期書き出し・HTTPでの公開はいずれもデーモンスレッドで行う。
+    終了時は write_textfile() で最終値を書き出すこと。
+    """
+    global _exporter_started
+    if _exporter_started:
+        return
+    _exporter_started = True
+
+    if textfile_path():
+        try:
+            interval = float(os.getenv('PDF_PROCESSOR_METRICS_INTERVAL', DEFAULT_INTERVAL))
+        except ValueError:
+            interval = DEFAULT_INTERVAL
+        threading.Thread(target=_textfile_loop, args=(max(interval, 1.0),), name='metrics-textfile', daemon=True).start()
+
+    port = os.getenv('PDF_PROCESSOR_METRICS_PORT')
+    if port:
+        try:
+            threading.Thread(target=_serve_http, args=(int(port),), name='metrics-http', daemon=True).start()
+        except ValueError:
+            print(f"[metrics] PDF_PROCESSOR_METRICS_PORT が不正です: {port}", file=sys.stderr)
@@ -12,6 +12,18 @@ Excelファイルの各シートを個別のPDFに変換します。
 
 使用法:
     python3 pdf_generator.py <excel_path> <output_dir>
+    python3 pdf_generator.py render_and_validate <excel_path> <output_dir> <company_name> <validation_data_json>
+    python3 pdf_generator.py batch <output_dir> <excel_path> [<excel_path> ...]
+
+    render_and_validate の excel_path には stdin:<名前> / fd:<番号>（stream_input.py参照）、
+    output_dir には stdout: を指定でき、生成したPDFを結果のJSONとともにバンドルで標準出力に返す
+    （stream_output.py参照、PDFは処理ごとの作業ディレクトリに出力し、返す前に削除する）。
+    validation_data_json には @<パス> / - / stdin:<名前> も指定できる（stream_input.load_json 参照）。
+
+    いずれも --optimize を付けると生成したPDFを最適化し（ストリームの再圧縮・重複オブジェクトの統合・
+    未使用オブジェクトの削除）、削減バイト数を "optimization" に出力します（pypdf 5.0以上が必要）。
+    最適化に失敗した場合は "optimization" に {"error": ...} を出力し、最適化前のPDFを返します。
+    --linearize を付けると最適化に加えてqpdf（インストールされている場合）で線形化します。
 
 引数:
     excel_path: Excelファイルのパス
@@ -23,9 +35,12 @@ Excelファイルの各シートを個別のPDFに変換します。
         "success": true,
         "order_pdf_path": "/tmp/注文書.pdf",
         "inspection_pdf_path": "/tmp/検収書.pdf",
-        "engine": "libreoffice" | "excel"
+        "engine": "libreoffice" | "excel",
+        "cache": "hit" | "miss" | "disabled"
     }
 
+    同じ内容のワークブックを変換済みの場合は生成結果キャッシュを返します（render_cache.py参照）。
+
 処理ルール（docs/processing_rules.md）:
     - 注文書シートを「注文書_YYMM.pdf」として出力
     - 検収書シートを「検収書_YYMM.pdf」として出力
@@ -35,30 +50,33 @@ import sys
 import json
 import subprocess
 import os
+import uuid
 import shutil
 from pathlib import Path
 import openpyxl
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+
+import environment_probe
+import metrics
+import render_cache
+import scratch
+import soffice_runner
+import stream_input
+import stream_output
+import timings
+
+# PDF最適化のコマンドラインオプション（全モード共通）
+OPTIMIZE_OPTIONS = ('--optimize', '--linearize')
 
 
 def check_libreoffice() -> bool:
     """
-    LibreOfficeがインストールされているかチェック
+    LibreOfficeがインストールされているかチェック（environment_probeのキャッシュを使用）
 
     Returns:
         インストール済みならTrue、未インストールならFalse
     """
-    try:
-        # soffice --version でバージョン情報が取得できるかチェック
-        result = subprocess.run(
-            ['soffice', '--version'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        return result.returncode == 0
-    except (FileNotFoundError, subprocess.TimeoutExpired):
-        return False
+    return environment_probe.libreoffice_available()
 
 
 def calculate_formulas_python(wb: openpyxl.Workbook) -> dict:
@@ -244,6 +262,20 @@ def resolve_cross_sheet_formulas(wb: openpyxl.Workbook, source_sheet_name: str)
                             cell.data_type = ref_cell.data_type if ref_cell.data_type != 'f' else 'n'
 
 
+def output_pdf_paths(output_dir: str) -> Tuple[str, str]:
+    """
+    注文書・検収書PDFの出力パス（呼び出しごとに異なる名前）
+
+    同じプロセスの複数スレッドが同じ出力ディレクトリに出力しても衝突しないよう、
+    プロセスIDではなく呼び出しごとのIDを付ける。
+    """
+    call_id = uuid.uuid4().hex[:12]
+    return (
+        os.path.join(output_dir, f"order_{call_id}.pdf"),
+        os.path.join(output_dir, f"inspection_{call_id}.pdf"),
+    )
+
+
 def convert_sheet_to_pdf(excel_path: str, sheet_name: str, output_path: str, calculated_values: dict = None) -> str:
     """
     Excelの特定シートをPDFに変換
@@ -271,71 +303,64 @@ def convert_sheet_to_pdf(excel_path: str, sheet_name: str, output_path: str, cal
             "本番環境（AWS Lambda Docker Image）ではLibreOfficeを含むイメージを使用してください。"
         )
 
-    # 一時ファイルパスを生成
-    output_dir = os.path.dirname(output_path)
-    temp_excel_path = os.path.join(output_dir, f"temp_{sheet_name}_{os.getpid()}.xlsx")
+    # 一時ファイルは呼び出しごとの作業ディレクトリに作成（scratch.py参照）
+    with scratch.workspace('sheet') as work_dir:
+        temp_excel_path = os.path.join(work_dir, f"temp_{sheet_name}.xlsx")
 
-    try:
-        # 元のExcelを読み込み（数式を保持）
-        wb = openpyxl.load_workbook(excel_path)
-
-        # Pythonで計算した値を適用（#NAME?エラー防止）
-        # LibreOfficeのheadless変換ではシート間参照の計算に失敗するため、
-        # Pythonで計算した値を直接セルに設定する
-        if calculated_values:
-            apply_calculated_values(wb, calculated_values)
-
-        # 対象シートのみを残す
-        sheets_to_remove = [s for s in wb.sheetnames if s != sheet_name]
-        for s in sheets_to_remove:
-            del wb[s]
-
-        # 印刷スケールを100%に設定
-        # LibreOfficeはExcelのスケール設定を正しく解釈できないため、
-        # 100%に設定してCubePDFと同じサイズで出力する
-        ws = wb[sheet_name]
-        ws.page_setup.scale = 100
+        try:
+            # 元のExcelを読み込み（数式を保持）
+            wb = openpyxl.load_workbook(excel_path)
+
+            # Pythonで計算した値を適用（#NAME?エラー防止）
+            # LibreOfficeのheadless変換ではシート間参照の計算に失敗するため、
+            # Pythonで計算した値を直接セルに設定する
+            if calculated_values:
+                apply_calculated_values(wb, calculated_values)
+
+            # 対象シートのみを残す
+            sheets_to_remove = [s for s in wb.sheetnames if s != sheet_name]
+            for s in sheets_to_remove:
+                del wb[s]
+
+            # 印刷スケールを100%に設定
+            # LibreOfficeはExcelのスケール設定を正しく解釈できないため、
+            # 100%に設定してCubePDFと同じサイズで出力する
+            ws = wb[sheet_name]
+            ws.page_setup.scale = 100
 
-        # 一時Excelとして保存
-        wb.save(temp_excel_path)
-        wb.close()
+            # 一時Excelとして保存
+            wb.save(temp_excel_path)
+            wb.close()
 
-        # LibreOfficeでPDF変換
-        result = subprocess.run(
-            [
-                'soffice',
-                '--headless',
-                '--convert-to', 'pdf',
-                '--outdir', output_dir,
-                temp_excel_path
-            ],
-            capture_output=True,
-            text=True,
-            timeout=60  # 60秒タイムアウト
-        )
+            # LibreOfficeでPDF変換
+            result = soffice_runner.run_soffice(
+                [
+                    '--headless',
+                    '--convert-to', 'pdf',
+                    '--outdir', work_dir,
+                    temp_excel_path
+                ],
+                timeout=60
+            )
 
-        if result.returncode != 0:
-            raise RuntimeError(f"LibreOffice変換エラー: {result.stderr}")
+            if result.returncode != 0:
+                raise RuntimeError(f"LibreOffice変換エラー: {result.stderr}")
 
-        # 生成されたPDFファイルのパスを推測（LibreOfficeは元ファイル名.pdfで出力）
-        temp_pdf_path = os.path.join(output_dir, f"temp_{sheet_name}_{os.getpid()}.pdf")
+            # 生成されたPDFファイルのパスを推測（LibreOfficeは元ファイル名.pdfで出力）
+            temp_pdf_path = os.path.join(work_dir, f"temp_{sheet_name}.pdf")
 
-        if not os.path.exists(temp_pdf_path):
-            raise RuntimeError(f"PDFファイルが生成されませんでした: {temp_pdf_path}")
+            if not os.path.exists(temp_pdf_path):
+                raise RuntimeError(f"PDFファイルが生成されませんでした: {temp_pdf_path}")
 
-        # 出力パスにリネーム
-        shutil.move(temp_pdf_path, output_path)
+            # 出力パスにリネーム
+            shutil.move(temp_pdf_path, output_path)
 
-        return output_path
+            return output_path
 
-    except subprocess.TimeoutExpired:
-        raise RuntimeError("PDF変換がタイムアウトしました（60秒以内に完了しませんでした）")
-    except Exception as e:
-        raise RuntimeError(f"PDF変換エラー: {str(e)}") from e
-    finally:
-        # 一時ファイル削除
-        if os.path.exists(temp_excel_path):
-            os.remove(temp_excel_path)
+        except subprocess.TimeoutExpired:
+            raise RuntimeError("PDF変換がタイムアウトしました（60秒以内に完了しませんでした）")
+        except Exception as e:
+            raise RuntimeError(f"PDF変換エラー: {str(e)}") from e
 
 
 def get_pdf_engine() -> str:
@@ -378,33 +403,18 @@ def convert_wsl_to_windows_path(wsl_path: str) -> str:
 
     # WSL内部パスの場合
     distro = get_wsl_distro_name()
-    return f"\\\\wsl$\\{distro}{path_str.replace('/', '\\')}"
+    windows_path = path_str.replace('/', '\\')
+    return f"\\\\wsl$\\{distro}{windows_path}"
 
 
 def get_wsl_distro_name() -> str:
     """
-    WSLディストリビューション名を取得
+    WSLディストリビューション名を取得（environment_probeのキャッシュを使用）
 
     Returns:
         ディストリビューション名（取得失敗時は 'Ubuntu'）
     """
-    try:
-        result = subprocess.run(
-            ['wslpath', '-w', '/'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            # \\wsl$\Ubuntu\ のような形式から抽出
-            win_path = result.stdout.strip()
-            parts = win_path.split('\\')
-            for i, part in enumerate(parts):
-                if part == 'wsl$' and i + 1 < len(parts):
-                    return parts[i + 1]
-    except Exception:
-        pass
-    return 'Ubuntu'  # デフォルト
+    return environment_probe.wsl_distro_name()
 
 
 def generate_excel_export_script(excel_path: str, order_pdf_path: str, inspection_pdf_path: str) -> str:
@@ -473,23 +483,12 @@ try {{
 
 def check_excel_available() -> bool:
     """
-    Windows側でExcelが利用可能かチェック（WSL2環境用）
+    Windows側でExcelが利用可能かチェック（WSL2環境用、environment_probeのキャッシュを使用）
 
     Returns:
         利用可能ならTrue、不可ならFalse
     """
-    try:
-        # PowerShellでExcel COMオブジェクトが作成できるかチェック
-        result = subprocess.run(
-            ['powershell.exe', '-ExecutionPolicy', 'Bypass', '-Command',
-             '$excel = New-Object -ComObject Excel.Application; $excel.Quit(); Write-Output "OK"'],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        return result.returncode == 0 and 'OK' in result.stdout
-    except Exception:
-        return False
+    return environment_probe.excel_available()
 
 
 def convert_excel_sheets_to_pdf_excel(excel_path: str, output_dir: str) -> Dict[str, str]:
@@ -507,8 +506,7 @@ def convert_excel_sheets_to_pdf_excel(excel_path: str, output_dir: str) -> Dict[
         RuntimeError: 変換失敗時
     """
     # 出力ファイルパス
-    order_pdf_path = os.path.join(output_dir, f"order_{os.getpid()}.pdf")
-    inspection_pdf_path = os.path.join(output_dir, f"inspection_{os.getpid()}.pdf")
+    order_pdf_path, inspection_pdf_path = output_pdf_paths(output_dir)
 
     try:
         # WSLパス → Windowsパス変換
@@ -526,12 +524,13 @@ def convert_excel_sheets_to_pdf_excel(excel_path: str, output_dir: str) -> Dict[
         # PowerShell実行
         # 日本語Windowsの場合、出力はcp932でエンコードされるため、
         # text=Falseでバイト列として受け取り、手動でデコードする
-        result = subprocess.run(
-            ['powershell.exe', '-ExecutionPolicy', 'Bypass', '-Command', ps_script],
-            capture_output=True,
-            text=False,
-            timeout=120  # 2分タイムアウト
-        )
+        with timings.span("excel.export"):
+            result = subprocess.run(
+                ['powershell.exe', '-ExecutionPolicy', 'Bypass', '-Command', ps_script],
+                capture_output=True,
+                text=False,
+                timeout=120  # 2分タイムアウト
+            )
 
         if result.returncode != 0:
             # エラーメッセージをデコード（cp932 → UTF-8、失敗時は置換）
@@ -558,6 +557,169 @@ def convert_excel_sheets_to_pdf_excel(excel_path: str, output_dir: str) -> Dict[
         raise RuntimeError(f"Excel PDF出力エラー: {str(e)}") from e
 
 
+def split_sheet_pdf(full_pdf_path: str, order_pdf_path: str, inspection_pdf_path: str) -> Dict[str, str]:
+    """
+    全シートを変換したPDFを注文書（1ページ目）と検収書（2ページ目）に分割
+
+    Args:
+        full_pdf_path: LibreOfficeが出力した全シートのPDF
+        order_pdf_path: 注文書PDFの出力パス
+        inspection_pdf_path: 検収書PDFの出力パス
+
+    Returns:
+        生成されたPDFファイルのパス辞書
+
+    Raises:
+        RuntimeError: ページ数が不足している場合
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    with timings.span("split_pdf"):
+        reader = PdfReader(full_pdf_path)
+
+        if len(reader.pages) < 2:
+            raise RuntimeError(f"PDFのページ数が不足しています: {len(reader.pages)}ページ")
+
+        # 注文書（1ページ目）
+        order_writer = PdfWriter()
+        order_writer.add_page(reader.pages[0])
+        with open(order_pdf_path, 'wb') as f:
+            order_writer.write(f)
+
+        # 検収書（2ページ目）
+        inspection_writer = PdfWriter()
+        inspection_writer.add_page(reader.pages[1])
+        with open(inspection_pdf_path, 'wb') as f:
+            inspection_writer.write(f)
+
+    return {
+        "order_pdf_path": order_pdf_path,
+        "inspection_pdf_path": inspection_pdf_path
+    }
+
+
+def make_single_sheet_workbook(excel_path: str, sheet_index: int, output_path: str) -> str:
+    """
+    指定シート以外を非表示にしたワークブックのコピーを作成（LibreOfficeは非表示シートをPDFに出力しない）
+
+    シートの削除やopenpyxlでの保存はシート間参照・キャッシュ値が失われるため、
+    xl/workbook.xml のシート表示状態（state）と表示中のシート（activeTab）のみ書き換え、
+    他のパートはそのままコピーする。
+
+    Args:
+        excel_path: Excelファイルのパス
+        sheet_index: 出力するシートの位置（0始まり）
+        output_path: コピーの出力パス
+
+    Returns:
+        output_path
+    """
+    import re
+    import zipfile
+
+    def set_sheet_state(match):
+        set_sheet_state.index += 1
+        tag = re.sub(r'\sstate="[^"]*"', '', match.group(0))
+        if set_sheet_state.index != sheet_index:
+            tag = tag.replace('<sheet ', '<sheet state="hidden" ', 1)
+        return tag
+    set_sheet_state.index = -1
+
+    with zipfile.ZipFile(excel_path, 'r') as src, zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            content = src.read(info.filename)
+            if info.filename == 'xl/workbook.xml':
+                xml = content.decode('utf-8')
+                xml = re.sub(r'<sheet\s[^>]*/>', set_sheet_state, xml)
+                xml = re.sub(
+                    r'<workbookView\b[^>]*?(/?)>',
+                    lambda m: re.sub(r'\s(?:activeTab|firstSheet)="[^"]*"', '', m.group(0)).replace(
+                        '<workbookView', f'<workbookView activeTab="{sheet_index}"', 1),
+                    xml,
+                    count=1
+                )
+                content = xml.encode('utf-8')
+            dst.writestr(info, content)
+
+    return output_path
+
+
+def _convert_single_sheet(excel_path: str, sheet_index: int, work_dir: str, slot: int, parent_span_id: str) -> str:
+    """
+    1シートのみ表示したコピーを指定スロットのLibreOfficeでPDFに変換し、PDFのパスを返す
+
+    別スレッドで実行するため、計測する区間は parent_span_id（呼び出し元の区間）の子とする。
+    """
+    sheet_dir = os.path.join(work_dir, f"sheet{sheet_index}")
+    os.makedirs(sheet_dir)
+    with timings.child_of(parent_span_id):
+        with timings.span("make_single_sheet_workbook"):
+            sheet_excel_path = make_single_sheet_workbook(
+                excel_path, sheet_index, os.path.join(sheet_dir, f"sheet{sheet_index}.xlsx")
+            )
+
+        result = soffice_runner.run_soffice(
+            [
+                '--headless',
+                '--convert-to', 'pdf',
+                '--outdir', sheet_dir,
+                sheet_excel_path
+            ],
+            timeout=60,
+            slot=slot,
+            label=f"convert.sheet{sheet_index}"
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"LibreOffice変換エラー: {result.stderr}")
+
+    pdf_path = os.path.join(sheet_dir, f"sheet{sheet_index}.pdf")
+    if not os.path.exists(pdf_path):
+        raise RuntimeError(f"PDFファイルが生成されませんでした: {pdf_path}")
+    return pdf_path
+
+
+def convert_excel_sheets_to_pdf_libreoffice_parallel(excel_path: str, output_dir: str, slot: int) -> Dict[str, str]:
+    """
+    注文書・検収書シートを2つのLibreOfficeで並行してPDFに変換
+
+    シートごとに他方を非表示にしたコピーを作成し、スロット0（共通プロファイル）と
+    取得済みのスロット（別プロファイル）で同時に変換する。
+
+    Args:
+        excel_path: Excelファイルのパス
+        output_dir: 出力ディレクトリのパス
+        slot: 検収書の変換に使うスロット（acquire_slot で取得済みであること）
+
+    Returns:
+        生成されたPDFファイルのパス辞書
+
+    Raises:
+        RuntimeError: 変換失敗時
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    order_pdf_path, inspection_pdf_path = output_pdf_paths(output_dir)
+
+    with scratch.workspace('parallel') as work_dir:
+        try:
+            parent_span_id = timings.current_span_id()
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                order_future = executor.submit(_convert_single_sheet, excel_path, 0, work_dir, 0, parent_span_id)
+                inspection_future = executor.submit(_convert_single_sheet, excel_path, 1, work_dir, slot, parent_span_id)
+                shutil.move(order_future.result(), order_pdf_path)
+                shutil.move(inspection_future.result(), inspection_pdf_path)
+
+            return {
+                "order_pdf_path": order_pdf_path,
+                "inspection_pdf_path": inspection_pdf_path
+            }
+
+        except subprocess.TimeoutExpired:
+            raise RuntimeError("PDF変換がタイムアウトしました（60秒以内に完了しませんでした）")
+        except Exception as e:
+            raise RuntimeError(f"PDF変換エラー: {str(e)}") from e
+
+
 def convert_excel_sheets_to_pdf_libreoffice(excel_path: str, output_dir: str) -> Dict[str, str]:
     """
     LibreOfficeでExcel→PDF変換（既存処理）
@@ -572,13 +734,14 @@ def convert_excel_sheets_to_pdf_libreoffice(excel_path: str, output_dir: str) ->
     Raises:
         RuntimeError: 変換失敗時
 
+    sofficeのスロットが2つ使える場合（soffice_runner.slot_count() >= 2 かつスロット1のリスナーが
+    起動済みで、他のワーカーが使用中でない場合）は、注文書・検収書を並行して変換する。
+
     Note:
         openpyxlを経由するとExcel XMLのキャッシュ値が失われ、LibreOfficeがTEXT関数を
         正しく計算できない問題があった。そのため、元のExcelを直接LibreOfficeでPDF変換し、
         pypdfでページを分割する方式に変更した。
     """
-    from pypdf import PdfReader, PdfWriter
-
     # LibreOfficeチェック
     if not check_libreoffice():
         raise RuntimeError(
@@ -586,75 +749,146 @@ def convert_excel_sheets_to_pdf_libreoffice(excel_path: str, output_dir: str) ->
             "本番環境（AWS Lambda Docker Image）ではLibreOfficeを含むイメージを使用してください。"
         )
 
-    # 一時PDFパス
-    temp_full_pdf_path = os.path.join(output_dir, f"temp_full_{os.getpid()}.pdf")
+    # 2つ目のスロットのリスナーが起動済みで空いていれば並行変換
+    # （リスナーがない場合、検収書のためだけにLibreOfficeをもう1つ起動することになり遅くなる）
+    if soffice_runner.slot_count() >= 2 and soffice_runner.listener_ready(1):
+        slot_lock = soffice_runner.acquire_slot(1)
+        if slot_lock is not None:
+            try:
+                return convert_excel_sheets_to_pdf_libreoffice_parallel(excel_path, output_dir, 1)
+            finally:
+                soffice_runner.release_slot(slot_lock)
 
-    try:
-        # LibreOfficeで全シートをPDFに変換（openpyxlを経由しない）
-        # これによりexcel_editor.pyで設定したキャッシュ値が保持される
-        result = subprocess.run(
-            [
-                'soffice',
-                '--headless',
-                '--convert-to', 'pdf',
-                '--outdir', output_dir,
-                excel_path
-            ],
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
+    # 全シートのPDFは呼び出しごとの作業ディレクトリに出力（同じ名前のExcelを並行して変換しても衝突しない、scratch.py参照）
+    with scratch.workspace('render') as work_dir:
+        try:
+            # LibreOfficeで全シートをPDFに変換（openpyxlを経由しない）
+            # これによりexcel_editor.pyで設定したキャッシュ値が保持される
+            result = soffice_runner.run_soffice(
+                [
+                    '--headless',
+                    '--convert-to', 'pdf',
+                    '--outdir', work_dir,
+                    excel_path
+                ],
+                timeout=60,
+                label='convert'
+            )
+
+            if result.returncode != 0:
+                raise RuntimeError(f"LibreOffice変換エラー: {result.stderr}")
+
+            # LibreOfficeが生成するPDFのファイル名を推測
+            excel_filename = os.path.basename(excel_path)
+            generated_pdf_name = os.path.splitext(excel_filename)[0] + '.pdf'
+            generated_pdf_path = os.path.join(work_dir, generated_pdf_name)
+
+            if not os.path.exists(generated_pdf_path):
+                raise RuntimeError(f"PDFファイルが生成されませんでした: {generated_pdf_path}")
+
+            # PDFをページごとに分割（注文書=1ページ目、検収書=2ページ目）
+            return split_sheet_pdf(generated_pdf_path, *output_pdf_paths(output_dir))
+
+        except subprocess.TimeoutExpired:
+            raise RuntimeError("PDF変換がタイムアウトしました（60秒以内に完了しませんでした）")
+        except Exception as e:
+            raise RuntimeError(f"PDF変換エラー: {str(e)}") from e
+
+
+def optimize_pdf(pdf_path: str, linearize: bool = False) -> Dict[str, Any]:
+    """
+    PDFを最適化して上書き（内容・表示は変更しない）
 
-        if result.returncode != 0:
-            raise RuntimeError(f"LibreOffice変換エラー: {result.stderr}")
+    - ページのコンテンツストリームを最大圧縮率で再圧縮
+    - 同一内容のオブジェクト（フォント・画像等）を1つにまとめ、参照されないオブジェクトを削除
+    - linearize=True かつ qpdf がインストールされている場合は、Web表示用に線形化
 
-        # LibreOfficeが生成するPDFのファイル名を推測
-        excel_filename = os.path.basename(excel_path)
-        generated_pdf_name = os.path.splitext(excel_filename)[0] + '.pdf'
-        generated_pdf_path = os.path.join(output_dir, generated_pdf_name)
+    フォントのサブセット化はLibreOffice・ExcelのPDF出力時に行われるため、ここでは行わない。
+    最適化後の方が大きい場合（線形化しない場合のみ）は元のPDFを残す。
 
-        if not os.path.exists(generated_pdf_path):
-            raise RuntimeError(f"PDFファイルが生成されませんでした: {generated_pdf_path}")
+    Args:
+        pdf_path: PDFファイルのパス
+        linearize: qpdfで線形化する
 
-        # 一時ファイル名にリネーム
-        shutil.move(generated_pdf_path, temp_full_pdf_path)
+    Returns:
+        {"original_bytes": 120000, "optimized_bytes": 90000, "bytes_saved": 30000, "linearized": false}
+    """
+    from pypdf import PdfWriter
 
-        # PDFをページごとに分割（注文書=1ページ目、検収書=2ページ目）
-        reader = PdfReader(temp_full_pdf_path)
+    original_bytes = os.path.getsize(pdf_path)
+    optimized_path = f"{pdf_path}.optimized"
+    linearized_path = f"{pdf_path}.linearized"
 
-        if len(reader.pages) < 2:
-            raise RuntimeError(f"PDFのページ数が不足しています: {len(reader.pages)}ページ")
+    try:
+        writer = PdfWriter(clone_from=pdf_path)
+        for page in writer.pages:
+            page.compress_content_streams(level=9)
+        # 同一オブジェクトの統合・未参照オブジェクトの削除（いずれもデフォルトで有効）
+        writer.compress_identical_objects()
+        with open(optimized_path, 'wb') as f:
+            writer.write(f)
+
+        linearized = False
+        qpdf_path = shutil.which('qpdf') if linearize else None
+        if qpdf_path:
+            result = subprocess.run(
+                [qpdf_path, '--linearize', '--object-streams=generate', optimized_path, linearized_path],
+                capture_output=True,
+                text=True,
+                timeout=60
+            )
+            # qpdfは警告のみの場合 終了コード3
+            if result.returncode in (0, 3) and os.path.exists(linearized_path):
+                os.replace(linearized_path, optimized_path)
+                linearized = True
+
+        if linearized or os.path.getsize(optimized_path) < original_bytes:
+            os.replace(optimized_path, pdf_path)
+    finally:
+        for path in (optimized_path, linearized_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    optimized_bytes = os.path.getsize(pdf_path)
+    return {
+        "original_bytes": original_bytes,
+        "optimized_bytes": optimized_bytes,
+        "bytes_saved": original_bytes - optimized_bytes,
+        "linearized": linearized
+    }
 
-        # 注文書（1ページ目）
-        order_pdf_path = os.path.join(output_dir, f"order_{os.getpid()}.pdf")
-        order_writer = PdfWriter()
-        order_writer.add_page(reader.pages[0])
-        with open(order_pdf_path, 'wb') as f:
-            order_writer.write(f)
 
-        # 検収書（2ページ目）
-        inspection_pdf_path = os.path.join(output_dir, f"inspection_{os.getpid()}.pdf")
-        inspection_writer = PdfWriter()
-        inspection_writer.add_page(reader.pages[1])
-        with open(inspection_pdf_path, 'wb') as f:
-            inspection_writer.write(f)
+def optimize_output_pdfs(result: Dict[str, Any], linearize: bool = False) -> Dict[str, Any]:
+    """
+    convert_excel_sheets_to_pdf の結果の注文書・検収書PDFを最適化
 
-        return {
-            "order_pdf_path": order_pdf_path,
-            "inspection_pdf_path": inspection_pdf_path
-        }
+    Returns:
+        {"order": {...}, "inspection": {...}, "bytes_saved": 合計削減バイト数}
+    """
+    with timings.span("optimize_pdf"):
+        order = optimize_pdf(result["order_pdf_path"], linearize)
+        inspection = optimize_pdf(result["inspection_pdf_path"], linearize)
+    return {
+        "order": order,
+        "inspection": inspection,
+        "bytes_saved": order["bytes_saved"] + inspection["bytes_saved"]
+    }
 
-    except subprocess.TimeoutExpired:
-        raise RuntimeError("PDF変換がタイムアウトしました（60秒以内に完了しませんでした）")
+
+def try_optimize_output_pdfs(result: Dict[str, Any], linearize: bool = False) -> Dict[str, Any]:
+    """
+    optimize_output_pdfs を実行し、失敗した場合は {"error": ...} を返す
+
+    最適化の失敗では変換結果を失敗にしない（最適化前のPDFが残る）。
+    """
+    try:
+        return optimize_output_pdfs(result, linearize)
     except Exception as e:
-        raise RuntimeError(f"PDF変換エラー: {str(e)}") from e
-    finally:
-        # 一時ファイル削除
-        if os.path.exists(temp_full_pdf_path):
-            os.remove(temp_full_pdf_path)
+        print(f"[optimize_pdf] PDFの最適化に失敗しました（最適化前のPDFを使用）: {e}", file=sys.stderr)
+        return {"error": str(e)}
 
 
-def convert_excel_sheets_to_pdf(excel_path: str, output_dir: str) -> Dict[str, str]:
+def convert_excel_sheets_to_pdf(excel_path: str, output_dir: str, optimize: bool = False, linearize: bool = False) -> Dict[str, Any]:
     """
     Excelファイルの注文書シートと検収書シートをそれぞれPDFに変換
 
@@ -665,23 +899,363 @@ def convert_excel_sheets_to_pdf(excel_path: str, output_dir: str) -> Dict[str, s
     Args:
         excel_path: Excelファイルのパス
         output_dir: 出力ディレクトリのパス
+        optimize: 生成したPDFを最適化する（optimize_pdf 参照）
+        linearize: 最適化時にWeb表示用に線形化する
 
     Returns:
         生成されたPDFファイルのパス辞書
         {
             "order_pdf_path": "/tmp/order.pdf",
-            "inspection_pdf_path": "/tmp/inspection.pdf"
+            "inspection_pdf_path": "/tmp/inspection.pdf",
+            "cache": "hit" | "miss" | "disabled",
+            "optimization": {"order": {...}, "inspection": {...}, "bytes_saved": 30000}  # optimize時のみ
+                            # 最適化に失敗した場合は {"error": "..."}（最適化前のPDFを返す）
         }
 
     Raises:
         RuntimeError: 変換失敗時
+
+    セル値・書式が同じワークブックを変換済みの場合は、生成結果キャッシュ（render_cache）の
+    PDFをコピーして返す（LibreOffice・Excelを起動しない）。結果の "cache" は "hit" / "miss"
+    （キャッシュ無効時は "disabled"）。
     """
     engine = get_pdf_engine()
 
-    if engine == 'excel':
-        return convert_excel_sheets_to_pdf_excel(excel_path, output_dir)
+    cache_key = None
+    if render_cache.cache_enabled():
+        order_pdf_path, inspection_pdf_path = output_pdf_paths(output_dir)
+        with timings.span("render_cache.lookup"):
+            cache_key = render_cache.workbook_render_key(excel_path, engine)
+            hit = render_cache.restore(cache_key, order_pdf_path, inspection_pdf_path)
+        if hit:
+            result = {
+                "order_pdf_path": order_pdf_path,
+                "inspection_pdf_path": inspection_pdf_path,
+                "cache": "hit"
+            }
+            if optimize:
+                result["optimization"] = try_optimize_output_pdfs(result, linearize)
+            return result
+
+    with timings.span("render"):
+        if engine == 'excel':
+            result = convert_excel_sheets_to_pdf_excel(excel_path, output_dir)
+        else:
+            result = convert_excel_sheets_to_pdf_libreoffice(excel_path, output_dir)
+
+    if cache_key is None:
+        result["cache"] = "disabled"
     else:
-        return convert_excel_sheets_to_pdf_libreoffice(excel_path, output_dir)
+        with timings.span("render_cache.store"):
+            render_cache.store(cache_key, result["order_pdf_path"], result["inspection_pdf_path"])
+        result["cache"] = "miss"
+
+    # キャッシュには最適化前のPDFを保存する（最適化の有無は呼び出しごとに異なるため）
+    if optimize:
+        result["optimization"] = try_optimize_output_pdfs(result, linearize)
+    return result
+
+
+def _batch_output_stems(excel_paths: List[str]) -> List[str]:
+    """バッチ出力のファイル名（拡張子なし）。同名のExcelがある場合は連番を付ける"""
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in excel_paths]
+    return [
+        stem if stems.count(stem) == 1 else f"{stem}_{index + 1}"
+        for index, stem in enumerate(stems)
+    ]
+
+
+def _optimize_batch_results(results: List[Dict[str, Any]], linearize: bool) -> List[Dict[str, Any]]:
+    """バッチ変換で成功したファイルのPDFを最適化し、結果に "optimization" を追加"""
+    for result in results:
+        if "error" in result:
+            continue
+        result["optimization"] = try_optimize_output_pdfs(result, linearize)
+    return results
+
+
+def convert_excel_batch_to_pdf(excel_paths: List[str], output_dir: str, optimize: bool = False, linearize: bool = False) -> List[Dict[str, Any]]:
+    """
+    複数のExcelファイルを1回のLibreOffice起動でPDFに変換し、それぞれ注文書・検収書に分割
+
+    月末の一括処理や履歴の再出力で、LibreOfficeの起動時間をファイルごとではなく
+    バッチごとに1回にする。出力ファイル名は「<Excelファイル名>_注文書.pdf」「<Excelファイル名>_検収書.pdf」。
+    PDF_ENGINE=excel の場合はファイルごとにExcelで変換する。
+
+    Args:
+        excel_paths: Excelファイルのパスのリスト
+        output_dir: 出力ディレクトリのパス
+        optimize: 生成したPDFを最適化する（optimize_pdf 参照）
+        linearize: 最適化時にWeb表示用に線形化する
+
+    Returns:
+        Excelファイルごとの結果のリスト（入力と同じ順序）
+        成功: {"excel_path": ..., "order_pdf_path": ..., "inspection_pdf_path": ...}
+              optimize時は "optimization" を含む
+        失敗: {"excel_path": ..., "error": "..."}
+
+    Raises:
+        RuntimeError: LibreOffice未インストール、またはLibreOfficeの起動自体に失敗した場合
+    """
+    stems = _batch_output_stems(excel_paths)
+    results: List[Dict[str, str]] = []
+
+    if get_pdf_engine() == 'excel':
+        for excel_path, stem in zip(excel_paths, stems):
+            try:
+                converted = convert_excel_sheets_to_pdf_excel(excel_path, output_dir)
+                order_pdf_path = os.path.join(output_dir, f"{stem}_注文書.pdf")
+                inspection_pdf_path = os.path.join(output_dir, f"{stem}_検収書.pdf")
+                shutil.move(converted["order_pdf_path"], order_pdf_path)
+                shutil.move(converted["inspection_pdf_path"], inspection_pdf_path)
+                results.append({
+                    "excel_path": excel_path,
+                    "order_pdf_path": order_pdf_path,
+                    "inspection_pdf_path": inspection_pdf_path
+                })
+            except Exception as e:
+                results.append({"excel_path": excel_path, "error": str(e)})
+        return _optimize_batch_results(results, linearize) if optimize else results
+
+    if not check_libreoffice():
+        raise RuntimeError(
+            "LibreOfficeがインストールされていません。\n"
+            "本番環境（AWS Lambda Docker Image）ではLibreOfficeを含むイメージを使用してください。"
+        )
+
+    # 同名ファイルの出力が衝突しないよう、連番付きの名前で作業ディレクトリに配置してから変換する
+    with scratch.workspace('batch') as staging_dir:
+        staged_paths = []
+        for excel_path, stem in zip(excel_paths, stems):
+            staged_path = os.path.join(staging_dir, f"{stem}.xlsx")
+            try:
+                os.symlink(os.path.abspath(excel_path), staged_path)
+            except (OSError, NotImplementedError):
+                shutil.copyfile(excel_path, staged_path)
+            staged_paths.append(staged_path)
+
+        # 1回のsoffice起動で全ファイルを変換（ファイル数に応じてタイムアウトを延長）
+        timeout = 60 + 15 * (len(staged_paths) - 1)
+        try:
+            result = soffice_runner.run_soffice(
+                [
+                    '--headless',
+                    '--convert-to', 'pdf',
+                    '--outdir', staging_dir
+                ] + staged_paths,
+                timeout=timeout,
+                label='convert_batch'
+            )
+        except subprocess.TimeoutExpired:
+            raise RuntimeError(f"PDF変換がタイムアウトしました（{timeout}秒以内に完了しませんでした）")
+
+        for excel_path, stem in zip(excel_paths, stems):
+            full_pdf_path = os.path.join(staging_dir, f"{stem}.pdf")
+            if not os.path.exists(full_pdf_path):
+                detail = result.stderr.strip() if result.returncode != 0 else ""
+                results.append({
+                    "excel_path": excel_path,
+                    "error": f"PDFファイルが生成されませんでした: {os.path.basename(excel_path)} {detail}".strip()
+                })
+                continue
+            try:
+                converted = split_sheet_pdf(
+                    full_pdf_path,
+                    os.path.join(output_dir, f"{stem}_注文書.pdf"),
+                    os.path.join(output_dir, f"{stem}_検収書.pdf")
+                )
+                results.append({"excel_path": excel_path, **converted})
+            except Exception as e:
+                results.append({"excel_path": excel_path, "error": str(e)})
+
+        return _optimize_batch_results(results, linearize) if optimize else results
+
+
+def main_batch(args: list, optimize: bool = False, linearize: bool = False) -> None:
+    """
+    batchモードのメイン処理
+
+    使用法: python3 pdf_generator.py batch <output_dir> <excel_path> [<excel_path> ...]
+    """
+    if len(args) < 2:
+        print(json.dumps({
+            "error": "引数が不足しています",
+            "usage": "python3 pdf_generator.py batch <output_dir> <excel_path> [<excel_path> ...]"
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+    output_dir = args[0]
+    excel_paths = args[1:]
+
+    # PDF_PROCESSOR_METRICS_TEXTFILE / PDF_PROCESSOR_METRICS_PORT の場合はメトリクスを出力（metrics.py参照）
+    metrics.start_exporter()
+
+    try:
+        results = convert_excel_batch_to_pdf(excel_paths, output_dir, optimize, linearize)
+        success = all("error" not in result for result in results)
+        for result in results:
+            metrics.jobs.inc(command='batch', company='', status='error' if "error" in result else 'success')
+
+        print(json.dumps(timings.attach({
+            "success": success,
+            "results": results,
+            "engine": get_pdf_engine()
+        }), ensure_ascii=False))
+
+        # 1件でも失敗した場合は結果をJSONで出力した上で終了コード1
+        if not success:
+            sys.exit(1)
+
+    except Exception as e:
+        import traceback
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc(),
+            "engine": get_pdf_engine()
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+    finally:
+        metrics.write_textfile()
+
+
+def render_and_validate(excel_path: str, output_dir: str, company_name: str, validation_data: Dict[str, Any],
+                        optimize: bool = False, linearize: bool = False) -> Dict[str, Any]:
+    """
+    PDFを生成し、生成したPDFの表示値を検証する
+
+    LibreOfficeの起動はPDF生成の1回のみ。検証は顧客に届くPDFそのものから
+    pdfplumberで抽出した値（注文番号・金額・明細タイトル・摘要・合計等）に対して行う。
+    検証エラーの場合、生成したPDFは削除する。
+
+    Args:
+        excel_path: Excelファイルのパス
+        output_dir: 出力ディレクトリのパス
+        company_name: 取引先名
+        validation_data: 検証データ（invoice, estimate, items_count を含む辞書）
+        optimize: 生成したPDFを最適化する（検証は最適化後のPDFに対して行う）
+        linearize: 最適化時にWeb表示用に線形化する
+
+    Returns:
+        PDFのパスと検証結果
+        {
+            "success": true,
+            "order_pdf_path": "/tmp/order.pdf",
+            "inspection_pdf_path": "/tmp/inspection.pdf",
+            "engine": "libreoffice" | "excel",
+            "cache": "hit" | "miss" | "disabled",
+            "validation": {"success": true, "checks": [...], "errors": [], "calculation": "rendered"}
+        }
+    """
+    from excel_validator import validate_rendered_pdfs
+
+    engine = get_pdf_engine()
+    result = convert_excel_sheets_to_pdf(excel_path, output_dir, optimize, linearize)
+
+    validation = None
+    try:
+        with timings.span("validate_rendered"):
+            validation = validate_rendered_pdfs(
+                result["order_pdf_path"], result["inspection_pdf_path"], company_name, validation_data
+            )
+    finally:
+        # 検証エラー・例外時は生成したPDFを残さない
+        if validation is None or not validation["success"]:
+            for path in (result["order_pdf_path"], result["inspection_pdf_path"]):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    response = {
+        "success": validation["success"],
+        "order_pdf_path": result["order_pdf_path"],
+        "inspection_pdf_path": result["inspection_pdf_path"],
+        "engine": engine,
+        "cache": result["cache"],
+        "validation": validation
+    }
+    if "optimization" in result:
+        response["optimization"] = result["optimization"]
+    return response
+
+
+def _render_and_validate_streamed(excel_source: str, output_dir: str, company_name: str,
+                                  validation_data: Dict[str, Any], optimize: bool, linearize: bool) -> Dict[str, Any]:
+    """
+    入力（stdin:<名前> / fd:<番号>）・出力（stdout:）をストリームで受け渡して render_and_validate を実行
+
+    sofficeはファイルの入出力しかできないため、処理ごとの作業ディレクトリを作成して
+    入力Excelを書き込み・PDFを出力し、出力が stdout: の場合は生成したPDFをバンドルで
+    標準出力に書き込む。作業ディレクトリは返す前に削除する。
+    """
+    with scratch.workspace('render') as work_dir:
+        excel_path = stream_input.resolve(excel_source)
+        if not isinstance(excel_path, str):
+            data = excel_path
+            excel_path = os.path.join(work_dir, 'input.xlsx')
+            with open(excel_path, 'wb') as f:
+                f.write(data)
+
+        to_stdout = stream_output.is_stdout(output_dir)
+        result = render_and_validate(
+            excel_path, work_dir if to_stdout else output_dir, company_name, validation_data, optimize, linearize
+        )
+        if not to_stdout:
+            print(json.dumps(timings.attach(result), ensure_ascii=False))
+            return result
+
+        # 検証エラー時はPDFが削除済みのため、結果のJSONのみ返す
+        artifacts = []
+        if result["success"]:
+            artifacts = [
+                stream_output.read_artifact("order", result["order_pdf_path"]),
+                stream_output.read_artifact("inspection", result["inspection_pdf_path"]),
+            ]
+        result["order_pdf_path"] = None
+        result["inspection_pdf_path"] = None
+        stream_output.write_bundle(timings.attach(result), artifacts)
+        return result
+
+
+def main_render_and_validate(args: list, optimize: bool = False, linearize: bool = False) -> None:
+    """
+    render_and_validateモードのメイン処理
+
+    使用法: python3 pdf_generator.py render_and_validate <excel_path> <output_dir> <company_name> <validation_data_json>
+    excel_path に stdin:<名前> / fd:<番号>、output_dir に stdout: を指定できる。
+    """
+    if len(args) != 4:
+        print(json.dumps({
+            "error": "引数が不足しています",
+            "usage": "python3 pdf_generator.py render_and_validate <excel_path> <output_dir> <company_name> <validation_data_json>"
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+    excel_path, output_dir, company_name, validation_data_json = args
+
+    try:
+        validation_data = stream_input.load_json(validation_data_json)
+        if stream_input.is_stream(excel_path) or stream_output.is_stdout(output_dir):
+            result = _render_and_validate_streamed(
+                excel_path, output_dir, company_name, validation_data, optimize, linearize
+            )
+        else:
+            result = render_and_validate(excel_path, output_dir, company_name, validation_data, optimize, linearize)
+            print(json.dumps(timings.attach(result), ensure_ascii=False))
+
+        # 検証エラー時は結果をJSONで出力した上で終了コード1（excel_validatorと同じ）
+        if not result["success"]:
+            sys.exit(1)
+
+    except Exception as e:
+        import traceback
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc(),
+            "engine": get_pdf_engine()
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
 
 
 def main():
@@ -689,31 +1263,49 @@ def main():
     メイン関数
 
     コマンドライン引数からExcelパスを受け取り、PDF変換結果のパスを標準出力に返す。
+    第1引数が render_and_validate の場合は、PDF生成と生成PDFの検証を1回で行う。
+    第1引数が batch の場合は、複数のExcelファイルを1回のLibreOffice起動で変換する。
+    いずれのモードも --optimize（PDFの最適化）・--linearize（最適化＋線形化）を指定できる。
     """
-    if len(sys.argv) != 3:
+    linearize = '--linearize' in sys.argv
+    optimize = linearize or '--optimize' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg not in OPTIMIZE_OPTIONS]
+
+    if len(args) >= 1 and args[0] == 'render_and_validate':
+        main_render_and_validate(args[1:], optimize, linearize)
+        return
+    if len(args) >= 1 and args[0] == 'batch':
+        main_batch(args[1:], optimize, linearize)
+        return
+
+    if len(args) != 2:
         print(json.dumps({
             "error": "引数が不足しています",
             "usage": "python3 pdf_generator.py <excel_path> <output_dir>"
         }, ensure_ascii=False), file=sys.stderr)
         sys.exit(1)
 
-    excel_path = sys.argv[1]
-    output_dir = sys.argv[2]
+    excel_path = args[0]
+    output_dir = args[1]
 
     try:
         # 使用エンジンを取得
         engine = get_pdf_engine()
 
         # PDF生成（注文書・検収書シートをそれぞれPDFに変換）
-        result = convert_excel_sheets_to_pdf(excel_path, output_dir)
+        result = convert_excel_sheets_to_pdf(excel_path, output_dir, optimize, linearize)
 
         # 成功時は出力パスをJSON形式で返す
-        print(json.dumps({
+        response = {
             "success": True,
             "order_pdf_path": result["order_pdf_path"],
             "inspection_pdf_path": result["inspection_pdf_path"],
-            "engine": engine
-        }, ensure_ascii=False))
+            "engine": engine,
+            "cache": result["cache"]
+        }
+        if "optimization" in result:
+            response["optimization"] = result["optimization"]
+        print(json.dumps(timings.attach(response), ensure_ascii=False))
 
     except Exception as e:
         # エラー時はエラー情報をJSON形式で返す
@@ -10,7 +10,7 @@ PDF解析スクリプト（pdfplumber使用）
 引数:
     company_name: 取引先名（ネクストビッツ or オフ・ビート・ワークス）
     pdf_type: PDF種別（estimate/invoice/order_confirmation/delivery）
-    pdf_path: PDFファイルのパス
+    pdf_path: PDFファイルのパス、または stdin:<名前> / fd:<番号>（一時ファイルを使わずに渡す場合、stream_input.py参照）
 
 出力:
     JSON形式の抽出データ（標準出力）
@@ -32,7 +32,10 @@ import sys
 import json
 import pdfplumber
 import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union, BinaryIO
+
+import stream_input
+import timings
 
 
 def normalize_fullwidth_digits(text: str) -> str:
@@ -48,7 +51,7 @@ def normalize_fullwidth_digits(text: str) -> str:
     return text
 
 
-def extract_nextbits_estimate(pdf_path: str) -> Dict[str, Any]:
+def extract_nextbits_estimate(pdf_path: Union[str, BinaryIO]) -> Dict[str, Any]:
     """
     ネクストビッツ様の見積書からデータ抽出
 
@@ -95,7 +98,7 @@ def extract_nextbits_estimate(pdf_path: str) -> Dict[str, Any]:
         }
 
 
-def extract_nextbits_invoice(pdf_path: str) -> Dict[str, Any]:
+def extract_nextbits_invoice(pdf_path: Union[str, BinaryIO]) -> Dict[str, Any]:
     """
     ネクストビッツ様の請求書からデータ抽出（チェック用）
 
@@ -132,7 +135,7 @@ def extract_nextbits_invoice(pdf_path: str) -> Dict[str, Any]:
         }
 
 
-def extract_offbeat_estimate(pdf_path: str) -> Dict[str, Any]:
+def extract_offbeat_estimate(pdf_path: Union[str, BinaryIO]) -> Dict[str, Any]:
     """
     オフ・ビート・ワークス様の見積書からデータ抽出
 
@@ -158,7 +161,7 @@ def extract_offbeat_estimate(pdf_path: str) -> Dict[str, Any]:
         }
 
 
-def extract_offbeat_invoice(pdf_path: str) -> Dict[str, Any]:
+def extract_offbeat_invoice(pdf_path: Union[str, BinaryIO]) -> Dict[str, Any]:
     """
     オフ・ビート・ワークス様の請求書からデータ抽出
 
@@ -254,7 +257,7 @@ def extract_offbeat_invoice(pdf_path: str) -> Dict[str, Any]:
         }
 
 
-def extract_offbeat_order_confirmation(pdf_path: str) -> Dict[str, Any]:
+def extract_offbeat_order_confirmation(pdf_path: Union[str, BinaryIO]) -> Dict[str, Any]:
     """
     オフ・ビート・ワークス様の注文請書からデータ抽出
 
@@ -291,19 +294,21 @@ def extract_offbeat_order_confirmation(pdf_path: str) -> Dict[str, Any]:
         }
 
 
-def parse_pdf(company_name: str, pdf_type: str, pdf_path: str) -> Dict[str, Any]:
+def parse_pdf(company_name: str, pdf_type: str, pdf_path: Union[str, bytes]) -> Dict[str, Any]:
     """
     PDFファイルを解析してデータを抽出
 
     Args:
         company_name: 取引先名（ネクストビッツ or オフ・ビート・ワークス）
         pdf_type: PDF種別（estimate/invoice/order_confirmation/delivery）
-        pdf_path: PDFファイルのパス
+        pdf_path: PDFファイルのパス、またはPDFのバイト列（メモリ上で解析）
 
     Returns:
         抽出データのJSON（辞書型）
     """
     try:
+        pdf_path = stream_input.as_file(pdf_path)
+
         # ネクストビッツ様
         if company_name == "ネクストビッツ":
             if pdf_type == "estimate":
@@ -351,12 +356,26 @@ def main():
 
     company_name = sys.argv[1]
     pdf_type = sys.argv[2]
-    pdf_path = sys.argv[3]
-
-    result = parse_pdf(company_name, pdf_type, pdf_path)
+    pdf_source = sys.argv[3]
+
+    # PDF_PROCESSOR_PRELAUNCH_SOFFICE=1 の場合、PDF解析と並行してLibreOfficeを起動しておく
+    # （後続のPDF生成・Excel検証が起動済みのLibreOfficeを使う）
+    import soffice_runner
+    if soffice_runner.prelaunch_enabled():
+        with timings.span("prelaunch_soffice"):
+            soffice_runner.prelaunch_if_enabled()
+
+    with timings.span("parse_pdf"):
+        try:
+            # stdin:<名前> / fd:<番号> の場合はバイト列を受け取り、メモリ上で解析
+            pdf = stream_input.resolve(pdf_source)
+        except (OSError, ValueError) as e:
+            result = {"error": str(e), "error_type": type(e).__name__}
+        else:
+            result = parse_pdf(company_name, pdf_type, pdf)
 
     # JSON形式で出力
-    print(json.dumps(result, ensure_ascii=False, indent=2))
+    print(json.dumps(timings.attach(result), ensure_ascii=False, indent=2))
 
     # エラーがあれば終了コード1
     if "error" in result:
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+1ジョブ分の処理を1プロセスで実行するスクリプト
+
+processService.executeProcess がサブプロセスを段階ごとに起動して行う処理
+（PDF解析 → Excel編集 → PDF生成＋表示値検証）を、同じ順序・同じデータの受け渡しで
+1回の呼び出しで実行します。Pythonの起動・モジュール読み込みはジョブごとに1回で済みます。
+serveモードの "pipeline" コマンドでも同じ処理を実行します（main.py参照）。
+
+金額チェック（見積書と請求書の金額の照合）はNode側の処理のため、ここでは行いません。
+
+使用法:
+    python3 pipeline.py <job_json>
+
+引数:
+    job_json: ジョブの指定（JSON文字列）（@<パス> / - / stdin:<名前> も指定可、stream_input.load_json 参照）
+        {
+            "company_name": "ネクストビッツ",
+            "template": "/path/to/template.xlsx",
+            "output_dir": "/path/to/output",
+            "documents": {"estimate": "/path/to/estimate.pdf", "invoice": "...", "order_confirmation": "..."},
+            "estimate_filename": "TRR-25-008_お見積書.pdf",   # 省略時は見積書PDFのファイル名（stdin:<名前> の場合は名前）
+            "render": true,      # false の場合はPDFを生成せず excel_validator で検証（デフォルト: true）
+            "optimize": false    # 生成したPDFを最適化（pdf_generator の --optimize と同じ）
+        }
+        order_confirmation はオフ・ビート・ワークスの場合のみ解析する。
+        template・documents にはパスの代わりに stdin:<名前> / fd:<番号> を指定でき、
+        一時ファイルを使わずにメモリ上で処理する（stream_input.py参照）。
+            python3 pipeline.py '{..., "template": "stdin:template", "documents": {"estimate": "stdin:estimate", ...}}' < frames.bin
+        output_dir に stdout: を指定すると、処理ごとの作業ディレクトリに出力し、編集済みExcel・生成したPDFを
+        結果のJSONとともにバンドルで標準出力に返す（stream_output.py参照、作業ディレクトリは返す前に削除する）。
+        バンドルの名前は excel / order / inspection（検証エラー時は excel のみ）。
+
+出力:
+    {
+        "success": true,
+        "estimate": {...}, "invoice": {...}, "order_confirmation": {...},   # pdf_parser の出力
+        "excel": {...},                                                    # excel_editor の出力
+        "output_excel_path": "/path/to/output/output.xlsx",
+        "render": {...}          # render_and_validate の出力（render: false の場合は "validation": excel_validatorの出力）
+    }
+    各段階の処理時間は "timings" の pdf_parser.estimate / pdf_parser.invoice / pdf_parser.order_confirmation /
+    excel_editor / render_and_validate（render: false の場合は excel_validator）に含まれる。
+    検証エラーの場合は結果をJSONで出力した上で終了コード1（render_and_validate と同じ）。
+"""
+
+import os
+import sys
+import json
+from typing import Dict, Any, Optional, Union
+
+import scratch
+import stream_input
+import stream_output
+import timings
+
+# 処理段階の名前（timings の区間名、load_test.py の段階名と共通）
+PARSE_STAGE = 'pdf_parser.{pdf_type}'
+EDIT_STAGE = 'excel_editor'
+RENDER_STAGE = 'render_and_validate'
+VALIDATE_STAGE = 'excel_validator'
+
+
+def run_job(company_name: str, template_path: Union[str, bytes], output_dir: str, documents: Dict[str, Union[str, bytes]],
+            estimate_filename: Optional[str] = None, render: bool = True, optimize: bool = False) -> Dict[str, Any]:
+    """
+    1ジョブ分の処理（PDF解析 → Excel編集 → PDF生成＋表示値検証）を実行
+
+    Args:
+        company_name: 取引先名
+        template_path: テンプレートExcelファイルのパス、またはバイト列
+        output_dir: 出力ディレクトリ（編集済みExcel・生成したPDF）
+        documents: PDF種別 → PDFのパス、またはバイト列（estimate, invoice, order_confirmation）
+        estimate_filename: 見積書のファイル名（ネクストビッツの発行日取得用、省略時は見積書PDFのファイル名、
+                           見積書がバイト列の場合は指定する）
+        render: PDFを生成して表示値を検証するか（False の場合は excel_validator で検証）
+        optimize: 生成したPDFを最適化するか
+
+    Returns:
+        各段階の結果（モジュールdocstringの出力形式を参照）
+
+    Raises:
+        ValueError: PDF解析・Excel編集でエラーが返された場合
+    """
+    import pdf_parser
+    import excel_editor
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    pdf_types = ['estimate', 'invoice']
+    if company_name == 'オフ・ビート・ワークス':
+        pdf_types.append('order_confirmation')
+
+    parsed: Dict[str, Any] = {'order_confirmation': {}}
+    for pdf_type in pdf_types:
+        with timings.span(PARSE_STAGE.format(pdf_type=pdf_type)):
+            parsed[pdf_type] = pdf_parser.parse_pdf(company_name, pdf_type, documents[pdf_type])
+        if 'error' in parsed[pdf_type]:
+            raise ValueError(f"PDF解析エラー（{pdf_type}）: {parsed[pdf_type]['error']}")
+
+    combined_data = {
+        'estimate': parsed['estimate'],
+        'invoice': parsed['invoice'],
+        'order_confirmation': parsed['order_confirmation'],
+        'estimate_filename': estimate_filename or (
+            os.path.basename(documents['estimate']) if isinstance(documents['estimate'], str) else ''
+        ),
+    }
+    output_excel_path = os.path.join(output_dir, 'output.xlsx')
+    with timings.span(EDIT_STAGE):
+        excel_result = excel_editor.edit_excel(company_name, template_path, output_excel_path, combined_data)
+    if 'error' in excel_result:
+        raise ValueError(f"Excel編集エラー: {excel_result['error']}")
+
+    validation_data = {
+        'invoice': parsed['invoice'],
+        'estimate': parsed['estimate'],
+        'items_count': len(parsed['invoice'].get('items') or []) or 1,
+    }
+    result = {'success': False, **parsed, 'excel': excel_result, 'output_excel_path': output_excel_path}
+
+    if render:
+        import pdf_generator
+        with timings.span(RENDER_STAGE):
+            result['render'] = pdf_generator.render_and_validate(
+                output_excel_path, output_dir, company_name, validation_data, optimize
+            )
+        result['success'] = result['render']['success']
+    else:
+        import excel_validator
+        with timings.span(VALIDATE_STAGE):
+            result['validation'] = excel_validator.validate_excel(output_excel_path, company_name, validation_data)
+        # checksのpassedフィールドをboolに強制変換（excel_validator.mainと同じ、Matchオブジェクト対策）
+        for check in result['validation'].get('checks', []):
+            if 'passed' in check:
+                check['passed'] = bool(check['passed'])
+        result['success'] = result['validation']['success']
+
+    return result
+
+
+def run_job_spec(job: Dict[str, Any]) -> Dict[str, Any]:
+    """ジョブの指定（モジュールdocstringの job_json の形式）から run_job を実行"""
+    documents = {pdf_type: stream_input.resolve(source) for pdf_type, source in job['documents'].items()}
+    # 各段階の中間ファイル（Excel編集・検証・PDF変換）を1つの作業ディレクトリにまとめる
+    with scratch.workspace('job'):
+        return run_job(
+            job['company_name'], stream_input.resolve(job['template']), job['output_dir'], documents,
+            job.get('estimate_filename') or stream_input.source_name(job['documents']['estimate']),
+            job.get('render', True), job.get('optimize', False)
+        )
+
+
+def run_job_spec_to_stdout(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    出力ディレクトリが stdout: のジョブを処理ごとの作業ディレクトリで実行し、
+    編集済みExcel・生成したPDFを結果のJSONとともにバンドルで標準出力に書き込む
+    """
+    with scratch.workspace('pipeline') as work_dir:
+        result = run_job_spec({**job, 'output_dir': work_dir})
+
+        artifacts = [stream_output.read_artifact('excel', result['output_excel_path'])]
+        result['output_excel_path'] = None
+        result['excel']['output_path'] = None
+        render_result = result.get('render')
+        if render_result is not None:
+            # 検証エラー時はPDFが削除済み
+            if render_result['success']:
+                artifacts.append(stream_output.read_artifact('order', render_result['order_pdf_path']))
+                artifacts.append(stream_output.read_artifact('inspection', render_result['inspection_pdf_path']))
+            render_result['order_pdf_path'] = None
+            render_result['inspection_pdf_path'] = None
+
+        stream_output.write_bundle(timings.attach(result), artifacts)
+        return result
+
+
+def main():
+    """
+    メイン関数
+
+    コマンドライン引数からジョブの指定を受け取り、各段階の結果をJSON形式で標準出力に返す。
+    """
+    if len(sys.argv) != 2:
+        print(json.dumps({
+            "error": "引数が不足しています",
+            "usage": "python3 pipeline.py <job_json>"
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        job = stream_input.load_json(sys.argv[1])
+        if stream_output.is_stdout(job['output_dir']):
+            result = run_job_spec_to_stdout(job)
+        else:
+            result = run_job_spec(job)
+            print(json.dumps(timings.attach(result), ensure_ascii=False))
+
+        # 検証エラー時は結果をJSONで出力した上で終了コード1（render_and_validateと同じ）
+        if not result["success"]:
+            sys.exit(1)
+
+    except Exception as e:
+        import traceback
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc()
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
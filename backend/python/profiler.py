@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+プロファイリングモジュール（環境変数で有効化）
+
+環境変数 PDF_PROCESSOR_PROFILE=<ディレクトリ> を設定すると、main.py が実行するサブコマンド全体を
+プロファイラで計測し、結果をディレクトリに保存します。コードやNode側の呼び出しを変更せずに、
+本番環境（PyInstallerでexe化したもの）のジョブをプロファイルできます。
+
+環境変数:
+    PDF_PROCESSOR_PROFILE: 出力ディレクトリ（未設定時はプロファイルしない）
+    PDF_PROCESSOR_PROFILE_MODE: 計測方式（デフォルト: cprofile）
+        - cprofile: cProfileで全関数呼び出しを計測し、pstatsファイルを出力
+        - sample: 一定間隔でスタックを採取し、collapsed stack形式（flamegraph.pl・speedscope用）で出力
+        - both: 両方
+    PDF_PROCESSOR_PROFILE_INTERVAL_MS: sampleモードの採取間隔（ミリ秒、デフォルト: 5）
+    PDF_PROCESSOR_JOB_ID: ファイル名に含めるジョブID（未設定時は日時）
+
+出力ファイル名:
+    <サブコマンド>_<ジョブID>_<プロセスID>.pstats      （python3 -m pstats で表示）
+    <サブコマンド>_<ジョブID>_<プロセスID>.collapsed   （"関数;関数;関数 採取回数" 形式）
+"""
+
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+PROFILE_ENV = 'PDF_PROCESSOR_PROFILE'
+DEFAULT_INTERVAL_MS = 5
+
+
+def profile_dir() -> Optional[str]:
+    """出力ディレクトリ（プロファイル無効時はNone）"""
+    return os.getenv(PROFILE_ENV) or None
+
+
+def profile_mode() -> str:
+    mode = os.getenv('PDF_PROCESSOR_PROFILE_MODE', 'cprofile').lower()
+    return mode if mode in ('cprofile', 'sample', 'both') else 'cprofile'
+
+
+def sample_interval() -> float:
+    """sampleモードの採取間隔（秒）"""
+    try:
+        interval_ms = float(os.getenv('PDF_PROCESSOR_PROFILE_INTERVAL_MS', DEFAULT_INTERVAL_MS))
+    except ValueError:
+        interval_ms = DEFAULT_INTERVAL_MS
+    return max(interval_ms, 0.1) / 1000
+
+
+def output_basename(command: str) -> str:
+    """出力ファイル名（拡張子なし）"""
+    job_id = os.getenv('PDF_PROCESSOR_JOB_ID') or datetime.now().strftime('%Y%m%d%H%M%S')
+    name = f"{command}_{job_id}_{os.getpid()}"
+    # ファイル名に使えない文字を置換
+    return re.sub(r'[^\w.-]', '_', name)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    指定スレッドのスタックを一定間隔で採取し、collapsed stack形式で集計する
+
+    採取は別スレッドで sys._current_frames() を読むだけのため、cProfileより計測の影響が小さい。
+    """
+
+    def __init__(self, interval: float, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.counts: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            key = ';'.join(reversed(stack))
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def write(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile_if_enabled(command: str):
+    """
+    PDF_PROCESSOR_PROFILE が設定されていれば、with内の処理をプロファイルして結果を保存
+
+    サブコマンドが sys.exit で終了した場合も保存する。保存の失敗は処理に影響させない。
+    """
+    output_dir = profile_dir()
+    if output_dir is None:
+        yield
+        return
+
+    mode = profile_mode()
+    profiler = None
+    sampler = None
+    if mode in ('cprofile', 'both'):
+        import cProfile
+        profiler = cProfile.Profile()
+    if mode in ('sample', 'both'):
+        sampler = StackSampler(sample_interval())
+
+    if sampler is not None:
+        sampler.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if sampler is not None:
+            sampler.stop()
+
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            basename = os.path.join(output_dir, output_basename(command))
+            if profiler is not None:
+                profiler.dump_stats(f"{basename}.pstats")
+            if sampler is not None:
+                sampler.write(f"{basename}.collapsed")
+        except OSError as e:
+            print(f"[profiler] プロファイル結果の保存に失敗しました: {e}", file=sys.stderr)
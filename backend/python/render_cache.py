@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+PDF生成結果キャッシュモジュール
+
+セル値・書式が同じワークブックの再生成（再ダウンロード、DB保存エラー後の再試行など）で
+LibreOfficeの変換を繰り返さないよう、生成した注文書・検収書PDFを
+ワークブックの正規化ハッシュをキーとしてディスクに保存します。
+
+正規化ハッシュ:
+    xlsx内の全パート（シートXML・共有文字列・スタイル・図形・画像等）のうち、
+    表示に影響しないもの（docProps/* のタイムスタンプ等、キャッシュ値マニフェスト）を除いて計算します。
+    出力エンジンとLibreOfficeのバージョンもキーに含めます。
+
+キャッシュ:
+    <キャッシュディレクトリ>/renders/<hash>/order.pdf, inspection.pdf
+    容量の上限を超えると、最後に使われた日時が古いものから削除します（LRU）。
+
+環境変数:
+    PDF_PROCESSOR_RENDER_CACHE: 0 でキャッシュを無効化（デフォルト: 有効）
+    PDF_PROCESSOR_RENDER_CACHE_MAX_MB: キャッシュ容量の上限（MB、デフォルト: 256）
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import zipfile
+from typing import Dict, Any
+
+import environment_probe
+import metrics
+from excel_formula import MANIFEST_PART
+
+# キー形式バージョン（正規化方法の変更時にインクリメント）
+RENDER_CACHE_VERSION = 1
+
+DEFAULT_MAX_MB = 256
+
+# 表示に影響しないため正規化ハッシュから除外するパート
+EXCLUDED_PART_PREFIXES = ('docProps/',)
+EXCLUDED_PARTS = (MANIFEST_PART,)
+
+ORDER_FILENAME = 'order.pdf'
+INSPECTION_FILENAME = 'inspection.pdf'
+
+
+def cache_enabled() -> bool:
+    """環境変数 PDF_PROCESSOR_RENDER_CACHE でキャッシュが有効か（デフォルト: 有効）"""
+    return os.getenv('PDF_PROCESSOR_RENDER_CACHE', '1').lower() not in ('0', 'false', 'no')
+
+
+def max_cache_bytes() -> int:
+    """キャッシュ容量の上限（バイト）"""
+    try:
+        return int(float(os.getenv('PDF_PROCESSOR_RENDER_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+    except ValueError:
+        return DEFAULT_MAX_MB * 1024 * 1024
+
+
+def get_render_cache_dir() -> str:
+    cache_dir = os.path.join(environment_probe.get_cache_dir(), 'renders')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def _is_excluded(name: str) -> bool:
+    return name.startswith(EXCLUDED_PART_PREFIXES) or name in EXCLUDED_PARTS
+
+
+def workbook_render_key(excel_path: str, engine: str) -> str:
+    """
+    ワークブックの正規化ハッシュ（PDF生成結果のキャッシュキー）
+
+    Args:
+        excel_path: Excelファイルのパス
+        engine: PDF出力エンジン（libreoffice / excel）
+
+    Returns:
+        SHA-256ハッシュ（16進文字列）
+    """
+    digest = hashlib.sha256()
+    digest.update(f"v{RENDER_CACHE_VERSION}\0{engine}\0".encode('utf-8'))
+    if engine == 'libreoffice':
+        digest.update((environment_probe.probe_environment().get("soffice_version") or '').encode('utf-8'))
+
+    with zipfile.ZipFile(excel_path, 'r') as zf:
+        for name in sorted(zf.namelist()):
+            if _is_excluded(name):
+                continue
+            content = zf.read(name)
+            if name == '[Content_Types].xml':
+                # 除外したパートのContentType登録も除外
+                content = re.sub(
+                    rb'<Override PartName="/(?:docProps/[^"]*|' + re.escape(EXCLUDED_PARTS[0].encode()) + rb')"[^>]*/>',
+                    b'', content
+                )
+            digest.update(b'\0' + name.encode('utf-8') + b'\0')
+            digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+
+def restore(key: str, order_pdf_path: str, inspection_pdf_path: str) -> bool:
+    """
+    キャッシュ済みのPDFを指定パスにコピー
+
+    Returns:
+        キャッシュにあればTrue（最終使用日時を更新する）
+    """
+    entry_dir = os.path.join(get_render_cache_dir(), key)
+    cached_order = os.path.join(entry_dir, ORDER_FILENAME)
+    cached_inspection = os.path.join(entry_dir, INSPECTION_FILENAME)
+    if not (os.path.exists(cached_order) and os.path.exists(cached_inspection)):
+        metrics.record_cache('render', False)
+        return False
+    try:
+        shutil.copyfile(cached_order, order_pdf_path)
+        shutil.copyfile(cached_inspection, inspection_pdf_path)
+        # LRU用に最終使用日時を更新
+        os.utime(entry_dir)
+    except OSError:
+        metrics.record_cache('render', False)
+        return False
+    metrics.record_cache('render', True)
+    return True
+
+
+def store(key: str, order_pdf_path: str, inspection_pdf_path: str) -> None:
+    """
+    生成したPDFをキャッシュに保存し、容量の上限を超えた分を古い順に削除
+
+    保存に失敗しても処理には影響させない。
+    """
+    cache_dir = get_render_cache_dir()
+    entry_dir = os.path.join(cache_dir, key)
+    tmp_dir = None
+    try:
+        # 書き込み途中のエントリを読まれないよう一時ディレクトリ経由で配置
+        tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix='.tmp_')
+        shutil.copyfile(order_pdf_path, os.path.join(tmp_dir, ORDER_FILENAME))
+        shutil.copyfile(inspection_pdf_path, os.path.join(tmp_dir, INSPECTION_FILENAME))
+        if os.path.exists(entry_dir):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        else:
+            os.rename(tmp_dir, entry_dir)
+        tmp_dir = None
+        evict(max_cache_bytes())
+    except OSError:
+        pass
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _entry_size(entry_dir: str) -> int:
+    size = 0
+    for name in (ORDER_FILENAME, INSPECTION_FILENAME):
+        try:
+            size += os.path.getsize(os.path.join(entry_dir, name))
+        except OSError:
+            pass
+    return size
+
+
+def evict(max_bytes: int) -> int:
+    """
+    キャッシュ容量が max_bytes 以下になるまで、最終使用日時が古いエントリから削除
+
+    Returns:
+        削除したエントリ数
+    """
+    cache_dir = get_render_cache_dir()
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.startswith('.'):
+            continue
+        entry_dir = os.path.join(cache_dir, name)
+        try:
+            entries.append((os.stat(entry_dir).st_mtime, entry_dir, _entry_size(entry_dir)))
+        except OSError:
+            continue
+
+    total = sum(size for _, _, size in entries)
+    removed = 0
+    for _, entry_dir, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+def stats() -> Dict[str, Any]:
+    """キャッシュの状態（エントリ数・合計サイズ）"""
+    cache_dir = get_render_cache_dir()
+    entries = [name for name in os.listdir(cache_dir) if not name.startswith('.')]
+    return {
+        "enabled": cache_enabled(),
+        "cache_dir": cache_dir,
+        "entries": len(entries),
+        "total_bytes": sum(_entry_size(os.path.join(cache_dir, name)) for name in entries),
+        "max_bytes": max_cache_bytes(),
+    }
+
+
+def main():
+    """
+    メイン関数
+
+    使用法:
+        python3 render_cache.py stats   # キャッシュの状態
+        python3 render_cache.py clear   # キャッシュを全削除
+    """
+    if len(sys.argv) != 2 or sys.argv[1] not in ('stats', 'clear'):
+        print(json.dumps({
+            "error": "引数が不正です",
+            "usage": "python3 render_cache.py stats|clear"
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        if sys.argv[1] == 'clear':
+            evict(0)
+        print(json.dumps(stats(), ensure_ascii=False))
+
+    except Exception as e:
+        import traceback
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc()
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+作業ディレクトリ（中間ファイル）管理モジュール
+
+sofficeの変換・Excel検証の中間ファイル（全シートPDF・ODS・CSV・シートごとのExcel等）は、
+従来 /tmp や出力ディレクトリにプロセスID・時刻付きの名前で作成していたため、
+sofficeのタイムアウトやプロセスの強制終了で残ったままになっていました。
+このモジュールはジョブごとに1つの作業ディレクトリを作成し、with を抜けるときに必ず削除します。
+強制終了等で残った作業ディレクトリは、スイーパーが作成したプロセスの終了・経過時間・
+合計容量の上限に基づいて削除します。
+
+配置:
+    RAM上のtmpfs（/dev/shm）が書き込み可能で空き容量が十分あればそこに作成し、
+    中間ファイルの書き込み・読み込みでディスクI/Oを発生させません。
+    それ以外は <tmp>/seikyu-henkan-scratch に作成します。
+    作業ディレクトリ名は <用途>.<プロセスID>.<ランダム> です。
+
+入れ子:
+    作業ディレクトリの中（同じスレッド）で workspace() を呼ぶと、外側の作業ディレクトリの中に
+    作成します（pipeline・ライブラリAPIの1ジョブの中間ファイルが1つのディレクトリにまとまる）。
+
+スイーパー（sweep）:
+    - 作成したプロセスが終了している作業ディレクトリを削除（POSIXのみ）
+    - 経過時間が上限を超えた作業ディレクトリを削除
+    - 合計容量が上限を超えている場合は、古いものから削除（このプロセスで使用中のもの・実行間隔より
+      新しいものは削除しない）
+    serveモードではバックグラウンドのスレッドで定期的に実行します（start_sweeper）。
+    サブプロセス方式では、作業ディレクトリの作成時に前回の実行から間隔が空いていれば実行します。
+
+環境変数:
+    PDF_PROCESSOR_SCRATCH_DIR: 作業ディレクトリの配置先（指定時はtmpfsを使わない）
+    PDF_PROCESSOR_SCRATCH_TMPFS: 0 でtmpfsを使わない（デフォルト: 使う）
+    PDF_PROCESSOR_SCRATCH_TMPFS_MIN_FREE_MB: tmpfsを使う空き容量の下限（MB、デフォルト: 256）
+    PDF_PROCESSOR_SCRATCH_QUOTA_MB: 作業ディレクトリの合計容量の上限（MB、デフォルト: 1024）
+    PDF_PROCESSOR_SCRATCH_MAX_AGE: 作業ディレクトリの経過時間の上限（秒、デフォルト: 3600）
+    PDF_PROCESSOR_SCRATCH_SWEEP_INTERVAL: スイーパーの実行間隔（秒、デフォルト: 60）
+
+使用例:
+    with scratch.workspace('render') as work_dir:
+        soffice_runner.run_soffice(['--convert-to', 'pdf', '--outdir', work_dir, excel_path], timeout=60)
+        ...
+
+使用法:
+    python3 scratch.py status   # 配置先・作業ディレクトリ数・合計容量
+    python3 scratch.py sweep    # スイーパーを1回実行
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+import metrics
+
+SCRATCH_DIRNAME = 'seikyu-henkan-scratch'
+TMPFS_DIR = '/dev/shm'
+
+DEFAULT_TMPFS_MIN_FREE_MB = 256
+DEFAULT_QUOTA_MB = 1024
+DEFAULT_MAX_AGE = 3600
+DEFAULT_SWEEP_INTERVAL = 60
+
+# 前回のスイープ時刻を記録するファイル（配置先ごと、サブプロセス方式の実行間隔の判定用）
+SWEEP_MARKER = '.last_sweep'
+
+# スレッドごとの使用中の作業ディレクトリのスタック（入れ子の作業ディレクトリ用）
+_local = threading.local()
+# このプロセスで使用中の作業ディレクトリ（スイーパーが削除しないようにする）
+_active = set()
+_active_lock = threading.Lock()
+_sweeper_started = False
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def quota_bytes() -> int:
+    """作業ディレクトリの合計容量の上限（バイト）"""
+    return int(_env_number('PDF_PROCESSOR_SCRATCH_QUOTA_MB', DEFAULT_QUOTA_MB) * 1024 * 1024)
+
+
+def max_age() -> float:
+    """作業ディレクトリの経過時間の上限（秒）"""
+    return _env_number('PDF_PROCESSOR_SCRATCH_MAX_AGE', DEFAULT_MAX_AGE)
+
+
+def sweep_interval() -> float:
+    """スイーパーの実行間隔（秒）"""
+    return max(_env_number('PDF_PROCESSOR_SCRATCH_SWEEP_INTERVAL', DEFAULT_SWEEP_INTERVAL), 1.0)
+
+
+def _disk_root() -> str:
+    return os.getenv('PDF_PROCESSOR_SCRATCH_DIR') or os.path.join(tempfile.gettempdir(), SCRATCH_DIRNAME)
+
+
+def _tmpfs_root() -> Optional[str]:
+    """tmpfsの配置先（使わない・使えない環境ではNone）"""
+    if os.getenv('PDF_PROCESSOR_SCRATCH_DIR'):
+        return None
+    if os.getenv('PDF_PROCESSOR_SCRATCH_TMPFS', '1').lower() in ('0', 'false', 'no'):
+        return None
+    if os.name != 'posix' or not os.path.isdir(TMPFS_DIR) or not os.access(TMPFS_DIR, os.W_OK):
+        return None
+    return os.path.join(TMPFS_DIR, SCRATCH_DIRNAME)
+
+
+def _has_free_space(path: str, min_free_bytes: int) -> bool:
+    try:
+        stat = os.statvfs(path)
+    except OSError:
+        return False
+    return stat.f_bavail * stat.f_frsize >= min_free_bytes
+
+
+def scratch_root() -> str:
+    """
+    作業ディレクトリの配置先（存在しない場合は作成）
+
+    tmpfsが使え、空き容量が PDF_PROCESSOR_SCRATCH_TMPFS_MIN_FREE_MB 以上ならtmpfs、
+    それ以外はディスク上の一時ディレクトリ。作成のたびに判定するため、
+    月末の集中時にtmpfsが埋まった場合はディスクに切り替わる。
+    """
+    tmpfs_root = _tmpfs_root()
+    min_free = int(_env_number('PDF_PROCESSOR_SCRATCH_TMPFS_MIN_FREE_MB', DEFAULT_TMPFS_MIN_FREE_MB) * 1024 * 1024)
+    if tmpfs_root is not None and _has_free_space(TMPFS_DIR, min_free):
+        try:
+            os.makedirs(tmpfs_root, exist_ok=True)
+            return tmpfs_root
+        except OSError:
+            pass
+    root = _disk_root()
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def _workspace_stack() -> List[str]:
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+@contextmanager
+def workspace(purpose: str = 'job'):
+    """
+    作業ディレクトリを作成し、with を抜けるときに中身ごと削除する（例外・タイムアウト時も削除）
+
+    同じスレッドで使用中の作業ディレクトリがある場合は、その中に作成する。
+
+    Args:
+        purpose: 用途（ディレクトリ名の先頭、例: render, validate, pipeline）
+
+    Yields:
+        作業ディレクトリのパス
+    """
+    stack = _workspace_stack()
+    if stack:
+        path = tempfile.mkdtemp(dir=stack[-1], prefix=f"{purpose}.")
+    else:
+        root = scratch_root()
+        maybe_sweep(root)
+        path = tempfile.mkdtemp(dir=root, prefix=f"{purpose}.{os.getpid()}.")
+        with _active_lock:
+            _active.add(path)
+    stack.append(path)
+    try:
+        yield path
+    finally:
+        stack.pop()
+        shutil.rmtree(path, ignore_errors=True)
+        with _active_lock:
+            _active.discard(path)
+
+
+def _owner_pid(name: str) -> Optional[int]:
+    """作業ディレクトリ名（<用途>.<プロセスID>.<ランダム>）から作成したプロセスIDを取得"""
+    parts = name.split('.')
+    if len(parts) == 3 and parts[1].isdigit():
+        return int(parts[1])
+    return None
+
+
+def _owner_alive(pid: Optional[int]) -> bool:
+    """作成したプロセスが実行中か（判定できない場合は実行中とみなし、経過時間のみで削除する）"""
+    if pid is None or os.name != 'posix':
+        return True
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # 権限がない（他のユーザーのプロセス）場合は実行中
+        return True
+    return True
+
+
+def _tree_size(path: str) -> int:
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def _list_workspaces(root: str) -> List[Dict[str, Any]]:
+    """配置先の作業ディレクトリ（名前・作成したプロセス・更新日時・サイズ）"""
+    workspaces = []
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return workspaces
+    with _active_lock:
+        active = set(_active)
+    for name in names:
+        if name.startswith('.'):
+            continue
+        path = os.path.join(root, name)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+        pid = _owner_pid(name)
+        workspaces.append({
+            "path": path,
+            "pid": pid,
+            "alive": _owner_alive(pid),
+            "active": path in active,
+            "mtime": mtime,
+            "bytes": _tree_size(path),
+        })
+    return workspaces
+
+
+def sweep_root(root: str, quota: int = None, age_limit: float = None) -> Dict[str, int]:
+    """
+    配置先の残った作業ディレクトリを削除
+
+    Args:
+        root: 配置先
+        quota: 合計容量の上限（バイト、省略時は quota_bytes()）
+        age_limit: 経過時間の上限（秒、省略時は max_age()）
+
+    Returns:
+        {"orphaned": 作成したプロセスが終了していた数, "expired": 経過時間の上限を超えた数,
+          "quota": 容量の上限のために削除した数, "remaining_bytes": 削除後の合計容量}
+    """
+    quota = quota_bytes() if quota is None else quota
+    age_limit = max_age() if age_limit is None else age_limit
+    now = time.time()
+    removed = {"orphaned": 0, "expired": 0, "quota": 0}
+
+    remaining = []
+    for entry in _list_workspaces(root):
+        # このプロセスで使用中のものは削除しない
+        if entry["active"]:
+            remaining.append(entry)
+            continue
+        if not entry["alive"]:
+            reason = "orphaned"
+        elif now - entry["mtime"] > age_limit:
+            reason = "expired"
+        else:
+            remaining.append(entry)
+            continue
+        shutil.rmtree(entry["path"], ignore_errors=True)
+        removed[reason] += 1
+        metrics.scratch_removed.inc(reason=reason)
+
+    # 容量の上限: このプロセスで使用中のもの・実行間隔より新しいもの（他のワーカーの実行中のジョブ）を除き、
+    # 古いものから削除
+    total = sum(entry["bytes"] for entry in remaining)
+    grace = sweep_interval()
+    for entry in sorted(remaining, key=lambda entry: entry["mtime"]):
+        if total <= quota:
+            break
+        if entry["active"] or now - entry["mtime"] < grace:
+            continue
+        shutil.rmtree(entry["path"], ignore_errors=True)
+        total -= entry["bytes"]
+        removed["quota"] += 1
+        metrics.scratch_removed.inc(reason="quota")
+
+    return {**removed, "remaining_bytes": total}
+
+
+def _roots() -> List[str]:
+    """スイープ対象の配置先（tmpfs・ディスクの両方、存在するもののみ）"""
+    roots = [root for root in (_tmpfs_root(), _disk_root()) if root]
+    return [root for root in roots if os.path.isdir(root)]
+
+
+def sweep() -> Dict[str, Dict[str, int]]:
+    """すべての配置先でスイーパーを1回実行（配置先 → sweep_root の結果）"""
+    results = {}
+    for root in _roots():
+        results[root] = sweep_root(root)
+        _touch_marker(root)
+    return results
+
+
+def _touch_marker(root: str) -> None:
+    try:
+        with open(os.path.join(root, SWEEP_MARKER), 'a'):
+            pass
+        os.utime(os.path.join(root, SWEEP_MARKER))
+    except OSError:
+        pass
+
+
+def maybe_sweep(root: str) -> None:
+    """前回のスイープから実行間隔が空いていれば、配置先のスイープを実行（サブプロセス方式用）"""
+    try:
+        last = os.stat(os.path.join(root, SWEEP_MARKER)).st_mtime
+    except OSError:
+        last = 0.0
+    if time.time() - last < sweep_interval():
+        return
+    # 先に記録して、同時に起動したワーカーが重ねて実行しないようにする
+    _touch_marker(root)
+    try:
+        sweep_root(root)
+    except Exception as e:
+        # スイープの失敗は処理に影響させない
+        print(f"[scratch] スイープに失敗しました: {e}", file=sys.stderr)
+
+
+def _sweeper_loop(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            sweep()
+        except Exception as e:
+            print(f"[scratch] スイープに失敗しました: {e}", file=sys.stderr)
+
+
+def start_sweeper() -> None:
+    """serveモードの開始時に呼び出し、スイーパーをデーモンスレッドで定期実行する"""
+    global _sweeper_started
+    if _sweeper_started:
+        return
+    _sweeper_started = True
+    try:
+        sweep()
+    except Exception as e:
+        print(f"[scratch] スイープに失敗しました: {e}", file=sys.stderr)
+    threading.Thread(target=_sweeper_loop, args=(sweep_interval(),), name='scratch-sweeper', daemon=True).start()
+
+
+def status() -> Dict[str, Any]:
+    """配置先と作業ディレクトリの状態"""
+    root = scratch_root()
+    roots = {}
+    for path in _roots():
+        workspaces = _list_workspaces(path)
+        roots[path] = {
+            "workspaces": len(workspaces),
+            "orphaned": sum(1 for entry in workspaces if not entry["alive"]),
+            "total_bytes": sum(entry["bytes"] for entry in workspaces),
+        }
+    return {
+        "root": root,
+        "tmpfs": root == _tmpfs_root(),
+        "quota_bytes": quota_bytes(),
+        "max_age": max_age(),
+        "roots": roots,
+    }
+
+
+def main():
+    """メイン関数"""
+    if len(sys.argv) != 2 or sys.argv[1] not in ('status', 'sweep'):
+        print(json.dumps({
+            "error": "引数が不正です",
+            "usage": "python3 scratch.py status|sweep"
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        if sys.argv[1] == 'sweep':
+            print(json.dumps({"removed": sweep(), **status()}, ensure_ascii=False))
+        else:
+            print(json.dumps(status(), ensure_ascii=False))
+
+    except Exception as e:
+        import traceback
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc()
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+LibreOffice（soffice）実行モジュール（ウォームスタート対応）
+
+sofficeの呼び出しはすべて run_soffice を経由し、共通のユーザープロファイル
+（-env:UserInstallation）を使用します。同じプロファイルで起動済みのsofficeがあると、
+後から起動したsofficeは変換要求を起動済みのプロセスに渡して終了するため、
+LibreOffice自体の起動時間がかかりません。
+
+環境変数 PDF_PROCESSOR_PRELAUNCH_SOFFICE=1 を設定すると、Pythonワーカーの起動直後
+（pdf_parser・serveモード）にheadlessのsoffice（--accept付き）をバックグラウンドで起動します。
+PDF解析中にLibreOfficeの起動が進むため、デプロイ直後やLambdaのコールドスタート時の
+最初のジョブでもPDF生成・Excel検証を待たずに済みます。
+
+起動したsofficeはプロセスIDをキャッシュディレクトリの soffice-listener.pid に記録し、
+以降のワーカーはこれを再利用します（POSIX環境のみ）。リスナーはスロットごとに起動します。
+
+リスナーを使うのはPDF生成・Excel検証（pdf_generator・excel_validator の run_soffice）ですが、
+起動はそれより前に動くPDF解析（pdf_parser）とserveモードの開始時に行います。PDF生成の
+直前に起動しても、起動時間は短縮されないためです。
+--accept は、開くドキュメントがなくてもheadlessのsofficeを常駐させるために指定しています。
+このパイプにUNOで接続するクライアントはありません。変換要求は、同じプロファイルで後から起動した
+sofficeが、プロファイルを共有するプロセス間通信で起動済みのプロセスに転送します。
+
+スロット:
+    同じプロファイルのsofficeは1プロセスに集約されるため、並行して変換するには
+    プロファイルを分ける必要があります。スロット0は共通プロファイル（リスナーと共有）、
+    スロット1以降は soffice-profile-<番号> を使用します。スロット1以降はロックファイルで
+    排他し、他のワーカーが使用中なら取得できません。
+    スロット数は PDF_PROCESSOR_SOFFICE_SLOTS（デフォルト: CPUが2コア以上なら2、それ以外は1）。
+    スロット1以降はリスナーが起動している場合のみ使用します（listener_ready 参照）。リスナーがないと
+    変換のたびにLibreOfficeをもう1つ起動することになり、起動時間とCPU・メモリの消費が倍になるため。
+
+使用法:
+    python3 soffice_runner.py prelaunch   # 全スロットのリスナーを起動（起動済みなら何もしない）
+    python3 soffice_runner.py status      # リスナーの状態
+    python3 soffice_runner.py shutdown    # 全スロットのリスナーを停止
+
+出力:
+    {"running": true, "pid": 12345, "profile_dir": "/tmp/seikyu-henkan-cache/soffice-profile", "slots": 2,
+     "listeners": [{"slot": 0, "pid": 12345}, {"slot": 1, "pid": 12350}]}
+"""
+
+import os
+import sys
+import json
+import signal
+import subprocess
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import environment_probe
+import metrics
+import timings
+
+PRELAUNCH_ENV = 'PDF_PROCESSOR_PRELAUNCH_SOFFICE'
+SLOTS_ENV = 'PDF_PROCESSOR_SOFFICE_SLOTS'
+
+# リスナーの接続名（--accept）
+LISTENER_PIPE_NAME = 'seikyu_henkan_soffice'
+
+
+def get_profile_dir(slot: int = 0) -> str:
+    """sofficeのユーザープロファイルディレクトリ（スロット0は共通プロファイル）"""
+    name = 'soffice-profile' if slot == 0 else f'soffice-profile-{slot}'
+    return os.path.join(environment_probe.get_cache_dir(), name)
+
+
+def profile_argument(slot: int = 0) -> str:
+    """-env:UserInstallation 引数（file:// URL）"""
+    return f"-env:UserInstallation={Path(get_profile_dir(slot)).as_uri()}"
+
+
+def slot_count() -> int:
+    """
+    同時に使用できるsofficeのスロット数
+
+    PDF_PROCESSOR_SOFFICE_SLOTS、未設定時はCPUが2コア以上なら2、それ以外は1。
+    """
+    value = os.getenv(SLOTS_ENV)
+    if value:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            pass
+    return 2 if (os.cpu_count() or 1) >= 2 else 1
+
+
+def acquire_slot(slot: int) -> Optional[Any]:
+    """
+    スロット（1以降）のロックを取得（待たない）
+
+    Returns:
+        ロック中のファイルオブジェクト（release_slot に渡す）。
+        他のワーカーが使用中、またはロックできない環境ではNone
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return None
+
+    lock_file = open(os.path.join(environment_probe.get_cache_dir(), f'soffice-slot-{slot}.lock'), 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def release_slot(lock_file: Any) -> None:
+    """acquire_slot で取得したロックを解放"""
+    # ファイルを閉じるとロックも解放される
+    lock_file.close()
+
+
+def _pid_path(slot: int = 0) -> str:
+    name = 'soffice-listener.pid' if slot == 0 else f'soffice-listener-{slot}.pid'
+    return os.path.join(environment_probe.get_cache_dir(), name)
+
+
+def listener_pipe_name(slot: int = 0) -> str:
+    """リスナーの接続名（--accept、スロット0は共通の名前）"""
+    return LISTENER_PIPE_NAME if slot == 0 else f'{LISTENER_PIPE_NAME}_{slot}'
+
+
+def listener_pid(slot: int = 0) -> Optional[int]:
+    """起動済みリスナーのプロセスID（起動していない場合はNone）"""
+    if os.name != 'posix':
+        return None
+    try:
+        with open(_pid_path(slot), 'r') as f:
+            pid = int(f.read().strip())
+        os.kill(pid, 0)
+    except (OSError, ValueError):
+        return None
+
+    # プロセスIDが再利用されていないか確認（/procがある環境のみ）
+    cmdline_path = f'/proc/{pid}/cmdline'
+    if os.path.exists(cmdline_path):
+        try:
+            with open(cmdline_path, 'rb') as f:
+                if f'name={listener_pipe_name(slot)};'.encode() not in f.read():
+                    return None
+        except OSError:
+            return None
+    return pid
+
+
+def listener_ready(slot: int) -> bool:
+    """スロットのリスナーが起動しているか（スロット1以降を並行変換に使う条件）"""
+    return listener_pid(slot) is not None
+
+
+def prelaunch_enabled() -> bool:
+    """環境変数 PDF_PROCESSOR_PRELAUNCH_SOFFICE でリスナーの事前起動が有効か（デフォルト: 無効）"""
+    return os.getenv(PRELAUNCH_ENV, '0').lower() in ('1', 'true', 'yes')
+
+
+def prelaunch(slot: int = 0) -> Optional[int]:
+    """
+    headlessのsofficeリスナーをバックグラウンドで起動（起動完了は待たない）
+
+    Args:
+        slot: リスナーを起動するスロット（スロットのプロファイルを使用する）
+
+    Returns:
+        リスナーのプロセスID（LibreOffice未インストール・非POSIX環境ではNone）
+    """
+    if os.name != 'posix' or not environment_probe.libreoffice_available():
+        return None
+
+    pid = listener_pid(slot)
+    if pid is not None:
+        return pid
+
+    os.makedirs(get_profile_dir(slot), exist_ok=True)
+    metrics.soffice_launches.inc(label='listener')
+    process = subprocess.Popen(
+        [
+            environment_probe.soffice_command(),
+            profile_argument(slot),
+            '--headless',
+            '--invisible',
+            '--nologo',
+            '--norestore',
+            '--nodefault',
+            f'--accept=pipe,name={listener_pipe_name(slot)};urp;',
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        # ワーカー終了後もリスナーを残す
+        start_new_session=True
+    )
+    with open(_pid_path(slot), 'w') as f:
+        f.write(str(process.pid))
+    return process.pid
+
+
+def prelaunch_all() -> List[Optional[int]]:
+    """全スロットのリスナーを起動（スロットごとのプロセスID）"""
+    return [prelaunch(slot) for slot in range(slot_count())]
+
+
+def prelaunch_if_enabled() -> None:
+    """
+    PDF_PROCESSOR_PRELAUNCH_SOFFICE が有効なら全スロットのリスナーを起動
+
+    起動に失敗しても処理は続行する（通常どおりsofficeが都度起動される）。
+    """
+    if not prelaunch_enabled():
+        return
+    try:
+        prelaunch_all()
+    except Exception as e:
+        print(f"[soffice_runner] リスナーの起動に失敗しました: {e}", file=sys.stderr)
+
+
+def shutdown_listener(slot: int = 0) -> bool:
+    """
+    起動済みリスナーを停止
+
+    Returns:
+        停止したらTrue、起動していなければFalse
+    """
+    pid = listener_pid(slot)
+    if pid is None:
+        # 終了済みリスナーのプロセスIDの記録が残っていれば削除
+        try:
+            os.remove(_pid_path(slot))
+        except OSError:
+            pass
+        return False
+    try:
+        # sofficeはラッパー経由でsoffice.binを起動するため、プロセスグループごと停止する
+        os.killpg(pid, signal.SIGTERM)
+    except OSError:
+        pass
+    try:
+        os.remove(_pid_path(slot))
+    except OSError:
+        pass
+    return True
+
+
+def shutdown_all() -> None:
+    """全スロットのリスナーを停止（スロット数を減らした後に残ったものも含む）"""
+    slots = slot_count()
+    for slot in range(slots):
+        shutdown_listener(slot)
+    slot = slots
+    while os.path.exists(_pid_path(slot)):
+        shutdown_listener(slot)
+        slot += 1
+
+
+def run_soffice(args: List[str], timeout: int, slot: int = 0, label: str = 'run') -> subprocess.CompletedProcess:
+    """
+    sofficeを実行（共通プロファイルを使用し、起動済みリスナーがあれば変換要求を転送する）
+
+    Args:
+        args: soffice の引数（例: ['--headless', '--convert-to', 'pdf', ...]）
+        timeout: タイムアウト（秒）
+        slot: 使用するスロット（1以降は acquire_slot で取得済みであること）
+        label: 処理時間の区間名（timings の "soffice.<label>"）
+
+    Raises:
+        subprocess.TimeoutExpired: タイムアウト時
+    """
+    metrics.soffice_launches.inc(label=label)
+    with timings.span(f"soffice.{label}"):
+        return subprocess.run(
+            [environment_probe.soffice_command(), profile_argument(slot)] + args,
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+
+
+def status() -> Dict[str, Any]:
+    """リスナーの状態"""
+    pid = listener_pid()
+    return {
+        "running": pid is not None,
+        "pid": pid,
+        "profile_dir": get_profile_dir(),
+        "slots": slot_count(),
+        "listeners": [{"slot": slot, "pid": listener_pid(slot)} for slot in range(slot_count())],
+    }
+
+
+def main():
+    """メイン関数"""
+    if len(sys.argv) != 2 or sys.argv[1] not in ('prelaunch', 'status', 'shutdown'):
+        print(json.dumps({
+            "error": "引数が不正です",
+            "usage": "python3 soffice_runner.py prelaunch|status|shutdown"
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+    action = sys.argv[1]
+
+    try:
+        if action == 'prelaunch':
+            prelaunch_all()
+        elif action == 'shutdown':
+            shutdown_all()
+        print(json.dumps(timings.attach(status()), ensure_ascii=False))
+
+    except Exception as e:
+        import traceback
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc()
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
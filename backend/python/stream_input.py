@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+入力ファイルを標準入力・ファイルディスクリプタから受け取るモジュール
+
+Node側はアップロードされたPDF・テンプレートをメモリ上に持っているため、
+一時ファイル（/tmp/*_<timestamp>.pdf）に書き出してパスを渡す代わりに、
+標準入力（長さ付きのフレーム）や継承したファイルディスクリプタで渡せるようにします。
+受け取ったデータはメモリ上（BytesIO）で解析し、書き込み・読み込み・削除の往復と、
+同じミリ秒に開始したジョブどうしの一時ファイル名の衝突をなくします。
+
+入力の指定（パスの代わりに引数に指定）:
+    stdin:<名前>  標準入力のフレームのうち、名前が一致するもの
+    fd:<番号>     継承したファイルディスクリプタからEOFまで読み込んだデータ（POSIXのみ）
+    それ以外      ファイルのパス（従来どおり）
+
+標準入力のフレーム形式（EOFまで繰り返し、数値はビッグエンディアン）:
+    [名前の長さ: 4バイト][名前: UTF-8][データの長さ: 8バイト][データ]
+
+    標準入力は最初に stdin: の入力を参照したときに1回だけ読み込み、プロセス内で共有する。
+    serveモードでは標準入力をリクエストに使うため、stdin: は指定できない。
+
+データの引数（excel_editor の data_json 等、JSON文字列の代わりに指定、load_json 参照）:
+    @<パス>       JSONファイル
+    -             標準入力全体をJSONとして読み込む（フレームの入力とは併用できない）
+    stdin:<名前>  標準入力のフレーム（テンプレート等と一緒に渡す場合）
+    fd:<番号>     継承したファイルディスクリプタ
+    明細行が多いとJSON文字列のコマンドライン引数がARG_MAXに近づくため、Node側は stdin:<名前> で渡す。
+
+使用例:
+    # Node側: encodeInputFrames({estimate: buffer, template: templateExcel}) を標準入力に書き込む
+    python3 pdf_parser.py ネクストビッツ estimate stdin:estimate < frames.bin
+    python3 stream_input.py encode estimate=見積書.pdf template=テンプレート.xlsx > frames.bin
+    python3 excel_editor.py ネクストビッツ テンプレート.xlsx output.xlsx @data.json
+
+使用法:
+    python3 stream_input.py encode <名前>=<パス> [...]   # フレーム形式に変換して標準出力へ（動作確認用）
+    python3 stream_input.py list                          # 標準入力のフレームの名前とサイズ
+"""
+
+import io
+import os
+import sys
+import json
+import struct
+import threading
+from typing import Any, Dict, Union, BinaryIO
+
+STDIN_PREFIX = 'stdin:'
+FD_PREFIX = 'fd:'
+FILE_PREFIX = '@'
+STDIN_ALL = '-'
+
+_NAME_LENGTH = struct.Struct('>I')
+_DATA_LENGTH = struct.Struct('>Q')
+
+# 標準入力から読み込んだフレーム（最初の参照時に読み込む）
+_stdin_frames: Union[Dict[str, bytes], None] = None
+# 標準入力を入力に使えるか（serveモードではリクエストに使うため False）
+_stdin_enabled = True
+# 標準入力全体をデータとして読み込んだか（- の指定、以降はフレームとして読み込めない）
+_stdin_read_whole = False
+# ファイルディスクリプタから読み込んだデータ（fd → バイト列）
+_fd_data: Dict[int, bytes] = {}
+_lock = threading.Lock()
+
+
+def read_exact(stream: BinaryIO, size: int) -> bytes:
+    """ストリームからちょうど size バイト読み込む（途中でEOFならエラー）"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            raise ValueError(f"データが途中で終わっています（残り {remaining} バイト）")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def read_frames(stream: BinaryIO) -> Dict[str, bytes]:
+    """フレーム形式のストリームをEOFまで読み込む（名前 → データ）"""
+    frames: Dict[str, bytes] = {}
+    while True:
+        header = stream.read(_NAME_LENGTH.size)
+        if not header:
+            return frames
+        if len(header) < _NAME_LENGTH.size:
+            header += read_exact(stream, _NAME_LENGTH.size - len(header))
+        name = read_exact(stream, _NAME_LENGTH.unpack(header)[0]).decode('utf-8')
+        data_length = _DATA_LENGTH.unpack(read_exact(stream, _DATA_LENGTH.size))[0]
+        frames[name] = read_exact(stream, data_length)
+
+
+def encode_frames(frames: Dict[str, bytes]) -> bytes:
+    """名前 → データ をフレーム形式のバイト列にする"""
+    output = bytearray()
+    for name, data in frames.items():
+        encoded_name = name.encode('utf-8')
+        output += _NAME_LENGTH.pack(len(encoded_name)) + encoded_name
+        output += _DATA_LENGTH.pack(len(data)) + data
+    return bytes(output)
+
+
+def disable_stdin() -> None:
+    """標準入力を入力に使わない（serveモード用、以降の stdin: の指定はエラー）"""
+    global _stdin_enabled
+    _stdin_enabled = False
+
+
+def _stdin_frame(name: str) -> bytes:
+    global _stdin_frames
+    if not _stdin_enabled:
+        raise ValueError(f"serveモードでは標準入力の入力（{STDIN_PREFIX}{name}）は指定できません")
+    with _lock:
+        if _stdin_read_whole:
+            raise ValueError(f"標準入力は {STDIN_ALL} で読み込み済みのため、{STDIN_PREFIX}{name} は指定できません")
+        if _stdin_frames is None:
+            _stdin_frames = read_frames(sys.stdin.buffer)
+        frames = _stdin_frames
+    if name not in frames:
+        raise ValueError(f"標準入力に入力がありません: {name}（受け取った入力: {', '.join(frames) or 'なし'}）")
+    return frames[name]
+
+
+def _stdin_whole() -> bytes:
+    global _stdin_read_whole
+    if not _stdin_enabled:
+        raise ValueError(f"serveモードでは標準入力の入力（{STDIN_ALL}）は指定できません")
+    with _lock:
+        if _stdin_frames is not None or _stdin_read_whole:
+            raise ValueError(f"標準入力は読み込み済みのため、{STDIN_ALL} は指定できません（{STDIN_PREFIX}<名前> を使用してください）")
+        _stdin_read_whole = True
+        return sys.stdin.buffer.read()
+
+
+def _fd_contents(fd: int) -> bytes:
+    with _lock:
+        if fd not in _fd_data:
+            chunks = []
+            while True:
+                chunk = os.read(fd, 1 << 20)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            os.close(fd)
+            _fd_data[fd] = b''.join(chunks)
+        return _fd_data[fd]
+
+
+def is_stream(source: str) -> bool:
+    """入力の指定が標準入力・ファイルディスクリプタか（パスでないか）"""
+    return source.startswith((STDIN_PREFIX, FD_PREFIX))
+
+
+def resolve(source: Union[str, bytes]) -> Union[str, bytes]:
+    """
+    入力の指定を解決（stdin:<名前> / fd:<番号> はバイト列、それ以外はパスのまま）
+
+    serveモードのMessagePackのリクエストでは、バイト列をそのまま受け取る（main.py参照）。
+
+    Raises:
+        ValueError: 標準入力に指定した名前の入力がない、またはフレームが壊れている場合
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if source.startswith(STDIN_PREFIX):
+        return _stdin_frame(source[len(STDIN_PREFIX):])
+    if source.startswith(FD_PREFIX):
+        return _fd_contents(int(source[len(FD_PREFIX):]))
+    return source
+
+
+def as_file(source: Union[str, bytes]) -> Union[str, BinaryIO]:
+    """pdfplumber・openpyxl・zipfile に渡せる形にする（バイト列は BytesIO、パスはそのまま）"""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return source
+
+
+def load_json(argument: str) -> Any:
+    """
+    データの引数を読み込む（@<パス> / - / stdin:<名前> / fd:<番号>、それ以外はJSON文字列）
+
+    Raises:
+        ValueError: JSONとして読み込めない、または標準入力を読み込めない場合
+    """
+    if argument == STDIN_ALL:
+        try:
+            return json.loads(_stdin_whole())
+        except UnicodeDecodeError as e:
+            raise ValueError(
+                f"標準入力をJSONとして読み込めません（フレーム形式の場合は {STDIN_PREFIX}<名前> を指定してください）: {e}"
+            ) from e
+    if argument.startswith(FILE_PREFIX):
+        with open(argument[len(FILE_PREFIX):], 'rb') as f:
+            return json.load(f)
+    if is_stream(argument):
+        return json.loads(resolve(argument))
+    return json.loads(argument)
+
+
+def source_name(source: Union[str, bytes]) -> str:
+    """入力の指定の表示名（stdin:<名前> は名前、パスはファイル名、バイト列は空文字列）"""
+    if isinstance(source, (bytes, bytearray)):
+        return ''
+    if source.startswith(STDIN_PREFIX):
+        return source[len(STDIN_PREFIX):]
+    if source.startswith(FD_PREFIX):
+        return source
+    return os.path.basename(source)
+
+
+def main():
+    """メイン関数（動作確認用）"""
+    try:
+        if len(sys.argv) >= 3 and sys.argv[1] == 'encode':
+            frames = {}
+            for arg in sys.argv[2:]:
+                name, _, path = arg.partition('=')
+                with open(path, 'rb') as f:
+                    frames[name] = f.read()
+            sys.stdout.buffer.write(encode_frames(frames))
+        elif len(sys.argv) == 2 and sys.argv[1] == 'list':
+            frames = read_frames(sys.stdin.buffer)
+            print(json.dumps({name: len(data) for name, data in frames.items()}, ensure_ascii=False))
+        else:
+            print(json.dumps({
+                "error": "引数が不足しています",
+                "usage": "python3 stream_input.py encode <名前>=<パス> [...] | list"
+            }, ensure_ascii=False), file=sys.stderr)
+            sys.exit(1)
+
+    except Exception as e:
+        import traceback
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc()
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
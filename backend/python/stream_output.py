@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+出力ファイルを標準出力にまとめて返すモジュール（バンドル）
+
+excel_editor・pdf_generator が出力したファイルをNode側が fs.readFile で読み戻し、
+Python側に order_<pid>.pdf 等が残る代わりに、結果のJSONと出力ファイルのバイト列を
+1つのバンドルとして標準出力に書き込みます。入力の stdin:<名前>（stream_input.py）と
+組み合わせると、ジョブの入出力に一時ファイルを使いません。
+
+出力先の指定（出力パス・出力ディレクトリの代わりに引数に指定）:
+    stdout:<ファイル名>  excel_editor の出力Excel（メモリ上で作成し、ファイルには書き込まない）
+    stdout:              pdf_generator render_and_validate・pipeline の出力ディレクトリ
+                         （sofficeはファイルにしか出力できないため、処理ごとの作業ディレクトリに
+                           出力して読み込み、返す前に作業ディレクトリごと削除する）
+
+バンドルの形式（数値はビッグエンディアン）:
+    [ヘッダーの長さ: 4バイト][ヘッダー: UTF-8のJSON][データ1][データ2]...
+    ヘッダー: 結果のJSON（従来の標準出力と同じ）に "artifacts" を追加したもの
+        "artifacts": [{"name": "excel", "filename": "output.xlsx", "length": 26205}, ...]
+        データは artifacts の順に、length バイトずつ続く。
+
+使用法:
+    python3 stream_output.py extract <output_dir>   # 標準入力のバンドルを展開し、ヘッダーを出力（動作確認用）
+"""
+
+import os
+import sys
+import json
+import struct
+from typing import Dict, Any, List, Tuple, BinaryIO
+
+import stream_input
+
+STDOUT_PREFIX = 'stdout:'
+
+_HEADER_LENGTH = struct.Struct('>I')
+
+# (名前, ファイル名, データ)
+Artifact = Tuple[str, str, bytes]
+
+
+def is_stdout(target: str) -> bool:
+    """出力先が標準出力（バンドル）の指定か"""
+    return target.startswith(STDOUT_PREFIX)
+
+
+def stdout_filename(target: str, default: str) -> str:
+    """stdout:<ファイル名> のファイル名（省略時は default）"""
+    return target[len(STDOUT_PREFIX):] or default
+
+
+def read_artifact(name: str, path: str) -> Artifact:
+    """出力ファイルを読み込んでバンドルの要素にする"""
+    with open(path, 'rb') as f:
+        return name, os.path.basename(path), f.read()
+
+
+def encode_bundle(header: Dict[str, Any], artifacts: List[Artifact]) -> bytes:
+    """結果のJSONと出力ファイルをバンドルのバイト列にする"""
+    header = dict(header)
+    header["artifacts"] = [
+        {"name": name, "filename": filename, "length": len(data)} for name, filename, data in artifacts
+    ]
+    encoded_header = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    return b''.join([_HEADER_LENGTH.pack(len(encoded_header)), encoded_header] + [data for _, _, data in artifacts])
+
+
+def write_bundle(header: Dict[str, Any], artifacts: List[Artifact], stream: BinaryIO = None) -> None:
+    """バンドルを標準出力（または stream）に書き込む"""
+    stream = stream or sys.stdout.buffer
+    stream.write(encode_bundle(header, artifacts))
+    stream.flush()
+
+
+def read_bundle(stream: BinaryIO) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+    """バンドルを読み込む（(ヘッダー, 名前 → データ)）"""
+    header_length = _HEADER_LENGTH.unpack(stream_input.read_exact(stream, _HEADER_LENGTH.size))[0]
+    header = json.loads(stream_input.read_exact(stream, header_length).decode('utf-8'))
+    artifacts = {}
+    for artifact in header.get("artifacts", []):
+        artifacts[artifact["name"]] = stream_input.read_exact(stream, artifact["length"])
+    return header, artifacts
+
+
+def main():
+    """メイン関数（動作確認用）"""
+    if len(sys.argv) != 3 or sys.argv[1] != 'extract':
+        print(json.dumps({
+            "error": "引数が不足しています",
+            "usage": "python3 stream_output.py extract <output_dir>"
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        header, artifacts = read_bundle(sys.stdin.buffer)
+        os.makedirs(sys.argv[2], exist_ok=True)
+        for artifact in header.get("artifacts", []):
+            with open(os.path.join(sys.argv[2], os.path.basename(artifact["filename"])), 'wb') as f:
+                f.write(artifacts[artifact["name"]])
+        print(json.dumps(header, ensure_ascii=False))
+
+    except Exception as e:
+        import traceback
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc()
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
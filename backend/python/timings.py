@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+処理時間計測モジュール
+
+各サブコマンドの内部処理（PDF解析、Excel読み込み、drawing復元、sofficeの実行、PDF分割等）の
+所要時間を単調増加クロック（time.perf_counter）で計測し、JSON出力の "timings" に含めます。
+Node側の processingTime（合計）だけでは、遅いジョブがどこで時間を使ったか分からないため。
+
+計測は span() で囲んだ区間の開始・終了時刻を記録するだけのため、本番環境でも有効のままで問題ありません。
+環境変数 PDF_PROCESSOR_TIMINGS=0 で無効化できます（"timings" を出力しない）。
+各区間のメモリ最大使用量も計測し、"memory" として出力します（memory_usage.py参照）。
+各区間には入れ子の親子関係（区間ID・親の区間ID）も記録し、トレースとして出力できます（tracing.py参照）。
+
+使用例:
+    with timings.span("load_workbook"):
+        wb = openpyxl.load_workbook(path)
+    ...
+    print(json.dumps(timings.attach(result), ensure_ascii=False))
+
+ライブラリAPI（api.py）では、呼び出しごとの区間を collect() で全体の記録から取り出します
+（1プロセス内で複数のジョブを並行して処理しても、各呼び出しの計測結果が混ざらない）。
+
+出力（ミリ秒、同名の区間は合計）:
+    "timings": {
+        "load_workbook": 182.4,
+        "restore_drawing": 35.1,
+        "soffice.convert": 2310.7,
+        "split_pdf": 41.0,
+        "total": 2612.9
+    }
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, NamedTuple
+
+import memory_usage
+import metrics
+
+
+class Span(NamedTuple):
+    """記録済みの区間（start, end は time.perf_counter の値）"""
+    name: str
+    start: float
+    end: float
+    span_id: str
+    parent_id: str  # 外側の区間のID（最も外側の区間は root_span_id()）
+
+
+def new_span_id() -> str:
+    """区間ID（16桁の16進文字列、OpenTelemetryのspan IDと同じ形式）"""
+    return os.urandom(8).hex()
+
+
+# 計測開始時刻（プロセス起動時、serveモードでは要求ごとに reset で更新）
+_started_at = time.perf_counter()
+# 計測全体（サブコマンド・serveモードの要求）を表す区間のID
+_root_span_id = new_span_id()
+
+# 記録済みの区間
+_spans: List[Span] = []
+_lock = threading.Lock()
+# スレッドごとの実行中の区間IDのスタック（入れ子の区間の親子関係）
+_local = threading.local()
+
+
+def enabled() -> bool:
+    """環境変数 PDF_PROCESSOR_TIMINGS で計測が有効か（デフォルト: 有効）"""
+    return os.getenv('PDF_PROCESSOR_TIMINGS', '1').lower() not in ('0', 'false', 'no')
+
+
+def reset() -> None:
+    """記録済みの区間を破棄し、計測開始時刻を現在時刻にする（serveモードの要求ごと）"""
+    global _started_at, _root_span_id
+    with _lock:
+        _started_at = time.perf_counter()
+        _root_span_id = new_span_id()
+        _spans.clear()
+    memory_usage.reset()
+
+
+def _span_stack() -> List[str]:
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def current_span_id() -> str:
+    """実行中の区間のID（区間外では root_span_id()）"""
+    stack = _span_stack()
+    return stack[-1] if stack else _root_span_id
+
+
+@contextmanager
+def child_of(parent_id: str):
+    """
+    with内で開始する区間の親を指定（ThreadPoolExecutor等の別スレッドで、呼び出し元の区間の子にする）
+
+    使用例:
+        parent_id = timings.current_span_id()
+        executor.submit(worker, parent_id)
+        ...
+        def worker(parent_id):
+            with timings.child_of(parent_id):
+                ...
+    """
+    stack = _span_stack()
+    stack.append(parent_id)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def record(name: str, start: float, end: float, span_id: str = None, parent_id: str = None) -> None:
+    """区間を記録（start, end は time.perf_counter の値、親を省略した場合は実行中の区間）"""
+    if parent_id is None:
+        parent_id = current_span_id()
+    with _lock:
+        _spans.append(Span(name, start, end, span_id or new_span_id(), parent_id))
+    metrics.stage_duration.observe(end - start, stage=name)
+
+
+@contextmanager
+def span(name: str):
+    """with で囲んだ区間の所要時間を記録（例外で抜けた場合も記録する）"""
+    if not enabled():
+        yield
+        return
+    stack = _span_stack()
+    parent_id = current_span_id()
+    span_id = new_span_id()
+    stack.append(span_id)
+    memory_state = memory_usage.stage_enter()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        stack.pop()
+        record(name, start, end, span_id, parent_id)
+        memory_usage.stage_exit(name, memory_state)
+
+
+def spans() -> List[Span]:
+    """記録済みの区間のコピー"""
+    with _lock:
+        return list(_spans)
+
+
+def started_at() -> float:
+    """計測開始時刻（time.perf_counter の値）"""
+    return _started_at
+
+
+def root_span_id() -> str:
+    """計測全体（サブコマンド・serveモードの要求）を表す区間のID"""
+    return _root_span_id
+
+
+def _totals_ms(items: List[Span]) -> Dict[str, float]:
+    """区間ごとの所要時間（ミリ秒、同名の区間は合計し、最初に開始した順）"""
+    totals: Dict[str, float] = {}
+    for item in sorted(items, key=lambda item: item.start):
+        totals[item.name] = totals.get(item.name, 0.0) + (item.end - item.start)
+    return {name: round(seconds * 1000, 1) for name, seconds in totals.items()}
+
+
+def summary() -> Dict[str, float]:
+    """
+    区間ごとの所要時間（ミリ秒、小数第1位）
+
+    同名の区間は合計し、最初に開始した順に並べる。"total" は計測開始から現在まで。
+    """
+    result = _totals_ms(spans())
+    result["total"] = round((time.perf_counter() - _started_at) * 1000, 1)
+    return result
+
+
+@contextmanager
+def collect():
+    """
+    with内で記録した区間（child_of で別スレッドから記録したものを含む）を全体の記録から取り出す
+
+    with を抜けると、yield した辞書に区間ごとの所要時間（summary() と同じ形式、"total" は
+    with内の経過時間）が入る。取り出した区間は serveモード・CLIの "timings" には含まれない。
+
+    使用例:
+        with timings.collect() as collected:
+            ...
+        result.timings = collected
+    """
+    collected: Dict[str, float] = {}
+    stack = _span_stack()
+    collect_id = new_span_id()
+    stack.append(collect_id)
+    start = time.perf_counter()
+    try:
+        yield collected
+    finally:
+        end = time.perf_counter()
+        stack.pop()
+        with _lock:
+            parents = {item.span_id: item.parent_id for item in _spans}
+
+            def is_descendant(span_id: str) -> bool:
+                while span_id in parents:
+                    span_id = parents[span_id]
+                    if span_id == collect_id:
+                        return True
+                return False
+
+            taken = [item for item in _spans if is_descendant(item.span_id)]
+            taken_ids = {item.span_id for item in taken}
+            _spans[:] = [item for item in _spans if item.span_id not in taken_ids]
+        if enabled():
+            collected.update(_totals_ms(taken))
+            collected["total"] = round((end - start) * 1000, 1)
+
+
+def attach(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    計測が有効なら結果の辞書に "timings" と "memory" を追加して返す
+
+    PDF_PROCESSOR_METRICS_FILE が設定されていれば、同じ内容をメトリクスファイルにも追記する。
+    """
+    if enabled():
+        result["timings"] = summary()
+        result["memory"] = memory_usage.summary()
+        memory_usage.write_metrics(result["timings"], result["memory"])
+    return result
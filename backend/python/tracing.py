@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+トレース出力モジュール（OTLP互換のJSON）
+
+Nodeのジョブ（1回の変換処理）と、その中で起動されるPythonの各サブコマンド・処理段階・
+sofficeの実行を1つのトレースとして関連付け、OpenTelemetry（OTLP/JSON）形式のスパンとして出力します。
+OpenTelemetry Collector の otlpjsonfile レシーバーや、本モジュールの view コマンドで
+1ジョブの処理の流れ（ウォーターフォール）を確認できます。
+
+スパンの親子関係:
+    ジョブ（Node） → サブコマンド（pdf_parser 等、Pythonのプロセス） → 処理段階（timings.span） → soffice の実行
+
+トレースの指定（環境変数、または main.py の --trace-id / --parent-span-id / --job-id オプション）:
+    PDF_PROCESSOR_TRACE_ID: トレースID（32桁の16進文字列、未指定時は新規に生成）
+    PDF_PROCESSOR_PARENT_SPAN_ID: 親スパンID（Nodeのジョブのスパン、16桁の16進文字列）
+    PDF_PROCESSOR_JOB_ID: ジョブID（スパンの属性 job.id）
+
+出力先（いずれも未設定時は出力しない）:
+    PDF_PROCESSOR_TRACE_FILE: スパンをJSON行（ExportTraceServiceRequest）で追記するファイル
+    PDF_PROCESSOR_TRACE_FD: スパンをJSON行で書き込むファイルディスクリプタ番号
+
+使用法:
+    python3 tracing.py view <trace_file> [<trace_id>]   # トレースをウォーターフォール表示
+"""
+
+import os
+import re
+import sys
+import json
+import time
+from typing import Dict, Any, List, Optional
+
+import timings
+
+SERVICE_NAME = 'seikyu-henkan-python'
+SCOPE_NAME = 'seikyu-henkan'
+
+# perf_counter の値をUNIX時刻（ナノ秒）に変換するための基準
+_wall_ns_at_start = time.time_ns()
+_perf_at_start = time.perf_counter()
+
+# main.py のオプション・serveモードの要求で指定されたトレース（環境変数より優先）
+_context: Dict[str, Optional[str]] = {}
+# トレースIDの指定がない場合に生成したID
+_generated_trace_id: Optional[str] = None
+
+
+def set_context(trace_id: Optional[str] = None, parent_span_id: Optional[str] = None,
+                job_id: Optional[str] = None) -> None:
+    """トレースを指定（Noneの項目は環境変数の値を使う、トレースIDの指定がない場合は新しいIDを生成する）"""
+    global _generated_trace_id
+    _generated_trace_id = None
+    _context.clear()
+    for key, value in (("trace_id", trace_id), ("parent_span_id", parent_span_id), ("job_id", job_id)):
+        if value:
+            _context[key] = value
+
+
+def _valid_hex(value: Optional[str], length: int) -> Optional[str]:
+    if value and re.match(rf'^[0-9a-f]{{{length}}}$', value.lower()):
+        return value.lower()
+    return None
+
+
+def trace_id() -> str:
+    """トレースID（未指定・形式不正の場合はプロセスごとに生成）"""
+    global _generated_trace_id
+    value = _valid_hex(_context.get("trace_id") or os.getenv('PDF_PROCESSOR_TRACE_ID'), 32)
+    if value is None:
+        if _generated_trace_id is None:
+            _generated_trace_id = os.urandom(16).hex()
+        value = _generated_trace_id
+    return value
+
+
+def parent_span_id() -> Optional[str]:
+    return _valid_hex(_context.get("parent_span_id") or os.getenv('PDF_PROCESSOR_PARENT_SPAN_ID'), 16)
+
+
+def job_id() -> Optional[str]:
+    return _context.get("job_id") or os.getenv('PDF_PROCESSOR_JOB_ID') or None
+
+
+def enabled() -> bool:
+    """出力先が設定されているか"""
+    return bool(os.getenv('PDF_PROCESSOR_TRACE_FILE') or os.getenv('PDF_PROCESSOR_TRACE_FD'))
+
+
+def _unix_nano(perf: float) -> str:
+    return str(_wall_ns_at_start + int((perf - _perf_at_start) * 1e9))
+
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _span(name: str, span_id: str, parent_id: Optional[str], start: float, end: float,
+          attributes: Dict[str, Any], error: Optional[str] = None) -> Dict[str, Any]:
+    span = {
+        "traceId": trace_id(),
+        "spanId": span_id,
+        "name": name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": _unix_nano(start),
+        "endTimeUnixNano": _unix_nano(end),
+        "attributes": [_attribute(key, value) for key, value in attributes.items() if value is not None],
+        "status": {"code": 2, "message": error} if error else {"code": 1},
+    }
+    if parent_id:
+        span["parentSpanId"] = parent_id
+    return span
+
+
+def build_request(name: str, attributes: Dict[str, Any] = None, error: Optional[str] = None) -> Dict[str, Any]:
+    """
+    記録済みの区間（timings）をOTLPのExportTraceServiceRequest形式に変換
+
+    サブコマンド全体（timings の計測開始から現在まで）を name のスパンとし、
+    各区間をその子孫のスパンとする。
+    """
+    root_attributes = {"job.id": job_id(), "process.pid": os.getpid()}
+    root_attributes.update(attributes or {})
+    spans = [_span(
+        name, timings.root_span_id(), parent_span_id(), timings.started_at(), time.perf_counter(),
+        root_attributes, error
+    )]
+    for item in timings.spans():
+        spans.append(_span(item.name, item.span_id, item.parent_id, item.start, item.end, {"job.id": job_id()}))
+
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": spans}],
+        }]
+    }
+
+
+def export(name: str, attributes: Dict[str, Any] = None, error: Optional[str] = None) -> None:
+    """
+    出力先が設定されていれば、記録済みの区間をスパンとして出力
+
+    出力の失敗は処理に影響させない。
+    """
+    if not enabled():
+        return
+    line = json.dumps(build_request(name, attributes, error), ensure_ascii=False) + '\n'
+
+    trace_file = os.getenv('PDF_PROCESSOR_TRACE_FILE')
+    if trace_file:
+        try:
+            with open(trace_file, 'a', encoding='utf-8') as f:
+                f.write(line)
+        except OSError as e:
+            print(f"[tracing] トレースファイルへの書き込みに失敗しました: {e}", file=sys.stderr)
+
+    trace_fd = os.getenv('PDF_PROCESSOR_TRACE_FD')
+    if trace_fd:
+        try:
+            os.write(int(trace_fd), line.encode('utf-8'))
+        except (OSError, ValueError) as e:
+            print(f"[tracing] トレースの書き込みに失敗しました（fd={trace_fd}）: {e}", file=sys.stderr)
+
+
+def load_spans(trace_file: str) -> List[Dict[str, Any]]:
+    """トレースファイル（JSON行）の全スパン"""
+    spans = []
+    with open(trace_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            for resource_spans in json.loads(line).get("resourceSpans", []):
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    spans.extend(scope_spans.get("spans", []))
+    return spans
+
+
+def render_waterfall(spans: List[Dict[str, Any]], width: int = 60) -> str:
+    """1トレースのスパンを親子関係に沿ってウォーターフォール形式の文字列にする"""
+    if not spans:
+        return ''
+    start = min(int(span["startTimeUnixNano"]) for span in spans)
+    end = max(int(span["endTimeUnixNano"]) for span in spans)
+    total = max(end - start, 1)
+
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    span_ids = {span["spanId"] for span in spans}
+    for span in spans:
+        # 親が出力されていないスパン（Node側のジョブのスパンがない場合等）は最上位に表示
+        parent = span.get("parentSpanId") if span.get("parentSpanId") in span_ids else None
+        children.setdefault(parent, []).append(span)
+
+    lines = []
+
+    def walk(parent: Optional[str], depth: int) -> None:
+        for span in sorted(children.get(parent, []), key=lambda s: int(s["startTimeUnixNano"])):
+            span_start = int(span["startTimeUnixNano"]) - start
+            span_end = int(span["endTimeUnixNano"]) - start
+            offset = int(span_start * width / total)
+            length = max(1, int((span_end - span_start) * width / total))
+            bar = ' ' * offset + '█' * length
+            label = ('  ' * depth + span["name"])[:40]
+            lines.append(f"{label:<40} {(span_end - span_start) / 1e6:>10.1f}ms |{bar:<{width}}|")
+            walk(span["spanId"], depth + 1)
+
+    walk(None, 0)
+    return '\n'.join(lines)
+
+
+def main():
+    """
+    メイン関数
+
+    トレースファイルのスパンをトレースごとにウォーターフォール形式で表示する。
+    """
+    if len(sys.argv) not in (3, 4) or sys.argv[1] != 'view':
+        print(json.dumps({
+            "error": "引数が不正です",
+            "usage": "python3 tracing.py view <trace_file> [<trace_id>]"
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        spans = load_spans(sys.argv[2])
+        traces: Dict[str, List[Dict[str, Any]]] = {}
+        for span in spans:
+            traces.setdefault(span["traceId"], []).append(span)
+        if len(sys.argv) == 4:
+            traces = {key: value for key, value in traces.items() if key == sys.argv[3]}
+
+        for key, trace_spans in traces.items():
+            print(f"trace {key}")
+            print(render_waterfall(trace_spans))
+            print()
+
+    except Exception as e:
+        import traceback
+        print(json.dumps({
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc()
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import { supabase } from '../lib/supabase'
 import { getAllCompanies } from './companiesService'
 import { spawn } from 'child_process'
+import { randomBytes } from 'crypto'
 import path from 'path'
 import fs from 'fs/promises'
 import type {
@@ -430,19 +431,144 @@ export async function validateExcelFilename(
 }
 
 /**
- * Pythonスクリプトを実行する汎用ヘルパー
+ * Pythonスクリプトの結果に含まれる処理時間（timings、ミリ秒）とメモリ使用量（memory、KB）をログに出力する
+ *
+ * 後続のスクリプトに渡すデータに含めないよう、結果からは削除する。
+ *
+ * @param stage - 処理段階名（ログ表示用）
+ * @param result - Pythonスクリプトの結果（JSONをパースしたもの）
+ */
+function logPythonTimings(
+  stage: string,
+  result: { timings?: Record<string, number>; memory?: { rss_peak_kb?: number; children_max_rss_kb?: number } }
+): void {
+  if (result && result.timings) {
+    console.log(`[timings] ${stage}: ${JSON.stringify(result.timings)}`)
+    delete result.timings
+  }
+  if (result && result.memory) {
+    console.log(
+      `[memory] ${stage}: rss_peak_kb=${result.memory.rss_peak_kb} children_max_rss_kb=${result.memory.children_max_rss_kb}`
+    )
+    delete result.memory
+  }
+}
+
+/**
+ * ジョブ（1回の変換処理）のトレース
+ *
+ * Pythonの各サブコマンドのスパンをジョブのスパンの子として出力させるため、
+ * トレースID・ジョブのスパンIDを環境変数でPythonに渡す（backend/python/tracing.py参照）。
+ */
+interface JobTrace {
+  traceId: string
+  spanId: string
+  jobId: string
+  startTimeUnixNano: string
+}
+
+function startJobTrace(jobId: string): JobTrace {
+  return {
+    traceId: randomBytes(16).toString('hex'),
+    spanId: randomBytes(8).toString('hex'),
+    jobId,
+    startTimeUnixNano: `${Date.now()}000000`,
+  }
+}
+
+/**
+ * ジョブのスパンをPDF_PROCESSOR_TRACE_FILEに追記（未設定時は何もしない）
+ *
+ * Pythonのスパンと同じOTLP互換のJSON行形式。書き込みの失敗は処理に影響させない。
+ */
+async function exportJobTrace(
+  trace: JobTrace,
+  companyName: string,
+  errorMessage?: string
+): Promise<void> {
+  const traceFile = process.env.PDF_PROCESSOR_TRACE_FILE
+  if (!traceFile) {
+    return
+  }
+  const span = {
+    traceId: trace.traceId,
+    spanId: trace.spanId,
+    name: 'executeProcess',
+    kind: 1,
+    startTimeUnixNano: trace.startTimeUnixNano,
+    endTimeUnixNano: `${Date.now()}000000`,
+    attributes: [
+      { key: 'job.id', value: { stringValue: trace.jobId } },
+      { key: 'company', value: { stringValue: companyName } },
+    ],
+    status: errorMessage ? { code: 2, message: errorMessage } : { code: 1 },
+  }
+  const request = {
+    resourceSpans: [
+      {
+        resource: {
+          attributes: [{ key: 'service.name', value: { stringValue: 'seikyu-henkan-backend' } }],
+        },
+        scopeSpans: [{ scope: { name: 'seikyu-henkan' }, spans: [span] }],
+      },
+    ],
+  }
+  try {
+    await fs.appendFile(traceFile, JSON.stringify(request) + '\n')
+  } catch (error) {
+    console.error('[trace] トレースファイルへの書き込みに失敗しました:', error)
+  }
+}
+
+/**
+ * 入力ファイルを標準入力のフレーム形式にする（backend/python/stream_input.py と同じ形式）
+ *
+ * フレーム: [名前の長さ: 4バイト][名前: UTF-8][データの長さ: 8バイト][データ]（ビッグエンディアン）
+ * Python側では引数に stdin:<名前> を指定すると、一時ファイルを使わずにメモリ上で読み込む。
+ *
+ * @param frames - 名前 → データ
+ * @returns 標準入力に書き込むバイト列
+ */
+function encodeInputFrames(frames: Record<string, Buffer>): Buffer {
+  const parts: Buffer[] = []
+  for (const [name, data] of Object.entries(frames)) {
+    const encodedName = Buffer.from(name, 'utf-8')
+    const header = Buffer.alloc(4 + encodedName.length + 8)
+    header.writeUInt32BE(encodedName.length, 0)
+    encodedName.copy(header, 4)
+    header.writeBigUInt64BE(BigInt(data.length), 4 + encodedName.length)
+    parts.push(header, data)
+  }
+  return Buffer.concat(parts)
+}
+
+/**
+ * Pythonスクリプトの実行結果（標準出力はバイト列のまま）
+ */
+interface PythonOutput {
+  code: number
+  stdout: Buffer
+  stderr: string
+}
+
+/**
+ * Pythonスクリプトを起動し、終了まで待つ
  *
  * 開発時: python3コマンドでスクリプトを直接実行
  * Electron本番時: PYTHON_EXECUTABLE環境変数で指定されたexeを使用
  *
  * @param scriptName - Pythonスクリプト名（pdf_parser.py等）
  * @param args - コマンドライン引数
- * @returns Pythonスクリプトの標準出力（JSON形式）
+ * @param trace - ジョブのトレース（指定時はPythonのスパンをジョブのスパンの子として出力させる）
+ * @param input - 標準入力に書き込むデータ（encodeInputFrames の出力、引数の stdin:<名前> で参照する）
+ * @returns 終了コード・標準出力・標準エラー出力
  */
-async function runPythonScript(
+function spawnPythonScript(
   scriptName: string,
-  args: string[]
-): Promise<string> {
+  args: string[],
+  trace?: JobTrace,
+  input?: Buffer
+): Promise<PythonOutput> {
   return new Promise((resolve, reject) => {
     let pythonCommand: string
     let pythonArgs: string[]
@@ -462,15 +588,22 @@ async function runPythonScript(
       pythonArgs = [scriptPath, ...args]
     }
 
+    const env: NodeJS.ProcessEnv = { ...process.env }
+    if (trace) {
+      env.PDF_PROCESSOR_TRACE_ID = trace.traceId
+      env.PDF_PROCESSOR_PARENT_SPAN_ID = trace.spanId
+      env.PDF_PROCESSOR_JOB_ID = trace.jobId
+    }
+
     const pythonProcess = spawn(pythonCommand, pythonArgs, {
-      env: { ...process.env },
+      env,
     })
 
-    let stdout = ''
+    const stdoutChunks: Buffer[] = []
     let stderr = ''
 
     pythonProcess.stdout.on('data', (data: Buffer) => {
-      stdout += data.toString()
+      stdoutChunks.push(data)
     })
 
     pythonProcess.stderr.on('data', (data: Buffer) => {
@@ -478,22 +611,118 @@ async function runPythonScript(
     })
 
     pythonProcess.on('close', (code: number) => {
-      if (code !== 0) {
-        // stderrが空の場合はstdoutからエラーメッセージを取得
-        // （excel_validator.pyは検証エラー時にstdoutにJSON出力してexit(1)するため）
-        const errorMessage = stderr.trim() || stdout.trim() || '不明なエラー'
-        reject(new Error(`Pythonスクリプトエラー: ${errorMessage}`))
-      } else {
-        resolve(stdout.trim())
-      }
+      resolve({ code, stdout: Buffer.concat(stdoutChunks), stderr })
     })
 
     pythonProcess.on('error', (error: Error) => {
       reject(new Error(`Pythonプロセス起動エラー: ${error.message}`))
     })
+
+    // 入力を読み込まずに終了した場合の書き込みエラー（EPIPE）は終了コードで判定する
+    pythonProcess.stdin.on('error', () => {})
+    pythonProcess.stdin.end(input)
   })
 }
 
+/**
+ * Pythonスクリプトを実行する汎用ヘルパー
+ *
+ * @param scriptName - Pythonスクリプト名（pdf_parser.py等）
+ * @param args - コマンドライン引数
+ * @param trace - ジョブのトレース（指定時はPythonのスパンをジョブのスパンの子として出力させる）
+ * @param input - 標準入力に書き込むデータ（encodeInputFrames の出力、引数の stdin:<名前> で参照する）
+ * @returns Pythonスクリプトの標準出力（JSON形式）
+ */
+async function runPythonScript(
+  scriptName: string,
+  args: string[],
+  trace?: JobTrace,
+  input?: Buffer
+): Promise<string> {
+  const { code, stdout, stderr } = await spawnPythonScript(scriptName, args, trace, input)
+  const output = stdout.toString().trim()
+  if (code !== 0) {
+    // stderrが空の場合はstdoutからエラーメッセージを取得
+    // （excel_validator.pyは検証エラー時にstdoutにJSON出力してexit(1)するため）
+    const errorMessage = stderr.trim() || output || '不明なエラー'
+    throw new Error(`Pythonスクリプトエラー: ${errorMessage}`)
+  }
+  return output
+}
+
+/**
+ * Pythonスクリプトの出力バンドル（backend/python/stream_output.py と同じ形式）
+ */
+interface PythonBundle {
+  // 結果のJSON（runPythonScript の出力を JSON.parse したものと同じ）
+  header: any
+  artifacts: Record<string, Buffer>
+}
+
+/**
+ * 標準出力のバンドルを結果のJSONと出力ファイルに分解する
+ *
+ * バンドル: [ヘッダーの長さ: 4バイト][ヘッダー: UTF-8のJSON][データ1][データ2]...（ビッグエンディアン）
+ * ヘッダーの "artifacts"（name, filename, length）の順にデータが続く。
+ *
+ * @param output - Pythonスクリプトの標準出力
+ * @returns 結果のJSONと、名前 → 出力ファイルのデータ
+ */
+function decodeOutputBundle(output: Buffer): PythonBundle {
+  if (output.length < 4) {
+    throw new Error('出力バンドルが不正です: ヘッダーがありません')
+  }
+  const headerLength = output.readUInt32BE(0)
+  let offset = 4 + headerLength
+  if (output.length < offset) {
+    throw new Error('出力バンドルが不正です: ヘッダーが途中で終わっています')
+  }
+  const header = JSON.parse(output.subarray(4, offset).toString('utf-8'))
+  const artifacts: Record<string, Buffer> = {}
+  for (const artifact of (header.artifacts || []) as { name: string; length: number }[]) {
+    if (output.length < offset + artifact.length) {
+      throw new Error(`出力バンドルが不正です: ${artifact.name} が途中で終わっています`)
+    }
+    artifacts[artifact.name] = output.subarray(offset, offset + artifact.length)
+    offset += artifact.length
+  }
+  return { header, artifacts }
+}
+
+/**
+ * 出力ファイルを標準出力のバンドルで受け取るPythonスクリプトを実行する
+ *
+ * 出力先に stdout:（excel_editor は stdout:<ファイル名>）を指定した呼び出しに使う。
+ * 出力ファイルは一時ファイルを経由せず、バンドルからメモリ上で受け取る。
+ *
+ * @param scriptName - Pythonスクリプト名（excel_editor.py等）
+ * @param args - コマンドライン引数
+ * @param trace - ジョブのトレース
+ * @param input - 標準入力に書き込むデータ（encodeInputFrames の出力）
+ * @returns 結果のJSONと出力ファイル
+ */
+async function runPythonScriptBundle(
+  scriptName: string,
+  args: string[],
+  trace?: JobTrace,
+  input?: Buffer
+): Promise<PythonBundle> {
+  const { code, stdout, stderr } = await spawnPythonScript(scriptName, args, trace, input)
+  if (code !== 0) {
+    // 検証エラー時は結果のJSON（バンドルのヘッダー）を標準出力に出力してexit(1)する
+    let errorMessage = stderr.trim()
+    if (!errorMessage && stdout.length > 0) {
+      try {
+        errorMessage = JSON.stringify(decodeOutputBundle(stdout).header)
+      } catch {
+        errorMessage = stdout.toString().trim()
+      }
+    }
+    throw new Error(`Pythonスクリプトエラー: ${errorMessage || '不明なエラー'}`)
+  }
+  return decodeOutputBundle(stdout)
+}
+
 /**
  * 処理結果をDBに保存
  *
@@ -607,11 +836,12 @@ export async function executeProcess(
   templateExcel: Buffer
 ): Promise<ProcessResult> {
   const startTime = Date.now()
-  const tmpDir = '/tmp'
   const timestamp = Date.now()
+  const trace = startJobTrace(String(timestamp))
+  let jobErrorMessage: string | undefined
 
   try {
-    // 1. 一時ファイル保存
+    // 1. 入力ファイルの準備（一時ファイルには書き出さず、標準入力で渡す）
     const estimateSlot = pdfSlots.find((s) => s.type === 'estimate')
     const invoiceSlot = pdfSlots.find((s) => s.type === 'invoice')
     const orderConfirmationSlot = pdfSlots.find(
@@ -628,35 +858,29 @@ export async function executeProcess(
       throw new Error('必須PDFファイルが不足しています')
     }
 
-    const estimatePath = path.join(tmpDir, `estimate_${timestamp}.pdf`)
-    const invoicePath = path.join(tmpDir, `invoice_${timestamp}.pdf`)
-    const orderConfirmationPath = path.join(
-      tmpDir,
-      `order_confirmation_${timestamp}.pdf`
-    )
-    const deliveryPath = path.join(tmpDir, `delivery_${timestamp}.pdf`)
-    const templatePath = path.join(tmpDir, `template_${timestamp}.xlsx`)
-
-    await fs.writeFile(estimatePath, estimateSlot.file.buffer)
-    await fs.writeFile(invoicePath, invoiceSlot.file.buffer)
-    await fs.writeFile(orderConfirmationPath, orderConfirmationSlot.file.buffer)
-    await fs.writeFile(deliveryPath, deliverySlot.file.buffer)
-    await fs.writeFile(templatePath, templateExcel)
+    // 納品書は保存のみ（Python側では使わない）
+    const estimateInput = encodeInputFrames({ estimate: estimateSlot.file.buffer })
+    const invoiceInput = encodeInputFrames({ invoice: invoiceSlot.file.buffer })
+    const orderConfirmationInput = encodeInputFrames({
+      order_confirmation: orderConfirmationSlot.file.buffer,
+    })
 
     // 2. PDF解析（pdfplumber）
     const estimateDataJson = await runPythonScript('pdf_parser.py', [
       companyName,
       'estimate',
-      estimatePath,
-    ])
+      'stdin:estimate',
+    ], trace, estimateInput)
     const invoiceDataJson = await runPythonScript('pdf_parser.py', [
       companyName,
       'invoice',
-      invoicePath,
-    ])
+      'stdin:invoice',
+    ], trace, invoiceInput)
 
     const estimateData = JSON.parse(estimateDataJson)
     const invoiceData = JSON.parse(invoiceDataJson)
+    logPythonTimings('pdf_parser(estimate)', estimateData)
+    logPythonTimings('pdf_parser(invoice)', invoiceData)
 
     if (estimateData.error || invoiceData.error) {
       throw new Error(
@@ -670,16 +894,17 @@ export async function executeProcess(
       const orderConfirmationDataJson = await runPythonScript('pdf_parser.py', [
         companyName,
         'order_confirmation',
-        orderConfirmationPath,
-      ])
+        'stdin:order_confirmation',
+      ], trace, orderConfirmationInput)
       orderConfirmationData = JSON.parse(orderConfirmationDataJson)
+      logPythonTimings('pdf_parser(order_confirmation)', orderConfirmationData)
       if (orderConfirmationData && (orderConfirmationData as { error?: string }).error) {
         throw new Error(`PDF解析エラー: ${(orderConfirmationData as { error: string }).error}`)
       }
     }
 
-    // 3. Excel編集（openpyxl）
-    const outputExcelPath = path.join(tmpDir, `output_${timestamp}.xlsx`)
+    // 3. Excel編集（openpyxl）- 編集済みExcelはファイルに書き出さず、標準出力のバンドルで受け取る
+    // ※入力データは明細行が多いとコマンドライン引数の上限（ARG_MAX）に近づくため、標準入力のフレームで渡す
     const combinedData = {
       estimate: estimateData,
       invoice: invoiceData,
@@ -688,14 +913,18 @@ export async function executeProcess(
       estimate_filename: estimateSlot.file.filename,
     }
 
-    const excelResultJson = await runPythonScript('excel_editor.py', [
+    const excelBundle = await runPythonScriptBundle('excel_editor.py', [
       companyName,
-      templatePath,
-      outputExcelPath,
-      JSON.stringify(combinedData),
-    ])
+      'stdin:template',
+      'stdout:output.xlsx',
+      'stdin:data',
+    ], trace, encodeInputFrames({
+      template: templateExcel,
+      data: Buffer.from(JSON.stringify(combinedData), 'utf-8'),
+    }))
 
-    const excelResult = JSON.parse(excelResultJson)
+    const excelResult = excelBundle.header
+    logPythonTimings('excel_editor', excelResult)
 
     if (excelResult.error) {
       throw new Error(`Excel編集エラー: ${excelResult.error}`)
@@ -752,27 +981,50 @@ export async function executeProcess(
       }
     }
 
-    // 4. Excel検証（LibreOfficeで数式計算後のセル値を取得して検証）
-    // ※PDF生成前に検証することで、エラー時のPDF生成を回避
+    // 4. 編集済みExcel（バンドルで受け取ったもの、PDF生成には標準入力で渡す）
+    const excelBuffer = excelBundle.artifacts.excel
+    console.log('[DEBUG] Excel受け取り完了、サイズ:', excelBuffer?.length ?? 0)
+    if (!excelBuffer || excelBuffer.length === 0) {
+      throw new Error('Excel読み込みエラー: ファイルが空です')
+    }
+
+    // 5. PDF生成＋検証（LibreOffice起動は1回）- 注文書シートと検収書シートを個別にPDF変換し、
+    // 生成したPDFの表示値（注文番号・金額・明細タイトル等）を検証する
+    // ※検証エラー時はPDFを削除してエラー終了する
+    // ※履歴に保存するPDFは最適化する（--optimize: ストリーム再圧縮・重複オブジェクト統合）
+    // ※生成したPDFは標準出力のバンドルで受け取る（Python側の作業ディレクトリは返す前に削除される）
     const validationData = {
       invoice: invoiceData,
       estimate: estimateData,
       items_count: invoiceData.items?.length || 1,  // オフ・ビート・ワークスの動的行数用
     }
-    const validationResultJson = await runPythonScript('excel_validator.py', [
-      outputExcelPath,
+    const pdfBundle = await runPythonScriptBundle('pdf_generator.py', [
+      'render_and_validate',
+      'stdin:excel',
+      'stdout:',
       companyName,
-      JSON.stringify(validationData),
-    ])
+      'stdin:validation_data',
+      '--optimize',
+    ], trace, encodeInputFrames({
+      excel: excelBuffer,
+      validation_data: Buffer.from(JSON.stringify(validationData), 'utf-8'),
+    }))
 
-    const validationResult = JSON.parse(validationResultJson)
+    const pdfResult = pdfBundle.header
+    logPythonTimings('render_and_validate', pdfResult)
 
-    if (!validationResult.success) {
+    if (pdfResult.error) {
+      throw new Error(`PDF生成エラー: ${pdfResult.error}`)
+    }
+
+    const validation = pdfResult.validation
+
+    if (!validation.success) {
       // 検証エラーの詳細をログに出力
-      console.error('Excel検証エラー:', validationResult.errors)
+      console.error('PDF検証エラー:', validation.errors)
 
       // エラーメッセージを整形
-      const errorMessages = validationResult.errors.join('\n')
+      const errorMessages = validation.errors.join('\n')
       throw new Error(`Excel検証エラー:\n${errorMessages}`)
     }
 
@@ -809,15 +1061,15 @@ export async function executeProcess(
       }
     }
 
-    // Excel検証結果（配列形式で返ってくる）
-    console.log(`[✓] Excel検証:`)
-    if (validationResult.checks && Array.isArray(validationResult.checks)) {
-      const passedCount = validationResult.checks.filter((c: { passed: boolean }) => c.passed).length
-      const totalCount = validationResult.checks.length
+    // 生成PDFの検証結果（配列形式で返ってくる）
+    console.log(`[✓] PDF検証:`)
+    if (validation.checks && Array.isArray(validation.checks)) {
+      const passedCount = validation.checks.filter((c: { passed: boolean }) => c.passed).length
+      const totalCount = validation.checks.length
       console.log(`    チェック項目: ${passedCount}/${totalCount} OK`)
 
       // 各チェック項目を表示
-      for (const check of validationResult.checks) {
+      for (const check of validation.checks) {
         const status = check.passed ? '✓' : '✗'
         console.log(`    [${status}] ${check.sheet} ${check.cell}(${check.item}): ${check.actual}`)
       }
@@ -826,32 +1078,13 @@ export async function executeProcess(
     console.log('     全チェック完了 - 処理続行')
     console.log('========================================\n')
 
-    // 5. Excelバッファを読み込み（PDF生成前に読み込むことで、LibreOfficeによる上書きの影響を受けない）
-    console.log('[DEBUG] Excelファイル読み込み開始:', outputExcelPath)
-    const excelBuffer = await fs.readFile(outputExcelPath)
-    console.log('[DEBUG] Excelファイル読み込み完了、サイズ:', excelBuffer.length)
-    if (excelBuffer.length === 0) {
-      throw new Error('Excel読み込みエラー: ファイルが空です')
+    // 生成したPDF（バンドルで受け取ったもの）
+    const orderPdfBuffer = pdfBundle.artifacts.order
+    const inspectionPdfBuffer = pdfBundle.artifacts.inspection
+    if (!orderPdfBuffer || !inspectionPdfBuffer) {
+      throw new Error('PDF生成エラー: 生成したPDFを受け取れませんでした')
     }
 
-    // 6. PDF生成（LibreOffice）- 注文書シートと検収書シートを個別にPDF変換
-    // ※検証OKの場合のみ実行
-    const outputPdfDir = tmpDir
-    const pdfResultJson = await runPythonScript('pdf_generator.py', [
-      outputExcelPath,
-      outputPdfDir,
-    ])
-
-    const pdfResult = JSON.parse(pdfResultJson)
-
-    if (pdfResult.error) {
-      throw new Error(`PDF生成エラー: ${pdfResult.error}`)
-    }
-
-    // PDFファイルを読み込み
-    const orderPdfBuffer = await fs.readFile(pdfResult.order_pdf_path)
-    const inspectionPdfBuffer = await fs.readFile(pdfResult.inspection_pdf_path)
-
     // 7. ファイル名生成（処理ルール確定版: 2025-12-08）
     // YYMM形式（年下2桁 + 月2桁）- 見積書ファイル名から処理対象月を抽出
     let yearMonth = ''
@@ -922,20 +1155,6 @@ export async function executeProcess(
       // 処理自体は成功しているので、エラーはログに残すのみで続行
     }
 
-    // 9. 一時ファイル削除
-    await Promise.all([
-      fs.unlink(estimatePath),
-      fs.unlink(invoicePath),
-      fs.unlink(orderConfirmationPath),
-      fs.unlink(deliveryPath),
-      fs.unlink(templatePath),
-      fs.unlink(outputExcelPath),
-      fs.unlink(pdfResult.order_pdf_path),
-      fs.unlink(pdfResult.inspection_pdf_path),
-    ]).catch((error) => {
-      console.error('一時ファイル削除エラー:', error)
-    })
-
     return {
       excelFilename,
       orderPdfFilename,
@@ -952,6 +1171,7 @@ export async function executeProcess(
     const processingTime = Math.round((endTime - startTime) / 1000)
 
     console.error('[executeProcess] エラー発生:', errorMessage)
+    jobErrorMessage = errorMessage
 
     try {
       // processed_filesに失敗レコードを保存
@@ -992,5 +1212,7 @@ export async function executeProcess(
     }
 
     throw error
+  } finally {
+    await exportJobTrace(trace, companyName, jobErrorMessage)
   }
 }
@@ -29,7 +29,7 @@ New-Item -ItemType Directory -Force -Path $outputDir | Out-Null
 
 # 依存パッケージインストール
 Write-Host "`n[1/4] 依存パッケージのインストール..." -ForegroundColor Yellow
-pip install pyinstaller pdfplumber openpyxl python-dateutil pypdf --quiet
+pip install pyinstaller pdfplumber openpyxl python-dateutil "pypdf>=5.0.0" --quiet
 if ($LASTEXITCODE -ne 0) {
     Write-Host "ERROR: 依存パッケージのインストールに失敗しました" -ForegroundColor Red
     exit 1
@@ -54,6 +54,21 @@ $pyinstallerArgs = @(
     "--add-data", "${pythonDir}/excel_editor.py;.",
     "--add-data", "${pythonDir}/excel_validator.py;.",
     "--add-data", "${pythonDir}/pdf_generator.py;.",
+    "--add-data", "${pythonDir}/excel_formula.py;.",
+    "--add-data", "${pythonDir}/excel_preview.py;.",
+    "--add-data", "${pythonDir}/pipeline.py;.",
+    "--add-data", "${pythonDir}/stream_input.py;.",
+    "--add-data", "${pythonDir}/stream_output.py;.",
+    "--add-data", "${pythonDir}/api.py;.",
+    "--add-data", "${pythonDir}/scratch.py;.",
+    "--add-data", "${pythonDir}/environment_probe.py;.",
+    "--add-data", "${pythonDir}/soffice_runner.py;.",
+    "--add-data", "${pythonDir}/render_cache.py;.",
+    "--add-data", "${pythonDir}/timings.py;.",
+    "--add-data", "${pythonDir}/memory_usage.py;.",
+    "--add-data", "${pythonDir}/metrics.py;.",
+    "--add-data", "${pythonDir}/tracing.py;.",
+    "--add-data", "${pythonDir}/profiler.py;.",
     "--hidden-import", "pdfplumber",
     "--hidden-import", "openpyxl",
     "--hidden-import", "pypdf",